@@ -0,0 +1,96 @@
+"""
+Compare the peak memory of the supply chain (months of stock) scorecard
+pipeline with a dict per cell and with the compact ScorecardGrid, over a
+synthetic national facility grid
+
+    python -m benchmarks.grid [num_facilities] [num_supplies]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from itertools import chain
+
+from cannula import grabbag
+from cannula.grid import ScorecardGrid, nan_to_none
+
+OU_PATH_FIELDS = ('district', 'subcounty', 'facility')
+FILL_RATIO = 0.8 # proportion of grid addresses that have a value
+AVG_MONTH_DAYS = 30
+
+def make_ou_list(num_facilities):
+    ou_list = list()
+    for i in range(num_facilities):
+        ou_list.append(('District %02d' % (i % 120,), 'Subcounty %03d' % (i % 1400,), 'Facility %05d' % (i,)))
+    return sorted(ou_list)
+
+def make_values(ou_list, de_names):
+    values = list()
+    for ou_path in ou_list:
+        for de_name in de_names:
+            if random.random() < FILL_RATIO:
+                v = dict(zip(OU_PATH_FIELDS, ou_path))
+                v.update({ 'de_name': de_name, 'cat_combo': None, 'period': None, 'values_count': 1, 'numeric_sum': float(random.randint(0, 29)) })
+                values.append(v)
+    return values
+
+def months_of_stock(days_out, utilized, on_hand):
+    if grabbag.all_not_none(utilized, days_out) and days_out < AVG_MONTH_DAYS:
+        avg_consumption = utilized * (AVG_MONTH_DAYS / (AVG_MONTH_DAYS - days_out))
+    else:
+        avg_consumption = None
+    if grabbag.all_not_none(on_hand) and avg_consumption and on_hand > 0:
+        return on_hand/avg_consumption
+    return -on_hand if on_hand else None
+
+def dict_pipeline(ou_list, de_meta, values):
+    def default_cell(row, col):
+        val_dict = dict(zip(OU_PATH_FIELDS, row))
+        val_dict.update({ 'cat_combo': col[1], 'de_name': col[0], 'numeric_sum': None })
+        return val_dict
+
+    grid = list(grabbag.pivot(ou_list, de_meta, values, lambda x: (x['district'], x['subcounty'], x['facility']), lambda x: (x['de_name'], x['cat_combo']), default_cell))
+    grouped_vals = grabbag.pivot_rows(ou_list, grid)
+    for group in grouped_vals:
+        ou_path, stock_vals = group
+        calculated_vals = list()
+        for days_out, utilized, on_hand in grabbag.grouper(stock_vals, 3):
+            mos = dict(zip(OU_PATH_FIELDS, ou_path))
+            mos.update({ 'de_name': on_hand['de_name'], 'cat_combo': None, 'numeric_sum': months_of_stock(days_out['numeric_sum'], utilized['numeric_sum'], on_hand['numeric_sum']) })
+            calculated_vals.append(mos)
+        group[1] = calculated_vals
+    return grouped_vals
+
+def grid_pipeline(ou_list, de_meta, values):
+    stock_grid = ScorecardGrid.from_values(OU_PATH_FIELDS, ou_list, de_meta, values, lambda x: (x['district'], x['subcounty'], x['facility']), lambda x: (x['de_name'], x['cat_combo']))
+    mos_grid = ScorecardGrid(OU_PATH_FIELDS, de_meta[2::3])
+    for ou_path, stock_row in stock_grid:
+        mos_grid.append(ou_path, [months_of_stock(*v) for v in grabbag.grouper(map(nan_to_none, stock_row.values), 3)])
+    return mos_grid
+
+def measured(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+if __name__ == '__main__':
+    num_facilities = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    num_supplies = int(sys.argv[2]) if len(sys.argv) > 2 else 39
+    random.seed(1)
+
+    ou_list = make_ou_list(num_facilities)
+    de_names = list(chain.from_iterable((s+' Days out of stock', s+' Quantity Utilized', s+' Stock at Hand') for s in ('Supply %02d' % (i,) for i in range(num_supplies))))
+    de_meta = [(de_name, None) for de_name in de_names]
+    values = make_values(ou_list, de_names)
+
+    dict_time, dict_peak, dict_result = measured(dict_pipeline, ou_list, de_meta, values)
+    grid_time, grid_peak, grid_result = measured(grid_pipeline, ou_list, de_meta, values)
+    assert [[c['numeric_sum'] for c in cells] for _, cells in dict_result] == [[c['numeric_sum'] for c in cells] for _, cells in grid_result], 'grid output differs from dict output'
+
+    print('%d facilities x %d data elements (%d values)' % (num_facilities, len(de_names), len(values)))
+    print('dict per cell:  peak %6.1f MB, %.2fs' % (dict_peak/2**20, dict_time))
+    print('ScorecardGrid:  peak %6.1f MB, %.2fs' % (grid_peak/2**20, grid_time))
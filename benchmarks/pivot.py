@@ -0,0 +1,82 @@
+"""
+Compare the old rasterize + sorted + groupby scorecard pipeline with the
+dict-indexed pivot over a synthetic national facility grid
+
+    python -m benchmarks.pivot [num_facilities] [num_columns]
+"""
+import random
+import sys
+import time
+from itertools import chain, groupby, product
+
+from cannula import grabbag
+
+OU_PATH_FIELDS = ('district', 'subcounty', 'facility')
+COLUMNS_PER_QUERY = 20 # views combine ~5-15 querysets of a few data elements each
+FILL_RATIO = 0.6 # proportion of grid addresses that have a value
+
+def ou_path_from_dict(v_dict):
+    return tuple((v_dict[f] for f in OU_PATH_FIELDS if f in v_dict))
+
+def make_ou_list(num_facilities):
+    ou_list = list()
+    for i in range(num_facilities):
+        ou_list.append(('District %02d' % (i % 120,), 'Subcounty %03d' % (i % 1400,), 'Facility %05d' % (i,)))
+    return sorted(ou_list)
+
+def make_result_sets(ou_list, num_columns):
+    result_sets = list()
+    for q in range(0, num_columns, COLUMNS_PER_QUERY):
+        de_meta = list(product(['DE %03d' % (c,) for c in range(q, min(q+COLUMNS_PER_QUERY, num_columns))], (None,)))
+        values = list()
+        for ou_path, (de_name, cat_combo) in product(ou_list, de_meta):
+            if random.random() < FILL_RATIO:
+                v = dict(zip(OU_PATH_FIELDS, ou_path))
+                v.update({ 'de_name': de_name, 'cat_combo': cat_combo, 'numeric_sum': random.randint(0, 500) })
+                values.append(v)
+        result_sets.append((de_meta, values))
+    return result_sets
+
+def default_cell(row, col):
+    val_dict = dict(zip(OU_PATH_FIELDS, row))
+    de_name, subcategory = col
+    val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+    return val_dict
+
+def col_key(x):
+    return (x['de_name'], x['cat_combo'])
+
+def old_pipeline(ou_list, result_sets):
+    grids = [list(grabbag.rasterize(ou_list, de_meta, values, ou_path_from_dict, col_key, default_cell)) for de_meta, values in result_sets]
+    return [[k, list(g)] for k, g in groupby(sorted(chain(*grids), key=ou_path_from_dict), key=ou_path_from_dict)]
+
+def new_pipeline(ou_list, result_sets):
+    grids = [list(grabbag.pivot(ou_list, de_meta, values, ou_path_from_dict, col_key, default_cell)) for de_meta, values in result_sets]
+    return grabbag.pivot_rows(ou_list, *grids)
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+if __name__ == '__main__':
+    num_facilities = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(1)
+
+    ou_list = make_ou_list(num_facilities)
+    result_sets = make_result_sets(ou_list, num_columns)
+
+    old_time, old_grid = timed(old_pipeline, ou_list, result_sets)
+    new_time, new_grid = timed(new_pipeline, ou_list, result_sets)
+    assert old_grid == new_grid, 'pivot output differs from rasterize output'
+
+    print('%d facilities x %d columns (%d result sets)' % (num_facilities, num_columns, len(result_sets)))
+    print('rasterize + sorted + groupby: %.2fs' % (old_time,))
+    print('pivot + pivot_rows:           %.2fs' % (new_time,))
+    print('speedup:                      %.1fx' % (old_time/new_time,))
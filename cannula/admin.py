@@ -1,14 +1,19 @@
 from django.contrib import admin
+from django.db import transaction
 
 from mptt.admin import MPTTModelAdmin
 
-from .models import SourceDocument, OrgUnit, DataElement, DataValue, Category, CategoryCombo, ValidationRule, load_excel_to_datavalues, load_excel_to_validations
+from .models import SourceDocument, OrgUnit, DataElement, DataValue, Category, CategoryCombo, ValidationRule, load_excel_to_datavalues, load_excel_to_validations, refresh_validation_views
+from .warming import warm_scorecards_after_import
 
 def load_document_values(modeladmin, request, queryset):
+    # commit the import before warming the scorecard cache, as data_workflow_new does
+    with transaction.atomic():
+        for doc in queryset:
+            load_excel_to_datavalues(doc)
     for doc in queryset:
-        all_values = load_excel_to_datavalues(doc)
-        for site_name, site_vals in all_values.items():
-            DataValue.objects.bulk_create(site_vals)
+        refresh_validation_views(doc)
+    warm_scorecards_after_import()
 
 load_document_values.short_description = 'Load data values from document into DB'
 
@@ -24,6 +29,11 @@ class SourceDocumentAdmin(admin.ModelAdmin):
     ordering = ['uploaded_at']
     actions = [load_document_values, load_document_validations]
 
+    @transaction.non_atomic_requests
+    def changelist_view(self, request, extra_context=None):
+        # actions are run from the changelist, load_document_values commits its own transaction
+        return super(SourceDocumentAdmin, self).changelist_view(request, extra_context)
+
 class OrgUnitAdmin(MPTTModelAdmin):
     list_display = ['name', 'level']
 
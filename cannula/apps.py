@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class CannulaConfig(AppConfig):
+    name = 'cannula'
+
+    def ready(self):
+        from . import signals # connect the signal handlers
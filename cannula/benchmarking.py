@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+import random
+import time
+import tracemalloc
+
+from .dateutil import current_and_previous_periods
+from .models import CategoryCombo, DataElement, DataValue, DataValueQuerySet, DataVersion, OrgUnit, SourceDocument, get_default_category_combo
+from .warming import scorecard_url_patterns
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark'
+
+# category combos the scorecards pick values out by (age/sex groups, family planning users)
+SEED_CATEGORY_COMBOS = (
+    (),
+    ('<15', 'Female'),
+    ('<15', 'Male'),
+    ('15+', 'Female'),
+    ('15+', 'Male'),
+    ('New Users',),
+    ('Revisits',),
+)
+
+FACILITIES_PER_SUBCOUNTY = 4
+SUBCOUNTIES_PER_DISTRICT = 5
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile
+
+    >>> percentile([5, 1, 4, 2, 3], 50), percentile([5, 1, 4, 2, 3], 95), percentile([], 50)
+    (3, 5, None)
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered)*p//100)) # ceiling
+    return ordered[int(rank)-1]
+
+def is_annual(de_name):
+    """Targets and populations are given for the whole year"""
+    return 'TARGET' in de_name.upper() or 'POPULATION' in de_name.upper()
+
+def seed_months(num_years, today=None):
+    """
+    (year, quarter, month) of each of the last num_years*12 months
+
+    >>> seed_months(1, date(2018, 2, 14))[:3]
+    [('2017', '2017-Q1', '2017-03'), ('2017', '2017-Q2', '2017-04'), ('2017', '2017-Q2', '2017-05')]
+    """
+    if today is None:
+        today = date.today()
+    months = list()
+    year, month = today.year, today.month
+    for _ in range(num_years*12):
+        months.append(('%d' % (year,), '%d-Q%d' % (year, (month-1)//3+1), '%d-%02d' % (year, month)))
+        year, month = (year, month-1) if month > 1 else (year-1, 12)
+    return list(reversed(months))
+
+def seed_orgunits(num_facilities):
+    """A country of districts of subcounties of facilities"""
+    root = OrgUnit.objects.create(name=settings.ORG_UNIT_ROOT_NAME)
+    facilities = list()
+    for i in range(num_facilities):
+        subcounty_num, district_num = i//FACILITIES_PER_SUBCOUNTY, i//(FACILITIES_PER_SUBCOUNTY*SUBCOUNTIES_PER_DISTRICT)
+        if i % (FACILITIES_PER_SUBCOUNTY*SUBCOUNTIES_PER_DISTRICT) == 0:
+            district = OrgUnit.objects.create(name='District %03d' % (district_num,), parent=root)
+        if i % FACILITIES_PER_SUBCOUNTY == 0:
+            subcounty = OrgUnit.objects.create(name='Subcounty %04d' % (subcounty_num,), parent=district)
+        facilities.append(OrgUnit.objects.create(name='Facility %05d' % (i,), parent=subcounty))
+    return facilities
+
+@contextmanager
+def recording_de_names():
+    """Collect the data element names that DataValue.objects.what() is asked for"""
+    de_names = set()
+    what = DataValueQuerySet.what
+
+    def recording_what(self, *names):
+        de_names.update(n for n in names if n is not None)
+        return what(self, *names)
+
+    DataValueQuerySet.what = recording_what
+    try:
+        yield de_names
+    finally:
+        DataValueQuerySet.what = what
+
+def seed_datavalues(facilities, de_names, num_years, fill_ratio=0.5, batch_size=5000, random_seed=0):
+    """
+    Random (but the same for the same arguments) values for each data
+    element, category combo, facility and month (or year, for targets)
+    """
+    rng = random.Random(random_seed)
+    source_doc = SourceDocument.objects.create(file='benchmark.xls')
+    category_combos = [CategoryCombo.from_cat_names(cat_names) if cat_names else get_default_category_combo() for cat_names in SEED_CATEGORY_COMBOS]
+    months = seed_months(num_years)
+    years = sorted(set(y for y, q, m in months))
+    site_strs = { ou.id:' => '.join(ou.get_ancestors(include_self=True).values_list('name', flat=True)) for ou in facilities }
+
+    batch, num_values = list(), 0
+    for de_name in de_names:
+        de, created = DataElement.objects.get_or_create(name=de_name, defaults={ 'value_type': 'NUMBER', 'aggregation_method': 'SUM' })
+        periods = [(y, None, None) for y in years] if is_annual(de_name) else months
+        for ou in facilities:
+            for cc in category_combos:
+                for year, quarter, month in periods:
+                    if rng.random() >= fill_ratio:
+                        continue
+                    batch.append(DataValue(data_element=de, category_combo=cc, org_unit=ou, site_str=site_strs[ou.id], numeric_value=Decimal(rng.randint(0, 500)), year=year, quarter=quarter, month=month, source_doc=source_doc))
+                    if len(batch) >= batch_size:
+                        DataValue.objects.bulk_create(batch)
+                        num_values += len(batch)
+                        batch = list()
+    DataValue.objects.bulk_create(batch)
+    num_values += len(batch)
+    DataVersion.bump()
+    return num_values
+
+def benchmark_client():
+    User = get_user_model()
+    if not User.objects.filter(username=BENCHMARK_USERNAME).exists():
+        User.objects.create_superuser(BENCHMARK_USERNAME, '', BENCHMARK_PASSWORD)
+    client = Client()
+    client.login(username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+    return client
+
+def scorecard_requests(output_formats=('HTML', 'EXCEL', 'CSV', 'JSON')):
+    for pattern, period_type in scorecard_url_patterns(output_formats=output_formats):
+        current_period, _ = current_and_previous_periods(period_type)
+        yield pattern, reverse(pattern.name), { 'period': current_period }
+
+def get_response(client, path, params):
+    response = client.get(path, params)
+    # streamed pages are only rendered as they are sent
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, len(content)
+
+def benchmark_scorecard(client, path, params, repeat):
+    timings = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response, content_length = get_response(client, path, params)
+        timings.append((time.perf_counter() - started)*1000)
+
+    # a separate run for the query count and memory, as tracing slows it down
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            get_response(client, path, params)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'bytes': content_length,
+        'p50_ms': round(percentile(timings, 50), 1),
+        'p95_ms': round(percentile(timings, 95), 1),
+        'queries': len(queries),
+        'peak_memory_kb': peak_memory//1024,
+    }
+
+def discover_de_names(client):
+    """The data element names each scorecard asks for, by requesting each once"""
+    with recording_de_names() as de_names:
+        for pattern, path, params in scorecard_requests(output_formats=('HTML',)):
+            get_response(client, path, params)
+    return sorted(de_names)
+
+def run_benchmarks(num_facilities, num_years, max_data_elements=None, repeat=5, fill_ratio=0.5, log=print):
+    """
+    Seed the (test) database and time every scorecard URL against it, with
+    the scorecard cache (and the Excel export cache) switched off. Returns
+    the results, for a JSON file
+    """
+    benchmark_caches = dict(settings.CACHES, benchmark={ 'BACKEND': 'django.core.cache.backends.dummy.DummyCache' })
+    # the test client asks for the 'testserver' host
+    with override_settings(CACHES=benchmark_caches, SCORECARD_CACHE='benchmark', SCORECARD_EXPORT_CACHE_DIR=None, SCORECARD_PROFILING=False, ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+        facilities = seed_orgunits(num_facilities)
+        client = benchmark_client()
+        de_names = discover_de_names(client)[:max_data_elements]
+        log('Seeding %d data elements for %d facilities over %d years' % (len(de_names), len(facilities), num_years))
+        num_values = seed_datavalues(facilities, de_names, num_years, fill_ratio)
+
+        results = list()
+        for pattern, path, params in scorecard_requests():
+            result = benchmark_scorecard(client, path, params, repeat)
+            result.update({ 'name': pattern.name, 'path': path, 'params': params, 'org_unit_level': pattern.default_args.get('org_unit_level'), 'output_format': pattern.default_args.get('output_format', 'HTML') })
+            log('%(name)s: p50 %(p50_ms)s ms, p95 %(p95_ms)s ms, %(queries)d queries, %(peak_memory_kb)d KB' % result)
+            results.append(result)
+
+    return {
+        'seed': {
+            'facilities': len(facilities),
+            'years': num_years,
+            'data_elements': len(de_names),
+            'category_combos': len(SEED_CATEGORY_COMBOS),
+            'data_values': num_values,
+            'fill_ratio': fill_ratio,
+        },
+        'repeat': repeat,
+        'results': sorted(results, key=lambda r: r['name']),
+    }
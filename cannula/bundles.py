@@ -0,0 +1,109 @@
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.urlresolvers import resolve, reverse
+from django.db import connection
+from django.test import RequestFactory
+
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+import re
+
+from . import dimensions
+from .dateutil import current_and_previous_periods
+from .excel import capturing_sheets, write_workbook
+from .warming import scorecard_url_patterns
+
+MAX_TITLE_LENGTH = 31 # of worksheet names
+INVALID_TITLE_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+def scorecard_name(url_name):
+    return re.sub(r'_excel$', '', url_name)
+
+def period_type_of(period):
+    """
+    >>> period_type_of('2017-Q4'), period_type_of('2017-12')
+    ('quarter', 'month')
+    """
+    return 'quarter' if '-Q' in period else 'month'
+
+def sheet_title(url_name, district, used_titles):
+    """
+    A worksheet name for a scorecard of a district, unique in the workbook
+
+    >>> used = set()
+    >>> sheet_title('hts_sites_excel', 'Kasese', used), sheet_title('hts_sites_excel', 'Kasese', used)
+    ('hts_sites Kasese', 'hts_sites Kasese (2)')
+    >>> sheet_title('mnch_preg_birth_sites_excel', None, used)
+    'mnch_preg_birth_sites All'
+    """
+    name = INVALID_TITLE_CHARS.sub('_', '%s %s' % (scorecard_name(url_name), district or 'All'))
+    title, n = name[:MAX_TITLE_LENGTH], 1
+    while title in used_titles:
+        n += 1
+        suffix = ' (%d)' % (n,)
+        title = name[:MAX_TITLE_LENGTH-len(suffix)] + suffix
+    used_titles.add(title)
+    return title
+
+def bundle_requests(periods=(), districts=None, names=None, levels=None):
+    """
+    (sheet title, URL name, params) of every scorecard x district, for the
+    period in periods of the scorecard's period type (or else its current
+    period). names are URL names, with or without the _excel suffix
+    """
+    if districts is None:
+        districts = dimensions.current().district_list
+
+    used_titles = set()
+    for pattern, period_type in scorecard_url_patterns(levels, output_formats=('EXCEL',)):
+        if names and pattern.name not in names and scorecard_name(pattern.name) not in names:
+            continue
+        period = next((p for p in periods if period_type_of(p) == period_type), None)
+        if period is None:
+            period, _ = current_and_previous_periods(period_type)
+        for district in districts:
+            params = { 'period': period }
+            if district:
+                params['district'] = district
+            yield sheet_title(pattern.name, district, used_titles), pattern.name, params
+
+def bundle_sheet(bundle_request):
+    """The ScorecardSheet of one scorecard, computed in a worker process"""
+    if not apps.ready: # worker processes that are started afresh, rather than forked
+        django.setup()
+
+    title, url_name, params = bundle_request
+    path = reverse(url_name)
+    match = resolve(path)
+    request = RequestFactory().get(path, params)
+    request.user = AnonymousUser()
+    # the view itself, past the login and the scorecard cache
+    view = inspect.unwrap(match.func)
+    with capturing_sheets() as sheets:
+        view(request, *match.args, **match.kwargs)
+    if not sheets:
+        return None
+    return sheets[0]._replace(title=title)
+
+def export_bundle(f, bundle_requests, processes=None):
+    """
+    Write the scorecards of bundle_requests as the sheets of one workbook to
+    the file f. The sheets are computed in a pool of worker processes, and
+    written as they come in. Returns the number of sheets
+    """
+    if processes is None:
+        processes = getattr(settings, 'SCORECARD_BUNDLE_PROCESSES', 2)
+
+    connection.close() # the worker processes open connections of their own
+    titles = list()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        def computed_sheets():
+            for sheet in executor.map(bundle_sheet, bundle_requests):
+                if sheet is not None:
+                    titles.append(sheet.title)
+                    yield sheet
+
+        write_workbook(f, computed_sheets())
+    return len(titles)
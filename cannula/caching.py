@@ -0,0 +1,254 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from calendar import timegm
+from functools import partial, wraps
+import hashlib
+import json
+import os
+import tempfile
+
+from .dateutil import current_and_previous_periods
+from .models import DataVersion
+from .profiling import panel_requested
+from .tables import request_table_params
+
+# headers describing how one response was encoded, rather than its content
+UNCACHED_HEADERS = ('content-encoding', 'content-length', 'vary')
+
+def scorecard_cache():
+    return caches[getattr(settings, 'SCORECARD_CACHE', 'default')]
+
+def request_period(request, period_type='quarter'):
+    """
+    The period(s) a scorecard request asks for, as a string. Scorecards default
+    to the current period when none is given, but the page still renders the
+    (missing) period parameter, so the default page has its own cache entry
+    """
+    if 'start_period' in request.GET or 'end_period' in request.GET:
+        return '%s..%s' % (request.GET.get('start_period', ''), request.GET.get('end_period', ''))
+    if 'period' in request.GET:
+        return request.GET['period']
+    current_period, _ = current_and_previous_periods(period_type)
+    return 'default@%s' % (current_period,)
+
+def scorecard_cache_key(view_name, org_unit_level, period, district, output_format, data_version, table_params=()):
+    """
+    >>> scorecard_cache_key('hts_scorecard', 3, '2017-Q4', None, 'HTML', 7)
+    'scorecard:hts_scorecard:3:HTML:v7:d946bba9df504b74fd412eedd332fe5f'
+    >>> scorecard_cache_key('hts_scorecard', 3, '2017-Q4', None, 'HTML', 7, (('page', ('2',)),))
+    'scorecard:hts_scorecard:3:HTML:v7:17e634bff8ac76387d1adee252d31cb7'
+    """
+    # hash the parts that come from the request, so they are safe to use in any cache backend
+    params = (period, district) + ((table_params,) if table_params else ()) # sorted/filtered/paged tables are cached separately
+    param_hash = hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+    return 'scorecard:%s:%s:%s:v%d:%s' % (view_name, org_unit_level, output_format, data_version, param_hash)
+
+def cached_result(name, params, compute):
+    """
+    Intermediate results that several scorecards are derived from (e.g. the
+    facility level matrix that the district level is rolled up from), cached
+    for the current data version. compute() is only called on a cache miss
+    """
+    param_hash = hashlib.md5(repr(params).encode('utf-8')).hexdigest()
+    cache_key = 'result:%s:v%d:%s' % (name, DataVersion.current().version, param_hash)
+    cache = scorecard_cache()
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute()
+        cache.set(cache_key, result, None)
+    return result
+
+def request_etags(if_none_match):
+    """
+    The entity tags of an If-None-Match header, without quotes, weakness or
+    the suffix GZipMiddleware adds to the tags of the responses it compresses
+
+    >>> request_etags('"abc", W/"def;gzip"')
+    ['abc', 'def']
+    """
+    etags = list()
+    for etag in if_none_match.split(','):
+        etag = etag.strip()
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        etag = etag.strip('"')
+        if etag.endswith(';gzip'):
+            etag = etag[:-len(';gzip')]
+        etags.append(etag)
+    return etags
+
+def not_modified(request, etag, last_modified):
+    """Whether the client's copy is current (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = request_etags(if_none_match)
+        return etag in etags or '*' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+def cache_when_streamed(response, cache, cache_key):
+    """
+    Pass the content of a streaming response through, and cache it as a plain
+    response once all of it has been sent
+    """
+    # the headers as the view set them, before any middleware (gzip_page in
+    # particular) rewrites them for the encoding of this one request
+    headers = [(header, value) for header, value in response.items() if header.lower() not in UNCACHED_HEADERS]
+    streaming_content = response.streaming_content
+
+    def content():
+        chunks = list()
+        for chunk in streaming_content:
+            chunks.append(chunk)
+            yield chunk
+        complete_response = HttpResponse(b''.join(chunks))
+        for header, value in headers:
+            complete_response[header] = value
+        cache.set(cache_key, complete_response, None)
+
+    response.streaming_content = content()
+    return response
+
+def export_cache_dir():
+    """Where Excel exports are kept between downloads, None if they are not"""
+    return getattr(settings, 'SCORECARD_EXPORT_CACHE_DIR', None)
+
+def export_cache_path(cache_key):
+    name = hashlib.md5(cache_key.encode('utf-8')).hexdigest()
+    return os.path.join(export_cache_dir(), name + '.xlsx')
+
+def cached_export(cache_key):
+    """The Excel export for a cache key from the export cache (if it is there), marked as just used"""
+    path = export_cache_path(cache_key)
+    try:
+        with open(path + '.json') as f:
+            headers = json.load(f)
+        export = open(path, 'rb')
+    except (OSError, ValueError):
+        return None
+    os.utime(path) # for the least recently used to be evicted first
+    response = FileResponse(export)
+    for header, value in headers:
+        response[header] = value
+    return response
+
+def evict_exports(max_bytes=None):
+    """Remove the least recently used exports until the rest take up at most max_bytes"""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'SCORECARD_EXPORT_CACHE_MAX_BYTES', 1024**3)
+    cache_dir = export_cache_dir()
+    exports = list()
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.xlsx'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError: # evicted meanwhile by another process
+            continue
+        exports.append((st.st_mtime, st.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in exports)
+    for _, size, path in sorted(exports):
+        if total_bytes <= max_bytes:
+            break
+        for p in (path, path + '.json'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        total_bytes -= size
+
+def cache_export_when_streamed(response, cache_key):
+    """
+    Pass the content of a streamed Excel export through, and write it to the
+    export cache as it goes (it only takes its place there once complete)
+    """
+    path = export_cache_path(cache_key)
+    headers = list(response.items())
+    streaming_content = response.streaming_content
+
+    def content():
+        os.makedirs(export_cache_dir(), exist_ok=True)
+        f = tempfile.NamedTemporaryFile(dir=export_cache_dir(), suffix='.partial', delete=False)
+        try:
+            with f:
+                for chunk in streaming_content:
+                    f.write(chunk)
+                    yield chunk
+            with open(path + '.json', 'w') as headers_file:
+                json.dump(headers, headers_file)
+            os.replace(f.name, path)
+        except BaseException: # including the client going away part way through
+            if os.path.exists(f.name):
+                os.remove(f.name)
+            raise
+        evict_exports()
+
+    response.streaming_content = content()
+    return response
+
+def cache_scorecard(view_func=None, period_type='quarter'):
+    """
+    Serve the response to a scorecard GET request from the scorecard cache, if
+    it has already been rendered for the current data version, or with a 304
+    if the client already has it. period_type ('quarter' or 'month') tells the
+    cache warmer which periods to ask for
+    """
+    if view_func is None:
+        return partial(cache_scorecard, period_type=period_type)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or panel_requested(request): # profiling a cached page would tell nothing
+            return view_func(request, *args, **kwargs)
+
+        data_version = DataVersion.current()
+        cache_key = scorecard_cache_key(
+            view_func.__name__,
+            kwargs.get('org_unit_level'),
+            request_period(request, period_type),
+            request.GET.get('district') or None,
+            kwargs.get('output_format', 'HTML'),
+            data_version.version,
+            request_table_params(request),
+        )
+        # the cache key identifies the content, so it serves as the entity tag too
+        etag = hashlib.md5(cache_key.encode('utf-8')).hexdigest()
+        last_modified = timegm(data_version.updated_at.utctimetuple())
+
+        if not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        elif kwargs.get('output_format') == 'EXCEL' and export_cache_dir():
+            # exports are kept on disk, rather than in the scorecard cache
+            response = cached_export(cache_key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and response.streaming:
+                    response = cache_export_when_streamed(response, cache_key)
+            if response.status_code != 200:
+                return response
+        else:
+            cache = scorecard_cache()
+            response = cache.get(cache_key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and response.streaming:
+                    response = cache_when_streamed(response, cache, cache_key)
+                elif response.status_code == 200:
+                    cache.set(cache_key, response, None) # never expires, the data version moves on instead
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = '"%s"' % (etag,)
+        response['Last-Modified'] = http_date(last_modified)
+        # scorecards are only for logged in users, so only their browsers may keep a copy, and check it is current
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        return response
+
+    wrapper.scorecard_period_type = period_type
+    return wrapper
@@ -0,0 +1,85 @@
+from django.http import HttpResponse
+
+import json
+
+from .grid import GridRow, nan_to_none
+
+EXTRA_FIELDS = ('previous', 'delta') # per-cell values some scorecards show next to numeric_sum
+
+def json_value(x):
+    """
+    >>> [json_value(x) for x in (None, float('nan'), 2, 1.5)]
+    [None, None, 2.0, 1.5]
+    """
+    return None if x is None else nan_to_none(float(x))
+
+def columnar_scorecard(context):
+    """
+    The rows of a scorecard context as columns: one array per orgunit header
+    (the paths) and one array per data element/category combo (the values,
+    null where missing), instead of a dict per cell
+
+    >>> context = { 'ou_headers': ['District'], 'data_element_names': [('tested', None), ('target', None)], 'period_desc': '2017-Q4' }
+    >>> context['grouped_data'] = [(('A',), [{ 'numeric_sum': 5 }, { 'numeric_sum': None }]), (('B',), [{ 'numeric_sum': 2 }, { 'numeric_sum': 4 }])]
+    >>> columnar_scorecard(context)
+    {'ou_headers': ['District'], 'ou_paths': [['A', 'B']], 'columns': [['tested', None], ['target', None]], 'values': [[5.0, 2.0], [None, 4.0]], 'period': '2017-Q4'}
+    """
+    ou_headers = list(context['ou_headers'])
+    columns = [[de_name, cat_combo] for de_name, cat_combo in context['data_element_names']]
+    ou_paths = [list() for _ in ou_headers]
+    values = [list() for _ in columns]
+    extras = dict()
+
+    for i, (ou_path, cells) in enumerate(context['grouped_data']):
+        for path_column, ou in zip(ou_paths, ou_path):
+            path_column.append(ou)
+        if isinstance(cells, GridRow):
+            # already floats, NaN for missing
+            row_values = map(nan_to_none, cells.values.tolist())
+            row_extras = { name:map(nan_to_none, e.tolist()) for name, e in zip(cells.grid.extras, cells.extras) }
+        else:
+            row_values = (json_value(c['numeric_sum']) for c in cells)
+            row_extras = { name:[json_value(c.get(name)) for c in cells] for name in EXTRA_FIELDS if any(name in c for c in cells) }
+        for value_column, v in zip(values, row_values):
+            value_column.append(v)
+        for name, extra_values in row_extras.items():
+            if name not in extras:
+                # fill in the rows before the first that had this extra
+                extras[name] = [[None]*i for _ in columns]
+            for extra_column, v in zip(extras[name], extra_values):
+                extra_column.append(v)
+        for name in extras.keys() - row_extras.keys():
+            for extra_column in extras[name]:
+                extra_column.append(None)
+
+    scorecard = {
+        'ou_headers': ou_headers,
+        'ou_paths': ou_paths,
+        'columns': columns,
+        'values': values,
+        'period': context.get('period_desc'),
+    }
+    scorecard.update(extras)
+    return scorecard
+
+def scorecard_json(request, context):
+    """
+    Compact JSON response for a scorecard. The .json URLs are gzipped (after
+    the scorecard cache, which is shared by all clients), as the long value
+    arrays compress well
+    """
+    content = json.dumps(columnar_scorecard(context), separators=(',', ':'), allow_nan=False)
+    return HttpResponse(content, content_type='application/json')
+
+def profile_json(request, context):
+    """
+    A facility profile as JSON: for each program, an array of values (one per
+    period, null where missing) for each of its columns
+    """
+    profile = {
+        'ou_path': list(context['ou_path']),
+        'periods': list(context['periods']),
+        'programs': [{ 'name': name, 'columns': [list(c) for c, _ in rows], 'values': [values for _, values in rows] } for name, _, rows in context['programs']],
+    }
+    content = json.dumps(profile, separators=(',', ':'), allow_nan=False)
+    return HttpResponse(content, content_type='application/json')
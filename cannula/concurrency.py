@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import connection
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from .profiling import phase
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def query_executor():
+    """Thread pool shared by all requests, so the number of extra connections stays bounded"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SCORECARD_QUERY_CONCURRENCY', 1))
+        return _executor
+
+def fetch_all(queryset):
+    try:
+        return list(queryset)
+    finally:
+        connection.close_if_unusable_or_obsolete() # each worker thread has its own connection
+
+def evaluate_querysets(*querysets):
+    """
+    Fetch the results of independent querysets, as lists in the same order,
+    running them at the same time on the connections of the query executor.
+    Worker connections cannot see uncommitted changes, so inside a
+    transaction (e.g. a view not marked non_atomic_requests, with
+    ATOMIC_REQUESTS on) the querysets are run in turn on the request's own
+    connection instead
+    """
+    concurrency = getattr(settings, 'SCORECARD_QUERY_CONCURRENCY', 1)
+    if concurrency <= 1 or len(querysets) <= 1 or connection.in_atomic_block:
+        return [list(qs) for qs in querysets]
+
+    # the worker connections do not log their queries, so their time is reported as a phase instead
+    with phase('concurrent_sql'):
+        futures = [query_executor().submit(fetch_all, qs) for qs in querysets]
+        return [f.result() for f in futures]
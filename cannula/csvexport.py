@@ -0,0 +1,120 @@
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+import csv
+import re
+import uuid
+
+from .excel import scorecard_rows
+
+PERIOD_FIELDS = (
+    (re.compile(r'^\d{4}-\d{2}$'), 'month'),
+    (re.compile(r'^\d{4}-Q\d$'), 'quarter'),
+    (re.compile(r'^\d{4}$'), 'year'),
+)
+
+# (CSV header, DataValue field) of the raw data value export
+DATA_VALUE_COLUMNS = (
+    ('data_element', 'data_element__name'),
+    ('category_combo', 'category_combo__name'),
+    ('org_unit', 'site_str'),
+    ('year', 'year'),
+    ('quarter', 'quarter'),
+    ('month', 'month'),
+    ('value', 'numeric_value'),
+)
+
+class Echo():
+    """A file-like object handing back what is written to it, for csv.writer to stream through"""
+    def write(self, value):
+        return value
+
+def csv_chunks(headers, rows, chunk_size=500):
+    """
+    The lines of a CSV file, chunk_size rows at a time. rows are closed once
+    done with, even when the client goes away part way through
+
+    >>> list(csv_chunks(['District', 'Tested'], [['A, B', 5], ['C', None]], chunk_size=2))
+    ['District,Tested\\r\\n"A, B",5\\r\\n', 'C,\\r\\n']
+    """
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(headers)]
+    try:
+        for row in rows:
+            lines.append(writer.writerow(row))
+            if len(lines) >= chunk_size:
+                yield ''.join(lines)
+                lines = list()
+    finally:
+        if hasattr(rows, 'close'):
+            rows.close()
+    if lines:
+        yield ''.join(lines)
+
+def csv_response(filename, headers, rows):
+    """Stream a CSV file as rows (which can be a generator) produces them"""
+    response = StreamingHttpResponse(csv_chunks(headers, rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (filename,)
+    return response
+
+def csv_header(name):
+    """
+    >>> csv_header('District'), csv_header(('Tested', '<15')), csv_header(('Tested', None))
+    ('District', 'Tested <15', 'Tested')
+    """
+    if not isinstance(name, tuple):
+        return str(name)
+    de, cat_combo = name
+    if cat_combo is None:
+        return str(de)
+    return str(de) + ' ' + str(cat_combo)
+
+def scorecard_csv_response(filename, ou_headers, data_element_names, grouped_vals):
+    headers = [csv_header(name) for name in ou_headers] + [csv_header(name) for name in data_element_names]
+    return csv_response(filename, headers, scorecard_rows(grouped_vals))
+
+def period_range_filter(start_period, end_period):
+    """
+    Values from start_period to end_period (both months, quarters or years)
+
+    >>> period_range_filter('2017-Q3', '2018-Q2')
+    <Q: (AND: ('quarter__gte', '2017-Q3'), ('quarter__lte', '2018-Q2'))>
+    >>> period_range_filter('2017-03', None)
+    <Q: (AND: ('month__gte', '2017-03'))>
+    """
+    filters = Q()
+    for lookup, period in (('gte', start_period), ('lte', end_period)):
+        if not period:
+            continue
+        field = next((f for regex, f in PERIOD_FIELDS if regex.match(period)), None)
+        if field is None:
+            raise ValueError('Not a month, quarter or year: %s' % (period,))
+        filters &= Q(**{ '%s__%s' % (field, lookup): period })
+    return filters
+
+def server_side_rows(qs, fields, itersize=2000):
+    """
+    Rows of the values of fields of a queryset, fetched through a server side
+    cursor itersize rows at a time, so that only those are in memory at once
+    """
+    values = qs.values_list(*fields)
+    if connection.vendor != 'postgresql':
+        yield from values.iterator()
+        return
+
+    sql, params = values.query.sql_with_params()
+    # the rows are streamed after the view (and the request's transaction)
+    # has ended, and a named cursor only lasts as long as its transaction
+    with transaction.atomic():
+        cursor = connection.connection.cursor(name='export_%s' % (uuid.uuid4().hex,))
+        cursor.itersize = itersize
+        try:
+            cursor.execute(sql, params)
+            yield from cursor
+        finally:
+            cursor.close()
+
+def data_values_csv_response(filename, qs):
+    headers = [header for header, field in DATA_VALUE_COLUMNS]
+    return csv_response(filename, headers, server_side_rows(qs, [field for header, field in DATA_VALUE_COLUMNS]))
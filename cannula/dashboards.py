@@ -2,7 +2,8 @@ from collections import namedtuple
 from decimal import Decimal
 
 from openpyxl.styles import Color, PatternFill, Font, Border
-from openpyxl.formatting.rule import ColorScaleRule, CellIsRule, Rule
+from openpyxl.formatting.rule import ColorScaleRule, Rule
+from openpyxl.styles.differential import DifferentialStyle
 
 _COLOR_MAP = {
     'RED': 'F44336',
@@ -17,6 +18,37 @@ _CONTRAST_MAP = {
     'GREEN': 'FFFFFF',
 }
 
+# fills, fonts and differential styles shared by the rules of all LegendSets,
+# so each colour is only styled once (and written once per workbook)
+_FILLS = dict()
+_FONTS = dict()
+_DIFFERENTIAL_STYLES = dict()
+
+def interval_fill(color):
+    if color not in _FILLS:
+        _FILLS[color] = PatternFill(start_color=color, end_color=color, fill_type='solid')
+    return _FILLS[color]
+
+def interval_font(contrast_color):
+    if contrast_color not in _FONTS:
+        _FONTS[contrast_color] = Font(color=contrast_color, bold=True) if contrast_color else Font(bold=True)
+    return _FONTS[contrast_color]
+
+def interval_style(color, contrast_color=None):
+    """
+    The (interned) differential style of a legend colour, with a bold font
+    in the contrasting colour, if any
+
+    >>> interval_style('F44336', 'FFFFFF') is interval_style('F44336', 'FFFFFF')
+    True
+    >>> interval_style('F44336', 'FFFFFF').fill is interval_style('F44336').fill
+    True
+    """
+    key = (color, contrast_color)
+    if key not in _DIFFERENTIAL_STYLES:
+        _DIFFERENTIAL_STYLES[key] = DifferentialStyle(font=interval_font(contrast_color), fill=interval_fill(color))
+    return _DIFFERENTIAL_STYLES[key]
+
 NEG_INF, POS_INF = Decimal('-Inf'), Decimal('Inf') # a couple of infinities
 
 LegendInterval = namedtuple('LegendInterval', ('color', 'start', 'end'))
@@ -71,6 +103,29 @@ def excel_column_name(i, zero_indexed=True):
     else:
         return indices2colname(num2alphaindices(i-1))
 
+def excel_ranges(columns, num_rows=None):
+    """
+    Ranges covering the data rows (below the header row) of the given
+    (zero-indexed) columns, with adjacent columns merged into one range
+
+    >>> excel_ranges([2, 3, 4, 7], 10)
+    ['C2:E11', 'H2:H11']
+    >>> excel_ranges([2], 0)
+    []
+    """
+    if num_rows == 0:
+        return []
+    # range = 'E:E' # entire-column-range syntax doesn't work in openpyxl 2.3.0
+    # use old-school row limit as stand-in for entire column
+    last_row = 16384 if num_rows is None else num_rows+1
+    runs = list()
+    for c in sorted(set(columns)):
+        if runs and runs[-1][1] == c-1:
+            runs[-1][1] = c
+        else:
+            runs.append([c, c])
+    return ['{0}2:{1}{2}'.format(excel_column_name(start), excel_column_name(end), last_row) for start, end in runs]
+
 class LegendSetMappings(object):
     """
     >>> ls = LegendSet()
@@ -141,52 +196,115 @@ class LegendSetMappings(object):
 class LegendSet():
     def __init__(self, ignore_blanks=True):
         self.__legends = list()
+        self.__rules = dict() # by contrast_text
         self.ignore_blanks = ignore_blanks
         self.mappings = LegendSetMappings()
 
     def add_interval(self, color, min, max):
         self.__legends.append(LegendInterval(color, min, max))
+        self.__rules.clear()
 
     def legends(self):
         return [l_i._asdict() for l_i in sorted(self.__legends, key=legend_sort_key)]
 
     def openpyxl_rules(self, contrast_text=True):
+        """
+        The conditional formatting rules of the legends, made once per LegendSet
+
+        >>> ls = LegendSet()
+        >>> ls.add_interval('red', None, 50)
+        >>> ls.add_interval('green', 50, None)
+        >>> rules = ls.openpyxl_rules()
+        >>> [r.type for r in rules], rules is ls.openpyxl_rules()
+        (['containsBlanks', 'cellIs', 'cellIs'], True)
+        """
+        if contrast_text not in self.__rules:
+            self.__rules[contrast_text] = list(self.make_openpyxl_rules(contrast_text))
+        return self.__rules[contrast_text]
+
+    def make_openpyxl_rules(self, contrast_text):
         if self.ignore_blanks:
             rule_ignore_blanks = Rule(type="containsBlanks", stopIfTrue=True)
             yield rule_ignore_blanks
 
         for l_i in self.__legends:
             interval_color = _COLOR_MAP.get(l_i.color.upper(), l_i.color)
-            color_fill = PatternFill(start_color=interval_color, end_color=interval_color, fill_type='solid')
             # use a contrasting text colour, like white, against dark coloured fills
-            if contrast_text and l_i.color.upper() in _CONTRAST_MAP:
-                interval_font = Font(color=_CONTRAST_MAP[l_i.color.upper()], bold=True)
-            else:
-                interval_font = Font(bold=True)
+            contrast_color = _CONTRAST_MAP.get(l_i.color.upper()) if contrast_text else None
 
             if l_i.start is None and l_i.end is None:
                 # make everything the same colour
-                rule = ColorScaleRule(start_type='percentile', start_value=0, start_color=interval_color, end_type='percentile', end_value=100, end_color=interval_color, font=interval_font)
+                rule = ColorScaleRule(start_type='percentile', start_value=0, start_color=interval_color, end_type='percentile', end_value=100, end_color=interval_color)
             elif l_i.start is None:
-                rule = CellIsRule(operator='lessThan', formula=[str(l_i.end)], stopIfTrue=True, fill=color_fill, font=interval_font)
+                rule = Rule(type='cellIs', operator='lessThan', formula=[str(l_i.end)], stopIfTrue=True, dxf=interval_style(interval_color, contrast_color))
             elif l_i.end is None:
-                rule = CellIsRule(operator='greaterThanOrEqual', formula=[str(l_i.start)], stopIfTrue=True, fill=color_fill, font=interval_font)
+                rule = Rule(type='cellIs', operator='greaterThanOrEqual', formula=[str(l_i.start)], stopIfTrue=True, dxf=interval_style(interval_color, contrast_color))
             else:
-                rule = CellIsRule(operator='between', formula=[str(l_i.start),str(l_i.end)], stopIfTrue=True, fill=color_fill, font=interval_font)
+                rule = Rule(type='cellIs', operator='between', formula=[str(l_i.start),str(l_i.end)], stopIfTrue=True, dxf=interval_style(interval_color, contrast_color))
 
             yield rule
 
-    def excel_ranges(self):
+    def mapped_columns(self):
+        """
+        >>> ls = LegendSet()
+        >>> ls.mappings[8:10] = True
+        >>> ls.mappings[5] = True
+        >>> ls.mappings['mobile'] = True
+        >>> ls.mapped_columns()
+        [5, 8, 9]
+        """
+        columns = set()
+        for m in self.mappings:
+            if isinstance(m, slice):
+                columns.update(range(m.start, m.stop, m.step or 1))
+            elif isinstance(m, int):
+                columns.add(m)
+        return sorted(columns)
+
+    def excel_ranges(self, num_rows=None):
         """
         >>> ls = LegendSet()
         >>> ls.mappings[5] = True
         >>> ls.mappings[7] = True
         >>> ls.excel_ranges()
-        ['F1:F16384', 'H1:H16384']
+        ['F2:F16384', 'H2:H16384']
+        >>> ls.mappings[6] = True
+        >>> ls.excel_ranges(100)
+        ['F2:H101']
+        """
+        return excel_ranges(self.mapped_columns(), num_rows)
+
+    def maps_column(self, column):
+        """
+        >>> ls = LegendSet()
+        >>> ls.mappings[5] = True
+        >>> ls.mappings[8:10] = True
+        >>> [ls.maps_column(i) for i in (5, 6, 9)]
+        [True, False, True]
+        """
+        for m in self.mappings:
+            if isinstance(m, int) and m == column:
+                return True
+            if isinstance(m, slice) and column in range(m.start, m.stop, m.step or 1):
+                return True
+        return False
+
+    def color(self, value):
+        """
+        The colour of the (first) interval value falls into, start inclusive and end exclusive
+
+        >>> ls = LegendSet()
+        >>> ls.add_interval('red', 0, 75)
+        >>> ls.add_interval('green', 75, None)
+        >>> [ls.color(x) for x in (10, 75, 200, None)]
+        ['red', 'green', 'green', None]
         """
-        # range = 'E:E' # entire-column-range syntax doesn't work in openpyxl 2.3.0
-        # use old-school column/row limit as stand-in for entire row
-        return ['{0}1:{0}16384'.format(excel_column_name(x)) for x in self.mappings]
+        if value is None or value != value: # missing or NaN
+            return None
+        for l_i in sorted(self.__legends, key=legend_sort_key):
+            if (l_i.start is None or value >= l_i.start) and (l_i.end is None or value < l_i.end):
+                return l_i.color.lower()
+        return None
 
     def canonical_name(self):
         intervals = [str(x).lower() for x in [self.legends()[0]['start']] + [l['end'] for l in self.legends()]]
@@ -157,3 +157,19 @@ class DateSpan():
 
     def __str__(self):
         return 'DateSpan(%s, %s)' % (self.start.isoformat(), self.end.isoformat())
+
+def current_and_previous_periods(period_type, today=None):
+    """
+    >>> current_and_previous_periods('quarter', date(2018, 2, 14))
+    ('2018-Q1', '2017-Q4')
+    >>> current_and_previous_periods('month', date(2018, 1, 3))
+    ('2018-01', '2017-12')
+    """
+    if today is None:
+        today = date.today()
+    if period_type == 'month':
+        prev_year, prev_month = (today.year, today.month-1) if today.month > 1 else (today.year-1, 12)
+        return '{0}-{1:02}'.format(today.year, today.month), '{0}-{1:02}'.format(prev_year, prev_month)
+    quarter = (today.month-1)//3+1
+    prev_year, prev_quarter = (today.year, quarter-1) if quarter > 1 else (today.year-1, 4)
+    return '%d-Q%d' % (today.year, quarter), '%d-Q%d' % (prev_year, prev_quarter)
@@ -0,0 +1,70 @@
+from functools import lru_cache
+import threading
+
+from .models import DataVersion, OrgUnit
+
+_current = None
+_current_lock = threading.Lock()
+
+class Dimensions():
+    """
+    The OrgUnit hierarchy as the scorecards list it, held in memory for one
+    version of the tree (DataVersion.tree_version)
+    """
+    def __init__(self, tree_version):
+        self.tree_version = tree_version
+        districts = OrgUnit.objects.filter(level=1).order_by('name')
+        self.districts = { ou.name:ou for ou in districts }
+        self.district_list = tuple(ou.name for ou in districts)
+        self._ou_paths = dict()
+
+    def district(self, name):
+        return self.districts.get(name)
+
+    def ou_paths(self, level, district=None):
+        """
+        Ordered orgunit paths (skipping the topmost/country level) of all the
+        orgunits at level, or only those in district (an OrgUnit)
+        """
+        district_name = district.name if district else None
+        try:
+            return self._ou_paths[(level, district_name)]
+        except KeyError:
+            pass
+
+        if district_name is None:
+            ou_path_fields = OrgUnit.level_fields(level)[1:] # skip the topmost/country level
+            qs_ou = OrgUnit.objects.filter(level=level).annotate(**OrgUnit.level_annotations(level))
+            qs_ou = qs_ou.order_by(*ou_path_fields)
+            ou_paths = tuple(qs_ou.values_list(*ou_path_fields))
+        else:
+            # the district is the first part of each path, so no need to go back to the database
+            ou_paths = tuple(ou_path for ou_path in self.ou_paths(level) if ou_path[0] == district_name)
+        # concurrent requests may both compute the paths, but they come up with the same answer
+        return self._ou_paths.setdefault((level, district_name), ou_paths)
+
+    def __repr__(self):
+        return 'Dimensions<tree v%d, %d districts>' % (self.tree_version, len(self.district_list))
+
+def current():
+    """The Dimensions for the current tree version, shared by all requests of the process"""
+    global _current
+
+    tree_version = DataVersion.current().tree_version
+    with _current_lock:
+        if _current is None or _current.tree_version != tree_version:
+            _current = Dimensions(tree_version)
+        return _current
+
+@lru_cache(maxsize=4)
+def prev_5yr_years(today):
+    return tuple('%d' % (y,) for y in range(today.year, today.year-6, -1))
+
+@lru_cache(maxsize=4)
+def prev_5yr_quarters(today):
+    return tuple('%d-Q%d' % (y, q) for y in range(today.year, today.year-6, -1) for q in range(4, 0, -1))
+
+@lru_cache(maxsize=4)
+def prev_5yr_months(today):
+    month_years = zip([((today.month-i-1)%12)+1 for i in range(5*12)], ([today.year] * today.month) + sorted([today.year-i for i in range(1, 5)]*12, reverse=True))
+    return tuple('{0}-{1:02}'.format(y, m) for m, y in month_years)
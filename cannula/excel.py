@@ -0,0 +1,201 @@
+from django.http import FileResponse, HttpResponse
+
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from itertools import chain
+import tempfile
+import threading
+
+import openpyxl
+from openpyxl.writer.worksheet import write_cols, write_format
+from openpyxl.writer.write_only import WriteOnlyWorksheet
+from openpyxl.xml.constants import SHEET_MAIN_NS
+from openpyxl.xml.functions import Element, xmlfile
+
+from .dashboards import excel_ranges
+from .profiling import timed
+
+_local = threading.local()
+
+# the openpyxl internals ScorecardWorksheet and write_workbook build on (as they
+# are in the openpyxl version pinned in requirements.txt), checked on import
+# so that an openpyxl upgrade fails loudly rather than writing broken exports
+OPENPYXL_INTERNALS = (
+    ('WriteOnlyWorksheet', WriteOnlyWorksheet, '_write_header'),
+    ('Workbook', openpyxl.Workbook, '_add_sheet'),
+    ('Workbook', openpyxl.Workbook(write_only=True), '_differential_styles'),
+)
+
+def missing_openpyxl_internals():
+    """
+    >>> missing_openpyxl_internals()
+    []
+    """
+    return ['%s.%s' % (class_name, name) for class_name, obj, name in OPENPYXL_INTERNALS if not hasattr(obj, name)]
+
+if missing_openpyxl_internals():
+    raise ImportError('openpyxl %s lacks %s, which the Excel exports rely on (see requirements.txt)' % (openpyxl.__version__, ', '.join(missing_openpyxl_internals())))
+
+ScorecardSheet = namedtuple('ScorecardSheet', ('title', 'headers', 'rows', 'legend_sets'))
+
+class ScorecardWorksheet(WriteOnlyWorksheet):
+    """
+    A write-only worksheet, with its rows written to a temporary file as they
+    are appended, that also writes its conditional formatting and page setup
+    (which openpyxl 2.3.0 leaves out of write-only worksheets)
+    """
+    def _write_header(self):
+        with xmlfile(self.filename) as xf:
+            with xf.element('worksheet', xmlns=SHEET_MAIN_NS):
+                xf.write(self.sheet_properties.to_tree())
+                views = Element('sheetViews')
+                views.append(self.sheet_view.to_tree())
+                xf.write(views)
+                xf.write(write_format(self))
+                cols = write_cols(self)
+                if cols is not None:
+                    xf.write(cols)
+
+                with xf.element('sheetData'):
+                    try:
+                        while True:
+                            r = (yield)
+                            xf.write(r)
+                    except GeneratorExit:
+                        pass
+
+                for cf in self._conditional_formatting():
+                    xf.write(cf)
+                xf.write(self.page_margins.to_tree())
+                if dict(self.page_setup):
+                    xf.write(self.page_setup.to_tree())
+
+    def _conditional_formatting(self):
+        """
+        As openpyxl writes it, except that a differential style shared by
+        several rules (see dashboards.interval_style) is added to the
+        workbook's styles once
+        """
+        dxfs = self.parent._differential_styles
+        for sqref, rules in self.conditional_formatting.cf_rules.items():
+            cf = Element('conditionalFormatting', {'sqref': sqref})
+            for rule in rules:
+                if rule.dxf is not None:
+                    dxf_id = next((i for i, dxf in enumerate(dxfs) if dxf is rule.dxf), None)
+                    if dxf_id is None:
+                        dxf_id = len(dxfs)
+                        dxfs.append(rule.dxf)
+                    rule.dxfId = dxf_id
+                cf.append(rule.to_tree())
+            yield cf
+
+def header_value(name):
+    """
+    >>> header_value('District'), header_value(('Tested', '<15')), header_value(('Tested', None))
+    ('District', 'Tested\\n<15', 'Tested')
+    """
+    if not isinstance(name, tuple):
+        return str(name)
+    de, cat_combo = name
+    if cat_combo is None:
+        return str(de)
+    return str(de) + '\n' + str(cat_combo)
+
+def scorecard_rows(grouped_vals):
+    """
+    Rows of a scorecard (ou_path, cells) as lists of values, with the IPT
+    rates some cells carry in a column of their own
+
+    >>> list(scorecard_rows([(('A', 'B'), [{ 'numeric_sum': 5 }, { 'numeric_sum': 2, 'ipt_rate': 40 }])]))
+    [['A', 'B', 5, 2, 40]]
+    """
+    for ou_path, g_val_list in grouped_vals:
+        row = list(ou_path)
+        for g_val in g_val_list:
+            row.append(g_val['numeric_sum'])
+            if 'ipt_rate' in g_val:
+                row.append(g_val['ipt_rate'])
+        yield row
+
+def conditional_formats(legend_sets, num_rows):
+    """
+    (sqref, legend set) for each distinct set of legends, so their rules are
+    written once, for all the columns mapped by legend sets with those legends
+
+    >>> from .dashboards import LegendSet
+    >>> a, b, c = LegendSet(), LegendSet(), LegendSet()
+    >>> for ls in (a, b): ls.add_interval('red', None, 50)
+    >>> c.add_interval('red', None, 75)
+    >>> a.mappings[2] = b.mappings[3] = b.mappings[5] = c.mappings[4] = True
+    >>> [(sqref, ls is c) for sqref, ls in conditional_formats([a, b, c], 10)]
+    [('C2:D11 F2:F11', False), ('E2:E11', True)]
+    """
+    grouped = OrderedDict()
+    for ls in legend_sets:
+        key = (ls.ignore_blanks, str(ls))
+        _, columns = grouped.setdefault(key, (ls, set()))
+        columns.update(ls.mapped_columns())
+    for ls, columns in grouped.values():
+        ranges = excel_ranges(columns, num_rows)
+        if ranges:
+            yield ' '.join(ranges), ls
+
+def add_sheet(wb, sheet):
+    ws = ScorecardWorksheet(wb, sheet.title)
+    wb._add_sheet(ws)
+    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+
+    ws.append([header_value(name) for name in sheet.headers])
+    num_rows = 0
+    for row in sheet.rows:
+        ws.append(row)
+        num_rows += 1
+
+    # conditional formatting is written after the rows, so it can cover just those
+    for sqref, ls in conditional_formats(sheet.legend_sets, num_rows):
+        for rule in ls.openpyxl_rules():
+            ws.conditional_formatting.add(sqref, rule)
+
+@timed('excel')
+def write_workbook(f, sheets):
+    """
+    Write an xlsx of ScorecardSheets to the file f, a row at a time, so only
+    one row of cells is in memory at once
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet in sheets:
+        add_sheet(wb, sheet)
+    wb.save(f)
+
+def excel_response(filename, headers, rows, legend_sets, title='Sheet1'):
+    """
+    Build the workbook in a temporary file (removed once closed) and send it
+    from there, in chunks
+    """
+    f = tempfile.TemporaryFile()
+    write_workbook(f, [ScorecardSheet(title, headers, rows, legend_sets)])
+    f.seek(0)
+    response = FileResponse(f, content_type='application/vnd.ms-excel')
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (filename,)
+    return response
+
+@contextmanager
+def capturing_sheets():
+    """
+    Have scorecard_excel_response keep the sheets of the scorecards asked for
+    within the with block, rather than write them (to bundle several together)
+    """
+    sheets = _local.sheets = list()
+    try:
+        yield sheets
+    finally:
+        _local.sheets = None
+
+def scorecard_excel_response(filename, ou_headers, data_element_names, grouped_vals, legend_sets):
+    headers = chain(ou_headers, data_element_names)
+    sheets = getattr(_local, 'sheets', None)
+    if sheets is not None:
+        sheets.append(ScorecardSheet(None, [header_value(name) for name in headers], list(scorecard_rows(grouped_vals)), legend_sets))
+        return HttpResponse(status=204)
+    return excel_response(filename, headers, scorecard_rows(grouped_vals), legend_sets)
@@ -98,6 +98,86 @@ def rasterize(rows, columns, values, row_index_func, col_index_func, default_fun
             else:
                 yield default_func(row, col)
 
+def pivot(rows, columns, values, row_index_func, col_index_func, default_func=lambda r, c: None):
+    """
+    Index sparse value sequence by (row, column) address and go through the
+    coordinate space filling each address with the indexed value or a computed
+    default. Unlike rasterize() the values can arrive in any order, so the
+    database collation of the row/column names does not have to match python's
+
+    >>> values = [('b', 1, 'B1'), ('a', 2, 'A2'), ('a', 2, 'A2 again')]
+    >>> list(pivot(['a', 'b'], [1, 2], values, lambda v: v[0], lambda v: v[1]))
+    [None, ('a', 2, 'A2'), ('b', 1, 'B1'), None]
+    >>> list(pivot(['a'], ['x'], [], lambda v: v[0], lambda v: v[1], lambda r, c: r+c))
+    ['ax']
+    """
+    index = dict()
+    for v in values:
+        index.setdefault((row_index_func(v), col_index_func(v)), v) # first value wins, like rasterize()
+    for row in rows:
+        for col in columns:
+            try:
+                yield index[(row, col)]
+            except KeyError:
+                yield default_func(row, col)
+
+def pivot_rows(rows, *grids):
+    """
+    Combine dense grids (as produced by pivot() over the same rows) into a list
+    of [row, cells] pairs in a single pass, keeping the order of rows
+
+    >>> pivot_rows([('a',), ('b',)], ['a1', 'a2', 'b1', 'b2'], iter(['a3', 'b3']))
+    [[('a',), ['a1', 'a2', 'a3']], [('b',), ['b1', 'b2', 'b3']]]
+    >>> pivot_rows([], [])
+    []
+    """
+    rows = list(rows)
+    grids = [g if isinstance(g, list) else list(g) for g in grids]
+    if not rows:
+        return []
+    widths = [len(g)//len(rows) for g in grids]
+
+    combined = list()
+    for i, row in enumerate(rows):
+        row_cells = list()
+        for g, w in zip(grids, widths):
+            row_cells.extend(g[i*w:(i+1)*w])
+        combined.append([row, row_cells])
+    return combined
+
+def trie_regex(words):
+    """
+    A regex pattern matching any of words, with their common prefixes factored
+    out (so a match is found in a single pass, whatever the number of words).
+    Where words overlap, the longest one matches
+
+    >>> trie_regex(['ab', 'abc', 'b'])
+    '(?:ab(?:c)?|b)'
+    >>> re.findall(trie_regex(['ANC 1', 'ANC 10', 'ANC 4']), 'ANC 10 + ANC 4 - ANC 1')
+    ['ANC 10', 'ANC 4', 'ANC 1']
+    >>> re.findall(trie_regex([]), 'ANC 1')
+    []
+    """
+    trie = dict()
+    for word in filter(None, words):
+        node = trie
+        for c in word:
+            node = node.setdefault(c, dict())
+        node[''] = None # a word ends here
+
+    def node_pattern(node):
+        alternatives = [re.escape(c) + node_pattern(child) for c, child in sorted(node.items()) if c]
+        if not alternatives:
+            return ''
+        if len(alternatives) == 1 and '' not in node:
+            return alternatives[0]
+        pattern = '(?:%s)' % ('|'.join(alternatives),)
+        if '' in node:
+            pattern += '?'
+        return pattern
+
+    return node_pattern(trie) or '(?!)' # which never matches
+
 def default(*args, fillvalue=None):
     try:
         return next(filter(lambda x: x is not None, args))
@@ -0,0 +1,155 @@
+from array import array
+import math
+
+def nan_to_none(x):
+    return None if x != x else x # NaN is the only value not equal to itself
+
+def none_to_nan(x):
+    return math.nan if x is None else float(x)
+
+class GridCell():
+    """
+    One value of a ScorecardGrid, looked up in its row and column headers, so
+    it can be used in place of the { 'district': ..., 'de_name': ...,
+    'numeric_sum': ... } dicts by the templates and Excel writers
+    """
+    __slots__ = ('row', 'index')
+
+    def __init__(self, row, index):
+        self.row = row
+        self.index = index
+
+    @property
+    def numeric_sum(self):
+        return nan_to_none(self.row.values[self.index])
+
+    @property
+    def de_name(self):
+        return self.row.grid.columns[self.index][0]
+
+    @property
+    def cat_combo(self):
+        return self.row.grid.columns[self.index][1]
+
+    def __getitem__(self, key):
+        if key == 'numeric_sum':
+            return self.numeric_sum
+        if key == 'de_name':
+            return self.de_name
+        if key == 'cat_combo':
+            return self.cat_combo
+        grid = self.row.grid
+        if key in grid.extras:
+            return nan_to_none(self.row.extras[grid.extras.index(key)][self.index])
+        if key in grid.ou_path_fields:
+            return self.row.ou_path[grid.ou_path_fields.index(key)]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        grid = self.row.grid
+        return key in ('numeric_sum', 'de_name', 'cat_combo') or key in grid.extras or key in grid.ou_path_fields
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return 'GridCell<%r, %r, %r>' % (self.row.ou_path, self.row.grid.columns[self.index], self.numeric_sum)
+
+class GridRow():
+    """The values (and any extra values, e.g. previous period) of one orgunit"""
+    __slots__ = ('grid', 'ou_path', 'values', 'extras')
+
+    def __init__(self, grid, ou_path, values, extras=()):
+        self.grid = grid
+        self.ou_path = ou_path
+        self.values = values
+        self.extras = extras
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return (GridCell(self, j) for j in range(len(self.values)))
+
+    def __getitem__(self, j):
+        if j < 0:
+            j += len(self.values)
+        if not 0 <= j < len(self.values):
+            raise IndexError(j)
+        return GridCell(self, j)
+
+    def is_empty(self):
+        return all(v != v for v in self.values)
+
+class ScorecardGrid():
+    """
+    Scorecard values with one shared column header of (de_name, cat_combo)
+    pairs, and an orgunit path plus an array of floats (NaN for NULL) per row.
+    Iterating gives the (ou_path, cells) pairs that grabbag.pivot_rows() used
+    to, without a dict per cell repeating the path and column names
+
+    >>> grid = ScorecardGrid(('district',), [('tested', None), ('target', None)])
+    >>> grid.append(('A',), [5, None])
+    >>> grid.append(('B',), [None, None])
+    >>> [(ou_path, [c['numeric_sum'] for c in cells]) for ou_path, cells in grid]
+    [(('A',), [5.0, None]), (('B',), [None, None])]
+    >>> cell = grid.rows[0][1]
+    >>> cell['district'], cell.de_name, 'previous' in cell
+    ('A', 'target', False)
+    >>> len(grid.remove_empty_rows())
+    1
+    """
+    __slots__ = ('ou_path_fields', 'columns', 'extras', 'rows')
+
+    def __init__(self, ou_path_fields, columns, extras=()):
+        self.ou_path_fields = tuple(ou_path_fields)
+        self.columns = list(columns)
+        self.extras = tuple(extras)
+        self.rows = list()
+
+    def make_row(self, ou_path, values, *extras):
+        """A row for this grid, without adding it (e.g. to stream it instead)"""
+        row_values = array('d', map(none_to_nan, values))
+        row_extras = tuple(array('d', map(none_to_nan, e)) for e in extras)
+        return GridRow(self, ou_path, row_values, row_extras)
+
+    def append(self, ou_path, values, *extras):
+        self.rows.append(self.make_row(ou_path, values, *extras))
+
+    @classmethod
+    def from_values(cls, ou_path_fields, rows, columns, values, row_index_func, col_index_func):
+        """
+        Fill a grid with the numeric_sum of each value dict (from a queryset's
+        values()) at its (row, column) address, like grabbag.pivot() but
+        without creating a default dict for every missing value
+        """
+        grid = cls(ou_path_fields, columns)
+        col_index = { c:j for j, c in enumerate(grid.columns) }
+        row_values = { r:array('d', [math.nan])*len(grid.columns) for r in rows }
+        for v in values:
+            try:
+                a = row_values[row_index_func(v)]
+                j = col_index[col_index_func(v)]
+            except KeyError:
+                continue
+            if a[j] != a[j]: # first (non-NULL) value wins, like pivot()
+                a[j] = none_to_nan(v['numeric_sum'])
+        for r in rows:
+            grid.rows.append(GridRow(grid, r, row_values[r]))
+        return grid
+
+    def remove_empty_rows(self):
+        self.rows = [row for row in self.rows if not row.is_empty()]
+        return self
+
+    def __iter__(self):
+        return ((row.ou_path, row) for row in self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return 'ScorecardGrid<%d rows, %d columns>' % (len(self.rows), len(self.columns))
@@ -0,0 +1,673 @@
+from django.db.models import F, Q, Sum
+
+from collections import OrderedDict, defaultdict
+from itertools import chain, product
+import math
+
+from .grid import nan_to_none, none_to_nan
+from .matrix import ScorecardMatrix, percent, zero_if_nan
+from .models import DataValue
+from .profiling import timed
+
+AGE_SEX_SUBCATEGORIES = ['(<15, Female)', '(<15, Male)', '(15+, Female)', '(15+, Male)']
+
+HTS_DE_NAMES = (
+    '105-4 Number of clients who have been linked to care',
+    '105-4 Number of Individuals who received HIV test results',
+    '105-4 Number of Individuals who tested HIV positive',
+)
+PMTCT_MOTHER_DE_NAMES = (
+    '105-2.1 Pregnant Women newly tested for HIV this pregnancy(TR & TRR)',
+    '105-2.2a Women tested for HIV in labour (1st time this Pregnancy)',
+    '105-2.3a Breastfeeding mothers tested for HIV(1st test)',
+)
+PMTCT_MOTHER_POS_DE_NAMES = (
+    '105-2.1 A19:Pregnant Women testing HIV+ on a retest (TRR+)',
+    '105-2.2a Women testing HIV+ in labour (1st time this Pregnancy)',
+    '105-2.2b Women testing HIV+ in labour (Retest this Pregnancy)',
+    '105-2.3a Breastfeeding mothers newly testing HIV+(1st test)',
+    '105-2.3b Breastfeeding mothers newly testing HIV+(retest)',
+)
+PMTCT_CHILD_DE_NAMES = (
+    '105-2.4a Exposed Infants Tested for HIV Below 18 Months(by 1st PCR) ',
+    '105-2.4b 1st DNA PCR result returned(HIV+)',
+    '105-2.4b 2nd DNA PCR result returned(HIV+)',
+    '105-2.1a Male partners received HIV test results in eMTCT(Total)',
+    '105-2.1b Male partners received HIV test results in eMTCT(HIV+)',
+)
+HTS_TARGET_DE_NAMES = (
+    'HTC_TST_TARGET',
+    'HTC_TST_POS_TARGET',
+)
+HTS_CC_LT_15 = ['18 Mths-<5 Years', '5-<10 Years', '10-<15 Years']
+HTS_CC_GE_15 = ['15-<19 Years', '19-<49 Years', '>49 Years']
+
+HTS_COLUMNS = list(chain(
+    product(['Tested',], AGE_SEX_SUBCATEGORIES),
+    product(['HIV+',], AGE_SEX_SUBCATEGORIES),
+    product(['Tested',], [None,]),
+    product(['HIV+',], [None,]),
+    product(['Linked',], AGE_SEX_SUBCATEGORIES),
+    product(['Tested (%)',], AGE_SEX_SUBCATEGORIES),
+    product(['HIV+ (%)',], AGE_SEX_SUBCATEGORIES),
+    product(['Linked (%)',], AGE_SEX_SUBCATEGORIES),
+))
+
+ART_CC_LT_15 = ['<2 Years', '2 - < 5 Years (HIV Care)', '5 - 14 Years']
+ART_CC_GE_15 = ['15 Years and above']
+ART_NEW_TARGET_CAT_COMBOS = ('(<1, Female)', '(<1, Male)', '(1-9, Female)', '(1-9, Male)', '(10-14, Female)', '(10-14, Male)', '(15+, Female)', '(15+, Male)')
+
+CYP_FACTORS = (
+    (('Oral dispensed (cycles)', None), 'CYPs Oral', 1/15),
+    (('Condoms dispensed (pieces)', None), 'CYPs Condoms', 1/120),
+    (('New users - Implants', None), 'CYPs Implants', 2.5),
+    (('Injectable dispensed (doses)', None), 'CYPs Injectable', 1/4),
+    (('IUD inserted', None), 'CYPs IUD', 4.6),
+    (('New users - Sterilisation (male and female)', None), 'CYP Sterilisation', 10),
+    (('Natural methods', None), 'CYPs Natural Methods', 1/4),
+    (('Emergency contraceptives dispensed (doses)', None), 'CYPs Emergency contraceptives', 1/20),
+)
+
+SUPPLY_NAMES = [
+    '105-6  Zidovudine /Lamivudine/Nevirapine (AZT/3TC/NVP)',
+    '105-6 (RHZE) blister strip 150/75/400/275 mg',
+    '105-6 Abacavir/Lamivudine (ABC/3TC) 60mg/30mg (Paediatric)',
+    '105-6 Amoxicillin dispersible 125mg tablet (For children)',
+    '105-6 Artemether/ Lumefantrine 100/20mg tablet',
+    '105-6 Bendrofulazide (Aprinox) 5mg',
+    '105-6 Blood 450 ml',
+    '105-6 CD4 reagent Specify',
+    '105-6 Captopril 25mg tablet',
+    '105-6 Cardiac Aspirin 75/80 mg',
+    '105-6 Ceftriaxone 1g Injection',
+    '105-6 Chlorhexidine 20%',
+    '105-6 Co-tromoxazole 480mg tablet',
+    '105-6 Cotrimoxazole 960mg tablet',
+    '105-6 Determine HIV Screening test, tests',
+    '105-6 Efavirenz (EFV) 600mg',
+    '105-6 Glibenclamide 5mg tablet',
+    '105-6 Insulin short-acting',
+    '105-6 Mama Kit',
+    '105-6 Measles Vaccine',
+    '105-6 Metformin 500mg',
+    '105-6 Misoprostol 200mcg Tablet',
+    '105-6 Nevirapine (NVP) 200mg',
+    '105-6 Nevirapine (NVP) 50mg',
+    '105-6 Nifedipine tablets 20mg tablet',
+    '105-6 ORS Sachets with zinc tablet',
+    '105-6 Oxytocin Injection',
+    '105-6 Propranolol 40mg tablet',
+    '105-6 RH blister strip 150/75 mg',
+    '105-6 Ready to use Therapeutic feeds (RUTF)',
+    '105-6 Stat-pack HIV Confirmatory rapid tests, tests',
+    '105-6 Sulfadoxine / Pyrimethamine tablet',
+    '105-6 Tenofovir/Lamivudine (TDF/3TC) 300mg/300mg',
+    '105-6 Tenofovir/Lamivudine/Efavirenz (TDF/3TC/EFV) 300mg/300mg/',
+    '105-6 Therapeutic milk F100 (100Kcal/100ml)',
+    '105-6 Therapeutic milk F75 (75Kcal/100ml)',
+    '105-6 Unigold HIV RDT Tie-breaker test, tests',
+    '105-6 ZN reagent for AFB',
+    '105-6 Zidovudine/Lamivudine (AZT/3TC) 300mg/150m'
+]
+STOCK_SUFFIXES = (' Days out of stock', ' Quantity Utilized', ' Stock at Hand')
+AVG_MONTH_DAYS = 30 # days in month
+
+UNDER_FIVE_CATEGORIES = ('0-28 Days', '29 Days-4 Years')
+
+def category_names(cat_combo_name):
+    """
+    The categories of a category combo, from its name
+
+    >>> sorted(category_names('(10-<15 Years, Female)'))
+    ['10-<15 Years', 'Female']
+    """
+    return frozenset(cat_combo_name.strip('()').split(', '))
+
+def months_of_stock(days_out, utilized, on_hand):
+    """
+    Stock on hand in months of the average consumption (the quantity used,
+    scaled up for the days the supply was out), or minus the stock on hand
+    where that cannot be worked out
+
+    >>> months_of_stock(0, 10, 25), months_of_stock(15, 10, 40), months_of_stock(None, None, 5), months_of_stock(30, 10, None)
+    (2.5, 2.0, -5, None)
+    """
+    if days_out is not None and utilized is not None and days_out < AVG_MONTH_DAYS:
+        avg_consumption = utilized * (AVG_MONTH_DAYS / (AVG_MONTH_DAYS - days_out))
+    else:
+        avg_consumption = None
+
+    if on_hand is not None and avg_consumption and on_hand > 0:
+        return on_hand/(avg_consumption)
+    if on_hand:
+        return -on_hand
+    return None
+
+def sum_columns(m, *columns):
+    """Sum of columns, where a missing value counts as nothing"""
+    return sum(zero_if_nan(m[c]) for c in columns)
+
+IPT_DE_NAMES = (
+    '105-2.1 A6:First dose IPT (IPT1)',
+    '105-2.1 A7:Second dose IPT (IPT2)',
+)
+
+def malaria_ipt_calculations(m):
+    for de_name in IPT_DE_NAMES:
+        m[de_name + ' %', None] = percent(m[de_name, None], m['Expected Pregnancies', None])
+
+MALARIA_CASES_DE_NAMES = (
+    '105-1.3 OPD Malaria (Total)',
+    '105-1.3 OPD Malaria Confirmed (Microscopic & RDT)',
+)
+
+def malaria_compliance_calculations(m):
+    total_de_name, confirmed_de_name = MALARIA_CASES_DE_NAMES
+    # a column for each period, in place of the category combo
+    periods = [period for de_name, period in m.columns if de_name == total_de_name]
+    for period in periods:
+        m[confirmed_de_name + ' %', period] = percent(m[confirmed_de_name, period], m[total_de_name, period])
+
+def hts_calculations(m):
+    linked_de_name, tested_de_name, pos_de_name = HTS_DE_NAMES
+    tst_target_de_name, pos_target_de_name = HTS_TARGET_DE_NAMES
+    infant_de_name, pcr1_de_name, pcr2_de_name, male_partner_tst_de_name, male_partner_pos_de_name = PMTCT_CHILD_DE_NAMES
+    under15_f, under15_m, over15_f, over15_m = AGE_SEX_SUBCATEGORIES
+
+    half_pos_infant = zero_if_nan(m[infant_de_name, None])/2
+    half_pos_pcr = (zero_if_nan(m[pcr1_de_name, None]) + zero_if_nan(m[pcr2_de_name, None]))/2
+
+    m['Tested', under15_f] = zero_if_nan(m[tested_de_name, under15_f]) + half_pos_infant
+    m['Tested', under15_m] = zero_if_nan(m[tested_de_name, under15_m]) + half_pos_infant
+    m['Tested', over15_f] = zero_if_nan(m[tested_de_name, over15_f]) + zero_if_nan(m['Pregnant Women tested for HIV', None])
+    m['Tested', over15_m] = zero_if_nan(m[tested_de_name, over15_m]) + zero_if_nan(m[male_partner_tst_de_name, None])
+    m['HIV+', under15_f] = zero_if_nan(m[pos_de_name, under15_f]) + half_pos_pcr
+    m['HIV+', under15_m] = zero_if_nan(m[pos_de_name, under15_m]) + half_pos_pcr
+    m['HIV+', over15_f] = zero_if_nan(m[pos_de_name, over15_f]) + zero_if_nan(m['Pregnant Women testing HIV+', None])
+    m['HIV+', over15_m] = zero_if_nan(m[pos_de_name, over15_m]) + zero_if_nan(m[male_partner_pos_de_name, None])
+
+    m['Tested', None] = sum(m['Tested', sc] for sc in AGE_SEX_SUBCATEGORIES)
+    m['HIV+', None] = sum(m['HIV+', sc] for sc in AGE_SEX_SUBCATEGORIES)
+
+    for sc in AGE_SEX_SUBCATEGORIES:
+        m['Linked', sc] = m[linked_de_name, sc]
+        m['Tested (%)', sc] = percent(m['Tested', sc], m[tst_target_de_name, sc])
+        m['HIV+ (%)', sc] = percent(m['HIV+', sc], m[pos_target_de_name, sc])
+        m['Linked (%)', sc] = percent(m[linked_de_name, sc], m[pos_de_name, sc])
+
+def cyp_calculations(m):
+    for method_col, cyp_name, cyp_factor in CYP_FACTORS:
+        m[cyp_name, None] = m[method_col] * cyp_factor
+
+def art_new_calculations(m):
+    for sc in (None,) + tuple(AGE_SEX_SUBCATEGORIES):
+        m['Perf% New on ART', sc] = percent(m['New on ART', sc], m['TARGET: New on ART', sc])
+
+def art_active_calculations(m):
+    for sc in (None,) + tuple(AGE_SEX_SUBCATEGORIES):
+        m['Perf% Active on ART', sc] = percent(m['Active on ART', sc], m['TARGET: Active on ART', sc])
+
+def vmmc_calculations(m):
+    method_sum = sum_columns(m, ('Circumcised by technique - Device Based', None), ('Circumcised by technique - Surgical', None), ('Circumcised by technique - Other', None))
+    adverse_sum = sum_columns(m, ('Adverse Events - Moderate', None), ('Adverse Events - Severe', None))
+    m['Perf% Circumcised', None] = percent(method_sum, m['TARGET: VMMC_CIRC', None])
+    m['Perf% Circumcised DC', None] = percent(m['Circumcised by technique - Device Based', None], m['TARGET: Device-based', None])
+    m['Perf% Circumcised Surgical', None] = percent(m['Circumcised by technique - Surgical', None], m['TARGET: Surgical', None])
+    m['% who returned within 48 hours', None] = percent(m['Follow up - Within 48 hours', None], method_sum)
+    m['% with at least one adverse event', None] = percent(adverse_sum, method_sum)
+
+def lab_calculations(m):
+    m['Malaria (Smear & RDTs)', None] = sum_columns(m, ('Malaria Microscopy Done', None), ('Malaria RDTs Done', None))
+
+def vl_calculations(m):
+    m['% Achievement (sent)', None] = percent(m['VL samples sent', None], m['Samples target', None])
+    m['% Sample rejection', None] = percent(m['VL samples rejected', None], m['VL samples sent', None])
+    m['Samples returned', None] = zero_if_nan(m['VL samples sent', None]) - zero_if_nan(m['VL samples rejected', None])
+    m['% Achievement (returned)', None] = percent(m['Samples returned', None], m['VL samples sent', None])
+
+FP_METHODS = ('Condoms', 'Injectables', 'IUDs', 'Natural methods', 'Implants', 'Oral', 'Other methods')
+
+def fp_calculations(m):
+    m['New Users - TOTAL', None] = sum_columns(m, *[('New users - %s' % method, None) for method in FP_METHODS + ('Sterilisation (male and female)',)])
+    m['Revisits - TOTAL', None] = sum_columns(m, *[('Revisits - %s' % method, None) for method in FP_METHODS])
+
+def tb_calculations(m):
+    evaluated = m['Number evaluated', None]
+    m['% TSR', None] = percent(m['Number cured or completed', None], evaluated)
+    m['% LTFU', None] = percent(m['LTFU', None], evaluated)
+    m['% of cases notified (NEW & Relapse)', None] = percent(m['Notification (New and Relapse)', None], m['TARGET: New/Relapsed TB default', None])
+    m['% Tested for HIV', None] = percent(m['Tested for HIV', None], m['Notification (All cases)', None])
+    m['% HIV+ on ART', None] = percent(m['HIV+ on ART', None], m['Tested HIV+', None])
+    m['% Cure Rate', None] = percent(m['Number Cured', None], evaluated)
+
+def nutrition_calculations(m):
+    mothers = m['Total number of pregnant and lactating mothers', None]
+    m['% of clients who received nutrition asssessment  in OPD', None] = percent(m['Clients assessed using MUAC/Z score in OPD', None], m['Total OPD attendence', None])
+    m['% of clients who received nutrition assessment   Pregnant/Lactating Women', None] = percent(m['Clients assessed using MUAC/Z score in OPD - Pregnant/Lactating Women', None], mothers)
+    m['% of active on ART assessed for Malnutrition at their visit in quarter', None] = percent(m['106a ART No. active on ART assessed for Malnutrition at their visit in quarter', None], m['Total No. active on ART in the quarter', None])
+    m['% of pregnant and lactating women who received infant feeding counseling ', None] = percent(m['106a Nutri N7-No. of pregnant and lactating women who received infant feeding counseling - Total', None], mothers)
+    m['% of pregnant and lactating women who received maternal nutrition counseling ', None] = percent(m['106a Nutri N6-No. of pregnant and lactating women who received maternal nutrition counseling - Total', None], mothers)
+    m['% of newly identified malnorished cases who received nutrition suplementary/ therapeutic feeds', None] = percent(m['No. of clients who received nutrition suplementary/therapeutic feeds', None], m['No of newly identified malnourished cases in this quarter', None])
+
+def gbv_calculations(m):
+    m['Perf% Sexual violence (post-rape care)', None] = percent(m['Sexual violence (post-rape care) - TOTAL', None], m['TARGET: Physical and/or emotional violence', None])
+    m['Perf% Sexual violence', 'Female'] = percent(m['Sexual violence (post-rape care) - Female', 'Female'], m['TARGET: GBV care - Female', 'Female'])
+    m['Perf% Sexual violence', 'Male'] = percent(m['Sexual violence (post-rape care) - Male', 'Male'], m['TARGET: GBV care - Male', 'Male'])
+    m['Perf% Receiving post-GBV clinical care', None] = percent(m['Receiving post-GBV clinical care', None], m['TARGET: GBV care', None])
+    m['Perf% PEP', None] = percent(m['Provided with PEP', None], m['TARGET: Provided with PEP', None])
+
+MNCH_PREG_BIRTH_COLUMNS = [(c, None) for c in (
+    'Expected Pregnancies (5 % of population)',
+    'Adolescent Population (12.8 % of population)',
+    'All expected pregnancies in a catchment population multiplied by HIV prevalence',
+    'Expected Deliveries (4.8 % of population)',
+    '% ANC1 Attendance coverage---Target=90%',
+    '% of pregnant women attending 1st ANC visit within the 1st trimester---Target=45%',
+    '% ANC4 Attendance coverage---Target=60%',
+    'IPT1 Coverage--Target=90%',
+    'IPT2 Coverage--Target=90%',
+    'VITA Supplementation for mothers--Target =90%',
+    'Maternal mortality',
+    '% of eMTCT eligible women on ART----95%',
+    '% of institutional deliveries  Target=60%',
+    'Caesarean section rate (10%-15%)',
+)]
+
+def mnch_preg_birth_calculations(m):
+    catchment_pop = m['Catchment Population', None]
+    expected_pregnant = catchment_pop * 0.05 / 4 # split by quarter
+    expected_pregnant_hiv = catchment_pop * 0.0485 * 0.058 / 4
+    expected_deliver = catchment_pop * 0.0485 / 4
+    deliveries = m['105-2.2a Deliveries in unit', None]
+    emtct_art = sum_columns(m, ('105-2.1 A17:HIV+ Pregnant Women already on ART before 1st ANC (ART-K)', None), ('105-2.1 HIV+ Pregnant Women initiated on ART for EMTCT (ART)', None), ('105-2.2 HIV+ women initiating ART in maternity', None), ('105-2.3 HIV+ women initiating ART in PNC', None))
+
+    m['Expected Pregnancies (5 % of population)', None] = expected_pregnant
+    m['Adolescent Population (12.8 % of population)', None] = catchment_pop * 0.128
+    m['All expected pregnancies in a catchment population multiplied by HIV prevalence', None] = expected_pregnant_hiv
+    m['Expected Deliveries (4.8 % of population)', None] = expected_deliver
+    m['% ANC1 Attendance coverage---Target=90%', None] = percent(m['105-2.1 A1:ANC 1st Visit for women', None], expected_pregnant)
+    m['% of pregnant women attending 1st ANC visit within the 1st trimester---Target=45%', None] = percent(m['105-2.1 A1:ANC 1st Visit for women (No. in 1st Trimester)', None], expected_pregnant)
+    m['% ANC4 Attendance coverage---Target=60%', None] = percent(m['105-2.1 A2:ANC 4th Visit for women', None], expected_pregnant)
+    m['IPT1 Coverage--Target=90%', None] = percent(m['105-2.1 A6:First dose IPT (IPT1)', None], expected_pregnant)
+    m['IPT2 Coverage--Target=90%', None] = percent(m['105-2.1 A7:Second dose IPT (IPT2)', None], expected_pregnant)
+    m['VITA Supplementation for mothers--Target =90%', None] = percent(m['105-2.3 Vitamin A supplementation given to mothers', None], deliveries)
+    m['Maternal mortality', None] = percent(m['105-2.2 OPD Maternal deaths', None], deliveries)
+    m['% of eMTCT eligible women on ART----95%', None] = percent(emtct_art, expected_pregnant_hiv)
+    m['% of institutional deliveries  Target=60%', None] = percent(deliveries, expected_deliver)
+    m['Caesarean section rate (10%-15%)', None] = percent(m['108-3 MSP Caesarian Sections', None], expected_deliver)
+
+MNCH_PNC_CHILD_COLUMNS = [(c, None) for c in (
+    'Expected Deliveries (4.8 % of population)',
+    'Number of children below one year in a given population (4.3 % of population)',
+    'Expected under-five with positive test for malaria (17.7 % of population)',
+    '% of Mothers receiving PNC checks within 6 days----Target=60%',
+    '% of babies with Birth Asphyxia ---<1.1',
+    '% of neonates (aged 0 -28 days) presenting to health facilities with sepsis/infections <1.1',
+    'DPT 3 coverage--Target=97% ',
+    'BCGCoverage---Target=97%',
+    'Polio3 Coverage---97%',
+    '% of children U5 diagnosed with malaria who have laboratory confirmation.-----90%',
+    '% 0f children under five with confirmed malaria---Target<20%',
+    '% under 5 treated with diarrhorea---Target=<20%',
+    '% under 5 treated with pneumonia----Target=<20%',
+    ' Vit A Suplement 2nd Dose COVERAGE  in theYear---Target=97%',
+    '105-2.8 Dewormed 2nd Dose COVERAGE in the Year----Target=97%',
+    'PCV3 Coverage----Target=97%',
+)]
+
+def mnch_pnc_child_calculations(m):
+    catchment_pop = m['Catchment Population', None]
+    expected_deliver = catchment_pop * 0.0485 / 4 # split by quarter
+    expected_under_1_pop = catchment_pop * 0.043
+    expected_under_5_malaria = catchment_pop * 0.177 / 4
+    expected_live = zero_if_nan(expected_deliver) - sum_columns(m, ('105-2.2b Deliveries in unit(Fresh Still births)', None), ('105-2.2c Deliveries in unit(Macerated still births)', None))
+    malaria_conf_under5 = m['105-1.3 OPD Malaria Confirmed (Microscopic & RDT)', None]
+    new_attend_under5 = m['105-1.1 OPD New Attendance', None]
+
+    m['Expected Deliveries (4.8 % of population)', None] = expected_deliver
+    m['Number of children below one year in a given population (4.3 % of population)', None] = expected_under_1_pop
+    m['Expected under-five with positive test for malaria (17.7 % of population)', None] = expected_under_5_malaria
+    m['% of Mothers receiving PNC checks within 6 days----Target=60%', None] = percent(m['105-2.3 Postnatal Attendances 6 Hours', None], expected_deliver)
+    m['% of babies with Birth Asphyxia ---<1.1', None] = percent(m['105-2.2 Birth Asyphyxia', None], m['105-2.2d Deliveries in unit(Live Births)', None])
+    m['% of neonates (aged 0 -28 days) presenting to health facilities with sepsis/infections <1.1', None] = percent(m['105-1.3 OPD Neonatal  Sepsis (0-7days)', None], expected_live)
+    m['DPT 3 coverage--Target=97% ', None] = percent(m['105-2.11 DPT-HepB+Hib 3', None], expected_under_1_pop)
+    m['BCGCoverage---Target=97%', None] = percent(m['105-2.11 BCG', None], expected_under_1_pop)
+    m['Polio3 Coverage---97%', None] = percent(m['105-2.11 Polio 3', None], expected_under_1_pop)
+    m['% of children U5 diagnosed with malaria who have laboratory confirmation.-----90%', None] = percent(malaria_conf_under5, m['105-1.3 OPD Malaria (Total)', None])
+    m['% 0f children under five with confirmed malaria---Target<20%', None] = percent(malaria_conf_under5, expected_under_5_malaria)
+    m['% under 5 treated with diarrhorea---Target=<20%', None] = percent(m['105-1.3 OPD Diarrhoea-Acute', None], new_attend_under5)
+    m['% under 5 treated with pneumonia----Target=<20%', None] = percent(m['105-1.3 OPD Pneumonia', None], new_attend_under5)
+    m[' Vit A Suplement 2nd Dose COVERAGE  in theYear---Target=97%', None] = percent(m['105-2.8 Vit A Suplement 2nd Dose in theYear', None], expected_under_1_pop)
+    m['105-2.8 Dewormed 2nd Dose COVERAGE in the Year----Target=97%', None] = percent(m['105-2.8 Dewormed 2nd Dose in the Year', None], expected_under_1_pop)
+    m['PCV3 Coverage----Target=97%', None] = percent(m['105-2.11 PCV 3', None], expected_under_1_pop)
+
+MOS_COLUMNS = [(s + ' Months of Stock', None) for s in SUPPLY_NAMES]
+
+def mos_calculations(m):
+    for supply_name, mos_column in zip(SUPPLY_NAMES, MOS_COLUMNS):
+        stock_values = zip(*(m[supply_name + suffix, None].tolist() for suffix in STOCK_SUFFIXES))
+        m[mos_column] = [none_to_nan(months_of_stock(*map(nan_to_none, v))) for v in stock_values]
+
+class Source():
+    """
+    The data elements summed into one source column of a program, picked out
+    by category combo as the scorecard does. Annual values (targets and
+    populations) count towards each quarter of their year, divided by divisor,
+    and stock levels (period='month') are those of the latest month of the
+    quarter
+    """
+    def __init__(self, column, de_names, categories=None, female=None, cat_combos=None, period='quarter', divisor=1):
+        self.column = column
+        self.de_names = tuple(de_names)
+        self.categories = None if categories is None else frozenset(categories)
+        self.female = female
+        self.cat_combos = None if cat_combos is None else frozenset(cat_combos)
+        self.period = period
+        self.divisor = divisor
+
+    def accepts(self, cat_combo_name):
+        """
+        >>> s = Source(('Tested', '(<15, Female)'), ['tested'], categories=HTS_CC_LT_15, female=True)
+        >>> s.accepts('(10-<15 Years, Female)'), s.accepts('(10-<15 Years, Male)'), s.accepts('(15-<19 Years, Female)')
+        (True, False, False)
+        """
+        if self.cat_combos is not None and cat_combo_name not in self.cat_combos:
+            return False
+        if self.categories is not None and not self.categories & category_names(cat_combo_name):
+            return False
+        if self.female is not None and ('Female' in cat_combo_name) != self.female:
+            return False
+        return True
+
+    def __repr__(self):
+        return 'Source<%r>' % (self.column,)
+
+def age_sex_sources(column_name, de_names, cc_lt_15, cc_ge_15):
+    """Sources of a column for each of the (<15/15+, Female/Male) subcategories"""
+    age_groups = (cc_lt_15, cc_lt_15, cc_ge_15, cc_ge_15)
+    return [Source((column_name, sc), de_names, categories=age_group, female=sc.endswith('Female)')) for sc, age_group in zip(AGE_SEX_SUBCATEGORIES, age_groups)]
+
+class Program():
+    """
+    The source columns of one scorecard, the calculation of its derived
+    indicators and the columns it shows (all of them, if columns is None)
+    """
+    def __init__(self, name, scorecard, sources, calculations=None, columns=None):
+        self.name = name
+        self.scorecard = scorecard # url name
+        self.sources = list(sources)
+        self.calculations = calculations
+        self.columns = columns
+
+    def source_columns(self):
+        return list(OrderedDict.fromkeys(s.column for s in self.sources))
+
+    def __repr__(self):
+        return 'Program<%s>' % (self.name,)
+
+PROGRAMS = [
+    Program('HIV Testing Services', 'hts_sites', list(chain(
+        chain.from_iterable(age_sex_sources(de_name, (de_name,), HTS_CC_LT_15, HTS_CC_GE_15) for de_name in HTS_DE_NAMES),
+        [Source(('Pregnant Women tested for HIV', None), PMTCT_MOTHER_DE_NAMES)],
+        [Source(('Pregnant Women testing HIV+', None), PMTCT_MOTHER_POS_DE_NAMES)],
+        [Source((de_name, None), (de_name,)) for de_name in PMTCT_CHILD_DE_NAMES],
+        [Source((de_name, sc), (de_name,), cat_combos=(sc,), period='year', divisor=4) for de_name in HTS_TARGET_DE_NAMES for sc in AGE_SEX_SUBCATEGORIES],
+    )), hts_calculations, HTS_COLUMNS),
+    Program('New on ART', 'art_new_sites', [
+        Source(('TARGET: New on ART', None), ('TX_NEW (N, DSD) TARGET: New on ART default',), period='year', divisor=4),
+    ] + [
+        # only the age/sex groups the targets are given for
+        Source(('TARGET: New on ART', sc), ('TX_NEW (N, Aggregated Age/Sex) TARGET: HIV Prevention Program',), cat_combos=set([sc]) & set(ART_NEW_TARGET_CAT_COMBOS), period='year', divisor=4) for sc in AGE_SEX_SUBCATEGORIES
+    ] + [
+        Source(('New on ART', None), ('106a ART No. of new clients started on ART at this facility during the quarter',)),
+    ] + age_sex_sources('New on ART', ('106a ART No. of new clients started on ART at this facility during the quarter',), ART_CC_LT_15, ART_CC_GE_15), art_new_calculations),
+    Program('Active on ART', 'art_active_sites', [
+        # cumulative targets, so not divided by quarter
+        Source(('TARGET: Active on ART', None), ('TX_CURR (N, DSD) TARGET: Receiving ART default',), period='year'),
+    ] + [
+        Source(('TARGET: Active on ART', sc), ('TX_CURR (N, Aggregated Age/Sex) TARGET: Receiving ART',), cat_combos=(sc,), period='year') for sc in AGE_SEX_SUBCATEGORIES
+    ] + [
+        Source(('Active on ART', None), ('106a ART No. active on ART on 1st line ARV regimen', '106a ART No. active on ART on 2nd line ARV regimen', '106a ART No. active on ART on 3rd line or higher ARV regimen')),
+    ] + age_sex_sources('Active on ART', ('106a ART No. active on ART on 1st line ARV regimen', '106a ART No. active on ART on 2nd line ARV regimen', '106a ART No. active on ART on 3rd line or higher ARV regimen'), ART_CC_LT_15, ART_CC_GE_15), art_active_calculations),
+    Program('Viral Load', 'vl_sites', [
+        Source(('Samples target', None), ('VL_TARGET',), period='year', divisor=4),
+        Source(('VL samples sent', None), ('VL samples sent',)),
+        Source(('VL samples rejected', None), ('VL samples rejected',)),
+    ], vl_calculations),
+    Program('TB and TB/HIV', 'tb_sites', [
+        Source(('TARGET: New/Relapsed TB default', None), ('TB_STAT (D, DSD) TARGET: New/Relapsed TB default',)),
+        Source(('Notification (New and Relapse)', None), [
+            '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC) [Cases] %s' % case for case in ('New', 'Relapse')
+        ] + [
+            '106a 3.1.a.2 Clinically diagnosed PTB, (P-CD) [Cases] %s' % case for case in ('New', 'Relapse')
+        ] + [
+            '106a 3.1.a.3 EPTB, (bacteriologically or clinically diagnosed) [Cases] %s' % case for case in ('New', 'Relapse')
+        ]),
+        Source(('Notification (All cases)', None), ['%s [Cases] %s' % (case_type, case) for case_type, case in product((
+            '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC)',
+            '106a 3.1.a.2 Clinically diagnosed PTB, (P-CD)',
+            '106a 3.1.a.3 EPTB, (bacteriologically or clinically diagnosed)',
+        ), ('New', 'Relapse', 'Lost to Followup', 'Failure', 'Trt History Unknown'))]),
+        Source(('Tested for HIV', None), ['%s Tested for HIV' % tb_type for tb_type in (
+            '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC)',
+            '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD)',
+            '106a 3.1.c.3 New HIV/TB Patients Registered, EPTB (BC or CD)',
+            '106a 3.1.c.4 New HIV/TB Patients Registered, Other types of TB',
+        )]),
+        Source(('Tested HIV+', None), ['%s HIV Positive' % tb_type for tb_type in (
+            '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC)',
+            '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD)',
+            '106a 3.1.c.3 New HIV/TB Patients Registered, EPTB (BC or CD)',
+            '106a 3.1.c.4 New HIV/TB Patients Registered, Other types of TB',
+        )]),
+        Source(('HIV+ on ART', None), ['%s On ART' % tb_type for tb_type in (
+            '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC)',
+            '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD)',
+            '106a 3.1.c.3 New HIV/TB Patients Registered, EPTB (BC or CD)',
+            '106a 3.1.c.4 New HIV/TB Patients Registered, Other types of TB',
+        )]),
+        Source(('Number evaluated', None), ['106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) %s' % outcome for outcome in ('Cured', 'Trt Completed', 'Died', 'Failure', 'Lost to Followup')]),
+        Source(('Number cured or completed', None), ['106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) %s' % outcome for outcome in ('Cured', 'Trt Completed')]),
+        Source(('Number Cured', None), ('106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Cured',)),
+        Source(('LTFU', None), ('106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Lost to Followup',)),
+    ], tb_calculations),
+    Program('VMMC', 'vmmc_sites', [
+        Source(('TARGET: VMMC_CIRC', None), ('VMMC_CIRC_TARGET',)),
+        Source(('TARGET: Device-based', None), ('VMMC_DEVICE_TARGET',)),
+        Source(('TARGET: Surgical', None), ('VMMC_SURGICAL_TARGET',)),
+        Source(('Circumcised by technique - Device Based', None), ('105-5 Clients circumcised by circumcision Technique Device Based (DC)',)),
+        Source(('Circumcised by technique - Other', None), ('105-5 Clients circumcised by circumcision Technique Other VMMC techniques',)),
+        Source(('Circumcised by technique - Surgical', None), ('105-5 Clients circumcised by circumcision Technique Surgical(SC)',)),
+        Source(('Follow up - Within 48 hours', None), ('105-5a Number of Clients Circumcised who Returned for Follow Up Visit within 6 weeks of SMC Procedure(Within 48 Hours)',)),
+        Source(('Adverse Events - Moderate', None), ('105-5 Clients Circumcised who Experienced one or more Adverse Events Moderate',)),
+        Source(('Adverse Events - Severe', None), ('105-5 Clients Circumcised who Experienced one or more Adverse Events Severe',)),
+    ], vmmc_calculations),
+    Program('Family Planning', 'fp_sites', [
+        Source(('New users - Condoms', None), ('105-2.5 Female Condom', '105-2.5 Male Condom'), categories=('New Users',)),
+        Source(('New users - Injectables', None), ('105-2.5 Injectable',), categories=('New Users',)),
+        Source(('New users - IUDs', None), ('105-2.5 IUDs',), categories=('New Users',)),
+        Source(('New users - Natural methods', None), ('105-2.5 Natural',), categories=('New Users',)),
+        Source(('New users - Implants', None), ('105-2.7 Implant',), categories=('New Users',)),
+        Source(('New users - Oral', None), ('105-2.5 Oral: Microgynon', '105-2.5 Oral: Lo-Feminal', '105-2.5 Oral : Ovrette or Another POP'), categories=('New Users',)),
+        Source(('New users - Other methods', None), ('105-2.5 Other Method',), categories=('New Users',)),
+        Source(('New users - Sterilisation (male and female)', None), ('105-2.7 Female Sterilisation (TubeLigation)', '105-2.7 Male Sterilisation (Vasectomy)')),
+        Source(('Revisits - Condoms', None), ('105-2.5 Female Condom', '105-2.5 Male Condom'), categories=('Revisits',)),
+        Source(('Revisits - Injectables', None), ('105-2.5 Injectable',), categories=('Revisits',)),
+        Source(('Revisits - IUDs', None), ('105-2.5 IUDs',), categories=('Revisits',)),
+        Source(('Revisits - Natural methods', None), ('105-2.5 Natural',), categories=('Revisits',)),
+        Source(('Revisits - Implants', None), ('105-2.7 Implant',), categories=('Revisits',)),
+        Source(('Revisits - Oral', None), ('105-2.5 Oral: Microgynon', '105-2.5 Oral: Lo-Feminal', '105-2.5 Oral : Ovrette or Another POP'), categories=('Revisits',)),
+        Source(('Revisits - Other methods', None), ('105-2.5 Other Method',), categories=('Revisits',)),
+        Source(('New users - HIV+', None), ('105-2.5 Number HIV+ FP users',), categories=('New Users',)),
+        Source(('Revisits - HIV+', None), ('105-2.5 Number HIV+ FP users',), categories=('Revisits',)),
+    ], fp_calculations),
+    Program('Family Planning: CYP', 'fp_cyp_sites', [
+        Source(('Oral dispensed (cycles)', None), ('105-2.5 Oral: Microgynon', '105-2.5 Oral: Lo-Feminal', '105-2.5 Oral : Ovrette or Another POP')),
+        Source(('Condoms dispensed (pieces)', None), ('105-2.5 Female Condom', '105-2.5 Male Condom')),
+        Source(('New users - Implants', None), ('105-2.7 Implant',), categories=('New Users',)),
+        Source(('Injectable dispensed (doses)', None), ('105-2.5 Injectable',)),
+        Source(('IUD inserted', None), ('105-2.5 IUDs',)),
+        Source(('New users - Sterilisation (male and female)', None), ('105-2.7 Female Sterilisation (TubeLigation)', '105-2.7 Male Sterilisation (Vasectomy)')),
+        Source(('Natural methods', None), ('105-2.5 Natural',)),
+        Source(('Emergency contraceptives dispensed (doses)', None), ('105-2.6 Emergency contraceptives  No. Dispensed by CBD', '105-2.6 Emergency contraceptives  No. Dispensed at Unit', '105-2.6 Emergency contraceptives  No. Disp. At Outreach')),
+    ], cyp_calculations),
+    Program('Lab. Tests', 'lab_sites', [
+        Source(('Malaria Microscopy Done', None), ('105-7.3 Lab Malaria Microscopy  Number Done',)),
+        Source(('Malaria RDTs Done', None), ('105-7.3 Lab Malaria RDTs Number Done',)),
+        Source(('HIV tests done using Determine', None), ['105-7.8 Lab Determine %s' % use for use in ('Clinical Diagnosis', 'HCT', 'PMTCT', 'Quality Control', 'SMC')]),
+        Source(('HIV tests done using Stat Pak', None), ['105-7.8 Lab Stat pak  %s' % use for use in ('Clinical Diagnosis', 'HCT', 'PMTCT', 'Quality Control', 'SMC')]),
+        Source(('HIV tests done using Unigold', None), ['105-7.8 Lab Unigold %s' % use for use in ('Clinical Diagnosis', 'HCT', 'PMTCT', 'Quality Control', 'SMC')]),
+        Source(('TB Smear', None), ('105-7.6 Lab ZN for AFBs  Number Done',)),
+        Source(('Syphilis tests', None), ('105-7.4 Lab VDRL/RPR Number Done', '105-7.4 Lab TPHA  Number Done')),
+        Source(('LFTs', None), ('105-7.7 Lab ALT Number Done', '105-7.7 Lab AST Number Done', '105-7.7 Lab Albumin  Number Done')),
+        Source(('RFTs', None), ('105-7.7 Lab Calcium  Number Done', '105-7.7 Lab Creatinine Number Done', '105-7.7 Lab Potassium Number Done', '105-7.7 Lab Sodium Number Done', '105-7.7 Lab Total Protein Number Done', '105-7.7 Lab Urea Number Done')),
+        Source(('All other Haematology', None), ('All Other Haematology - Lab - OPD  Number Done',)),
+    ], lab_calculations),
+    Program('Nutrition', 'nutrition_hospitals', [
+        Source(('Total OPD attendence', None), ('105-1.1 OPD New Attendance', '105-1.1 OPD Re-Attendance')),
+        Source(('Clients assessed using MUAC/Z score in OPD', None), ('106a Nutri No. 1 of clients who received nutrition assessment in this quarter using color coded MUAC tapes/Z score chart',)),
+        Source(('Clients assessed using MUAC/Z score in OPD - Pregnant/Lactating Women', None), ('106a Nutri No. 1 of clients who received nutrition assessment in this quarter using color coded MUAC tapes/Z score chart Pregnant/Lactating Women',)),
+        Source(('Total number of pregnant and lactating mothers', None), ('105-2.1 A3:Total ANC visits (New clients + Re-attendances)', '105-2.3 Postnatal Attendances')),
+        Source(('106a Nutri N7-No. of pregnant and lactating women who received infant feeding counseling - Total', None), ('106a Nutri N7-No. of pregnant and lactating women who received infant feeding counseling - Total',)),
+        Source(('106a Nutri N6-No. of pregnant and lactating women who received maternal nutrition counseling - Total', None), ('106a Nutri N6-No. of pregnant and lactating women who received maternal nutrition counseling - Total',)),
+        Source(('Total No. active on ART in the quarter', None), ('106a ART No. active on ART on 1st line ARV regimen', '106a ART No. active on ART on 2nd line ARV regimen', '106a ART No. active on ART on 3rd line or higher ARV regimen')),
+        Source(('106a ART No. active on ART assessed for Malnutrition at their visit in quarter', None), ('106a ART No. active on ART assessed for Malnutrition at their visit in quarter',)),
+        Source(('No of newly identified malnourished cases in this quarter', None), ('106a Nutri N4-No. of newly identified malnourished cases in this quarter - Total',)),
+        Source(('No. of clients who received nutrition suplementary/therapeutic feeds', None), ('106a Nutri N5-No. of clients who received nutrition supplementary / therapeutic feeds - Total',)),
+    ], nutrition_calculations),
+    Program('GBV', 'gbv_sites', [
+        Source(('TARGET: GBV care', None), ('GEND_GBV TARGET: GBV Care',), period='year', divisor=4),
+        Source(('TARGET: Physical and/or emotional violence', None), ('GEND_GBV TARGET: GBV Care Physical and/or Emotional Violence',), period='year', divisor=4),
+        Source(('TARGET: Sexual violence', None), ('GEND_GBV TARGET: GBV Care Sexual Violence (Post-Rape Care)',), period='year', divisor=4),
+        Source(('TARGET: GBV care - Female', 'Female'), ('GEND_GBV TARGET: GBV Care',), categories=('Female',), period='year', divisor=4),
+        Source(('TARGET: GBV care - Male', 'Male'), ('GEND_GBV TARGET: GBV Care',), categories=('Male',), period='year', divisor=4),
+        Source(('TARGET: Provided with PEP', None), ('GEND_GBV_PEP TARGET: GBV PEP default',), period='year', divisor=4),
+        Source(('Sexual violence (post-rape care) - Female', 'Female'), ('105-1.3 OPD Abortions Due To Gender Based Violence (GBV)', '105-1.3 OPD Sexually Transmitted Infection Due To SGBV'), categories=('Female',)),
+        Source(('Sexual violence (post-rape care) - Male', 'Male'), ('105-1.3 OPD Abortions Due To Gender Based Violence (GBV)', '105-1.3 OPD Sexually Transmitted Infection Due To SGBV'), categories=('Male',)),
+        Source(('Sexual violence (post-rape care) - TOTAL', None), ('105-1.3 OPD Abortions Due To Gender Based Violence (GBV)', '105-1.3 OPD Sexually Transmitted Infection Due To SGBV')),
+        Source(('Receiving post-GBV clinical care', None), ('105-1.3 OPD Sexually Transmitted Infection Due To SGBV',)),
+        Source(('Provided with PEP', None), ('106a PEP Q2-Number provided with PEP following - Rape/Sexual Assault or Defilement',)),
+    ], gbv_calculations),
+    Program('MNCH: Pregnancy and Birth', 'mnch_preg_birth_subcounties', [
+        # population estimates are annual
+        Source(('Catchment Population', None), ('Catchment Population',), period='year'),
+    ] + [Source((de_name, None), (de_name,)) for de_name in (
+        '105-2.1 A1:ANC 1st Visit for women',
+        '105-2.1 A1:ANC 1st Visit for women (No. in 1st Trimester)',
+        '105-2.1 A17:HIV+ Pregnant Women already on ART before 1st ANC (ART-K)',
+        '105-2.1 A2:ANC 4th Visit for women',
+        '105-2.1 A6:First dose IPT (IPT1)',
+        '105-2.1 A7:Second dose IPT (IPT2)',
+        '105-2.1 HIV+ Pregnant Women initiated on ART for EMTCT (ART)',
+        '105-2.2 HIV+ women initiating ART in maternity',
+        '105-2.2 OPD Maternal deaths',
+        '105-2.2a Deliveries in unit',
+        '105-2.3 HIV+ women initiating ART in PNC',
+        '105-2.3 Vitamin A supplementation given to mothers',
+        '108-3 MSP Caesarian Sections',
+    )], mnch_preg_birth_calculations, MNCH_PREG_BIRTH_COLUMNS),
+    Program('MNCH: PNC and Child Health', 'mnch_pnc_child_subcounties', [
+        Source(('Catchment Population', None), ('Catchment Population',), period='year'),
+    ] + [Source((de_name, None), (de_name,)) for de_name in (
+        '105-1.3 OPD Neonatal  Sepsis (0-7days)',
+        '105-2.2 Birth Asyphyxia',
+        '105-2.2a Deliveries in unit',
+        '105-2.2b Deliveries in unit(Fresh Still births)',
+        '105-2.2c Deliveries in unit(Macerated still births)',
+        '105-2.2d Deliveries in unit(Live Births)',
+        '105-2.3 Postnatal Attendances 6 Hours',
+        '105-2.11 PCV 3',
+        '105-2.8 Dewormed 2nd Dose in the Year',
+        '105-2.8 Vit A Suplement 2nd Dose in theYear',
+    )] + [Source((de_name, None), (de_name,), categories=('Under 1',)) for de_name in (
+        '105-2.11 BCG',
+        '105-2.11 DPT-HepB+Hib 3',
+        '105-2.11 Polio 3',
+    )] + [Source((de_name, None), (de_name,), categories=UNDER_FIVE_CATEGORIES) for de_name in (
+        '105-1.1 OPD New Attendance',
+        '105-1.3 OPD Diarrhoea-Acute',
+        '105-1.3 OPD Malaria (Total)',
+        '105-1.3 OPD Malaria Confirmed (Microscopic & RDT)',
+        '105-1.3 OPD Pneumonia',
+    )], mnch_pnc_child_calculations, MNCH_PNC_CHILD_COLUMNS),
+    Program('Supply Chain: Months of Stock', 'sc_mos_sites', [
+        Source((supply_name + suffix, None), (supply_name + suffix,), period='month') for supply_name, suffix in product(SUPPLY_NAMES, STOCK_SUFFIXES)
+    ], mos_calculations, MOS_COLUMNS),
+]
+
+def profile_values(facility, periods, programs=PROGRAMS):
+    """
+    The sums of all the data elements of programs for one facility, by
+    category combo and period, in a single query. Annual values are fetched
+    for the years of periods
+    """
+    de_names = sorted(set(chain.from_iterable(s.de_names for p in programs for s in p.sources)))
+    years = sorted(set(p[:4] for p in periods))
+    qs = DataValue.objects.what(*de_names).filter(org_unit=facility)
+    qs = qs.filter(Q(quarter__in=periods) | Q(year__in=years, quarter__isnull=True))
+    qs = qs.annotate(de_alias=F('data_element__alias'), cat_combo=F('category_combo__name'))
+    return qs.order_by().values('de_name', 'de_alias', 'cat_combo', 'year', 'quarter', 'month').annotate(numeric_sum=Sum('numeric_value'))
+
+@timed('pivot')
+def program_matrices(values, periods, programs=PROGRAMS):
+    """
+    A ScorecardMatrix per program (by name) with a row for each period, filled
+    in from the values of profile_values() and with its derived indicators
+    calculated
+    """
+    rows = [(p,) for p in periods]
+    period_index = { p:i for i, p in enumerate(periods) }
+    matrices = OrderedDict((program.name, ScorecardMatrix(rows, program.source_columns())) for program in programs)
+
+    # data elements are asked for by name or alias
+    sources_by_name = defaultdict(list)
+    for program in programs:
+        for source in program.sources:
+            for de_name in source.de_names:
+                sources_by_name[de_name.lower()].append((program.name, source))
+
+    latest_months = dict() # (program name, column, row): month the value is for, of 'month' sources
+    for v in values:
+        matched = sources_by_name.get(v['de_name'].lower(), []) + sources_by_name.get((v['de_alias'] or '').lower(), [])
+        for program_name, source in set(matched):
+            if not source.accepts(v['cat_combo']):
+                continue
+            m = matrices[program_name]
+            j = m.col_index[source.column]
+            x = float(v['numeric_sum'])
+
+            if source.period == 'year':
+                if v['quarter'] is not None:
+                    continue
+                row_indices = [i for p, i in period_index.items() if p[:4] == v['year']]
+                x = x / source.divisor
+            elif v['quarter'] in period_index:
+                i = period_index[v['quarter']]
+                if source.period == 'month':
+                    key, month = (program_name, source.column, i), v['month'] or ''
+                    if month < latest_months.get(key, month):
+                        continue
+                    if month > latest_months.get(key, month):
+                        m.values[i, j] = math.nan # replace the values of an earlier month
+                    latest_months[key] = month
+                row_indices = [i]
+            else:
+                continue
+
+            for i in row_indices:
+                m.values[i, j] = x if math.isnan(m.values[i, j]) else m.values[i, j] + x
+
+    for program in programs:
+        if program.calculations is not None:
+            matrices[program.name].calculate(program.calculations)
+    return matrices
+
+def facility_profile(facility, periods, programs=PROGRAMS):
+    return program_matrices(profile_values(facility, periods, programs), periods, programs)
+
+def profile_tables(matrices, programs=PROGRAMS):
+    """The (program, [(column, [value for each period])]) to show of each program"""
+    for program in programs:
+        m = matrices[program.name]
+        columns = m.columns if program.columns is None else program.columns
+        yield program, [(c, [nan_to_none(x) for x in m[c].tolist()]) for c in columns]
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+import json
+
+from cannula.benchmarking import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time every scorecard URL (each level and output format) against a seeded synthetic test database, and write the results to a JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facilities', type=int, default=50, help='number of facilities to seed (default: 50)')
+        parser.add_argument('--years', type=int, default=1, help='years of monthly data to seed, up to this month (default: 1)')
+        parser.add_argument('--data-elements', type=int, default=None, dest='data_elements', help='only seed this many of the data elements the scorecards ask for (default: all)')
+        parser.add_argument('--fill', type=float, default=0.5, help='proportion of values present (default: 0.5)')
+        parser.add_argument('--repeat', type=int, default=5, help='timed requests per scorecard URL (default: 5)')
+        parser.add_argument('--keepdb', action='store_true', help='keep the test database afterwards')
+        parser.add_argument('--output', default='scorecard_benchmarks.json', help='JSON file to write the results to (default: scorecard_benchmarks.json)')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        # never seed the real database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+        try:
+            results = run_benchmarks(options['facilities'], options['years'], options['data_elements'], options['repeat'], options['fill'], log=self.stdout.write)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity, keepdb=options['keepdb'])
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        self.stdout.write('Wrote %d results to %s' % (len(results['results']), options['output']))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cannula.bundles import bundle_requests, export_bundle
+
+
+class Command(BaseCommand):
+    help = 'Export scorecards into one workbook, with a sheet for each scorecard and district'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='xlsx file to write')
+        parser.add_argument('--period', action='append', dest='periods', default=[], help='quarter (2017-Q4) or month (2017-12) for the scorecards of that period type (may be repeated, default: the current period)')
+        parser.add_argument('--scorecard', action='append', dest='names', help='only this scorecard, by URL name, e.g. hts_sites (may be repeated)')
+        parser.add_argument('--level', type=int, action='append', dest='levels', help='only this org unit level (may be repeated)')
+        parser.add_argument('--district', action='append', dest='districts', help='only this district (may be repeated, default: each district)')
+        parser.add_argument('--processes', type=int, default=None, help='number of scorecards to compute at once (default: settings.SCORECARD_BUNDLE_PROCESSES)')
+
+    def handle(self, *args, **options):
+        requests = list(bundle_requests(options['periods'], options['districts'], options['names'], options['levels']))
+        if not requests:
+            raise CommandError('No scorecards to export')
+
+        with open(options['output'], 'wb') as f:
+            num_sheets = export_bundle(f, requests, options['processes'])
+
+        self.stdout.write('Exported %d scorecards to %s' % (num_sheets, options['output']))
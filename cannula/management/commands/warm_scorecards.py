@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cannula.warming import warm_scorecards, warm_user
+
+
+class Command(BaseCommand):
+    help = 'Render the common scorecards (current and previous period, all and each district) into the scorecard cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='number of scorecards to render at once (default: settings.SCORECARD_WARM_CONCURRENCY)')
+        parser.add_argument('--level', type=int, action='append', dest='levels', help='only warm this org unit level (may be repeated)')
+        parser.add_argument('--format', action='append', dest='output_formats', choices=['HTML', 'EXCEL', 'CSV'], help='output format to warm (may be repeated, default: HTML)')
+        parser.add_argument('--district', action='append', dest='districts', help='only warm this district (may be repeated)')
+        parser.add_argument('--username', help='user to render the scorecards as (default: first active superuser)')
+
+    def handle(self, *args, **options):
+        user = warm_user(options['username'])
+        if user is None:
+            raise CommandError('No active superuser found, use --username')
+
+        output_formats = tuple(options['output_formats'] or ('HTML',))
+        num_warmed = warm_scorecards(user, options['concurrency'], options['levels'], output_formats, options['districts'])
+
+        self.stdout.write('Warmed %d scorecards' % (num_warmed,))
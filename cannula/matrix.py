@@ -0,0 +1,214 @@
+import numpy as np
+
+from .grid import ScorecardGrid, nan_to_none
+
+def zero_if_nan(a):
+    """
+    Vectorised default_zero(), for sums where a missing value counts as nothing
+
+    >>> zero_if_nan(np.array([1.0, np.nan])).tolist()
+    [1.0, 0.0]
+    """
+    return np.where(np.isnan(a), 0.0, a)
+
+def safe_divide(numerator, denominator):
+    """
+    Element-wise division giving NaN (NULL) wherever the denominator is zero or
+    either operand is missing, instead of raising or producing infinities
+
+    >>> [nan_to_none(x) for x in safe_divide(np.array([1.0, 1.0, np.nan, 3.0]), np.array([2.0, 0.0, 4.0, np.nan])).tolist()]
+    [0.5, None, None, None]
+    """
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float))
+    result = np.full(numerator.shape, np.nan)
+    valid = ~np.isnan(numerator) & ~np.isnan(denominator) & (denominator != 0)
+    np.divide(numerator, denominator, out=result, where=valid)
+    return result
+
+def percent(numerator, denominator):
+    return safe_divide(numerator * 100, denominator)
+
+class ScorecardMatrix():
+    """
+    Dense grid of scorecard values with one row per orgunit path and one column
+    per (data element, category combo) pair. Missing (NULL) values are NaN, so
+    derived indicators can be computed one whole column at a time
+
+    >>> m = ScorecardMatrix([('A',), ('B',)], [('tested', None), ('target', None)], [[5, 10], [None, 0]])
+    >>> m['tested %', None] = percent(m['tested', None], m['target', None])
+    >>> [(ou_path, [(c['district'], c['de_name'], c['numeric_sum']) for c in cells]) for ou_path, cells in m.to_grid(('district',), [('tested %', None)])]
+    [(('A',), [('A', 'tested %', 50.0)]), (('B',), [('B', 'tested %', None)])]
+    >>> m.mask.tolist()
+    [[False, False, False], [True, False, True]]
+    """
+    def __init__(self, rows, columns, values=None):
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.col_index = { c:i for i, c in enumerate(self.columns) }
+        if values is None:
+            self.values = np.full((len(self.rows), len(self.columns)), np.nan)
+        else:
+            # None becomes NaN when converting object sequences to floats
+            self.values = np.array(values, dtype=float).reshape((len(self.rows), len(self.columns)))
+        self.num_source_columns = len(self.columns) # columns added later are derived
+        self.calculations = list()
+
+    @classmethod
+    def from_grouped(cls, grouped_vals, columns):
+        """
+        Build a matrix from the [ou_path, [cell, ...]] rows produced by
+        grabbag.pivot_rows(), where cells are in the same order as columns
+        """
+        rows = [ou_path for ou_path, _ in grouped_vals]
+        values = [[c['numeric_sum'] for c in cells] for _, cells in grouped_vals]
+        return cls(rows, columns, values)
+
+    @property
+    def mask(self):
+        return np.isnan(self.values)
+
+    def __getitem__(self, column):
+        return self.values[:, self.col_index[column]]
+
+    def __setitem__(self, column, col_values):
+        if column not in self.col_index:
+            self.col_index[column] = len(self.columns)
+            self.columns.append(column)
+            self.values = np.hstack((self.values, np.full((len(self.rows), 1), np.nan)))
+        self.values[:, self.col_index[column]] = col_values
+
+    def __contains__(self, column):
+        return column in self.col_index
+
+    def calculate(self, calc_func):
+        """
+        Run calc_func(matrix) to fill in derived columns, remembering it so the
+        derived columns can be computed again once the matrix has been reshaped
+        """
+        self.calculations.append(calc_func)
+        calc_func(self)
+        return self
+
+    def rollup(self, rows, by_period=False):
+        """
+        Sum this matrix, whose rows are (facility) orgunit paths followed by the
+        period, into the coarser orgunit paths in rows (e.g. districts). Each
+        row is counted towards the row its path starts with, for all periods
+        or (by_period) for its own period only. A sum of only missing values
+        stays missing and rows without any values are left out, as with
+        filter_empty_rows(). Derived columns (e.g. percentages) do not add up,
+        so only the source columns are summed and the remembered calculations
+        are run again on the sums
+
+        >>> m = ScorecardMatrix([('A', 'a1', 'Q1'), ('A', 'a2', 'Q1'), ('A', 'a2', 'Q2'), ('B', 'b1', 'Q1')], [('tested', None), ('target', None)], [[5, 10], [None, 10], [2, 5], [None, None]])
+        >>> def calc(m):
+        ...     m['tested %', None] = percent(m['tested', None], m['target', None])
+        >>> m.calculate(calc)
+        ScorecardMatrix<4 rows, 3 columns>
+        >>> d = m.rollup([('A',), ('B',), ('C',)])
+        >>> d.rows, d.values.tolist()
+        ([('A',)], [[7.0, 25.0, 28.0]])
+        >>> d = m.rollup([('A', 'Q1'), ('A', 'Q2'), ('B', 'Q1')], by_period=True)
+        >>> d.rows, d.values.tolist()
+        ([('A', 'Q1'), ('A', 'Q2')], [[5.0, 20.0, 25.0], [2.0, 5.0, 40.0]])
+        """
+        depth = len(rows[0]) if rows else 0
+        if by_period:
+            depth -= 1
+            target_path = lambda r: r[:depth] + r[-1:]
+        else:
+            target_path = lambda r: r[:depth]
+        row_index = { r:i for i, r in enumerate(rows) }
+        targets = np.array([row_index.get(target_path(r), -1) for r in self.rows], dtype=int)
+        in_rows = targets >= 0
+        source_values = self.values[in_rows, :self.num_source_columns]
+
+        sums = np.zeros((len(rows), self.num_source_columns))
+        counts = np.zeros((len(rows), self.num_source_columns), dtype=int)
+        np.add.at(sums, targets[in_rows], zero_if_nan(source_values))
+        np.add.at(counts, targets[in_rows], ~np.isnan(source_values))
+        sums[counts == 0] = np.nan
+        non_empty = counts.any(axis=1)
+
+        rolled_up = ScorecardMatrix([r for r, keep in zip(rows, non_empty) if keep], self.columns[:self.num_source_columns], sums[non_empty])
+        for calc_func in self.calculations:
+            rolled_up.calculate(calc_func)
+        return rolled_up
+
+    def take(self, row_indices):
+        """
+        A matrix of only the rows at row_indices, in that order
+
+        >>> ScorecardMatrix([('A',), ('B',), ('C',)], [('tested', None)], [[1], [2], [3]]).take([2, 0]).rows
+        [('C',), ('A',)]
+        """
+        taken = ScorecardMatrix([self.rows[i] for i in row_indices], self.columns, self.values[np.asarray(row_indices, dtype=int)])
+        taken.num_source_columns = self.num_source_columns
+        taken.calculations = list(self.calculations)
+        return taken
+
+    def to_grid(self, ou_path_fields, columns=None, previous_periods=None, previous_columns=None):
+        """
+        Copy (a selection of columns of) the matrix into a ScorecardGrid for
+        the templates and Excel writers. For rows ending with the period,
+        previous_periods ({ period: previous period }) adds the value for the
+        previous period and the change since then to each cell. Where the
+        periods are columns instead, previous_columns (the column of the
+        previous period for each of columns, None where there is none) does the
+        same
+
+        >>> m = ScorecardMatrix([('A', 'Q1'), ('A', 'Q2')], [('tested', None)], [[5], [7]])
+        >>> [(c['numeric_sum'], c['delta']) for _, cells in m.to_grid(('district', 'period'), previous_periods={ 'Q2': 'Q1' }) for c in cells]
+        [(5.0, None), (7.0, 2.0)]
+        >>> m = ScorecardMatrix([('A',)], [('tested', 'Q1'), ('tested', 'Q2')], [[5, 7]])
+        >>> [(c['numeric_sum'], c['previous']) for _, cells in m.to_grid(('district',), previous_columns=[None, ('tested', 'Q1')]) for c in cells]
+        [(5.0, None), (7.0, 5.0)]
+        """
+        grid = self.empty_grid(ou_path_fields, columns, previous_periods is not None or previous_columns is not None)
+        grid.rows = [row for _, row in self.grid_rows(grid, previous_periods, previous_columns)]
+        return grid
+
+    def iter_grid(self, ou_path_fields, columns=None, previous_periods=None, previous_columns=None):
+        """
+        The (ou_path, cells) rows of to_grid(), each only made as it is reached,
+        so a streamed page can send its first rows before making the rest
+
+        >>> m = ScorecardMatrix([('A',), ('B',)], [('tested', None)], [[5], [None]])
+        >>> rows = m.iter_grid(('district',))
+        >>> [(ou_path, [c['numeric_sum'] for c in cells]) for ou_path, cells in rows]
+        [(('A',), [5.0]), (('B',), [None])]
+        """
+        grid = self.empty_grid(ou_path_fields, columns, previous_periods is not None or previous_columns is not None)
+        return self.grid_rows(grid, previous_periods, previous_columns)
+
+    def empty_grid(self, ou_path_fields, columns=None, with_previous=False):
+        return ScorecardGrid(ou_path_fields, self.columns if columns is None else columns, ('previous', 'delta') if with_previous else ())
+
+    def grid_rows(self, grid, previous_periods=None, previous_columns=None):
+        """The rows of the matrix (for the columns of grid) as rows of grid, one at a time"""
+        col_indices = [self.col_index[c] for c in grid.columns]
+        selected_values = self.values[:, col_indices]
+
+        if not grid.extras:
+            for ou_path, row_values in zip(self.rows, selected_values):
+                yield ou_path, grid.make_row(ou_path, row_values.tolist())
+            return
+
+        previous_values = np.full(selected_values.shape, np.nan)
+        if previous_periods is not None:
+            row_index = { r:i for i, r in enumerate(self.rows) }
+            for i, ou_path in enumerate(self.rows):
+                j = row_index.get(ou_path[:-1] + (previous_periods.get(ou_path[-1]),))
+                if j is not None:
+                    previous_values[i] = selected_values[j]
+        else:
+            for j, c in enumerate(previous_columns):
+                if c in self.col_index:
+                    previous_values[:, j] = self.values[:, self.col_index[c]]
+        delta_values = selected_values - previous_values
+
+        for ou_path, row_values, row_previous, row_delta in zip(self.rows, selected_values, previous_values, delta_values):
+            yield ou_path, grid.make_row(ou_path, row_values.tolist(), row_previous.tolist(), row_delta.tolist())
+
+    def __repr__(self):
+        return 'ScorecardMatrix<%d rows, %d columns>' % (len(self.rows), len(self.columns))
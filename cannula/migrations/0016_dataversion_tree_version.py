@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cannula', '0015_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='tree_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cannula', '0016_dataversion_tree_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='validationrule',
+            name='left_symbolic',
+            field=models.CharField(max_length=512, blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='validationrule',
+            name='right_symbolic',
+            field=models.CharField(max_length=512, blank=True, editable=False),
+        ),
+    ]
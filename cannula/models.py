@@ -440,6 +440,41 @@ class DataValue(models.Model):
     def __str__(self):
         return '%s [%s], %s, %s, %d' % (str(self.data_element), self.category_combo, self.site_str.split(' => ')[-1],  next(filter(None, (self.month, self.quarter, self.year))), self.numeric_value,)
 
+class DataVersion(models.Model):
+    """Counter that changes whenever the data that scorecards are computed from changes"""
+    version = models.PositiveIntegerField(default=0)
+    tree_version = models.PositiveIntegerField(default=0) # changes with the OrgUnit hierarchy only
+    element_version = models.PositiveIntegerField(default=0) # changes as data elements are added, renamed or removed
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls):
+        data_version, created = cls.objects.get_or_create(id=1)
+        return data_version
+
+    @classmethod
+    def bump(cls):
+        from django.utils import timezone
+
+        cls.current() # make sure the row exists
+        cls.objects.filter(id=1).update(version=F('version')+1, updated_at=timezone.now())
+
+    @classmethod
+    def bump_tree(cls):
+        from django.utils import timezone
+
+        cls.current() # make sure the row exists
+        # orgunit names appear in the scorecards too, so they are stale as well
+        cls.objects.filter(id=1).update(version=F('version')+1, tree_version=F('tree_version')+1, updated_at=timezone.now())
+
+    @classmethod
+    def bump_elements(cls):
+        cls.current() # make sure the row exists
+        cls.objects.filter(id=1).update(element_version=F('element_version')+1)
+
+    def __str__(self):
+        return 'v%d (%s)' % (self.version, self.updated_at)
+
 @lru_cache(maxsize=16) # memoize to reduce cost of "parsing"
 def extract_periods(period_str):
     from .grabbag import period_to_dates, dates_to_iso_periods
@@ -527,8 +562,7 @@ def load_excel_to_datavalues(source_doc):
                 except decimal.InvalidOperation as e:
                     pass # not convertible to a Decimal, ignore
 
-
-    return dict() # TODO: remove this and update callers
+    DataVersion.bump() # invalidate cached scorecards
 
 def de_pivot_col(de):
     return 'DE_%d' % (de.id,)
@@ -539,16 +573,35 @@ def pivot_clause(data_elements):
 def validation_expr(left, right, operator):
     pass
 
-def validation_expr_elements(expr):
+@lru_cache(maxsize=1)
+def data_element_matcher(element_version):
+    """
+    A compiled regex matching the name or alias of any data element, and the
+    ids of the data elements by their casefolded names and aliases, for one
+    DataVersion.element_version (so every process sees data element changes)
+    """
+    de_ids = dict()
+    for de_id, name, alias in DataElement.objects.all().values_list('id', 'name', 'alias'):
+        for de_name in filter(None, (name, alias)):
+            de_ids[de_name.casefold()] = de_id
+    return re.compile(grabbag.trie_regex(de_ids.keys()), flags=re.IGNORECASE), de_ids
+
+def tokenize_validation_expr(expr):
+    """
+    The expression in symbolic form, with the data element names and aliases
+    in it replaced by DE_<id>, and the names and aliases found
+    """
+    matcher, de_ids = data_element_matcher(DataVersion.current().element_version)
     names = list()
-    for de_tup in DataElement.objects.all().values_list('name', 'alias'):
-        names.extend(de_tup)
-    names = filter(None, names)
-    sorted_names = list(sorted(names, reverse=True)) # sort puts longest matches first
-    DE_REGEX = '|'.join('%s' % (re.escape(de_name),) for de_name in sorted_names)
-    m = re.findall(DE_REGEX, expr, flags=re.IGNORECASE)
-    print(m)
-    return tuple(filter(None, m))
+    def symbol(m):
+        # the regex ignores case one character at a time, which (as with
+        # 'İ' for 'i') does not always give back a casefolded name
+        de_id = de_ids.get(m.group(0).casefold())
+        if de_id is None:
+            return m.group(0)
+        names.append(m.group(0))
+        return 'DE_%d' % (de_id,)
+    return matcher.sub(symbol, expr), tuple(names)
 
 def load_excel_to_validations(source_doc):
     wb = openpyxl.load_workbook(source_doc.file.path) #TODO: ensure we close the workbook file. use a context manager?
@@ -566,47 +619,33 @@ def load_excel_to_validations(source_doc):
             validation_name, l_exp, op, r_exp, *_ = [c.value for c in row]
             if not l_exp or not op or not r_exp:
                 continue # ignore rows where any part of the rule is missing
-            print(validation_name, l_exp, op, r_exp)
-            l_element_names = validation_expr_elements(l_exp)
-            r_element_names = validation_expr_elements(r_exp)
-            element_names = l_element_names + r_element_names
+            logger.debug((validation_name, l_exp, op, r_exp))
             try:
                 vr = ValidationRule.objects.get(name=validation_name)
                 vr.left_expr, vr.right_expr, vr.operator = l_exp, r_exp, op
             except ValidationRule.DoesNotExist as e:
                 vr = ValidationRule(name=validation_name, left_expr=l_exp, right_expr=r_exp, operator=op)
             vr.save()
-            print(vr.view_name())
-
-    return
+            logger.debug(vr.view_name())
 
-    ou_level = month_multiple = None
-    search_periods = ['2016']
-    de_meta_list = query_de_meta(tt_names)
-    print(de_meta_list)
-    calc_exprs = (
-        ('DE_5*100/DE_22', ['DE_22',]),
-        ('DE_6*100/DE_22', ['DE_22',]),
-    )
-    if ou_level is None: # if not explicitly given use the highest orgunit level
-        ou_level = min(map(lambda x: x.ou_level, de_meta_list))
-    if month_multiple is None:
-        month_multiple = max(map(lambda x: x.month_multiple, de_meta_list))
-    calc_query = mk_calculation_sql(calc_exprs, de_meta_list, [], ou_level, search_periods, month_multiple)
-    print(calc_query)
-
-def mk_validation_rule_sql(rule_expr, data_elements):
-    de_meta_list = query_de_meta(data_elements)
+def validation_rule_grain(de_meta_list):
+    """The (ou_level, month_multiple) at which a rule over de_meta_list is checked"""
     ou_level = min(map(lambda x: x.ou_level, de_meta_list))
     month_multiple = max(map(lambda x: x.month_multiple, de_meta_list))
+    return ou_level, month_multiple
 
-    subst_rule_expr = rule_expr
-    for de_meta in sorted(de_meta_list, key=lambda x: x.name, reverse=True):
-        subst_rule_expr = re.sub('(?i)' + re.escape(de_meta.name), 'DE_%d' % (de_meta.id,), subst_rule_expr)
-        if de_meta.alias:
-            subst_rule_expr = re.sub('(?i)' + re.escape(de_meta.alias), 'DE_%d' % (de_meta.id,), subst_rule_expr)
+def validation_rule_key_fields(de_meta_list):
+    """
+    The columns identifying a row of a validation rule's view, with the
+    district first, as reports filter on it
+    """
+    ou_level, month_multiple = validation_rule_grain(de_meta_list)
+    ou_fields = fields_for_ou_level(ou_level)
+    return ou_fields[1:] + fields_for_month_multiple(month_multiple) + ou_fields[:1]
 
-    return mk_calculation_sql([(subst_rule_expr, [])], de_meta_list, [], ou_level, [], month_multiple)
+def mk_validation_rule_sql(symbolic_expr, de_meta_list):
+    ou_level, month_multiple = validation_rule_grain(de_meta_list)
+    return mk_calculation_sql([(symbolic_expr, [])], de_meta_list, [], ou_level, [], month_multiple)
 
 def query_de_meta(de_names):
     """
@@ -623,7 +662,7 @@ def query_de_meta(de_names):
     q_objs = reduce(lambda x, y: x | y, (Q(alias__iexact=de_name)|Q(name__iexact=de_name) for de_name in de_names))
     qs = DataElement.objects.filter(q_objs)
     qs = qs.annotate(ou_level=Min(F('data_values__org_unit__level')))
-    qs = qs.annotate(month_multiple=Min(Case(When(data_values__month__isnull=False, then=1), When(data_values__quarter__isnull=False, then=4), When(data_values__year__isnull=False, then=12), default=None, output_field=models.IntegerField())))
+    qs = qs.annotate(month_multiple=Min(Case(When(data_values__month__isnull=False, then=1), When(data_values__quarter__isnull=False, then=3), When(data_values__year__isnull=False, then=12), default=None, output_field=models.IntegerField())))
     qs = qs.order_by('name', 'id', 'ou_level', 'month_multiple')
     
     DataElementMeta = namedtuple('DataElementMeta', ['name', 'alias', 'id', 'ou_level', 'month_multiple'])
@@ -635,41 +674,37 @@ def fields_for_ou_level(ou_level):
 def fields_for_month_multiple(month_mul):
     return ('year', 'quarter', 'month')[:(12, 3, 1).index(month_mul)+1]
 
-def gen_pairs(iterable):
-    item2_iter = iter(iterable)
-    _ = next(item2_iter) # skip one ahead
-    for item1 in iterable:
-        yield (item1, next(item2_iter))
-
-def mk_de_group_sql(de_meta_list, all_fields, ou_level):
+def mk_de_group_sql(de_meta_list, all_fields, ou_level, field_params=()):
+    """
+    SQL (with its parameters) selecting all_fields of the values of the data
+    elements of de_meta_list that are collected at ou_level, with ou0..ouN
+    the org units from the root down to the value's own
+    """
     select_clause = ' '.join(['SELECT', ', '.join(all_fields)])
-    
-    _tables = ['cannula_datavalue dv', 'cannula_orgunit ou', 'cannula_dataelement de'] + ['cannula_orgunit ou%d' % i for i in range(ou_level+1)]
-    from_clause = ' '.join(['FROM', ', '.join(_tables)])
 
-    join_filter_subclause = ' AND '.join(('dv.org_unit_id=ou.id', 'dv.data_element_id=de.id'))
-    ou_traversals = ['ou0.parent_id IS NULL'] + ['ou%d.parent_id=ou%d.id' % (c, p) for p,c in gen_pairs(range(ou_level+1))]
-    ou_traversals.append('ou.id = ou%d.id' % (ou_level,))
-    de_filters = ['de.name=\'%s\'' % (de_m.name,) for de_m in de_meta_list] #TODO: switch to data element IDs/UIDs/CODEs to avoid SQL injection
-    de_filter_clause = '(%s)' % ('\nOR '.join(de_filters),)
-    where_parts = [join_filter_subclause, *ou_traversals, de_filter_clause]
-    where_clause = 'WHERE ' + ('\nAND '.join(where_parts))
+    # walk up from the value's org unit to the root of the hierarchy
+    joins = ['FROM cannula_datavalue dv', 'JOIN cannula_orgunit ou%d ON ou%d.id=dv.org_unit_id' % (ou_level, ou_level)]
+    joins.extend('JOIN cannula_orgunit ou%d ON ou%d.id=ou%d.parent_id' % (c-1, c-1, c) for c in range(ou_level, 0, -1))
+    from_clause = '\n'.join(joins)
+
+    de_filter_clause = 'dv.data_element_id IN (%s)' % (', '.join(['%s'] * len(de_meta_list)),)
+    where_clause = 'WHERE ' + '\nAND '.join(['ou0.parent_id IS NULL', de_filter_clause])
 
-    return '\n'.join([select_clause, from_clause, where_clause])
+    params = list(field_params) + [de_m.id for de_m in de_meta_list]
+    return '\n'.join([select_clause, from_clause, where_clause]), params
 
 def mk_union_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple):
     from itertools import groupby
 
     ou_fields = fields_for_ou_level(ou_level)
     period_fields = fields_for_month_multiple(period_month_multiple)
-    print(ou_fields, period_fields)
+    logger.debug((ou_fields, period_fields))
 
     hier_ou_pairs = tuple(('ou%d' % (i,), f) for i, f in enumerate(ou_fields))
     hier_ou_fields = tuple('%s.name as %s' % (code, desc) for code, desc in hier_ou_pairs)
+    value_fields = ('dv.data_element_id as de_id', 'dv.numeric_value as numeric_value')
 
-    placeholder_fields = ', '.join(['NULL as %s' % (f,) for f in (period_fields + ou_fields)])
-    union_parts = ['SELECT %s, NULL as de_name, NULL as numeric_value FROM cannula_datavalue dv' % (placeholder_fields,)]
-
+    union_parts, params = list(), list()
     grouped_de_metas = groupby(de_meta_list, lambda x: (x.ou_level, x.month_multiple))
     for g in grouped_de_metas:
         g_ident, g_seq = g
@@ -677,46 +712,53 @@ def mk_union_sql(de_meta_list, ou_list, ou_level, period_list, period_month_mult
         g_ou_level, g_month_multiple = g_ident
 
         if g_month_multiple > period_month_multiple:
-            my_period_fields = fields_for_month_multiple(g_month_multiple)
+            my_period_fields = tuple('dv.%s as %s' % (f, f) for f in fields_for_month_multiple(g_month_multiple))
             my_periods = [tuple(filter(None, grabbag.dates_to_iso_periods(*grabbag.period_to_dates(p)))) for p in period_list]
-            my_periods = [tuple('\'%s\'' % (p,) for p in p_tup) for p_tup in my_periods] #TODO: do proper db quoting
-            print(my_periods)
             for p_tup in my_periods:
-                all_fields = my_period_fields + p_tup[len(my_period_fields):] + hier_ou_fields + ('de.name as de_name' , 'numeric_value')
-                group_select = mk_de_group_sql(g_seq, all_fields, g_ou_level)
+                # the finer periods the values are spread over, as constants
+                p_consts = tuple(zip(period_fields, p_tup))[len(my_period_fields):]
+                all_fields = my_period_fields + tuple('%%s as %s' % (f,) for f, _ in p_consts) + hier_ou_fields + value_fields
+                group_select, group_params = mk_de_group_sql(g_seq, all_fields, g_ou_level, [p for _, p in p_consts])
                 union_parts.append(group_select)
+                params.extend(group_params)
         else:
-            my_period_fields = period_fields
-            all_fields = my_period_fields + hier_ou_fields + ('de.name as de_name' , 'numeric_value')
-            group_select = mk_de_group_sql(g_seq, all_fields, g_ou_level)
+            my_period_fields = tuple('dv.%s as %s' % (f, f) for f in period_fields)
+            all_fields = my_period_fields + hier_ou_fields + value_fields
+            group_select, group_params = mk_de_group_sql(g_seq, all_fields, g_ou_level)
             union_parts.append(group_select)
+            params.extend(group_params)
+
+    if not union_parts: # no values to select, but the columns still need names
+        placeholder_fields = ', '.join(['NULL as %s' % (f,) for f in (period_fields + ou_fields + ('de_id', 'numeric_value'))])
+        union_parts.append('SELECT %s WHERE false' % (placeholder_fields,))
 
-    return '\nUNION ALL\n'.join(union_parts)
+    return '\nUNION ALL\n'.join(union_parts), params
 
 def mk_aggregate_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple):
-    union_sql = mk_union_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
+    union_sql, params = mk_union_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
     ou_fields = fields_for_ou_level(ou_level)
     period_fields = fields_for_month_multiple(period_month_multiple)
-    groupby_fields = period_fields+ou_fields+('de_name',)
+    groupby_fields = period_fields+ou_fields+('de_id',)
     groupby_fields_str = ', '.join(groupby_fields)
     select_clause = ' '.join(['SELECT', ', '.join(groupby_fields+('sum(numeric_value) as numeric_sum', 'count(numeric_value) as numeric_count'))])
-    group_order_clause = 'AS q_aggregate\nGROUP BY %s\nORDER BY %s' % (groupby_fields_str, groupby_fields_str)
+    group_clause = 'AS q_aggregate\nGROUP BY %s' % (groupby_fields_str,)
 
-    aggregate_sql = select_clause + '\n' + 'FROM (' + '\n' + union_sql + '\n' + ') ' + group_order_clause
+    aggregate_sql = select_clause + '\n' + 'FROM (' + '\n' + union_sql + '\n' + ') ' + group_clause
 
-    return aggregate_sql
+    return aggregate_sql, params
 
 def mk_pivot_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple):
-    aggregate_sql = mk_aggregate_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
+    aggregate_sql, aggregate_params = mk_aggregate_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
     ou_fields = fields_for_ou_level(ou_level)
     period_fields = fields_for_month_multiple(period_month_multiple)
-    pivot_fields = list()
+    pivot_fields, params = list(), list()
     for de in de_meta_list:
         if de.month_multiple <= period_month_multiple:
-            de_pivot_str = 'SUM(CASE WHEN de_name = \'%s\' THEN numeric_sum ELSE 0 END) as DE_%d' % (de.name, de.id)
+            de_pivot_str = 'SUM(CASE WHEN de_id = %%s THEN numeric_sum ELSE 0 END) as DE_%d' % (de.id,)
         else:
-            de_pivot_str = 'SUM(CASE WHEN de_name = \'%s\' THEN numeric_sum/%f ELSE 0 END) as DE_%d' % (de.name, de.month_multiple/period_month_multiple, de.id)
+            de_pivot_str = 'SUM(CASE WHEN de_id = %%s THEN numeric_sum/%f ELSE 0 END) as DE_%d' % (de.month_multiple/period_month_multiple, de.id)
         pivot_fields.append(de_pivot_str)
+        params.append(de.id)
     groupby_fields = period_fields + ou_fields
     groupby_fields_str = ', '.join(groupby_fields)
     select_clause = ' '.join(['SELECT', ', '.join(groupby_fields+tuple(pivot_fields))])
@@ -724,11 +766,13 @@ def mk_pivot_sql(de_meta_list, ou_list, ou_level, period_list, period_month_mult
 
     pivot_sql = select_clause + '\n' + 'FROM (' + '\n' + aggregate_sql + '\n' + ') ' + group_clause
 
-    return pivot_sql
+    # the pivot's parameters come first, in the select clause
+    return pivot_sql, params + aggregate_params
 
 def mk_calc_fields(calculations):
     calc_fields = list()
     for i, (calc_exp, zero_checks) in enumerate(calculations, start=1):
+        calc_exp = calc_exp.replace('%', '%%') # not a parameter placeholder
         z_c_str = ' AND '.join('(%s != 0)' % (z_c_field) for z_c_field in zero_checks)
         if len(zero_checks) > 0:
             calc_str = 'CASE WHEN %s THEN %s ELSE NULL END as DE_CALC_%d' % (z_c_str, calc_exp, i)
@@ -739,17 +783,20 @@ def mk_calc_fields(calculations):
     return tuple(calc_fields)
 
 def mk_calculation_sql(calculations, de_meta_list, ou_list, ou_level, period_list, period_month_multiple):
+    """
+    SQL of the calculations over the data elements of de_meta_list, at
+    ou_level and period_month_multiple, and the parameters to execute it with
+    """
     from collections import defaultdict
 
-    print('OU_PARAM: %d, PERIOD_PARAM: %d' % (ou_level, period_month_multiple))
+    logger.debug('OU_PARAM: %d, PERIOD_PARAM: %d' % (ou_level, period_month_multiple))
     
-    pivot_sql = mk_pivot_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
+    pivot_sql, pivot_params = mk_pivot_sql(de_meta_list, ou_list, ou_level, period_list, period_month_multiple)
     ou_fields = fields_for_ou_level(ou_level)
     period_fields = fields_for_month_multiple(period_month_multiple)
     calc_src_fields =  tuple('DE_%d' % (de.id,) for de in de_meta_list)
     calc_fields = mk_calc_fields(calculations)
     groupby_fields = period_fields + ou_fields
-    groupby_fields_str = ', '.join(groupby_fields)
     select_clause = ' '.join(['SELECT', ', '.join(groupby_fields+calc_src_fields+calc_fields)])
 
     where_groups = defaultdict(list)
@@ -759,7 +806,8 @@ def mk_calculation_sql(calculations, de_meta_list, ou_list, ou_level, period_lis
         for p_pair in zip(p_fields, p_vals):
             if p_pair not in where_groups[p_pair[0]]:
                 where_groups[p_pair[0]].append(p_pair)
-    where_parts = ['(%s)' % (' OR '.join('%s=\'%s\'' % (f, v) for f, v in l),) for k, l in where_groups.items()]
+    where_parts = ['(%s)' % (' OR '.join('%s=%%s' % (f,) for f, v in l),) for k, l in where_groups.items()]
+    where_params = [v for k, l in where_groups.items() for f, v in l]
 
     if len(where_parts) > 0:
         where_clause = 'WHERE (%s)' % ' AND '.join(where_parts)
@@ -768,13 +816,16 @@ def mk_calculation_sql(calculations, de_meta_list, ou_list, ou_level, period_lis
 
     calculation_sql = select_clause + '\n' + 'FROM (' + '\n' + pivot_sql + '\n' + ') AS q_calculate' + '\n' + where_clause
 
-    return calculation_sql
+    return calculation_sql, pivot_params + where_params
 
 class ValidationRule(models.Model):
     name = models.CharField(max_length=128, unique=True)
-    left_expr = models.CharField(max_length=256) #TODO: store the cleaned up expression with symbolic data element names
+    left_expr = models.CharField(max_length=256)
     right_expr = models.CharField(max_length=256)
     operator = models.CharField(max_length=2) #TODO: make this a choice field
+    # the expressions with data elements as DE_<id> (see tokenize_validation_expr), set by instanciate()
+    left_symbolic = models.CharField(max_length=512, blank=True, editable=False)
+    right_symbolic = models.CharField(max_length=512, blank=True, editable=False)
     #TODO: add a description/comments field ?
 
     data_elements = models.ManyToManyField(DataElement)
@@ -782,15 +833,18 @@ class ValidationRule(models.Model):
     def expression(self):
         return ' '.join([self.left_expr, self.operator, self.right_expr])
 
+    def symbolic_expression(self):
+        return ' '.join([self.left_symbolic, self.operator, self.right_symbolic])
+
     def view_name(self):
         return 'vw_validation_%d' % (self.id,)
 
     def instanciate(self):
         from django.db import connection
 
-        # parse and collect data element names
-        l_element_names = validation_expr_elements(self.left_expr)
-        r_element_names = validation_expr_elements(self.right_expr)
+        # parse into symbolic form, collecting data element names
+        self.left_symbolic, l_element_names = tokenize_validation_expr(self.left_expr)
+        self.right_symbolic, r_element_names = tokenize_validation_expr(self.right_expr)
         element_names = l_element_names + r_element_names
 
         if len(l_element_names) == 0 or len(r_element_names) == 0:
@@ -807,10 +861,22 @@ class ValidationRule(models.Model):
                 self.data_elements.add(DataElement.objects.get(id=de_meta.id))
 
         # create the view
-        sql = mk_validation_rule_sql(self.expression(), element_names)
-        view_sql = 'CREATE OR REPLACE VIEW %s AS\n%s' % (self.view_name(), sql)
+        sql, params = mk_validation_rule_sql(self.symbolic_expression(), new_meta_list)
         cursor = connection.cursor()
-        cursor.execute(view_sql, [])
+        cursor.execute('SELECT relkind FROM pg_catalog.pg_class WHERE relname=%s', (self.view_name(),))
+        row = cursor.fetchone()
+        if getattr(settings, 'VALIDATION_MATERIALIZED_VIEWS', False):
+            if row is not None:
+                cursor.execute('DROP %s %s' % ('MATERIALIZED VIEW' if row[0] == 'm' else 'VIEW', self.view_name()))
+            cursor.execute('CREATE MATERIALIZED VIEW %s AS\n%s' % (self.view_name(), sql), params)
+            # needed to refresh the view concurrently, and what reports by district read through
+            key_fields = validation_rule_key_fields(new_meta_list)
+            cursor.execute('CREATE UNIQUE INDEX %s_key ON %s (%s)' % (self.view_name(), self.view_name(), ', '.join(key_fields)))
+        else:
+            if row is not None and row[0] == 'm':
+                cursor.execute('DROP MATERIALIZED VIEW %s' % (self.view_name(),))
+            view_sql = 'CREATE OR REPLACE VIEW %s AS\n%s' % (self.view_name(), sql)
+            cursor.execute(view_sql, params)
 
     def save(self, *args, **kwargs):
         super(ValidationRule, self).save(*args, **kwargs)
@@ -825,5 +891,30 @@ class ValidationRule(models.Model):
 def get_validation_view_names():
     from django.db import connection
     cursor = connection.cursor()
-    cursor.execute('SELECT viewname FROM pg_catalog.pg_views WHERE viewowner=%s and viewname LIKE %s;', (settings.DATABASES['default']['USER'], 'vw_validation_%'))
+    owner = settings.DATABASES['default']['USER']
+    cursor.execute('SELECT viewname FROM pg_catalog.pg_views WHERE viewowner=%s and viewname LIKE %s UNION SELECT matviewname FROM pg_catalog.pg_matviews WHERE matviewowner=%s and matviewname LIKE %s;', (owner, 'vw_validation_%', owner, 'vw_validation_%'))
+    return [x[0] for x in cursor]
+
+def get_materialized_validation_view_names():
+    from django.db import connection
+    cursor = connection.cursor()
+    cursor.execute('SELECT matviewname FROM pg_catalog.pg_matviews WHERE matviewowner=%s and matviewname LIKE %s;', (settings.DATABASES['default']['USER'], 'vw_validation_%'))
     return [x[0] for x in cursor]
+
+def refresh_validation_views(source_doc):
+    """
+    Refresh the materialized views of the validation rules over data elements
+    that source_doc has values of. Being refreshed concurrently, the views
+    can still be read meanwhile
+    """
+    from django.db import connection
+    materialized = set(get_materialized_validation_view_names())
+    if not materialized:
+        return
+
+    doc_elements = DataValue.objects.filter(source_doc=source_doc).values('data_element_id')
+    rules = ValidationRule.objects.filter(data_elements__id__in=doc_elements).distinct()
+    cursor = connection.cursor()
+    for rule in rules:
+        if rule.view_name() in materialized:
+            cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY %s' % (rule.view_name(),))
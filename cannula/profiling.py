@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils.html import escape
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import inspect
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+NUM_SLOWEST_QUERIES = 5
+
+def query_time(queries):
+    return sum(float(q['time']) for q in queries)
+
+class RequestProfile():
+    """Where the time of one request went, recorded by the phases it runs through"""
+    def __init__(self, request):
+        self.path = request.path
+        self.query_string = request.META.get('QUERY_STRING', '')
+        self.show_panel = panel_requested(request)
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float) # seconds of python time, excluding the queries run meanwhile
+
+    def sql_time(self):
+        return query_time(connection.queries_log)
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+@contextmanager
+def phase(name):
+    """Count the time spent in the with block (less any queries) towards a phase"""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+
+    started, sql_before = time.perf_counter(), profile.sql_time()
+    try:
+        yield
+    finally:
+        profile.phases[name] += time.perf_counter() - started - (profile.sql_time() - sql_before)
+
+def timed(name):
+    """
+    Decorator counting the calls of a function towards a phase. For generator
+    functions that is the time taken to produce each item
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                items = func(*args, **kwargs)
+                if current_profile() is None:
+                    yield from items
+                    return
+                while True:
+                    with phase(name):
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                    yield item
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with phase(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def panel_requested(request):
+    user = getattr(request, 'user', None)
+    return 'profile' in request.GET and user is not None and user.is_staff
+
+def explain(sql):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql)
+            return '\n'.join(' '.join(map(str, row)) for row in cursor.fetchall())
+    except DatabaseError:
+        return None
+
+def profile_record(profile, response):
+    queries = list(connection.queries_log)
+    total_time = time.perf_counter() - profile.started
+    sql_time = query_time(queries)
+    connection.force_debug_cursor = False # the EXPLAINs are not part of the request
+
+    slowest = sorted(queries, key=lambda q: float(q['time']), reverse=True)[:NUM_SLOWEST_QUERIES]
+    phases_ms = { '%s_ms' % name:round(t*1000, 1) for name, t in profile.phases.items() }
+    # what is not accounted for by a phase is the python of the view itself, i.e. the calculations
+    phases_ms['calculation_ms'] = round((total_time - sql_time - sum(profile.phases.values()))*1000, 1)
+    return {
+        'path': profile.path,
+        'query_string': profile.query_string,
+        'status': response.status_code,
+        'total_ms': round(total_time*1000, 1),
+        'sql_count': len(queries),
+        'sql_ms': round(sql_time*1000, 1),
+        'phases': phases_ms,
+        'slowest_queries': [{ 'ms': round(float(q['time'])*1000, 1), 'sql': q['sql'], 'plan': explain(q['sql']) } for q in slowest],
+    }
+
+def profile_panel(record):
+    rows = [('Total', record['total_ms']), ('SQL (%d queries)' % record['sql_count'], record['sql_ms'])]
+    rows.extend(sorted(record['phases'].items()))
+    html = ['<div class="w3-container w3-small no-print"><h4>Profile</h4><table class="w3-table w3-border">']
+    html.extend('<tr><td>%s</td><td class="w3-right-align">%s ms</td></tr>' % (escape(name), ms) for name, ms in rows)
+    html.append('</table>')
+    for q in record['slowest_queries']:
+        html.append('<p>%s ms</p><pre>%s</pre><pre>%s</pre>' % (q['ms'], escape(q['sql']), escape(q['plan'] or '')))
+    html.append('</div>')
+    return ''.join(html)
+
+def finish_profile(profile, response):
+    """Log the profile (and return the panel for the page, if asked for)"""
+    try:
+        record = profile_record(profile, response)
+        logger.info(json.dumps(record, sort_keys=True))
+        return profile_panel(record) if profile.show_panel else None
+    finally:
+        connection.force_debug_cursor = False
+        _local.profile = None
+
+class ProfilingMiddleware():
+    """
+    Record the queries and the time spent in each phase (pivot, render, excel)
+    of every request when SCORECARD_PROFILING is on, or of a staff user's
+    request with ?profile in the URL, in which case the profile is also shown
+    at the end of the page. Must come after AuthenticationMiddleware
+    """
+    def process_request(self, request):
+        if current_profile() is not None:
+            # a streamed response of the previous request was not sent in full
+            connection.force_debug_cursor = False
+            _local.profile = None
+
+        if getattr(settings, 'SCORECARD_PROFILING', False) or panel_requested(request):
+            connection.queries_log.clear()
+            connection.force_debug_cursor = True
+            _local.profile = RequestProfile(request)
+
+    def process_response(self, request, response):
+        profile = current_profile()
+        if profile is None:
+            return response
+
+        is_html = response.get('Content-Type', '').startswith('text/html')
+        if response.streaming:
+            # the rows of streamed pages are rendered while the response is sent
+            streaming_content = response.streaming_content
+
+            def content():
+                yield from streaming_content
+                panel = finish_profile(profile, response)
+                if panel and is_html:
+                    yield panel.encode(response.charset)
+
+            response.streaming_content = content()
+        else:
+            panel = finish_profile(profile, response)
+            if panel and is_html and b'</body>' in response.content:
+                response.content = response.content.replace(b'</body>', panel.encode(response.charset) + b'</body>', 1)
+        return response
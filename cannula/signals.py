@@ -1,9 +1,27 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from cannula.models import OrgUnit
+from cannula.models import OrgUnit, DataElement, DataVersion
 
 # Clear the OrgUnit cache whenever an OrgUnit is deleted
 @receiver(post_delete, sender=OrgUnit)
 def orgunit_cache_clear_handler(sender, **kwargs):
 	if OrgUnit.from_path_recurse.cache_clear and callable(OrgUnit.from_path_recurse.cache_clear):
 		OrgUnit.from_path_recurse.cache_clear()
+
+# Validation expressions are tokenized with a matcher of all data element names and aliases (see models.data_element_matcher)
+@receiver(post_save, sender=DataElement)
+@receiver(post_delete, sender=DataElement)
+def dataelement_element_version_handler(sender, **kwargs):
+	DataVersion.bump_elements()
+
+# Scorecards look data elements up by name or alias, so renaming/aliasing one can change their output
+@receiver(post_save, sender=DataElement)
+def dataelement_data_version_handler(sender, created, **kwargs):
+	if not created:
+		DataVersion.bump()
+
+# Cached orgunit paths and district lists (see dimensions.py) follow the tree version
+@receiver(post_save, sender=OrgUnit)
+@receiver(post_delete, sender=OrgUnit)
+def orgunit_tree_version_handler(sender, **kwargs):
+	DataVersion.bump_tree()
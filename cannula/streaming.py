@@ -0,0 +1,37 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template
+
+from itertools import islice
+
+from .profiling import phase
+
+ROWS_MARKER = '<!-- scorecard rows -->' # where base_dashboard.html puts the rows of the table
+
+def stream_scorecard(request, template_name, context, chunk_size=200):
+    """
+    Render a scorecard page (a template extending base_dashboard.html) as a
+    stream: the page up to the table body first, then the rows, chunk_size at
+    a time, as grouped_data (which can be a generator) produces them, and
+    finally the rest of the page. The end of the page is rendered once all the
+    rows are, so what is only known after making them (e.g. the number of
+    pages) is shown there
+    """
+    template = get_template(template_name)
+    grouped_data = iter(context['grouped_data'])
+
+    def render_page():
+        with phase('render'):
+            page = template.render(dict(context, grouped_data=()), request)
+        yield page.split(ROWS_MARKER, 1)[0]
+        while True:
+            rows = list(islice(grouped_data, chunk_size))
+            if not rows:
+                break
+            with phase('render'):
+                chunk = template.render(dict(context, grouped_data=rows, rows_only=True), request)
+            yield chunk
+        with phase('render'):
+            page = template.render(dict(context, grouped_data=()), request)
+        yield page.split(ROWS_MARKER, 1)[1]
+
+    return StreamingHttpResponse(render_page())
@@ -0,0 +1,202 @@
+from django.utils.http import urlencode
+
+from itertools import islice
+import math
+import operator
+import re
+
+import numpy as np
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+FILTER_REGEX = re.compile(r'^(\d+)(<=|>=|!=|<|>|=)(.+)$')
+FILTER_OPS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+TABLE_PARAMS = ('sort', 'filter', 'page', 'page_size')
+
+def parse_filter(filter_str):
+    """
+    A threshold ('14<5') or legend colour ('14=red') filter on a column, as
+    (column, op, value)
+
+    >>> parse_filter('14<5'), parse_filter('3=Red'), parse_filter('x<5')
+    ((14, '<', 5.0), (3, '=', 'red'), None)
+    """
+    m = FILTER_REGEX.match(filter_str.replace(' ', ''))
+    if m is None:
+        return None
+    column, op, value = m.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        if op not in ('=', '!='):
+            return None
+        value = value.lower()
+    return int(column), op, value
+
+def parse_int(s, default=None):
+    try:
+        return int(s)
+    except (TypeError, ValueError):
+        return default
+
+def request_table_params(request):
+    """The parts of a request that change which scorecard rows are shown (for the cache key)"""
+    return tuple((p, tuple(request.GET.getlist(p))) for p in TABLE_PARAMS if p in request.GET)
+
+class TableParams():
+    """
+    Sort (by any column, sort=3 or sort=-3 for descending), filters
+    (filter=14<5, filter=14=red for a legend colour) and pagination
+    (page=2&page_size=50) of scorecard rows. Columns are counted from the
+    first value column, as in data_element_names
+    """
+    def __init__(self, sort_column=None, descending=False, filters=(), page=None, page_size=DEFAULT_PAGE_SIZE, query=()):
+        self.sort_column = sort_column
+        self.descending = descending
+        self.filters = list(filters)
+        self.page = page
+        self.page_size = page_size
+        self.query = list(query) # the other request parameters, for links
+        self.num_rows = None
+
+    @classmethod
+    def from_request(cls, request):
+        sort = request.GET.get('sort', '')
+        sort_column = parse_int(sort.lstrip('-'))
+        filters = [f for f in map(parse_filter, request.GET.getlist('filter')) if f]
+        page = parse_int(request.GET.get('page'))
+        page_size = parse_int(request.GET.get('page_size'), DEFAULT_PAGE_SIZE)
+        if 'page_size' in request.GET and page is None:
+            page = 1
+        query = [(k, v) for k in request.GET if k not in ('sort', 'page') for v in request.GET.getlist(k)]
+        return cls(sort_column, sort.startswith('-'), filters, max(page, 1) if page else None, min(max(page_size, 1), MAX_PAGE_SIZE), query)
+
+    def page_slice(self):
+        if self.page is None:
+            return slice(None)
+        return slice((self.page-1)*self.page_size, self.page*self.page_size)
+
+    @property
+    def num_pages(self):
+        if self.page is None or self.num_rows is None:
+            return None
+        return max(1, math.ceil(self.num_rows/self.page_size))
+
+    @property
+    def previous_page(self):
+        return self.page-1 if self.page and self.page > 1 else None
+
+    @property
+    def next_page(self):
+        if self.page is None or (self.num_pages is not None and self.page >= self.num_pages):
+            return None
+        return self.page+1
+
+    @property
+    def base_query(self):
+        """Query string for links changing the sort (with a trailing & to append to)"""
+        return urlencode(self.query) + '&' if self.query else ''
+
+    @property
+    def page_query(self):
+        """Query string for links changing the page"""
+        sort = [('sort', '%s%d' % ('-' if self.descending else '', self.sort_column))] if self.sort_column is not None else []
+        return urlencode(self.query + sort) + '&' if self.query or sort else ''
+
+    def ignore_missing_columns(self, num_columns):
+        """
+        Drop the sort and filters on columns past the last one (from a stale
+        or edited link), rather than fail on them
+
+        >>> table = TableParams(7, filters=[(0, '<', 5), (9, '>', 1)])
+        >>> table.ignore_missing_columns(2)
+        >>> table.sort_column, table.filters
+        (None, [(0, '<', 5)])
+        """
+        if self.sort_column is not None and self.sort_column >= num_columns:
+            self.sort_column = None
+        self.filters = [f for f in self.filters if f[0] < num_columns]
+
+    def legend_colors(self, column, num_ou_fields, legend_sets):
+        legend_set = next((ls for ls in legend_sets if ls.maps_column(num_ou_fields+column)), None)
+        return legend_set.color if legend_set else (lambda value: None)
+
+    def apply(self, rows, num_ou_fields, legend_sets, num_rows=None):
+        """
+        The (ou_path, cells) rows to show. Rows are only gone through in full
+        when sorting or filtering, so a generator of rows is only computed up
+        to the end of the page otherwise (num_rows gives its length)
+
+        >>> rows = [(('A',), [{ 'numeric_sum': 5 }]), (('B',), [{ 'numeric_sum': None }]), (('C',), [{ 'numeric_sum': 7 }])]
+        >>> [ou_path for ou_path, cells in TableParams(0, descending=True).apply(rows, 1, [])]
+        [('C',), ('A',), ('B',)]
+        >>> [ou_path for ou_path, cells in TableParams(filters=[(0, '<', 6)]).apply(rows, 1, [])]
+        [('A',)]
+        >>> table = TableParams(page=2, page_size=2)
+        >>> table.apply(iter(rows), 1, [], num_rows=3), table.num_pages, table.next_page
+        ([(('C',), [{'numeric_sum': 7}])], 2, None)
+        >>> [ou_path for ou_path, cells in TableParams(7, filters=[(3, '<', 6)]).apply(rows, 1, [])]
+        [('A',), ('B',), ('C',)]
+        """
+        if self.filters or self.sort_column is not None:
+            rows = list(rows)
+            if rows:
+                self.ignore_missing_columns(len(rows[0][1]))
+            for column, op, value in self.filters:
+                if isinstance(value, str):
+                    colors = self.legend_colors(column, num_ou_fields, legend_sets)
+                    rows = [r for r in rows if FILTER_OPS[op](colors(r[1][column]['numeric_sum']), value)]
+                else:
+                    rows = [r for r in rows if r[1][column]['numeric_sum'] is not None and FILTER_OPS[op](r[1][column]['numeric_sum'], value)]
+            if self.sort_column is not None:
+                column = self.sort_column
+                present = [r for r in rows if r[1][column]['numeric_sum'] is not None]
+                missing = [r for r in rows if r[1][column]['numeric_sum'] is None]
+                rows = sorted(present, key=lambda r: r[1][column]['numeric_sum'], reverse=self.descending) + missing # missing values last
+            num_rows = len(rows)
+        elif num_rows is None and hasattr(rows, '__len__'):
+            num_rows = len(rows)
+        self.num_rows = num_rows
+
+        if self.page is None:
+            return rows
+        page = self.page_slice()
+        return list(islice(rows, page.start, page.stop))
+
+    def matrix_rows(self, matrix, columns, num_ou_fields, legend_sets):
+        """
+        Indices of the rows of a ScorecardMatrix to show, so that only those
+        are copied out for the templates
+
+        >>> from .matrix import ScorecardMatrix
+        >>> m = ScorecardMatrix([('A',), ('B',), ('C',)], [('tested', None)], [[5], [None], [7]])
+        >>> TableParams(0, descending=True, page=1, page_size=2).matrix_rows(m, [('tested', None)], 1, []).tolist()
+        [2, 0]
+        >>> TableParams(7, filters=[(1, '>', 0)]).matrix_rows(m, [('tested', None)], 1, []).tolist()
+        [0, 1, 2]
+        """
+        self.ignore_missing_columns(len(columns))
+        indices = np.arange(len(matrix.rows))
+        for column, op, value in self.filters:
+            col_values = matrix[columns[column]][indices]
+            if isinstance(value, str):
+                colors = self.legend_colors(column, num_ou_fields, legend_sets)
+                keep = np.array([FILTER_OPS[op](colors(v), value) for v in col_values.tolist()], dtype=bool)
+            else:
+                keep = ~np.isnan(col_values) & FILTER_OPS[op](col_values, value)
+            indices = indices[keep]
+        if self.sort_column is not None:
+            col_values = matrix[columns[self.sort_column]][indices]
+            # NaN (missing) sorts last either way
+            order = np.argsort(-col_values if self.descending else col_values, kind='mergesort')
+            indices = indices[order]
+        self.num_rows = len(indices)
+        return indices[self.page_slice()]
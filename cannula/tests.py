@@ -1,3 +1,326 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import resolve, reverse
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import parse_http_date
 
-# Create your tests here.
+from datetime import date
+import io
+import json
+import os
+import tempfile
+
+import openpyxl
+
+from .benchmarking import run_benchmarks, seed_orgunits
+from .caching import cache_scorecard, not_modified, request_period, scorecard_cache, scorecard_cache_key
+from .csvexport import csv_chunks, server_side_rows
+from .dashboards import LegendSet
+from .dateutil import current_and_previous_periods
+from .excel import ScorecardSheet, write_workbook
+from .indicators import AGE_SEX_SUBCATEGORIES, HTS_DE_NAMES, HTS_TARGET_DE_NAMES, PMTCT_CHILD_DE_NAMES, hts_calculations
+from .matrix import ScorecardMatrix, percent
+from .models import DataElement, DataValue, DataVersion, SourceDocument, data_element_matcher, get_default_category_combo, mk_calculation_sql, mk_validation_rule_sql, query_de_meta, tokenize_validation_expr
+from .tables import MAX_PAGE_SIZE, TableParams
+
+class ScorecardCacheKeyTests(SimpleTestCase):
+    def test_every_part_of_the_request_is_in_the_key(self):
+        key = scorecard_cache_key('hts_scorecard', 3, '2017-Q4', None, 'HTML', 7)
+        self.assertNotEqual(key, scorecard_cache_key('vmmc_scorecard', 3, '2017-Q4', None, 'HTML', 7))
+        self.assertNotEqual(key, scorecard_cache_key('hts_scorecard', 2, '2017-Q4', None, 'HTML', 7))
+        self.assertNotEqual(key, scorecard_cache_key('hts_scorecard', 3, '2017-Q3', None, 'HTML', 7))
+        self.assertNotEqual(key, scorecard_cache_key('hts_scorecard', 3, '2017-Q4', 'Kasese District', 'HTML', 7))
+        self.assertNotEqual(key, scorecard_cache_key('hts_scorecard', 3, '2017-Q4', None, 'EXCEL', 7))
+        self.assertNotEqual(key, scorecard_cache_key('hts_scorecard', 3, '2017-Q4', None, 'HTML', 8))
+
+    def test_request_period(self):
+        factory = RequestFactory()
+        self.assertEqual(request_period(factory.get('/', {'period': '2017-Q4'})), '2017-Q4')
+        self.assertEqual(request_period(factory.get('/', {'start_period': '2017-Q1', 'end_period': '2017-Q4'})), '2017-Q1..2017-Q4')
+        self.assertNotEqual(request_period(factory.get('/')), request_period(factory.get('/', {'period': '2017-Q4'})))
+
+    def test_default_period_is_the_current_period(self):
+        factory = RequestFactory()
+        current_quarter, _ = current_and_previous_periods('quarter')
+        current_month, _ = current_and_previous_periods('month')
+        self.assertEqual(request_period(factory.get('/')), 'default@' + current_quarter)
+        self.assertEqual(request_period(factory.get('/'), 'month'), 'default@' + current_month)
+
+class ScorecardConditionalGetTests(TestCase):
+    def setUp(self):
+        scorecard_cache().clear()
+        self.calls = 0
+
+        @cache_scorecard
+        def scorecard(request, org_unit_level=3, output_format='HTML'):
+            self.calls += 1
+            return HttpResponse('scorecard')
+
+        self.scorecard = scorecard
+        self.factory = RequestFactory()
+
+    def test_current_copy_is_not_modified(self):
+        response = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.calls, 1)
+
+        # GZipMiddleware suffixes the tags of the .json responses
+        response = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}, HTTP_IF_NONE_MATCH='W/"%s;gzip"' % etag.strip('"')))
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_request_or_data_version_is_modified(self):
+        etag = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}))['ETag']
+        response = self.scorecard(self.factory.get('/', {'period': '2017-Q3'}, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+
+        DataVersion.bump()
+        response = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.scorecard(self.factory.get('/', {'period': '2017-Q4'}))['Last-Modified']
+        request = self.factory.get('/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertTrue(not_modified(request, 'etag', parse_http_date(last_modified)))
+        self.assertFalse(not_modified(request, 'etag', parse_http_date(last_modified) + 1))
+        # If-None-Match wins
+        request = self.factory.get('/', HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"other"')
+        self.assertFalse(not_modified(request, 'etag', parse_http_date(last_modified)))
+
+class ScorecardWarmingTests(SimpleTestCase):
+    def test_imports_commit_before_warming(self):
+        # the admin action and the upload view commit their own transaction, then warm the cache
+        self.assertIn('default', resolve('/admin/cannula/sourcedocument/').func._non_atomic_requests)
+        self.assertIn('default', resolve(reverse('data_workflow_new')).func._non_atomic_requests)
+
+class ScorecardRollupTests(SimpleTestCase):
+    def setUp(self):
+        facilities = [('A', 'a1', 'f1'), ('A', 'a1', 'f2'), ('A', 'a2', 'f3'), ('B', 'b1', 'f4')]
+        self.facility_matrix = ScorecardMatrix(facilities, [('tested', None), ('target', None)], [[1, 4], [None, 4], [3, None], [None, None]])
+        def calc(m):
+            m['tested %', None] = percent(m['tested', None], m['target', None])
+        self.facility_matrix.calculate(calc)
+
+    def test_rollup_sums_source_columns(self):
+        subcounty_matrix = self.facility_matrix.rollup([('A', 'a1'), ('A', 'a2'), ('B', 'b1')])
+        self.assertEqual(subcounty_matrix.rows, [('A', 'a1'), ('A', 'a2')]) # B has no values
+        self.assertEqual(subcounty_matrix['tested', None].tolist(), [1.0, 3.0])
+        cells = subcounty_matrix.to_grid(('district', 'subcounty'), [('target', None)])
+        self.assertEqual([c['numeric_sum'] for _, (c,) in cells], [8.0, None]) # a sum of only missing values stays missing
+
+    def test_rollup_recalculates_derived_columns(self):
+        district_matrix = self.facility_matrix.rollup([('A',), ('B',)])
+        cells = list(district_matrix.to_grid(('district',), [('tested %', None)]))
+        self.assertEqual(cells[0][1][0]['numeric_sum'], 50.0) # (1 + 3) / (4 + 4), not a sum of percentages
+
+class TableParamsTests(SimpleTestCase):
+    def setUp(self):
+        self.matrix = ScorecardMatrix([('A',), ('B',), ('C',), ('D',)], [('tested', None), ('target', None)], [[5, 10], [None, 10], [7, 10], [1, 10]])
+        self.columns = [('tested', None), ('target', None)]
+        self.rows = [(ou_path, [{ 'numeric_sum': v } for v in values]) for ou_path, values in zip(self.matrix.rows, [[5, 10], [None, 10], [7, 10], [1, 10]])]
+        legend_set = LegendSet()
+        legend_set.add_interval('red', 0, 5)
+        legend_set.add_interval('green', 5, None)
+        legend_set.mappings[1] = True # the tested column, after the orgunit column
+        self.legend_sets = [legend_set]
+
+    def test_from_request(self):
+        factory = RequestFactory()
+        table = TableParams.from_request(factory.get('/', {'period': '2017-Q4', 'sort': '-1', 'filter': ['0>2', '0=Red', 'junk'], 'page_size': '5000'}))
+        self.assertEqual((table.sort_column, table.descending), (1, True))
+        self.assertEqual(table.filters, [(0, '>', 2.0), (0, '=', 'red')])
+        self.assertEqual((table.page, table.page_size), (1, MAX_PAGE_SIZE)) # a page size alone starts paging
+        self.assertIsNone(TableParams.from_request(factory.get('/', {'page': 'x'})).page)
+
+    def test_links_keep_the_other_parameters(self):
+        table = TableParams.from_request(RequestFactory().get('/', {'period': '2017-Q4', 'sort': '-1', 'page': '2'}))
+        self.assertEqual(table.base_query, 'period=2017-Q4&')
+        self.assertEqual(table.page_query, 'period=2017-Q4&sort=-1&')
+
+    def test_matrix_rows_and_apply_agree(self):
+        for table_args in ({ 'sort_column': 0 }, { 'sort_column': 0, 'descending': True }, { 'filters': [(0, '>=', 5)] }, { 'filters': [(0, '=', 'red')] }, { 'page': 2, 'page_size': 3 }):
+            indices = TableParams(**table_args).matrix_rows(self.matrix, self.columns, 1, self.legend_sets)
+            rows = TableParams(**table_args).apply(self.rows, 1, self.legend_sets)
+            self.assertEqual([self.matrix.rows[i] for i in indices], [ou_path for ou_path, cells in rows], table_args)
+
+    def test_missing_values_sort_last(self):
+        for descending in (False, True):
+            indices = TableParams(0, descending=descending).matrix_rows(self.matrix, self.columns, 1, self.legend_sets)
+            self.assertEqual(self.matrix.rows[indices[-1]], ('B',))
+
+    def test_legend_colour_filter(self):
+        indices = TableParams(filters=[(0, '=', 'green')]).matrix_rows(self.matrix, self.columns, 1, self.legend_sets)
+        self.assertEqual([self.matrix.rows[i] for i in indices], [('A',), ('C',)])
+
+    def test_page_count(self):
+        table = TableParams(page=2, page_size=3)
+        table.matrix_rows(self.matrix, self.columns, 1, self.legend_sets)
+        self.assertEqual((table.num_pages, table.previous_page, table.next_page), (2, 1, None))
+
+    def test_columns_past_the_last_are_ignored(self):
+        table = TableParams(5, filters=[(9, '<', 1)])
+        indices = table.matrix_rows(self.matrix, self.columns, 1, self.legend_sets)
+        self.assertEqual(len(indices), 4)
+        self.assertEqual(table.page_query, '')
+
+class IndicatorTests(SimpleTestCase):
+    def test_hts_under15_positives_add_both_pcr_results(self):
+        linked_de_name, tested_de_name, pos_de_name = HTS_DE_NAMES
+        infant_de_name, pcr1_de_name, pcr2_de_name, male_partner_tst_de_name, male_partner_pos_de_name = PMTCT_CHILD_DE_NAMES
+        columns = [(de_name, sc) for de_name in HTS_DE_NAMES + HTS_TARGET_DE_NAMES for sc in AGE_SEX_SUBCATEGORIES]
+        columns += [(de_name, None) for de_name in PMTCT_CHILD_DE_NAMES + ('Pregnant Women tested for HIV', 'Pregnant Women testing HIV+')]
+        values = [[0]*len(columns)]
+        values[0][columns.index((pcr1_de_name, None))] = 2
+        values[0][columns.index((pcr2_de_name, None))] = 4
+        m = ScorecardMatrix([('A',)], columns, values)
+        m.calculate(hts_calculations)
+        self.assertEqual(m['HIV+', '(<15, Female)'].tolist(), [3.0]) # half of each PCR result
+        self.assertEqual(m['HIV+', '(<15, Male)'].tolist(), [3.0])
+
+class ScorecardViewTests(TestCase):
+    def setUp(self):
+        scorecard_cache().clear()
+        get_user_model().objects.create_superuser('scorecards', '', 'scorecards')
+        self.client.login(username='scorecards', password='scorecards')
+        self.facility, = seed_orgunits(1)
+        DataVersion.bump_tree()
+
+    def add_value(self, de_name, value, quarter):
+        de = DataElement.objects.create(name=de_name, value_type='NUMBER', aggregation_method='SUM')
+        source_doc = SourceDocument.objects.create(file='test.xls')
+        DataValue.objects.create(data_element=de, category_combo=get_default_category_combo(), org_unit=self.facility, site_str=self.facility.name, numeric_value=value, year=quarter[:4], quarter=quarter, month=None, source_doc=source_doc)
+        DataVersion.bump()
+
+    def test_vmmc_cells_follow_their_headings(self):
+        quarter = '%d-Q4' % (date.today().year-1,) # the scorecards only offer the last five years
+        self.add_value('105-5 Clients circumcised by circumcision Technique Device Based (DC)', 7, quarter)
+        self.add_value('105-5 SMC Clients Counseled, Tested and Circumcised for HIV at SMC site HIV Positive', 3, quarter)
+        scorecard = json.loads(self.client.get(reverse('vmmc_districts_json'), {'period': quarter}).content.decode('utf-8'))
+        values = { tuple(column):column_values for column, column_values in zip(scorecard['columns'], scorecard['values']) }
+        self.assertEqual(values['Circumcised by technique - Device Based', None], [7.0])
+        self.assertEqual(values['Circumcised by HIV status - Positive', None], [3.0])
+
+    def test_scorecard_csv_has_the_excel_rows(self):
+        quarter = '%d-Q4' % (date.today().year-1,)
+        self.add_value('105-5 Clients circumcised by circumcision Technique Device Based (DC)', 7, quarter)
+        response = self.client.get(reverse('vmmc_districts_csv'), {'period': quarter})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, row = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(header.split(',')[:5], ['District', 'TARGET: VMMC_CIRC', 'TARGET: Device-based', 'TARGET: Surgical', 'Circumcised by technique - Device Based'])
+        self.assertEqual(row.split(',')[:5], ['District 000', '', '', '', '7.0'])
+
+    def test_data_values_csv(self):
+        self.add_value('105-5 Clients circumcised by circumcision Technique Device Based (DC)', 7, '2017-Q4')
+        self.add_value('105-5 SMC Clients Counseled, Tested and Circumcised for HIV at SMC site HIV Positive', 3, '2017-Q4')
+        response = self.client.get(reverse('data_values_csv'), {'de': '105-5 Clients circumcised by circumcision Technique Device Based (DC)', 'start_period': '2017'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'data_element,category_combo,org_unit,year,quarter,month,value')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(',Facility 00000,2017,2017-Q4,,7.0000'))
+
+    def test_data_values_csv_needs_a_data_element(self):
+        # rather than exporting every data value there is
+        self.assertEqual(self.client.get(reverse('data_values_csv')).status_code, 404)
+
+    def test_export_closes_its_cursor_when_left_part_way(self):
+        self.add_value('105-5 Clients circumcised by circumcision Technique Device Based (DC)', 7, '2017-Q4')
+        self.add_value('105-5 SMC Clients Counseled, Tested and Circumcised for HIV at SMC site HIV Positive', 3, '2017-Q4')
+        rows = server_side_rows(DataValue.objects.all(), ['numeric_value'], itersize=1)
+        chunks = csv_chunks(['value'], rows, chunk_size=1)
+        next(chunks)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_cursors')
+            self.assertEqual(cursor.fetchone(), (1,))
+            chunks.close() # as the response does when the client goes away
+            cursor.execute('SELECT count(*) FROM pg_cursors')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+class ExcelExportTests(SimpleTestCase):
+    """
+    The Excel exports write conditional formatting and page setup through
+    openpyxl internals (see excel.ScorecardWorksheet), so check they still do
+    """
+    def test_conditional_formatting_and_page_setup_are_written(self):
+        ls = LegendSet()
+        ls.add_interval('red', None, 50)
+        ls.add_interval('green', 50, None)
+        ls.mappings[1] = True
+
+        f = io.BytesIO()
+        write_workbook(f, [ScorecardSheet('Scorecard', ['District', 'Tested'], [['A', 10], ['B', 70]], [ls])])
+        f.seek(0)
+        ws = openpyxl.load_workbook(f)['Scorecard']
+
+        self.assertEqual([row[1].value for row in ws.rows], ['Tested', 10, 70])
+        self.assertEqual(list(ws.conditional_formatting.cf_rules), ['B2:B3'])
+        rules = ws.conditional_formatting.cf_rules['B2:B3']
+        self.assertEqual(len(rules), len(list(ls.openpyxl_rules())))
+        self.assertTrue(all(rule.dxfId is not None for rule in rules if rule.type == 'cellIs'))
+        self.assertEqual(ws.page_setup.orientation, 'landscape')
+
+class ValidationSqlTests(TestCase):
+    def setUp(self):
+        data_element_matcher.cache_clear() # each test starts from the same element_version
+        self.facility, = seed_orgunits(1)
+        self.tested = self.add_value('Tested', 8, '2017-01')
+        self.positive = self.add_value("Tested 'positive'", 2, '2017-01')
+
+    def add_value(self, de_name, value, month):
+        de = DataElement.objects.create(name=de_name, value_type='NUMBER', aggregation_method='SUM')
+        source_doc = SourceDocument.objects.create(file='test.xls')
+        DataValue.objects.create(data_element=de, category_combo=get_default_category_combo(), org_unit=self.facility, site_str=self.facility.name, numeric_value=value, year=month[:4], quarter='%s-Q%d' % (month[:4], (int(month[5:])+2)//3), month=month, source_doc=source_doc)
+        return de
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def test_names_and_periods_are_parameters(self):
+        de_meta_list = query_de_meta(['Tested', "Tested 'positive'"])
+        sql, params = mk_calculation_sql([('DE_%d*100/DE_%d' % (self.positive.id, self.tested.id), ['DE_%d' % (self.tested.id,)])], de_meta_list, [], 3, ['2017-01'], 1)
+        self.assertNotIn('Tested', sql)
+        self.assertNotIn('2017', sql)
+        self.assertIn(self.positive.id, params)
+        self.assertIn('2017-01', params)
+        self.assertEqual(self.execute(sql, params), [('2017', '2017-Q1', '2017-01', 'Uganda', 'District 000', 'Subcounty 0000', 'Facility 00000', 8, 2, 25)])
+
+        sql, params = mk_calculation_sql([('DE_%d' % (self.tested.id,), [])], de_meta_list, [], 3, ['2017-02'], 1)
+        self.assertEqual(self.execute(sql, params), [])
+
+    def test_validation_rule_sql_has_only_value_rows(self):
+        self.add_value('Tested quarterly', 30, '2017-02')
+        DataValue.objects.filter(data_element__name='Tested quarterly').update(month=None) # collected by quarter
+        symbolic_expr, de_names = tokenize_validation_expr("Tested 'positive' <= tested quarterly")
+        sql, params = mk_validation_rule_sql(symbolic_expr, query_de_meta(de_names))
+        self.assertEqual([row[-1] for row in self.execute(sql, params)], [True]) # and no row of NULLs
+
+class TokenizeValidationExprTests(TestCase):
+    def setUp(self):
+        data_element_matcher.cache_clear() # each test starts from the same element_version
+        self.tested = DataElement.objects.create(name='Tested', alias='HTS_TST', value_type='NUMBER', aggregation_method='SUM')
+        self.positive = DataElement.objects.create(name='Tested Positive', value_type='NUMBER', aggregation_method='SUM')
+        self.folic_acid = DataElement.objects.create(name='Folic acid 400µg', value_type='NUMBER', aggregation_method='SUM') # a micro sign
+
+    def test_names_in_any_case(self):
+        symbolic_expr, de_names = tokenize_validation_expr('TESTED POSITIVE*100/hts_tst <= FOLIC ACID 400ΜG + tested') # a Greek capital mu
+        self.assertEqual(symbolic_expr, 'DE_%d*100/DE_%d <= DE_%d + DE_%d' % (self.positive.id, self.tested.id, self.folic_acid.id, self.tested.id))
+        self.assertEqual(de_names, ('TESTED POSITIVE', 'hts_tst', 'FOLIC ACID 400ΜG', 'tested'))
+
+    def test_new_data_elements_are_matched(self):
+        self.assertEqual(tokenize_validation_expr('Tested Negative'), ('DE_%d Negative' % (self.tested.id,), ('Tested',)))
+        negative = DataElement.objects.create(name='Tested Negative', value_type='NUMBER', aggregation_method='SUM')
+        self.assertEqual(tokenize_validation_expr('Tested Negative'), ('DE_%d' % (negative.id,), ('Tested Negative',)))
+
+class BenchmarkTests(TestCase):
+    def test_benchmark_leaves_the_export_cache_alone(self):
+        with tempfile.TemporaryDirectory() as export_dir, override_settings(SCORECARD_EXPORT_CACHE_DIR=export_dir):
+            results = run_benchmarks(1, 1, max_data_elements=2, repeat=1, log=lambda msg: None)
+            self.assertTrue({'EXCEL', 'CSV'} <= {result['output_format'] for result in results['results']})
+            self.assertEqual(os.listdir(export_dir), [])
@@ -3,24 +3,39 @@ from django.db.models import Avg, Case, Count, F, Max, Min, Prefetch, Q, Sum, Wh
 from django.db.models import Value, CharField
 from django.db.models.functions import Substr, Concat
 from django.contrib.auth.decorators import login_required
-from django.http import Http404, HttpResponse
+from django.http import Http404
 from django.template import RequestContext
 from django.core.urlresolvers import reverse
+from django.db import transaction
 
 from datetime import date
-from decimal import Decimal
-from itertools import groupby, tee, chain, product
-from collections import OrderedDict
+from itertools import tee, chain, product
 
-import openpyxl
+from . import dateutil, dimensions, grabbag, indicators
+from .grabbag import grouper
 
-from . import dateutil, grabbag
-from .grabbag import default_zero, sum_zero, all_not_none, grouper
-
-from .models import DataElement, OrgUnit, DataValue, ValidationRule, SourceDocument, ou_dict_from_path, ou_path_from_dict, get_validation_view_names
+from .models import DataElement, OrgUnit, DataValue, ValidationRule, SourceDocument, ou_path_from_dict, get_validation_view_names
 from .forms import SourceDocumentForm, DataElementAliasForm
 
+from .caching import cache_scorecard, cached_result
+from .columnar import profile_json, scorecard_json
+from .concurrency import evaluate_querysets
+from .csvexport import data_values_csv_response, period_range_filter, scorecard_csv_response
 from .dashboards import LegendSet
+from .excel import excel_response, scorecard_excel_response
+from .grid import ScorecardGrid, nan_to_none
+from .indicators import AGE_SEX_SUBCATEGORIES, CYP_FACTORS, HTS_CC_GE_15, HTS_CC_LT_15, HTS_COLUMNS, HTS_DE_NAMES, HTS_TARGET_DE_NAMES, PMTCT_CHILD_DE_NAMES, PMTCT_MOTHER_DE_NAMES, PMTCT_MOTHER_POS_DE_NAMES, STOCK_SUFFIXES, SUPPLY_NAMES
+from .indicators import IPT_DE_NAMES, MALARIA_CASES_DE_NAMES, MNCH_PNC_CHILD_COLUMNS, MNCH_PREG_BIRTH_COLUMNS
+from .indicators import art_active_calculations, art_new_calculations, cyp_calculations, fp_calculations, gbv_calculations, hts_calculations, lab_calculations, malaria_compliance_calculations, malaria_ipt_calculations, mnch_pnc_child_calculations, mnch_preg_birth_calculations, months_of_stock, nutrition_calculations, tb_calculations, vl_calculations, vmmc_calculations
+from .matrix import ScorecardMatrix
+from .profiling import timed
+from .streaming import stream_scorecard
+from .tables import TableParams, parse_int
+
+# the phases of a request that the profiling middleware reports
+pivot = timed('pivot')(grabbag.pivot)
+pivot_rows = timed('pivot')(grabbag.pivot_rows)
+render = timed('render')(render)
 
 @login_required
 def index(request):
@@ -35,10 +50,6 @@ def data_elements(request):
     data_elements = DataElement.objects.order_by('name').all()
     return render(request, 'cannula/data_element_listing.html', {'data_elements': data_elements})
 
-# avoid strange behaviour from itertools.groupby by evaluating all the group iterables as lists
-def groupbylist(*args, **kwargs):
-    return [[k, list(g)] for k, g in groupby(*args, **kwargs)]
-
 def filter_empty_rows(grouped_vals):
     for row in grouped_vals:
         row_heading, row_values = row
@@ -48,136 +59,158 @@ def filter_empty_rows(grouped_vals):
 def month2quarter(month_num):
     return ((month_num-1)//3+1)
 
-def make_excel_url(request_path):
+def trend_periods(request, period_list):
+    """
+    Consecutive quarters from the start_period to the end_period of a
+    scorecard trend request, or None if the request is for a single period
+    """
+    start_period, end_period = request.GET.get('start_period'), request.GET.get('end_period')
+    if start_period not in period_list or end_period not in period_list:
+        return None
+    start_period, end_period = sorted((start_period, end_period))
+    if start_period == end_period:
+        return [start_period]
+    return dateutil.get_quarters(start_period, end_period)
+
+def make_export_url(request_path, extension):
     import os
     import urllib
 
     parts = urllib.parse.urlparse(request_path)
     a, b, path, *others = parts
-    excel_path = ''.join([os.path.splitext(path)[0], '.xls'])
-    return urllib.parse.urlunparse([a, b, excel_path, *others])
+    export_path = ''.join([os.path.splitext(path)[0], extension])
+    return urllib.parse.urlunparse([a, b, export_path, *others])
+
+def make_excel_url(request_path):
+    return make_export_url(request_path, '.xls')
+
+def make_csv_url(request_path):
+    return make_export_url(request_path, '.csv')
 
 @login_required
+@cache_scorecard
 def malaria_ipt_scorecard(request, org_unit_level=2, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
-    # annotations for data collected at subcounty level
-    SUBCOUNTY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(2, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
-    ipt_de_names = (
-        '105-2.1 A6:First dose IPT (IPT1)',
-        '105-2.1 A7:Second dose IPT (IPT2)',
-    )
+    ipt_de_names = IPT_DE_NAMES
     de_ipt_meta = list(product(ipt_de_names, (None,)))
 
-    # get IPT1 and IPT2 without subcategory disaggregation
-    qs = DataValue.objects.what(*ipt_de_names)
-    qs = qs.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs = qs.where(filter_district)
-    qs = qs.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs = qs.when(filter_period)
-    qs = qs.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_ipt_all = qs.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    
-    gen_raster = grabbag.rasterize(ou_list, de_ipt_meta, val_ipt_all, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_ipt_all2 = list(gen_raster)
-
     # get list of subcategories for IPT2
     qs_ipt_subcat = DataValue.objects.what('105-2.1 A7:Second dose IPT (IPT2)').order_by('category_combo__name').values_list('de_name', 'category_combo__name').distinct()
     subcategory_names = tuple(qs_ipt_subcat)
 
-    # get IPT2 with subcategory disaggregation
-    qs2 = DataValue.objects.what('105-2.1 A7:Second dose IPT (IPT2)')
-    qs2 = qs2.annotate(cat_combo=F('category_combo__name'))
-    if filter_district:
-        qs2 = qs2.where(filter_district)
-    qs2 = qs2.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs2 = qs2.when(filter_period)
-    qs2 = qs2.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_dicts2 = qs2.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, subcategory_names, val_dicts2, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_dicts2 = list(gen_raster)
-
     pregnancies_de_names = (
         'Expected Pregnancies',
     )
     de_pregnancies_meta = list(product(pregnancies_de_names, (None,)))
-    # get expected pregnancies
-    qs3 = DataValue.objects.what(*pregnancies_de_names)
-    qs3 = qs3.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs3 = qs3.where(filter_district)
-    # use clearer aliases for the unwieldy names
-    qs3 = qs3.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
-    # pregnancy estimates are annual (from population), so filter by year component of period and divide by 4
-    qs3 = qs3.when(filter_period[:4])
-    qs3 = qs3.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_preg = qs3.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(numeric_sum=(Sum('numeric_value')/4))
-
-    gen_raster = grabbag.rasterize(ou_list, de_pregnancies_meta, val_preg, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_preg2 = list(gen_raster)
-
-    # combine the data and group by district and subcounty
-    grouped_vals = groupbylist(sorted(chain(val_preg2, val_ipt_all2, val_dicts2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-    
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (preg_val, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-
-        if preg_val['de_name'] == 'Expected Pregnancies':
-            for i, val in enumerate(reversed(other_vals)):
-                # calculate the IPT rate for the IPT1/IPT2 values (without subcategories)
-                if val['de_name'] in ipt_de_names and val['cat_combo'] is None:
-                    if all_not_none(val['numeric_sum'], preg_val['numeric_sum']) and preg_val['numeric_sum']:
-                        ipt_percent = 100 * val['numeric_sum'] / preg_val['numeric_sum']
-                    else:
-                        ipt_percent = None
-                    ipt_percent_val = {
-                        'de_name': val['de_name'] + ' %',
-                        'cat_combo': val['cat_combo'],
-                        'numeric_sum': ipt_percent,
-                    }
-                    ipt_percent_val.update(_group_ou_dict)
-                    _group[1].insert(len(other_vals)-i+1, ipt_percent_val)
+
+    def ipt_subcounty_matrix():
+        # data is collected at facility and subcounty level, the district level is rolled up from the subcounty matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(2)[1:] # skip the topmost/country level
+        # annotations for data collected at facility level
+        FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
+        # annotations for data collected at subcounty level
+        SUBCOUNTY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(2, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(2, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        # get IPT1 and IPT2 without subcategory disaggregation
+        qs = DataValue.objects.what(*ipt_de_names)
+        qs = qs.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs = qs.where(filter_district)
+        qs = qs.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs = qs.when(*periods)
+        qs = qs.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_ipt_all = qs.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_ipt_meta, val_ipt_all, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_ipt_all2 = list(gen_raster)
+
+        # get IPT2 with subcategory disaggregation
+        qs2 = DataValue.objects.what('105-2.1 A7:Second dose IPT (IPT2)')
+        qs2 = qs2.annotate(cat_combo=F('category_combo__name'))
+        if filter_district:
+            qs2 = qs2.where(filter_district)
+        qs2 = qs2.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs2 = qs2.when(*periods)
+        qs2 = qs2.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_dicts2 = qs2.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, subcategory_names, val_dicts2, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_dicts2 = list(gen_raster)
+
+        # get expected pregnancies
+        qs3 = DataValue.objects.what(*pregnancies_de_names)
+        qs3 = qs3.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs3 = qs3.where(filter_district)
+        # use clearer aliases for the unwieldy names
+        qs3 = qs3.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
+        # pregnancy estimates are annual (from population), so filter by year component of period and divide by 4
+        qs3 = qs3.when(*sorted(set(p[:4] for p in periods)))
+        qs3 = qs3.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_preg = qs3.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(numeric_sum=(Sum('numeric_value')/4))
+
+        gen_raster = pivot(year_rows, de_pregnancies_meta, val_preg, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_preg2 = list(gen_raster)
+
+        # combine the data and group by district and subcounty
+        grouped_vals = pivot_rows(period_rows, val_preg2, val_ipt_all2, val_dicts2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
+
+        return ScorecardMatrix.from_grouped(grouped_vals, de_pregnancies_meta + de_ipt_meta + list(subcategory_names))
+
+    # the subcounty matrix serves every level of this scorecard
+    ipt_matrix = cached_result('malaria_ipt_scorecard', (periods, filter_district and filter_district.name), ipt_subcounty_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        ipt_matrix = ipt_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        ipt_matrix = ipt_matrix.rollup(ou_list)
+    ipt_matrix.calculate(malaria_ipt_calculations)
 
     data_element_names = list()
     data_element_names.insert(0, ('Expected Pregnancies', None))
@@ -185,6 +218,11 @@ def malaria_ipt_scorecard(request, org_unit_level=2, output_format='HTML'):
         data_element_names.append((de_n, None))
         data_element_names.append(('%', None))
     data_element_names.extend(subcategory_names)
+    # the columns under those headings
+    ipt_columns = list(de_pregnancies_meta)
+    for de_n in ipt_de_names:
+        ipt_columns += [(de_n, None), (de_n + ' %', None)]
+    ipt_columns += list(subcategory_names)
 
     num_path_elements = len(ou_headers)
     legend_sets = list()
@@ -196,46 +234,19 @@ def malaria_ipt_scorecard(request, org_unit_level=2, output_format='HTML'):
     ipt_ls.mappings[num_path_elements+4] = True
     legend_sets.append(ipt_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(ipt_matrix.to_grid(OU_PATH_FIELDS + ('period',), ipt_columns, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        ipt_matrix = ipt_matrix.take(table.matrix_rows(ipt_matrix, ipt_columns, len(ou_headers), legend_sets))
+        grouped_vals = ipt_matrix.to_grid(OU_PATH_FIELDS, ipt_columns)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_names)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            offset = 0
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j+offset, value=g_val['numeric_sum'])
-                if 'ipt_rate' in g_val:
-                    offset += 1
-                    ws.cell(row=i, column=j+offset, value=g_val['ipt_rate'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSet
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="malaria_ipt_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('malaria_ipt_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_names, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('malaria_ipt_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_names, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -243,28 +254,31 @@ def malaria_ipt_scorecard(request, org_unit_level=2, output_format='HTML'):
         'data_element_names': data_element_names,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
     if output_format == 'JSON':
-        from django.http import JsonResponse
-        
-        return JsonResponse(context)
+        return scorecard_json(request, context)
 
     return render(request, 'cannula/malaria_ipt_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def malaria_compliance(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'start_period' in request.GET and request.GET['start_period'] in PREV_5YR_QTRS and 'end_period' in request.GET and request.GET['end_period']:
         start_quarter = request.GET['start_period']
@@ -286,25 +300,14 @@ def malaria_compliance(request, org_unit_level=3, output_format='HTML'):
         periods = periods[:1]
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_period_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, period = col
-        val_dict.update({ 'period': period, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     cases_de_names = (
@@ -314,48 +317,51 @@ def malaria_compliance(request, org_unit_level=3, output_format='HTML'):
     de_cases_meta = tuple(product(cases_de_names, periods))
     data_element_metas += de_cases_meta
 
-    qs = DataValue.objects.what(*cases_de_names)
-    qs = qs.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs = qs.where(filter_district)
-    qs = qs.when(*periods)
-    qs = qs.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs = qs.order_by(*OU_PATH_FIELDS, 'de_name', 'period')
-    val_dicts = qs.values(*OU_PATH_FIELDS, 'de_name', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+    def compliance_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+
+        def orgunit_vs_de_period_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, period = col
+            val_dict.update({ 'period': period, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs = DataValue.objects.what(*cases_de_names)
+        qs = qs.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs = qs.where(filter_district)
+        qs = qs.when(*periods)
+        qs = qs.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs = qs.order_by(*OU_PATH_FIELDS, 'de_name', 'period')
+        val_dicts = qs.values(*OU_PATH_FIELDS, 'de_name', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(ou_list, de_cases_meta, val_dicts, ou_path_from_dict, lambda x: (x['de_name'], x['period']), orgunit_vs_de_period_default)
+        val_dicts2 = gen_raster
+
+        # combine the data and group by district and subcounty
+        grouped_vals = pivot_rows(ou_list, val_dicts2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-    gen_raster = grabbag.rasterize(ou_list, de_cases_meta, val_dicts, ou_path_from_dict, lambda x: (x['de_name'], x['period']), orgunit_vs_de_period_default)
-    val_dicts2 = gen_raster
+        return ScorecardMatrix.from_grouped(grouped_vals, list(de_cases_meta))
 
-    # combine the data and group by district and subcounty
-    grouped_vals = groupbylist(sorted(val_dicts2, key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
+    # the facility matrix serves every level of this scorecard
+    compliance_matrix = cached_result('malaria_compliance', (periods, filter_district and filter_district.name), compliance_facility_matrix)
+    compliance_matrix = compliance_matrix.rollup(ou_list)
+    compliance_matrix.calculate(malaria_compliance_calculations)
 
-    for _group in grouped_vals:
-        (_group_ou_path, other_vals) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-
-        totals, confirmeds = other_vals[:len(periods)], other_vals[len(periods):]
-        for i, (total_val, confirmed_val) in enumerate(reversed(list(zip(totals, confirmeds)))):
-            if (total_val['de_name'], confirmed_val['de_name']) == cases_de_names:
-                if all_not_none(confirmed_val['numeric_sum'], total_val['numeric_sum']) and total_val['numeric_sum']:
-                    confirmed_rate = 100 * confirmed_val['numeric_sum'] / total_val['numeric_sum']
-                else:
-                    confirmed_rate = None
-                confirmed_rate_val = {
-                    'de_name': confirmed_val['de_name'] + ' %',
-                    'period': confirmed_val['period'],
-                    'numeric_sum': confirmed_rate,
-                }
-                confirmed_rate_val.update(_group_ou_dict)
-                _group[1].insert(len(other_vals)-i*2, confirmed_rate_val)
-
-        prev_vals = None
-        for total_val, confirmed_val in zip(totals, confirmeds):
-            if prev_vals:
-                total_val['previous'], confirmed_val['previous'] = prev_vals
-            
-            prev_vals = total_val['numeric_sum'], confirmed_val['numeric_sum']
+    total_de_name, confirmed_de_name = cases_de_names
+    # the totals for each period, then the confirmed cases and their rate for each period
+    compliance_columns = list(product((total_de_name,), periods))
+    for p in periods:
+        compliance_columns += [(confirmed_de_name, p), (confirmed_de_name + ' %', p)]
+    # with the cases of the previous period next to the cases of each period
+    previous_period = dict(zip(periods[1:], periods))
+    previous_columns = [None if de_name.endswith(' %') else (de_name, previous_period.get(p)) for de_name, p in compliance_columns]
 
     data_element_names = list()
     for de_n in cases_de_names:
@@ -373,46 +379,15 @@ def malaria_compliance(request, org_unit_level=3, output_format='HTML'):
         compliance_ls.mappings[num_path_elements+len(periods)+i*2+1] = True
     legend_sets.append(compliance_ls)
 
+    table = TableParams.from_request(request)
+    # only copy out the rows of the page
+    compliance_matrix = compliance_matrix.take(table.matrix_rows(compliance_matrix, compliance_columns, len(ou_headers), legend_sets))
+    grouped_vals = compliance_matrix.to_grid(OU_PATH_FIELDS, compliance_columns, previous_columns=previous_columns)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            offset = 0
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j+offset, value=g_val['numeric_sum'])
-                if 'ipt_rate' in g_val:
-                    offset += 1
-                    ws.cell(row=i, column=j+offset, value=g_val['ipt_rate'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSet
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="malaria_compliance_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('malaria_compliance_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('malaria_compliance_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -426,24 +401,33 @@ def malaria_compliance(request, org_unit_level=3, output_format='HTML'):
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/malaria_compliance_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@transaction.non_atomic_requests
 def data_workflow_new(request):
-    from .models import load_excel_to_datavalues, load_excel_to_validations
+    from .models import load_excel_to_datavalues, load_excel_to_validations, refresh_validation_views
+    from .warming import warm_scorecards_after_import
 
     if request.method == 'POST':
         form = SourceDocumentForm(request.POST, request.FILES)
         if form.is_valid():
-            src_doc = form.save()
+            # commit the import before warming the scorecard cache, so the warm-up sees the new data
+            with transaction.atomic():
+                src_doc = form.save()
 
-            all_values = load_excel_to_datavalues(src_doc)
-            for site_name, site_vals in all_values.items():
-                DataValue.objects.bulk_create(site_vals)
-            load_excel_to_validations(src_doc)
+                load_excel_to_datavalues(src_doc)
+                load_excel_to_validations(src_doc)
+            refresh_validation_views(src_doc)
+            warm_scorecards_after_import()
             
             return redirect('data_workflow_listing')
     else:
@@ -510,17 +494,19 @@ def validation_report(request, output_format='HTML'):
     cursor = connection.cursor()
     vr_id = int(request.GET['id'])
     vr = ValidationRule.objects.get(id=vr_id)
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
+    view_name = connection.ops.quote_name(vr.view_name())
     if filter_district:
-        cursor.execute('SELECT * FROM %s WHERE district=\'%s\'' % (vr.view_name(), filter_district.name))
+        cursor.execute('SELECT * FROM %s WHERE district=%%s' % (view_name,), [filter_district.name])
     else:
-        cursor.execute('SELECT * FROM %s' % (vr.view_name(),))
+        cursor.execute('SELECT * FROM %s' % (view_name,))
 
     columns = [col[0] for col in cursor.description]
     de_name_map = dict()
@@ -543,44 +529,13 @@ def validation_report(request, output_format='HTML'):
     validates_ls.mappings[4] = True
 
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = vr.expression().strip()[:31] # worksheet names length limit is 31
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
         def format_values(v_dict):
             return '\n'.join([ '%s: %s' % (k,v) for k,v in v_dict.items()])
 
         headers = ['Period', 'District', 'Subcounty', 'Facility', 'Validates?', 'Source Data']
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, res in enumerate(results, start=2):
-            ws.cell(row=i, column=1, value=next(filter(lambda x: x is not None, (res['month'], res['quarter'], res['year'])), None))
-            ws.cell(row=i, column=2, value=res['district'])
-            ws.cell(row=i, column=3, value=res['subcounty'])
-            ws.cell(row=i, column=4, value=res['facility'])
-            ws.cell(row=i, column=5, value=res['de_calc_1'])
-            ws.cell(row=i, column=6, value=format_values(res['data_values']))
-
-        for rule in validates_ls.openpyxl_rules():
-            # apply conditional formatting from LegendSet
-            for xls_range in validates_ls.excel_ranges():
-                ws.conditional_formatting.add(xls_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="%s_validation.xlsx"' % (vr.name.lower(),)
-
-        return response
+        rows = ([next(filter(lambda x: x is not None, (res['month'], res['quarter'], res['year'])), None), res['district'], res['subcounty'], res['facility'], res['de_calc_1'], format_values(res['data_values'])] for res in results)
+        # worksheet names length limit is 31
+        return excel_response('%s_validation.xlsx' % (vr.name.lower(),), headers, rows, [validates_ls], title=vr.expression().strip()[:31])
 
     context = {
         'results': results,
@@ -616,130 +571,56 @@ def data_element_alias(request):
     return render_to_response('cannula/data_element_edit_alias.html', context, context_instance=RequestContext(request))
 
 @login_required
+@cache_scorecard
 def hts_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
-    hts_de_names = ( #TODO: collation problem
-        '105-4 Number of clients who have been linked to care',
-        '105-4 Number of Individuals who received HIV test results',
-        '105-4 Number of Individuals who tested HIV positive',
-    )
+    hts_de_names = HTS_DE_NAMES
     hts_short_names = (
         'Linked',
         'Tested',
         'HIV+',
     )
-    subcategory_names = ['(<15, Female)', '(<15, Male)', '(15+, Female)', '(15+, Male)']
+    subcategory_names = AGE_SEX_SUBCATEGORIES
     de_positivity_meta = list(product(hts_de_names, subcategory_names))
 
-    qs_positivity = DataValue.objects.what(*hts_de_names)
-    cc_lt_15 = ['18 Mths-<5 Years', '5-<10 Years', '10-<15 Years']
-    cc_ge_15 = ['15-<19 Years', '19-<49 Years', '>49 Years']
-    #TODO: cc_lt_15_f = CategoryCombo.from_cat_names(['Female', '<15']) gives a CategoryCombo instance that makes the Case statement clearer/safer
-    qs_positivity = qs_positivity.annotate(
-        cat_combo=Case(
-            When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
-            When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
-            default=None, output_field=CharField()
-        )
-    )
-    qs_positivity = qs_positivity.exclude(cat_combo__iexact=None)
-    if filter_district:
-        qs_positivity = qs_positivity.where(filter_district)
-    qs_positivity = qs_positivity.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_positivity = qs_positivity.when(filter_period)
-    qs_positivity = qs_positivity.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_positivity = qs_positivity.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    
-    gen_raster = grabbag.rasterize(ou_list, de_positivity_meta, val_positivity, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_positivity2 = list(gen_raster)
-
-    pmtct_mother_de_names = (
-        '105-2.1 Pregnant Women newly tested for HIV this pregnancy(TR & TRR)',
-        '105-2.2a Women tested for HIV in labour (1st time this Pregnancy)',
-        '105-2.3a Breastfeeding mothers tested for HIV(1st test)',
-    )
+    pmtct_mother_de_names = PMTCT_MOTHER_DE_NAMES
     de_pmtct_mother_meta = list(product(('Pregnant Women tested for HIV',), (None,)))
 
-    qs_pmtct_mother = DataValue.objects.what(*pmtct_mother_de_names)
-    qs_pmtct_mother = qs_pmtct_mother.annotate(de_name=Value('Pregnant Women tested for HIV', output_field=CharField()))
-    qs_pmtct_mother = qs_pmtct_mother.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_pmtct_mother = qs_pmtct_mother.where(filter_district)
-    qs_pmtct_mother = qs_pmtct_mother.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_pmtct_mother = qs_pmtct_mother.when(filter_period)
-    qs_pmtct_mother = qs_pmtct_mother.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_pmtct_mother = qs_pmtct_mother.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_mother_meta, val_pmtct_mother, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_pmtct_mother2 = list(gen_raster)
-
-    pmtct_mother_pos_de_names = (
-        '105-2.1 A19:Pregnant Women testing HIV+ on a retest (TRR+)',
-        '105-2.2a Women testing HIV+ in labour (1st time this Pregnancy)',
-        '105-2.2b Women testing HIV+ in labour (Retest this Pregnancy)',
-        '105-2.3a Breastfeeding mothers newly testing HIV+(1st test)',
-        '105-2.3b Breastfeeding mothers newly testing HIV+(retest)',
-    )
+    pmtct_mother_pos_de_names = PMTCT_MOTHER_POS_DE_NAMES
     de_pmtct_mother_pos_meta = list(product(('Pregnant Women testing HIV+',), (None,)))
 
-    qs_pmtct_mother_pos = DataValue.objects.what(*pmtct_mother_pos_de_names)
-    qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(de_name=Value('Pregnant Women testing HIV+', output_field=CharField()))
-    qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_pmtct_mother_pos = qs_pmtct_mother_pos.where(filter_district)
-    qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_pmtct_mother_pos = qs_pmtct_mother_pos.when(filter_period)
-    qs_pmtct_mother_pos = qs_pmtct_mother_pos.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_pmtct_mother_pos = qs_pmtct_mother_pos.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_mother_pos_meta, val_pmtct_mother_pos, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_pmtct_mother_pos2 = list(gen_raster)
-
-    pmtct_child_de_names = (
-        '105-2.4a Exposed Infants Tested for HIV Below 18 Months(by 1st PCR) ',
-        '105-2.4b 1st DNA PCR result returned(HIV+)',
-        '105-2.4b 2nd DNA PCR result returned(HIV+)',
-        '105-2.1a Male partners received HIV test results in eMTCT(Total)',
-        '105-2.1b Male partners received HIV test results in eMTCT(HIV+)',
-    )
+    pmtct_child_de_names = PMTCT_CHILD_DE_NAMES
     pmtct_child_short_names = (
         'PMTCT INFANT HIV+',
         'PMTCT CHILD PCR1 HIV+',
@@ -749,306 +630,113 @@ def hts_scorecard(request, org_unit_level=3, output_format='HTML'):
     )
     de_pmtct_child_meta = list(product(pmtct_child_de_names, (None,)))
 
-    qs_pmtct_child = DataValue.objects.what(*pmtct_child_de_names)
-    qs_pmtct_child = qs_pmtct_child.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_pmtct_child = qs_pmtct_child.where(filter_district)
-    qs_pmtct_child = qs_pmtct_child.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_pmtct_child = qs_pmtct_child.when(filter_period)
-    qs_pmtct_child = qs_pmtct_child.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_pmtct_child = qs_pmtct_child.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_pmtct_child = list(val_pmtct_child)
-
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_child_meta, val_pmtct_child, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_pmtct_child2 = list(gen_raster)
-
-    target_de_names = (
-        'HTC_TST_TARGET',
-        'HTC_TST_POS_TARGET',
-    )
+    target_de_names = HTS_TARGET_DE_NAMES
     de_target_meta = list(product(target_de_names, subcategory_names))
 
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_target = DataValue.objects.what(*target_de_names)
-    qs_target = qs_target.annotate(cat_combo=F('category_combo__name'))
-    if filter_district:
-        qs_target = qs_target.where(filter_district)
-    qs_target = qs_target.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_target = qs_target.when(filter_period[:4])
-    qs_target = qs_target.order_by(*OU_PATH_FIELDS, '-de_name', 'cat_combo', 'period') # note reversed order of data element names
-    val_target = qs_target.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-
-    gen_raster = grabbag.rasterize(ou_list, de_target_meta, val_target, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_target2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_positivity2, val_pmtct_mother2, val_pmtct_mother_pos2, val_pmtct_child2, val_target2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (linked_under15_f, linked_under15_m, linked_over15_f, linked_over15_m, tst_under15_f, tst_under15_m, tst_over15_f, tst_over15_m, pos_under15_f, pos_under15_m, pos_over15_f, pos_over15_m, tst_pregnant, pos_pregnant, pos_infant, pos_pcr1, pos_pcr2, tst_male_partner, pos_male_partner, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        under15_f_sum = default_zero(tst_under15_f['numeric_sum']) + Decimal(default_zero(pos_infant['numeric_sum'])/2)
-        under15_f_val = {
-            'de_name': 'Tested',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': under15_f_sum,
-        }
-        under15_f_val.update(_group_ou_dict)
-        calculated_vals.append(under15_f_val)
-        
-        under15_m_sum = default_zero(tst_under15_m['numeric_sum']) + Decimal(default_zero(pos_infant['numeric_sum'])/2)
-        under15_m_val = {
-            'de_name': 'Tested',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': under15_m_sum,
-        }
-        under15_m_val.update(_group_ou_dict)
-        calculated_vals.append(under15_m_val)
-        
-        over15_f_sum = default_zero(tst_over15_f['numeric_sum']) + default_zero(tst_pregnant['numeric_sum'])
-        over15_f_val = {
-            'de_name': 'Tested',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': over15_f_sum,
-        }
-        over15_f_val.update(_group_ou_dict)
-        calculated_vals.append(over15_f_val)
-        
-        over15_m_sum = default_zero(tst_over15_m['numeric_sum']) + default_zero(tst_male_partner['numeric_sum'])
-        over15_m_val = {
-            'de_name': 'Tested',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': over15_m_sum,
-        }
-        over15_m_val.update(_group_ou_dict)
-        calculated_vals.append(over15_m_val)
-        
-        half_pos_pcr = Decimal(default_zero(pos_pcr1['numeric_sum']) + default_zero(pos_pcr1['numeric_sum']))/2
-        pos_under15_f_sum = default_zero(pos_under15_f['numeric_sum']) + half_pos_pcr
-        pos_under15_f_val = {
-            'de_name': 'HIV+',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': pos_under15_f_sum,
-        }
-        pos_under15_f_val.update(_group_ou_dict)
-        calculated_vals.append(pos_under15_f_val)
-        
-        pos_under15_m_sum = default_zero(pos_under15_m['numeric_sum']) + half_pos_pcr
-        pos_under15_m_val = {
-            'de_name': 'HIV+',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': pos_under15_m_sum,
-        }
-        pos_under15_m_val.update(_group_ou_dict)
-        calculated_vals.append(pos_under15_m_val)
-        
-        pos_over15_f_sum = default_zero(pos_over15_f['numeric_sum']) + Decimal(default_zero(pos_pregnant['numeric_sum']))
-        pos_over15_f_val = {
-            'de_name': 'HIV+',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': pos_over15_f_sum,
-        }
-        pos_over15_f_val.update(_group_ou_dict)
-        calculated_vals.append(pos_over15_f_val)
-        
-        pos_over15_m_sum = default_zero(pos_over15_m['numeric_sum']) + Decimal(default_zero(pos_male_partner['numeric_sum']))
-        pos_over15_m_val = {
-            'de_name': 'HIV+',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': pos_over15_m_sum,
-        }
-        pos_over15_m_val.update(_group_ou_dict)
-        calculated_vals.append(pos_over15_m_val)
-
-        tested_total = sum([under15_f_sum, under15_m_sum, over15_f_sum, over15_m_sum])
-        pos_total = sum([pos_under15_f_sum, pos_under15_m_sum, pos_over15_f_sum, pos_over15_m_sum])
-        tested_total_val = {
-            'de_name': 'Tested',
-            'cat_combo': None,
-            'numeric_sum': tested_total,
-        }
-        tested_total_val.update(_group_ou_dict)
-        pos_total_val = {
-            'de_name': 'HIV+',
-            'cat_combo': None,
-            'numeric_sum': pos_total,
-        }
-        pos_total_val.update(_group_ou_dict)
-        calculated_vals.append(tested_total_val)
-        calculated_vals.append(pos_total_val)
-
-        # copy linked to care totals over
-        calculated_vals.append(linked_under15_f)
-        calculated_vals.append(linked_under15_m)
-        calculated_vals.append(linked_over15_f)
-        calculated_vals.append(linked_over15_m)
-
-        # calculate the percentages
-        target_under15_f, target_under15_m, target_over15_f, target_over15_m, target_pos_under15_f, target_pos_under15_m, target_pos_over15_f, target_pos_over15_m, *further_vals = other_vals
-
-        if all_not_none(under15_f_sum, target_under15_f['numeric_sum']) and target_under15_f['numeric_sum']:
-            under15_f_percent = (under15_f_sum * 100) / target_under15_f['numeric_sum']
-        else:
-            under15_f_percent = None
-        under15_f_percent_val = {
-            'de_name': 'Tested (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': under15_f_percent,
-        }
-        under15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(under15_f_percent_val)
-
-        if all_not_none(under15_m_sum, target_under15_m['numeric_sum']) and target_under15_m['numeric_sum']:
-            under15_m_percent = (under15_m_sum * 100) / target_under15_m['numeric_sum']
-        else:
-            under15_m_percent = None
-        under15_m_percent_val = {
-            'de_name': 'Tested (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': under15_m_percent,
-        }
-        under15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(under15_m_percent_val)
-
-        if all_not_none(over15_f_sum, target_over15_f['numeric_sum']) and target_over15_f['numeric_sum']:
-            over15_f_percent = (over15_f_sum * 100) / target_over15_f['numeric_sum']
-        else:
-            over15_f_percent = None
-        over15_f_percent_val = {
-            'de_name': 'Tested (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': over15_f_percent,
-        }
-        over15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(over15_f_percent_val)
-
-        if all_not_none(over15_m_sum, target_over15_m['numeric_sum']) and target_over15_m['numeric_sum']:
-            over15_m_percent = (over15_m_sum * 100) / target_over15_m['numeric_sum']
-        else:
-            over15_m_percent = None
-        over15_m_percent_val = {
-            'de_name': 'Tested (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': over15_m_percent,
-        }
-        over15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(over15_m_percent_val)
-
-        if all_not_none(pos_under15_f_sum, target_pos_under15_f['numeric_sum']) and target_pos_under15_f['numeric_sum']:
-            pos_under15_f_percent = (pos_under15_f_sum * 100) / target_pos_under15_f['numeric_sum']
-        else:
-            pos_under15_f_percent = None
-        pos_under15_f_percent_val = {
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': pos_under15_f_percent,
-        }
-        pos_under15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pos_under15_f_percent_val)
-
-        if all_not_none(pos_under15_m_sum, target_pos_under15_m['numeric_sum']) and target_pos_under15_m['numeric_sum']:
-            pos_under15_m_percent = (pos_under15_m_sum * 100) / target_pos_under15_m['numeric_sum']
-        else:
-            pos_under15_m_percent = None
-        pos_under15_m_percent_val = {
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': pos_under15_m_percent,
-        }
-        pos_under15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pos_under15_m_percent_val)
-
-        if all_not_none(pos_over15_f_sum, target_pos_over15_f['numeric_sum']) and target_pos_over15_f['numeric_sum']:
-            pos_over15_f_percent = (pos_over15_f_sum * 100) / target_pos_over15_f['numeric_sum']
-        else:
-            pos_over15_f_percent = None
-        pos_over15_f_percent_val = {
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': pos_over15_f_percent,
-        }
-        pos_over15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pos_over15_f_percent_val)
-
-        if all_not_none(pos_over15_m_sum, target_pos_over15_m['numeric_sum']) and target_pos_over15_m['numeric_sum']:
-            pos_over15_m_percent = (pos_over15_m_sum * 100) / target_pos_over15_m['numeric_sum']
-        else:
-            pos_over15_m_percent = None
-        pos_over15_m_percent_val = {
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': pos_over15_m_percent,
-        }
-        pos_over15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pos_over15_m_percent_val)
-
-        if all_not_none(linked_under15_f['numeric_sum'], pos_under15_f['numeric_sum']) and pos_under15_f['numeric_sum']:
-            linked_under15_f_percent = (linked_under15_f['numeric_sum'] * 100) / pos_under15_f['numeric_sum']
-        else:
-            linked_under15_f_percent = None
-        linked_under15_f_percent_val = {
-            'de_name': 'Linked (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': linked_under15_f_percent,
-        }
-        linked_under15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(linked_under15_f_percent_val)
-
-        if all_not_none(linked_under15_m['numeric_sum'], pos_under15_m['numeric_sum']) and pos_under15_m['numeric_sum']:
-            linked_under15_m_percent = (linked_under15_m['numeric_sum'] * 100) / pos_under15_m['numeric_sum']
-        else:
-            linked_under15_m_percent = None
-        linked_under15_m_percent_val = {
-            'de_name': 'Linked (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': linked_under15_m_percent,
-        }
-        linked_under15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(linked_under15_m_percent_val)
+    def hts_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_positivity = DataValue.objects.what(*hts_de_names)
+        cc_lt_15, cc_ge_15 = HTS_CC_LT_15, HTS_CC_GE_15
+        #TODO: cc_lt_15_f = CategoryCombo.from_cat_names(['Female', '<15']) gives a CategoryCombo instance that makes the Case statement clearer/safer
+        qs_positivity = qs_positivity.annotate(
+            cat_combo=Case(
+                When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
+                When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
+                default=None, output_field=CharField()
+            )
+        )
+        qs_positivity = qs_positivity.exclude(cat_combo__iexact=None)
+        if filter_district:
+            qs_positivity = qs_positivity.where(filter_district)
+        qs_positivity = qs_positivity.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_positivity = qs_positivity.when(*periods)
+        qs_positivity = qs_positivity.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_positivity = qs_positivity.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+    
+        gen_raster = pivot(period_rows, de_positivity_meta, val_positivity, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_positivity2 = list(gen_raster)
+
+        qs_pmtct_mother = DataValue.objects.what(*pmtct_mother_de_names)
+        qs_pmtct_mother = qs_pmtct_mother.annotate(de_name=Value('Pregnant Women tested for HIV', output_field=CharField()))
+        qs_pmtct_mother = qs_pmtct_mother.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_pmtct_mother = qs_pmtct_mother.where(filter_district)
+        qs_pmtct_mother = qs_pmtct_mother.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_pmtct_mother = qs_pmtct_mother.when(*periods)
+        qs_pmtct_mother = qs_pmtct_mother.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_pmtct_mother = qs_pmtct_mother.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_pmtct_mother_meta, val_pmtct_mother, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_pmtct_mother2 = list(gen_raster)
+
+        qs_pmtct_mother_pos = DataValue.objects.what(*pmtct_mother_pos_de_names)
+        qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(de_name=Value('Pregnant Women testing HIV+', output_field=CharField()))
+        qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_pmtct_mother_pos = qs_pmtct_mother_pos.where(filter_district)
+        qs_pmtct_mother_pos = qs_pmtct_mother_pos.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_pmtct_mother_pos = qs_pmtct_mother_pos.when(*periods)
+        qs_pmtct_mother_pos = qs_pmtct_mother_pos.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_pmtct_mother_pos = qs_pmtct_mother_pos.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_pmtct_mother_pos_meta, val_pmtct_mother_pos, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_pmtct_mother_pos2 = list(gen_raster)
+
+        qs_pmtct_child = DataValue.objects.what(*pmtct_child_de_names)
+        qs_pmtct_child = qs_pmtct_child.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_pmtct_child = qs_pmtct_child.where(filter_district)
+        qs_pmtct_child = qs_pmtct_child.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_pmtct_child = qs_pmtct_child.when(*periods)
+        qs_pmtct_child = qs_pmtct_child.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_pmtct_child = qs_pmtct_child.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_pmtct_child = list(val_pmtct_child)
+
+        gen_raster = pivot(period_rows, de_pmtct_child_meta, val_pmtct_child, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_pmtct_child2 = list(gen_raster)
+
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_target = DataValue.objects.what(*target_de_names)
+        qs_target = qs_target.annotate(cat_combo=F('category_combo__name'))
+        if filter_district:
+            qs_target = qs_target.where(filter_district)
+        qs_target = qs_target.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_target = qs_target.when(*sorted(set(p[:4] for p in periods)))
+        qs_target = qs_target.order_by(*OU_PATH_FIELDS, '-de_name', 'cat_combo', 'period') # note reversed order of data element names
+        val_target = qs_target.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the target for its year
+        gen_raster = pivot(year_rows, de_target_meta, val_target, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_target2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_positivity2, val_pmtct_mother2, val_pmtct_mother_pos2, val_pmtct_child2, val_target2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(linked_over15_f['numeric_sum'], pos_over15_f['numeric_sum']) and pos_over15_f['numeric_sum']:
-            linked_over15_f_percent = (linked_over15_f['numeric_sum'] * 100) / pos_over15_f['numeric_sum']
-        else:
-            linked_over15_f_percent = None
-        linked_over15_f_percent_val = {
-            'de_name': 'Linked (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': linked_over15_f_percent,
-        }
-        linked_over15_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(linked_over15_f_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, de_positivity_meta + de_pmtct_mother_meta + de_pmtct_mother_pos_meta + de_pmtct_child_meta + de_target_meta)
 
-        if all_not_none(linked_over15_m['numeric_sum'], pos_over15_m['numeric_sum']) and pos_over15_m['numeric_sum']:
-            linked_over15_m_percent = (linked_over15_m['numeric_sum'] * 100) / pos_over15_m['numeric_sum']
-        else:
-            linked_over15_m_percent = None
-        linked_over15_m_percent_val = {
-            'de_name': 'Linked (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': linked_over15_m_percent,
-        }
-        linked_over15_m_percent_val.update(_group_ou_dict)
-        calculated_vals.append(linked_over15_m_percent_val)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
 
-        # _group[1].extend(calculated_vals)
-        _group[1] = calculated_vals
-    
-    data_element_metas = list()
-    
-    data_element_metas += list(product(['Tested',], subcategory_names))
-    data_element_metas += list(product(['HIV+',], subcategory_names))
-    data_element_metas += list(product(['Tested',], [None,]))
-    data_element_metas += list(product(['HIV+',], [None,]))
-    data_element_metas += list(product(['Linked',], subcategory_names))
-    data_element_metas += list(product(['Tested (%)',], subcategory_names))
-    data_element_metas += list(product(['HIV+ (%)',], subcategory_names))
-    data_element_metas += list(product(['Linked (%)',], subcategory_names))
+    data_element_metas = list(HTS_COLUMNS)
 
     num_path_elements = len(ou_headers)
     legend_sets = list()
@@ -1069,41 +757,33 @@ def hts_scorecard(request, org_unit_level=3, output_format='HTML'):
         linked_ls.mappings[i] = True
     legend_sets.append(linked_ls)
 
+    table = TableParams.from_request(request)
+
+    def hts_rows():
+        # computed as the rows are sent, so a streamed page starts before the scorecard is ready
+        # the facility matrix serves every level of this scorecard
+        hts_matrix = cached_result('hts_scorecard', (periods, filter_district and filter_district.name), hts_facility_matrix)
+        if trend:
+            hts_matrix = hts_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+        else:
+            hts_matrix = hts_matrix.rollup(ou_list)
+        hts_matrix.calculate(hts_calculations)
+
+        if trend:
+            # the change since the previous period needs the rows of the previous period, so pick the rows out of the whole matrix
+            rows = table.apply(hts_matrix.iter_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets, num_rows=len(hts_matrix.rows))
+        else:
+            # only make the rows of the page
+            hts_matrix = hts_matrix.take(table.matrix_rows(hts_matrix, data_element_metas, len(ou_headers), legend_sets))
+            rows = hts_matrix.iter_grid(OU_PATH_FIELDS, data_element_metas)
+        yield from rows
+
+    grouped_vals = hts_rows()
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="hts_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('hts_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('hts_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -1111,20 +791,32 @@ def hts_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
-    return render(request, 'cannula/hts_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
+    template_name = 'cannula/hts_{0}.html'.format(OrgUnit.get_level_field(org_unit_level))
+    if org_unit_level == 3: # facility pages are long, send the table as it is rendered
+        return stream_scorecard(request, template_name, context)
+    return render(request, template_name, context)
 
 @login_required
 def hts_by_district(request, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YRS = ['%d' % (y,) for y in range(this_year, this_year-6, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YRS = dimensions.prev_5yr_years(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YRS:
         filter_period=request.GET['period']
@@ -1134,7 +826,7 @@ def hts_by_district(request, output_format='HTML'):
     period_desc = filter_period
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
@@ -1176,18 +868,14 @@ def hts_by_district(request, output_format='HTML'):
     val_positivity = list(val_positivity)
     
     # all districts (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=1).annotate(district=F('name'))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by('district')
-    ou_list = list(v for v in qs_ou.values_list('district'))
+    ou_list = dims.ou_paths(1, filter_district)
     ou_headers = ['District',]
 
     def val_with_subcat_fun(row, col):
         district, = row
         de_name, subcategory = col
         return { 'district': district, 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None }
-    gen_raster = grabbag.rasterize(ou_list, de_positivity_meta, val_positivity, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_positivity_meta, val_positivity, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_positivity2 = list(gen_raster)
 
     pmtct_mother_de_names = (
@@ -1208,7 +896,7 @@ def hts_by_district(request, output_format='HTML'):
     qs_pmtct_mother = qs_pmtct_mother.order_by('district', 'de_name', 'cat_combo', 'period')
     val_pmtct_mother = qs_pmtct_mother.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
 
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_mother_meta, val_pmtct_mother, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_pmtct_mother_meta, val_pmtct_mother, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_pmtct_mother2 = list(gen_raster)
 
     pmtct_mother_pos_de_names = (
@@ -1231,7 +919,7 @@ def hts_by_district(request, output_format='HTML'):
     qs_pmtct_mother_pos = qs_pmtct_mother_pos.order_by('district', 'de_name', 'cat_combo', 'period')
     val_pmtct_mother_pos = qs_pmtct_mother_pos.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
 
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_mother_pos_meta, val_pmtct_mother_pos, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_pmtct_mother_pos_meta, val_pmtct_mother_pos, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_pmtct_mother_pos2 = list(gen_raster)
 
     pmtct_child_de_names = (
@@ -1260,7 +948,7 @@ def hts_by_district(request, output_format='HTML'):
     qs_pmtct_child = qs_pmtct_child.order_by('district', 'de_name', 'cat_combo', 'period')
     val_pmtct_child = qs_pmtct_child.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
 
-    gen_raster = grabbag.rasterize(ou_list, de_pmtct_child_meta, val_pmtct_child, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_pmtct_child_meta, val_pmtct_child, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_pmtct_child2 = list(gen_raster)
 
     target_de_names = (
@@ -1281,280 +969,18 @@ def hts_by_district(request, output_format='HTML'):
     val_target = qs_target.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_target = list(val_target)
 
-    gen_raster = grabbag.rasterize(ou_list, de_target_meta, val_target, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_target_meta, val_target, lambda x: (x['district'],), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_target2 = list(gen_raster)
 
     # combine the data and group by district
-    grouped_vals = groupbylist(sorted(chain(val_positivity2, val_pmtct_mother2, val_pmtct_mother_pos2, val_pmtct_child2, val_target2), key=lambda x: (x['district'],)), key=lambda x: (x['district'],))
+    grouped_vals = pivot_rows(ou_list, val_positivity2, val_pmtct_mother2, val_pmtct_mother_pos2, val_pmtct_child2, val_target2)
 
     # perform calculations
-    for _group in grouped_vals:
-        (ou_path_list, (linked_under15_f, linked_under15_m, linked_over15_f, linked_over15_m, tst_under15_f, tst_under15_m, tst_over15_f, tst_over15_m, pos_under15_f, pos_under15_m, pos_over15_f, pos_over15_m, tst_pregnant, pos_pregnant, pos_infant, pos_pcr1, pos_pcr2, tst_male_partner, pos_male_partner, *other_vals)) = _group
-        
-        calculated_vals = list()
-
-        under15_f_sum = default_zero(tst_under15_f['numeric_sum']) + Decimal(default_zero(pos_infant['numeric_sum'])/2)
-        under15_f_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': under15_f_sum,
-        }
-        calculated_vals.append(under15_f_val)
-        
-        under15_m_sum = default_zero(tst_under15_m['numeric_sum']) + Decimal(default_zero(pos_infant['numeric_sum'])/2)
-        under15_m_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': under15_m_sum,
-        }
-        calculated_vals.append(under15_m_val)
-        
-        over15_f_sum = default_zero(tst_over15_f['numeric_sum']) + default_zero(tst_pregnant['numeric_sum'])
-        over15_f_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': over15_f_sum,
-        }
-        calculated_vals.append(over15_f_val)
-        
-        over15_m_sum = default_zero(tst_over15_m['numeric_sum']) + default_zero(tst_male_partner['numeric_sum'])
-        over15_m_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': over15_m_sum,
-        }
-        calculated_vals.append(over15_m_val)
-        
-        half_pos_pcr = Decimal(default_zero(pos_pcr1['numeric_sum']) + default_zero(pos_pcr1['numeric_sum']))/2
-        pos_under15_f_sum = default_zero(pos_under15_f['numeric_sum']) + half_pos_pcr
-        pos_under15_f_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': pos_under15_f_sum,
-        }
-        calculated_vals.append(pos_under15_f_val)
-        
-        pos_under15_m_sum = default_zero(pos_under15_m['numeric_sum']) + half_pos_pcr
-        pos_under15_m_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': pos_under15_m_sum,
-        }
-        calculated_vals.append(pos_under15_m_val)
-        
-        pos_over15_f_sum = default_zero(pos_over15_f['numeric_sum']) + Decimal(default_zero(pos_pregnant['numeric_sum']))
-        pos_over15_f_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': pos_over15_f_sum,
-        }
-        calculated_vals.append(pos_over15_f_val)
-        
-        pos_over15_m_sum = default_zero(pos_over15_m['numeric_sum']) + Decimal(default_zero(pos_male_partner['numeric_sum']))
-        pos_over15_m_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': pos_over15_m_sum,
-        }
-        calculated_vals.append(pos_over15_m_val)
-
-        tested_total = sum([under15_f_sum, under15_m_sum, over15_f_sum, over15_m_sum])
-        pos_total = sum([pos_under15_f_sum, pos_under15_m_sum, pos_over15_f_sum, pos_over15_m_sum])
-        tested_total_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested',
-            'cat_combo': None,
-            'numeric_sum': tested_total,
-        }
-        pos_total_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+',
-            'cat_combo': None,
-            'numeric_sum': pos_total,
-        }
-        calculated_vals.append(tested_total_val)
-        calculated_vals.append(pos_total_val)
-
-        # copy linked to care totals over
-        calculated_vals.append(linked_under15_f)
-        calculated_vals.append(linked_under15_m)
-        calculated_vals.append(linked_over15_f)
-        calculated_vals.append(linked_over15_m)
-
-        # calculate the percentages
-        target_under15_f, target_under15_m, target_over15_f, target_over15_m, target_pos_under15_f, target_pos_under15_m, target_pos_over15_f, target_pos_over15_m, *further_vals = other_vals
-
-        if all_not_none(under15_f_sum, target_under15_f['numeric_sum']) and target_under15_f['numeric_sum']:
-            under15_f_percent = (under15_f_sum * 100) / target_under15_f['numeric_sum']
-        else:
-            under15_f_percent = None
-        under15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': under15_f_percent,
-        }
-        calculated_vals.append(under15_f_percent_val)
-
-        if all_not_none(under15_m_sum, target_under15_m['numeric_sum']) and target_under15_m['numeric_sum']:
-            under15_m_percent = (under15_m_sum * 100) / target_under15_m['numeric_sum']
-        else:
-            under15_m_percent = None
-        under15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': under15_m_percent,
-        }
-        calculated_vals.append(under15_m_percent_val)
-
-        if all_not_none(over15_f_sum, target_over15_f['numeric_sum']) and target_over15_f['numeric_sum']:
-            over15_f_percent = (over15_f_sum * 100) / target_over15_f['numeric_sum']
-        else:
-            over15_f_percent = None
-        over15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': over15_f_percent,
-        }
-        calculated_vals.append(over15_f_percent_val)
-
-        if all_not_none(over15_m_sum, target_over15_m['numeric_sum']) and target_over15_m['numeric_sum']:
-            over15_m_percent = (over15_m_sum * 100) / target_over15_m['numeric_sum']
-        else:
-            over15_m_percent = None
-        over15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Tested (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': over15_m_percent,
-        }
-        calculated_vals.append(over15_m_percent_val)
-
-        if all_not_none(pos_under15_f_sum, target_pos_under15_f['numeric_sum']) and target_pos_under15_f['numeric_sum']:
-            pos_under15_f_percent = (pos_under15_f_sum * 100) / target_pos_under15_f['numeric_sum']
-        else:
-            pos_under15_f_percent = None
-        pos_under15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': pos_under15_f_percent,
-        }
-        calculated_vals.append(pos_under15_f_percent_val)
-
-        if all_not_none(pos_under15_m_sum, target_pos_under15_m['numeric_sum']) and target_pos_under15_m['numeric_sum']:
-            pos_under15_m_percent = (pos_under15_m_sum * 100) / target_pos_under15_m['numeric_sum']
-        else:
-            pos_under15_m_percent = None
-        pos_under15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': pos_under15_m_percent,
-        }
-        calculated_vals.append(pos_under15_m_percent_val)
-
-        if all_not_none(pos_over15_f_sum, target_pos_over15_f['numeric_sum']) and target_pos_over15_f['numeric_sum']:
-            pos_over15_f_percent = (pos_over15_f_sum * 100) / target_pos_over15_f['numeric_sum']
-        else:
-            pos_over15_f_percent = None
-        pos_over15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': pos_over15_f_percent,
-        }
-        calculated_vals.append(pos_over15_f_percent_val)
+    hts_matrix = ScorecardMatrix.from_grouped(grouped_vals, de_positivity_meta + de_pmtct_mother_meta + de_pmtct_mother_pos_meta + de_pmtct_child_meta + de_target_meta)
+    hts_matrix.calculate(hts_calculations)
 
-        if all_not_none(pos_over15_m_sum, target_pos_over15_m['numeric_sum']) and target_pos_over15_m['numeric_sum']:
-            pos_over15_m_percent = (pos_over15_m_sum * 100) / target_pos_over15_m['numeric_sum']
-        else:
-            pos_over15_m_percent = None
-        pos_over15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'HIV+ (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': pos_over15_m_percent,
-        }
-        calculated_vals.append(pos_over15_m_percent_val)
-
-        if all_not_none(linked_under15_f['numeric_sum'], pos_under15_f['numeric_sum']) and pos_under15_f['numeric_sum']:
-            linked_under15_f_percent = (linked_under15_f['numeric_sum'] * 100) / pos_under15_f['numeric_sum']
-        else:
-            linked_under15_f_percent = None
-        linked_under15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Linked (%)',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': linked_under15_f_percent,
-        }
-        calculated_vals.append(linked_under15_f_percent_val)
-
-        if all_not_none(linked_under15_m['numeric_sum'], pos_under15_m['numeric_sum']) and pos_under15_m['numeric_sum']:
-            linked_under15_m_percent = (linked_under15_m['numeric_sum'] * 100) / pos_under15_m['numeric_sum']
-        else:
-            linked_under15_m_percent = None
-        linked_under15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Linked (%)',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': linked_under15_m_percent,
-        }
-        calculated_vals.append(linked_under15_m_percent_val)
-
-        if all_not_none(linked_over15_f['numeric_sum'], pos_over15_f['numeric_sum']) and pos_over15_f['numeric_sum']:
-            linked_over15_f_percent = (linked_over15_f['numeric_sum'] * 100) / pos_over15_f['numeric_sum']
-        else:
-            linked_over15_f_percent = None
-        linked_over15_f_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Linked (%)',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': linked_over15_f_percent,
-        }
-        calculated_vals.append(linked_over15_f_percent_val)
-
-        if all_not_none(linked_over15_m['numeric_sum'], pos_over15_m['numeric_sum']) and pos_over15_m['numeric_sum']:
-            linked_over15_m_percent = (linked_over15_m['numeric_sum'] * 100) / pos_over15_m['numeric_sum']
-        else:
-            linked_over15_m_percent = None
-        linked_over15_m_percent_val = {
-            'district': ou_path_list[0],
-            'de_name': 'Linked (%)',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': linked_over15_m_percent,
-        }
-        calculated_vals.append(linked_over15_m_percent_val)
-
-        # _group[1].extend(calculated_vals)
-        _group[1] = calculated_vals
-    
-    data_element_names = list()
-    
-    # data_element_names += list(product(hts_short_names, subcategory_names))
-    # data_element_names += de_pmtct_mother_meta
-    # data_element_names += de_pmtct_mother_pos_meta
-    # data_element_names += list(product(pmtct_child_short_names, (None,)))
-    # data_element_names += de_target_meta
-
-    data_element_names += list(product(['Tested',], subcategory_names))
-    data_element_names += list(product(['HIV+',], subcategory_names))
-    data_element_names += list(product(['Tested',], [None,]))
-    data_element_names += list(product(['HIV+',], [None,]))
-    data_element_names += list(product(['Linked',], subcategory_names))
-    data_element_names += list(product(['Tested (%)',], subcategory_names))
-    data_element_names += list(product(['HIV+ (%)',], subcategory_names))
-    data_element_names += list(product(['Linked (%)',], subcategory_names))
+    data_element_names = list(HTS_COLUMNS)
+    grouped_vals = hts_matrix.to_grid(('district',), data_element_names)
 
     legend_sets = list()
     test_and_pos_ls = LegendSet()
@@ -1575,41 +1001,9 @@ def hts_by_district(request, output_format='HTML'):
     legend_sets.append(linked_ls)
 
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_names)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="hts_districts_scorecard.xlsx"'
-
-        return response
+        return scorecard_excel_response('hts_districts_scorecard.xlsx', ou_headers, data_element_names, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('hts_districts_scorecard.csv', ou_headers, data_element_names, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -1623,42 +1017,39 @@ def hts_by_district(request, output_format='HTML'):
     return render(request, 'cannula/hts_districts.html', context)
 
 @login_required
+@cache_scorecard
+@transaction.non_atomic_requests # read only, and the queries run on other connections
 def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     targets_de_names = (
@@ -1674,19 +1065,6 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_meta = list(product(targets_de_names, (None,)))
     data_element_metas += list(product(targets_short_names, (None,)))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_targets = qs_targets.when(filter_period)
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     method_de_names = (
         '105-5 Clients circumcised by circumcision Technique Device Based (DC)',
         '105-5 Clients circumcised by circumcision Technique Other VMMC techniques',
@@ -1700,18 +1078,6 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_method_meta = list(product(method_de_names, (None,)))
     data_element_metas += list(product(method_short_names, (None,)))
 
-    qs_method = DataValue.objects.what(*method_de_names)
-    qs_method = qs_method.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_method = qs_method.where(filter_district)
-    qs_method = qs_method.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_method = qs_method.when(filter_period)
-    qs_method = qs_method.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_method = qs_method.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_method_meta, val_method, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_method2 = list(gen_raster)
-
     hiv_de_names = (
         '105-5 SMC Clients Counseled, Tested and Circumcised for HIV at SMC site HIV Negative',
         '105-5 SMC Clients Counseled, Tested and Circumcised for HIV at SMC site HIV Positive',
@@ -1723,18 +1089,6 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_meta = list(product(hiv_de_names, (None,)))
     data_element_metas += list(product(hiv_short_names, (None,)))
 
-    qs_hiv = DataValue.objects.what(*hiv_de_names)
-    qs_hiv = qs_hiv.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv = qs_hiv.where(filter_district)
-    qs_hiv = qs_hiv.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv = qs_hiv.when(filter_period)
-    qs_hiv = qs_hiv.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv = qs_hiv.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_meta, val_hiv, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv2 = list(gen_raster)
-
     location_de_names = (
         '105-5 Number of Males Circumcised by Age group and Technique Facility, Device Based (DC)',
         '105-5 Number of Males Circumcised by Age group and Technique Facility, Surgical(SC)',
@@ -1753,20 +1107,6 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_location_meta = list(product(location_de_names2, (None,)))
     data_element_metas += list(product(location_short_names, (None,)))
 
-    qs_location = DataValue.objects.what(*location_de_names)
-    # drop the technique section from the returned data element name
-    qs_location = qs_location.annotate(de_name=Substr('data_element__name', 1, location_prefix_len))
-    qs_location = qs_location.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_location = qs_location.where(filter_district)
-    qs_location = qs_location.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_location = qs_location.when(filter_period)
-    qs_location = qs_location.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_location = qs_location.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_location_meta, val_location, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_location2 = list(gen_raster)
-
     followup_de_names = (
         '105-5a Number of Clients Circumcised who Returned for Follow Up Visit within 6 weeks of SMC Procedure(Within 48 Hours)',
         '105-5b Number of Clients Circumcised who Returned for Follow Up Visit within 6 weeks of SMC Procedure(Within 7 Days)',
@@ -1780,18 +1120,6 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_followup_meta = list(product(followup_de_names, (None,)))
     data_element_metas += list(product(followup_short_names, (None,)))
 
-    qs_followup = DataValue.objects.what(*followup_de_names)
-    qs_followup = qs_followup.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_followup = qs_followup.where(filter_district)
-    qs_followup = qs_followup.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_followup = qs_followup.when(filter_period)
-    qs_followup = qs_followup.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_followup = qs_followup.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_followup_meta, val_followup, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_followup2 = list(gen_raster)
-
     adverse_de_names = (
         '105-5 Clients Circumcised who Experienced one or more Adverse Events Moderate',
         '105-5 Clients Circumcised who Experienced one or more Adverse Events Severe',
@@ -1803,102 +1131,121 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_adverse_meta = list(product(adverse_de_names, (None,)))
     data_element_metas += list(product(adverse_short_names, (None,)))
 
-    qs_adverse = DataValue.objects.what(*adverse_de_names)
-    qs_adverse = qs_adverse.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_adverse = qs_adverse.where(filter_district)
-    qs_adverse = qs_adverse.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_adverse = qs_adverse.when(filter_period)
-    qs_adverse = qs_adverse.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_adverse = qs_adverse.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_adverse_meta, val_adverse, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_adverse2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_targets2, val_hiv2, val_location2, val_method2, val_followup2, val_adverse2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (target_total, target_device, target_surgical, hiv_negative, hiv_positive, location_facility, location_outreach, method_device, method_other, method_surgical, followup_48hrs, followup_7days, followup_plus7days, adverse_moderate, adverse_severe, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        method_sum = default_zero(method_device['numeric_sum']) + default_zero(method_surgical['numeric_sum']) + default_zero(method_other['numeric_sum'])
-
-        if all_not_none(target_total['numeric_sum'], method_sum) and target_total['numeric_sum']:
-            target_total_percent = (method_sum * 100) / target_total['numeric_sum']
-        else:
-            target_total_percent = None
-        target_total_percent_val = {
-            'de_name': 'Perf% Circumcised',
-            'cat_combo': None,
-            'numeric_sum': target_total_percent,
-        }
-        target_total_percent_val.update(_group_ou_dict)
-        calculated_vals.append(target_total_percent_val)
-
-        if all_not_none(target_device['numeric_sum'], method_device['numeric_sum']) and target_device['numeric_sum']:
-            target_device_percent = (method_device['numeric_sum'] * 100) / target_device['numeric_sum']
-        else:
-            target_device_percent = None
-        target_device_percent_val = {
-            'de_name': 'Perf% Circumcised DC',
-            'cat_combo': None,
-            'numeric_sum': target_device_percent,
-        }
-        target_device_percent_val.update(_group_ou_dict)
-        calculated_vals.append(target_device_percent_val)
-
-        if all_not_none(target_surgical['numeric_sum'], method_surgical['numeric_sum']) and target_surgical['numeric_sum']:
-            target_surgical_percent = (method_surgical['numeric_sum'] * 100) / target_surgical['numeric_sum']
-        else:
-            target_surgical_percent = None
-        target_surgical_percent_val = {
-            'de_name': 'Perf% Circumcised Surgical',
-            'cat_combo': None,
-            'numeric_sum': target_surgical_percent,
-        }
-        target_surgical_percent_val.update(_group_ou_dict)
-        calculated_vals.append(target_surgical_percent_val)
-
-        if all_not_none(followup_48hrs['numeric_sum'], method_sum) and method_sum:
-            followup_48hrs_percent = (followup_48hrs['numeric_sum'] * 100) / method_sum
-        else:
-            followup_48hrs_percent = None
-        followup_48hrs_percent_val = {
-            'de_name': '% who returned within 48 hours',
-            'cat_combo': None,
-            'numeric_sum': followup_48hrs_percent,
-        }
-        followup_48hrs_percent_val.update(_group_ou_dict)
-        calculated_vals.append(followup_48hrs_percent_val)
-
-        adverse_sum = default_zero(adverse_moderate['numeric_sum']) + default_zero(adverse_severe['numeric_sum'])
+    def vmmc_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_targets = qs_targets.when(*periods)
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        qs_method = DataValue.objects.what(*method_de_names)
+        qs_method = qs_method.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_method = qs_method.where(filter_district)
+        qs_method = qs_method.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_method = qs_method.when(*periods)
+        qs_method = qs_method.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_method = qs_method.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        qs_hiv = DataValue.objects.what(*hiv_de_names)
+        qs_hiv = qs_hiv.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv = qs_hiv.where(filter_district)
+        qs_hiv = qs_hiv.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv = qs_hiv.when(*periods)
+        qs_hiv = qs_hiv.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv = qs_hiv.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        qs_location = DataValue.objects.what(*location_de_names)
+        # drop the technique section from the returned data element name
+        qs_location = qs_location.annotate(de_name=Substr('data_element__name', 1, location_prefix_len))
+        qs_location = qs_location.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_location = qs_location.where(filter_district)
+        qs_location = qs_location.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_location = qs_location.when(*periods)
+        qs_location = qs_location.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_location = qs_location.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        qs_followup = DataValue.objects.what(*followup_de_names)
+        qs_followup = qs_followup.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_followup = qs_followup.where(filter_district)
+        qs_followup = qs_followup.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_followup = qs_followup.when(*periods)
+        qs_followup = qs_followup.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_followup = qs_followup.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        qs_adverse = DataValue.objects.what(*adverse_de_names)
+        qs_adverse = qs_adverse.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_adverse = qs_adverse.where(filter_district)
+        qs_adverse = qs_adverse.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_adverse = qs_adverse.when(*periods)
+        qs_adverse = qs_adverse.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_adverse = qs_adverse.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        # the queries are independent of each other, so they can run at the same time
+        val_targets, val_method, val_hiv, val_location, val_followup, val_adverse = evaluate_querysets(val_targets, val_method, val_hiv, val_location, val_followup, val_adverse)
+
+        gen_raster = pivot(period_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        gen_raster = pivot(period_rows, de_method_meta, val_method, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_method2 = list(gen_raster)
+
+        gen_raster = pivot(period_rows, de_hiv_meta, val_hiv, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv2 = list(gen_raster)
+
+        gen_raster = pivot(period_rows, de_location_meta, val_location, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_location2 = list(gen_raster)
+
+        gen_raster = pivot(period_rows, de_followup_meta, val_followup, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_followup2 = list(gen_raster)
+
+        gen_raster = pivot(period_rows, de_adverse_meta, val_adverse, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_adverse2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_targets2, val_hiv2, val_location2, val_method2, val_followup2, val_adverse2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(adverse_sum, method_sum) and method_sum:
-            adverse_percent = (adverse_sum * 100) / method_sum
-        else:
-            adverse_percent = None
-        adverse_percent_val = {
-            'de_name': '% with at least one adverse event',
-            'cat_combo': None,
-            'numeric_sum': adverse_percent,
-        }
-        adverse_percent_val.update(_group_ou_dict)
-        calculated_vals.append(adverse_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, [(de_n, None) for de_n in targets_short_names + hiv_short_names + location_short_names + method_short_names + followup_short_names + adverse_short_names])
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    vmmc_matrix = cached_result('vmmc_scorecard', (periods, filter_district and filter_district.name), vmmc_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        vmmc_matrix = vmmc_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        vmmc_matrix = vmmc_matrix.rollup(ou_list)
+    vmmc_matrix.calculate(vmmc_calculations)
 
     data_element_metas += list(product(['Perf% Circumcised'], (None,)))
     data_element_metas += list(product(['Perf% Circumcised DC'], (None,)))
     data_element_metas += list(product(['Perf% Circumcised Surgical'], (None,)))
     data_element_metas += list(product(['% who returned within 48 hours'], (None,)))
     data_element_metas += list(product(['% with at least one adverse event'], (None,)))
-
     num_path_elements = len(ou_headers)
     legend_sets = list()
     vmmc_ls = LegendSet()
@@ -1916,42 +1263,19 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
     adverse_ls.mappings[num_path_elements+19] = True
     legend_sets.append(adverse_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(vmmc_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        vmmc_matrix = vmmc_matrix.take(table.matrix_rows(vmmc_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = vmmc_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="vmmc_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('vmmc_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('vmmc_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -1959,51 +1283,55 @@ def vmmc_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/vmmc_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     malaria_de_names = (
@@ -2017,19 +1345,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_malaria_meta = list(product(malaria_de_names, (None,)))
     data_element_metas += list(product(malaria_short_names, (None,)))
 
-    qs_malaria = DataValue.objects.what(*malaria_de_names)
-    qs_malaria = qs_malaria.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_malaria = qs_malaria.where(filter_district)
-    qs_malaria = qs_malaria.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_malaria = qs_malaria.when(filter_period)
-    qs_malaria = qs_malaria.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_malaria = qs_malaria.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_malaria = list(val_malaria)
-
-    gen_raster = grabbag.rasterize(ou_list, de_malaria_meta, val_malaria, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_malaria2 = list(gen_raster)
-
     hiv_determine_de_names = (
         '105-7.8 Lab Determine Clinical Diagnosis',
         '105-7.8 Lab Determine HCT',
@@ -2043,20 +1358,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_determine_meta = list(product(hiv_determine_short_names, (None,)))
     data_element_metas += de_hiv_determine_meta
 
-    qs_hiv_determine = DataValue.objects.what(*hiv_determine_de_names)
-    qs_hiv_determine = qs_hiv_determine.annotate(de_name=Value(hiv_determine_short_names[0], output_field=CharField()))
-    qs_hiv_determine = qs_hiv_determine.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_determine = qs_hiv_determine.where(filter_district)
-    qs_hiv_determine = qs_hiv_determine.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_determine = qs_hiv_determine.when(filter_period)
-    qs_hiv_determine = qs_hiv_determine.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_determine = qs_hiv_determine.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_determine = list(val_hiv_determine)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_determine_meta, val_hiv_determine, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_determine2 = list(gen_raster)
-
     hiv_statpak_de_names = (
         '105-7.8 Lab Stat pak  Clinical Diagnosis',
         '105-7.8 Lab Stat pak  HCT',
@@ -2070,20 +1371,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_statpak_meta = list(product(hiv_statpak_short_names, (None,)))
     data_element_metas += de_hiv_statpak_meta
 
-    qs_hiv_statpak = DataValue.objects.what(*hiv_statpak_de_names)
-    qs_hiv_statpak = qs_hiv_statpak.annotate(de_name=Value(hiv_statpak_short_names[0], output_field=CharField()))
-    qs_hiv_statpak = qs_hiv_statpak.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_statpak = qs_hiv_statpak.where(filter_district)
-    qs_hiv_statpak = qs_hiv_statpak.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_statpak = qs_hiv_statpak.when(filter_period)
-    qs_hiv_statpak = qs_hiv_statpak.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_statpak = qs_hiv_statpak.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_statpak = list(val_hiv_statpak)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_statpak_meta, val_hiv_statpak, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_statpak2 = list(gen_raster)
-
     hiv_unigold_de_names = (
         '105-7.8 Lab Unigold Clinical Diagnosis',
         '105-7.8 Lab Unigold HCT',
@@ -2097,20 +1384,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_unigold_meta = list(product(hiv_unigold_short_names, (None,)))
     data_element_metas += de_hiv_unigold_meta
 
-    qs_hiv_unigold = DataValue.objects.what(*hiv_unigold_de_names)
-    qs_hiv_unigold = qs_hiv_unigold.annotate(de_name=Value(hiv_unigold_short_names[0], output_field=CharField()))
-    qs_hiv_unigold = qs_hiv_unigold.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_unigold = qs_hiv_unigold.where(filter_district)
-    qs_hiv_unigold = qs_hiv_unigold.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_unigold = qs_hiv_unigold.when(filter_period)
-    qs_hiv_unigold = qs_hiv_unigold.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_unigold = qs_hiv_unigold.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_unigold = list(val_hiv_unigold)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_unigold_meta, val_hiv_unigold, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_unigold2 = list(gen_raster)
-
     tb_smear_de_names = (
         '105-7.6 Lab ZN for AFBs  Number Done',
     )
@@ -2120,19 +1393,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_tb_smear_meta = list(product(tb_smear_de_names, (None,)))
     data_element_metas += list(product(tb_smear_short_names, (None,)))
 
-    qs_tb_smear = DataValue.objects.what(*tb_smear_de_names)
-    qs_tb_smear = qs_tb_smear.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_tb_smear = qs_tb_smear.where(filter_district)
-    qs_tb_smear = qs_tb_smear.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_tb_smear = qs_tb_smear.when(filter_period)
-    qs_tb_smear = qs_tb_smear.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_tb_smear = qs_tb_smear.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_tb_smear = list(val_tb_smear)
-
-    gen_raster = grabbag.rasterize(ou_list, de_tb_smear_meta, val_tb_smear, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_tb_smear2 = list(gen_raster)
-
     syphilis_de_names = (
         '105-7.4 Lab VDRL/RPR Number Done',
         '105-7.4 Lab TPHA  Number Done',
@@ -2143,20 +1403,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_syphilis_meta = list(product(syphilis_short_names, (None,)))
     data_element_metas += de_syphilis_meta
 
-    qs_syphilis = DataValue.objects.what(*syphilis_de_names)
-    qs_syphilis = qs_syphilis.annotate(de_name=Value(syphilis_short_names[0], output_field=CharField()))
-    qs_syphilis = qs_syphilis.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_syphilis = qs_syphilis.where(filter_district)
-    qs_syphilis = qs_syphilis.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_syphilis = qs_syphilis.when(filter_period)
-    qs_syphilis = qs_syphilis.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_syphilis = qs_syphilis.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_syphilis = list(val_syphilis)
-
-    gen_raster = grabbag.rasterize(ou_list, de_syphilis_meta, val_syphilis, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_syphilis2 = list(gen_raster)
-
     liver_de_names = (
         '105-7.7 Lab ALT Number Done',
         '105-7.7 Lab AST Number Done',
@@ -2168,20 +1414,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_liver_meta = list(product(liver_short_names, (None,)))
     data_element_metas += de_liver_meta
 
-    qs_liver = DataValue.objects.what(*liver_de_names)
-    qs_liver = qs_liver.annotate(de_name=Value(liver_short_names[0], output_field=CharField()))
-    qs_liver = qs_liver.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_liver = qs_liver.where(filter_district)
-    qs_liver = qs_liver.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_liver = qs_liver.when(filter_period)
-    qs_liver = qs_liver.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_liver = qs_liver.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_liver = list(val_liver)
-
-    gen_raster = grabbag.rasterize(ou_list, de_liver_meta, val_liver, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_liver2 = list(gen_raster)
-
     renal_de_names = (
         '105-7.7 Lab Calcium  Number Done',
         '105-7.7 Lab Creatinine Number Done',
@@ -2196,20 +1428,6 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_renal_meta = list(product(renal_short_names, (None,)))
     data_element_metas += de_renal_meta
 
-    qs_renal = DataValue.objects.what(*renal_de_names)
-    qs_renal = qs_renal.annotate(de_name=Value(renal_short_names[0], output_field=CharField()))
-    qs_renal = qs_renal.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_renal = qs_renal.where(filter_district)
-    qs_renal = qs_renal.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_renal = qs_renal.when(filter_period)
-    qs_renal = qs_renal.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_renal = qs_renal.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_renal = list(val_renal)
-
-    gen_raster = grabbag.rasterize(ou_list, de_renal_meta, val_renal, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_renal2 = list(gen_raster)
-
     other_haem_de_names = (
         'All Other Haematology - Lab - OPD  Number Done',
     )
@@ -2219,41 +1437,161 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_other_haem_meta = list(product(other_haem_de_names, (None,)))
     data_element_metas += list(product(other_haem_short_names, (None,)))
 
-    qs_other_haem = DataValue.objects.what(*other_haem_de_names)
-    qs_other_haem = qs_other_haem.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_other_haem = qs_other_haem.where(filter_district)
-    qs_other_haem = qs_other_haem.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_other_haem = qs_other_haem.when(filter_period)
-    qs_other_haem = qs_other_haem.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_other_haem = qs_other_haem.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_other_haem = list(val_other_haem)
-
-    gen_raster = grabbag.rasterize(ou_list, de_other_haem_meta, val_other_haem, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_other_haem2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_malaria2, val_hiv_determine2, val_hiv_statpak2, val_hiv_unigold2, val_tb_smear2, val_syphilis2, val_liver2,val_renal2, val_other_haem2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
+    def lab_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_malaria = DataValue.objects.what(*malaria_de_names)
+        qs_malaria = qs_malaria.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_malaria = qs_malaria.where(filter_district)
+        qs_malaria = qs_malaria.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_malaria = qs_malaria.when(*periods)
+        qs_malaria = qs_malaria.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_malaria = qs_malaria.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_malaria = list(val_malaria)
+
+        gen_raster = pivot(period_rows, de_malaria_meta, val_malaria, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_malaria2 = list(gen_raster)
+
+        qs_hiv_determine = DataValue.objects.what(*hiv_determine_de_names)
+        qs_hiv_determine = qs_hiv_determine.annotate(de_name=Value(hiv_determine_short_names[0], output_field=CharField()))
+        qs_hiv_determine = qs_hiv_determine.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_determine = qs_hiv_determine.where(filter_district)
+        qs_hiv_determine = qs_hiv_determine.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_determine = qs_hiv_determine.when(*periods)
+        qs_hiv_determine = qs_hiv_determine.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_determine = qs_hiv_determine.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_determine = list(val_hiv_determine)
+
+        gen_raster = pivot(period_rows, de_hiv_determine_meta, val_hiv_determine, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_determine2 = list(gen_raster)
+
+        qs_hiv_statpak = DataValue.objects.what(*hiv_statpak_de_names)
+        qs_hiv_statpak = qs_hiv_statpak.annotate(de_name=Value(hiv_statpak_short_names[0], output_field=CharField()))
+        qs_hiv_statpak = qs_hiv_statpak.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_statpak = qs_hiv_statpak.where(filter_district)
+        qs_hiv_statpak = qs_hiv_statpak.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_statpak = qs_hiv_statpak.when(*periods)
+        qs_hiv_statpak = qs_hiv_statpak.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_statpak = qs_hiv_statpak.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_statpak = list(val_hiv_statpak)
+
+        gen_raster = pivot(period_rows, de_hiv_statpak_meta, val_hiv_statpak, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_statpak2 = list(gen_raster)
+
+        qs_hiv_unigold = DataValue.objects.what(*hiv_unigold_de_names)
+        qs_hiv_unigold = qs_hiv_unigold.annotate(de_name=Value(hiv_unigold_short_names[0], output_field=CharField()))
+        qs_hiv_unigold = qs_hiv_unigold.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_unigold = qs_hiv_unigold.where(filter_district)
+        qs_hiv_unigold = qs_hiv_unigold.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_unigold = qs_hiv_unigold.when(*periods)
+        qs_hiv_unigold = qs_hiv_unigold.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_unigold = qs_hiv_unigold.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_unigold = list(val_hiv_unigold)
+
+        gen_raster = pivot(period_rows, de_hiv_unigold_meta, val_hiv_unigold, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_unigold2 = list(gen_raster)
+
+        qs_tb_smear = DataValue.objects.what(*tb_smear_de_names)
+        qs_tb_smear = qs_tb_smear.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_tb_smear = qs_tb_smear.where(filter_district)
+        qs_tb_smear = qs_tb_smear.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_tb_smear = qs_tb_smear.when(*periods)
+        qs_tb_smear = qs_tb_smear.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_tb_smear = qs_tb_smear.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_tb_smear = list(val_tb_smear)
+
+        gen_raster = pivot(period_rows, de_tb_smear_meta, val_tb_smear, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_tb_smear2 = list(gen_raster)
+
+        qs_syphilis = DataValue.objects.what(*syphilis_de_names)
+        qs_syphilis = qs_syphilis.annotate(de_name=Value(syphilis_short_names[0], output_field=CharField()))
+        qs_syphilis = qs_syphilis.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_syphilis = qs_syphilis.where(filter_district)
+        qs_syphilis = qs_syphilis.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_syphilis = qs_syphilis.when(*periods)
+        qs_syphilis = qs_syphilis.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_syphilis = qs_syphilis.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_syphilis = list(val_syphilis)
+
+        gen_raster = pivot(period_rows, de_syphilis_meta, val_syphilis, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_syphilis2 = list(gen_raster)
+
+        qs_liver = DataValue.objects.what(*liver_de_names)
+        qs_liver = qs_liver.annotate(de_name=Value(liver_short_names[0], output_field=CharField()))
+        qs_liver = qs_liver.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_liver = qs_liver.where(filter_district)
+        qs_liver = qs_liver.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_liver = qs_liver.when(*periods)
+        qs_liver = qs_liver.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_liver = qs_liver.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_liver = list(val_liver)
+
+        gen_raster = pivot(period_rows, de_liver_meta, val_liver, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_liver2 = list(gen_raster)
+
+        qs_renal = DataValue.objects.what(*renal_de_names)
+        qs_renal = qs_renal.annotate(de_name=Value(renal_short_names[0], output_field=CharField()))
+        qs_renal = qs_renal.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_renal = qs_renal.where(filter_district)
+        qs_renal = qs_renal.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_renal = qs_renal.when(*periods)
+        qs_renal = qs_renal.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_renal = qs_renal.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_renal = list(val_renal)
+
+        gen_raster = pivot(period_rows, de_renal_meta, val_renal, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_renal2 = list(gen_raster)
+
+        qs_other_haem = DataValue.objects.what(*other_haem_de_names)
+        qs_other_haem = qs_other_haem.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_other_haem = qs_other_haem.where(filter_district)
+        qs_other_haem = qs_other_haem.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_other_haem = qs_other_haem.when(*periods)
+        qs_other_haem = qs_other_haem.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_other_haem = qs_other_haem.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_other_haem = list(val_other_haem)
+
+        gen_raster = pivot(period_rows, de_other_haem_meta, val_other_haem, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_other_haem2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_malaria2, val_hiv_determine2, val_hiv_statpak2, val_hiv_unigold2, val_tb_smear2, val_syphilis2, val_liver2,val_renal2, val_other_haem2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (malaria_microscopy, malaria_rdt, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        malaria_sum = default_zero(malaria_microscopy['numeric_sum']) + default_zero(malaria_rdt['numeric_sum'])
-        malaria_val = {
-            'de_name': 'Malaria (Smear & RDTs)',
-            'cat_combo': None,
-            'numeric_sum': malaria_sum,
-        }
-        malaria_val.update(_group_ou_dict)
-        calculated_vals.append(malaria_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    lab_matrix = cached_result('lab_scorecard', (periods, filter_district and filter_district.name), lab_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        lab_matrix = lab_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        lab_matrix = lab_matrix.rollup(ou_list)
+    lab_matrix.calculate(lab_calculations)
 
     data_element_metas += list(product(['Malaria (Smear & RDTs)'], (None,)))
 
@@ -2265,41 +1603,19 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
     # lab_ls.add_interval('green', 60, None)
     # legend_sets.append(lab_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(lab_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        lab_matrix = lab_matrix.take(table.matrix_rows(lab_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = lab_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="lab_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('lab_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('lab_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -2307,51 +1623,56 @@ def lab_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/lab_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
 
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     condoms_new_de_names = (
@@ -2364,21 +1685,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_condoms_new_meta = list(product(condoms_new_short_names, (None,)))
     data_element_metas += de_condoms_new_meta
 
-    qs_condoms_new = DataValue.objects.what(*condoms_new_de_names)
-    qs_condoms_new = qs_condoms_new.annotate(de_name=Value(condoms_new_short_names[0], output_field=CharField()))
-    qs_condoms_new = qs_condoms_new.filter(category_combo__categories__name='New Users')
-    qs_condoms_new = qs_condoms_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_condoms_new = qs_condoms_new.where(filter_district)
-    qs_condoms_new = qs_condoms_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_condoms_new = qs_condoms_new.when(filter_period)
-    qs_condoms_new = qs_condoms_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_condoms_new = qs_condoms_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_condoms_new = list(val_condoms_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_condoms_new_meta, val_condoms_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_condoms_new2 = list(gen_raster)
-
     fp_new_de_names = (
         '105-2.5 Injectable',
         '105-2.5 IUDs',
@@ -2394,20 +1700,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_fp_new_meta = list(product(fp_new_de_names, (None,)))
     data_element_metas += list(product(fp_new_short_names, (None,)))
 
-    qs_fp_new = DataValue.objects.what(*fp_new_de_names)
-    qs_fp_new = qs_fp_new.filter(category_combo__categories__name='New Users')
-    qs_fp_new = qs_fp_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_fp_new = qs_fp_new.where(filter_district)
-    qs_fp_new = qs_fp_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_fp_new = qs_fp_new.when(filter_period)
-    qs_fp_new = qs_fp_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_fp_new = qs_fp_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_fp_new = list(val_fp_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_fp_new_meta, val_fp_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_fp_new2 = list(gen_raster)
-
     oral_new_de_names = (
         '105-2.5 Oral: Microgynon',
         '105-2.5 Oral: Lo-Feminal',
@@ -2419,21 +1711,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_oral_new_meta = list(product(oral_new_short_names, (None,)))
     data_element_metas += de_oral_new_meta
 
-    qs_oral_new = DataValue.objects.what(*oral_new_de_names)
-    qs_oral_new = qs_oral_new.annotate(de_name=Value(oral_new_short_names[0], output_field=CharField()))
-    qs_oral_new = qs_oral_new.filter(category_combo__categories__name='New Users')
-    qs_oral_new = qs_oral_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_oral_new = qs_oral_new.where(filter_district)
-    qs_oral_new = qs_oral_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_oral_new = qs_oral_new.when(filter_period)
-    qs_oral_new = qs_oral_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_oral_new = qs_oral_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_oral_new = list(val_oral_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_oral_new_meta, val_oral_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_oral_new2 = list(gen_raster)
-
     other_new_de_names = (
         '105-2.5 Other Method',
     )
@@ -2443,21 +1720,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_other_new_meta = list(product(other_new_short_names, (None,)))
     data_element_metas += de_other_new_meta
 
-    qs_other_new = DataValue.objects.what(*other_new_de_names)
-    qs_other_new = qs_other_new.annotate(de_name=Value(other_new_short_names[0], output_field=CharField()))
-    qs_other_new = qs_other_new.filter(category_combo__categories__name='New Users')
-    qs_other_new = qs_other_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_other_new = qs_other_new.where(filter_district)
-    qs_other_new = qs_other_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_other_new = qs_other_new.when(filter_period)
-    qs_other_new = qs_other_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_other_new = qs_other_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_other_new = list(val_other_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_other_new_meta, val_other_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_other_new2 = list(gen_raster)
-
     sterile_new_de_names = (
         '105-2.7 Female Sterilisation (TubeLigation)',
         '105-2.7 Male Sterilisation (Vasectomy)',
@@ -2468,20 +1730,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_sterile_new_meta = list(product(sterile_new_short_names, (None,)))
     data_element_metas += de_sterile_new_meta
 
-    qs_sterile_new = DataValue.objects.what(*sterile_new_de_names)
-    qs_sterile_new = qs_sterile_new.annotate(de_name=Value(sterile_new_short_names[0], output_field=CharField()))
-    qs_sterile_new = qs_sterile_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_sterile_new = qs_sterile_new.where(filter_district)
-    qs_sterile_new = qs_sterile_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_sterile_new = qs_sterile_new.when(filter_period)
-    qs_sterile_new = qs_sterile_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_sterile_new = qs_sterile_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_sterile_new = list(val_sterile_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_sterile_new_meta, val_sterile_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_sterile_new2 = list(gen_raster)
-
     condoms_revisit_de_names = (
         '105-2.5 Female Condom',
         '105-2.5 Male Condom',
@@ -2492,21 +1740,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_condoms_revisit_meta = list(product(condoms_revisit_short_names, (None,)))
     data_element_metas += de_condoms_revisit_meta
 
-    qs_condoms_revisit = DataValue.objects.what(*condoms_revisit_de_names)
-    qs_condoms_revisit = qs_condoms_revisit.annotate(de_name=Value(condoms_revisit_short_names[0], output_field=CharField()))
-    qs_condoms_revisit = qs_condoms_revisit.filter(category_combo__categories__name='Revisits')
-    qs_condoms_revisit = qs_condoms_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_condoms_revisit = qs_condoms_revisit.where(filter_district)
-    qs_condoms_revisit = qs_condoms_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_condoms_revisit = qs_condoms_revisit.when(filter_period)
-    qs_condoms_revisit = qs_condoms_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_condoms_revisit = qs_condoms_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_condoms_revisit = list(val_condoms_revisit)
-
-    gen_raster = grabbag.rasterize(ou_list, de_condoms_revisit_meta, val_condoms_revisit, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_condoms_revisit2 = list(gen_raster)
-
     fp_revisit_de_names = (
         '105-2.5 Injectable',
         '105-2.5 IUDs',
@@ -2522,20 +1755,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_fp_revisit_meta = list(product(fp_revisit_de_names, (None,)))
     data_element_metas += list(product(fp_revisit_short_names, (None,)))
 
-    qs_fp_revisit = DataValue.objects.what(*fp_revisit_de_names)
-    qs_fp_revisit = qs_fp_revisit.filter(category_combo__categories__name='Revisits')
-    qs_fp_revisit = qs_fp_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_fp_revisit = qs_fp_revisit.where(filter_district)
-    qs_fp_revisit = qs_fp_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_fp_revisit = qs_fp_revisit.when(filter_period)
-    qs_fp_revisit = qs_fp_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_fp_revisit = qs_fp_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_fp_revisit = list(val_fp_revisit)
-
-    gen_raster = grabbag.rasterize(ou_list, de_fp_revisit_meta, val_fp_revisit, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_fp_revisit2 = list(gen_raster)
-
     oral_revisit_de_names = (
         '105-2.5 Oral: Microgynon',
         '105-2.5 Oral: Lo-Feminal',
@@ -2547,21 +1766,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_oral_revisit_meta = list(product(oral_revisit_short_names, (None,)))
     data_element_metas += de_oral_revisit_meta
 
-    qs_oral_revisit = DataValue.objects.what(*oral_revisit_de_names)
-    qs_oral_revisit = qs_oral_revisit.annotate(de_name=Value(oral_revisit_short_names[0], output_field=CharField()))
-    qs_oral_revisit = qs_oral_revisit.filter(category_combo__categories__name='Revisits')
-    qs_oral_revisit = qs_oral_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_oral_revisit = qs_oral_revisit.where(filter_district)
-    qs_oral_revisit = qs_oral_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_oral_revisit = qs_oral_revisit.when(filter_period)
-    qs_oral_revisit = qs_oral_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_oral_revisit = qs_oral_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_oral_revisit = list(val_oral_revisit)
-
-    gen_raster = grabbag.rasterize(ou_list, de_oral_revisit_meta, val_oral_revisit, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_oral_revisit2 = list(gen_raster)
-
     other_revisit_de_names = (
         '105-2.5 Other Method',
     )
@@ -2571,21 +1775,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_other_revisit_meta = list(product(other_revisit_short_names, (None,)))
     data_element_metas += de_other_revisit_meta
 
-    qs_other_revisit = DataValue.objects.what(*other_revisit_de_names)
-    qs_other_revisit = qs_other_revisit.annotate(de_name=Value(other_revisit_short_names[0], output_field=CharField()))
-    qs_other_revisit = qs_other_revisit.filter(category_combo__categories__name='Revisits')
-    qs_other_revisit = qs_other_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_other_revisit = qs_other_revisit.where(filter_district)
-    qs_other_revisit = qs_other_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_other_revisit = qs_other_revisit.when(filter_period)
-    qs_other_revisit = qs_other_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_other_revisit = qs_other_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_other_revisit = list(val_other_revisit)
-
-    gen_raster = grabbag.rasterize(ou_list, de_other_revisit_meta, val_other_revisit, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_other_revisit2 = list(gen_raster)
-
     hiv_new_de_names = (
         '105-2.5 Number HIV+ FP users',
     )
@@ -2595,21 +1784,6 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_new_meta = list(product(hiv_new_short_names, (None,)))
     data_element_metas += de_hiv_new_meta
 
-    qs_hiv_new = DataValue.objects.what(*hiv_new_de_names)
-    qs_hiv_new = qs_hiv_new.annotate(de_name=Value(hiv_new_short_names[0], output_field=CharField()))
-    qs_hiv_new = qs_hiv_new.filter(category_combo__categories__name='New Users')
-    qs_hiv_new = qs_hiv_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_new = qs_hiv_new.where(filter_district)
-    qs_hiv_new = qs_hiv_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_new = qs_hiv_new.when(filter_period)
-    qs_hiv_new = qs_hiv_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_new = qs_hiv_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_new = list(val_hiv_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_new_meta, val_hiv_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_new2 = list(gen_raster)
-
     hiv_revisit_de_names = (
         '105-2.5 Number HIV+ FP users',
     )
@@ -2619,52 +1793,200 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_revisit_meta = list(product(hiv_revisit_short_names, (None,)))
     data_element_metas += de_hiv_revisit_meta
 
-    qs_hiv_revisit = DataValue.objects.what(*hiv_revisit_de_names)
-    qs_hiv_revisit = qs_hiv_revisit.annotate(de_name=Value(hiv_revisit_short_names[0], output_field=CharField()))
-    qs_hiv_revisit = qs_hiv_revisit.filter(category_combo__categories__name='Revisits')
-    qs_hiv_revisit = qs_hiv_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_revisit = qs_hiv_revisit.where(filter_district)
-    qs_hiv_revisit = qs_hiv_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_revisit = qs_hiv_revisit.when(filter_period)
-    qs_hiv_revisit = qs_hiv_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_revisit = qs_hiv_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_revisit = list(val_hiv_revisit)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_revisit_meta, val_hiv_revisit, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_revisit2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_condoms_new2, val_fp_new2, val_oral_new2, val_other_new2, val_sterile_new2, val_condoms_revisit2, val_fp_revisit2, val_oral_revisit2, val_other_revisit2, val_hiv_new2, val_hiv_revisit2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
+    def fp_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_condoms_new = DataValue.objects.what(*condoms_new_de_names)
+        qs_condoms_new = qs_condoms_new.annotate(de_name=Value(condoms_new_short_names[0], output_field=CharField()))
+        qs_condoms_new = qs_condoms_new.filter(category_combo__categories__name='New Users')
+        qs_condoms_new = qs_condoms_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_condoms_new = qs_condoms_new.where(filter_district)
+        qs_condoms_new = qs_condoms_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_condoms_new = qs_condoms_new.when(*periods)
+        qs_condoms_new = qs_condoms_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_condoms_new = qs_condoms_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_condoms_new = list(val_condoms_new)
+
+        gen_raster = pivot(period_rows, de_condoms_new_meta, val_condoms_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_condoms_new2 = list(gen_raster)
+
+        qs_fp_new = DataValue.objects.what(*fp_new_de_names)
+        qs_fp_new = qs_fp_new.filter(category_combo__categories__name='New Users')
+        qs_fp_new = qs_fp_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_fp_new = qs_fp_new.where(filter_district)
+        qs_fp_new = qs_fp_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_fp_new = qs_fp_new.when(*periods)
+        qs_fp_new = qs_fp_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_fp_new = qs_fp_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_fp_new = list(val_fp_new)
+
+        gen_raster = pivot(period_rows, de_fp_new_meta, val_fp_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_fp_new2 = list(gen_raster)
+
+        qs_oral_new = DataValue.objects.what(*oral_new_de_names)
+        qs_oral_new = qs_oral_new.annotate(de_name=Value(oral_new_short_names[0], output_field=CharField()))
+        qs_oral_new = qs_oral_new.filter(category_combo__categories__name='New Users')
+        qs_oral_new = qs_oral_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_oral_new = qs_oral_new.where(filter_district)
+        qs_oral_new = qs_oral_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_oral_new = qs_oral_new.when(*periods)
+        qs_oral_new = qs_oral_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_oral_new = qs_oral_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_oral_new = list(val_oral_new)
+
+        gen_raster = pivot(period_rows, de_oral_new_meta, val_oral_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_oral_new2 = list(gen_raster)
+
+        qs_other_new = DataValue.objects.what(*other_new_de_names)
+        qs_other_new = qs_other_new.annotate(de_name=Value(other_new_short_names[0], output_field=CharField()))
+        qs_other_new = qs_other_new.filter(category_combo__categories__name='New Users')
+        qs_other_new = qs_other_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_other_new = qs_other_new.where(filter_district)
+        qs_other_new = qs_other_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_other_new = qs_other_new.when(*periods)
+        qs_other_new = qs_other_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_other_new = qs_other_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_other_new = list(val_other_new)
+
+        gen_raster = pivot(period_rows, de_other_new_meta, val_other_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_other_new2 = list(gen_raster)
+
+        qs_sterile_new = DataValue.objects.what(*sterile_new_de_names)
+        qs_sterile_new = qs_sterile_new.annotate(de_name=Value(sterile_new_short_names[0], output_field=CharField()))
+        qs_sterile_new = qs_sterile_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_sterile_new = qs_sterile_new.where(filter_district)
+        qs_sterile_new = qs_sterile_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_sterile_new = qs_sterile_new.when(*periods)
+        qs_sterile_new = qs_sterile_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_sterile_new = qs_sterile_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_sterile_new = list(val_sterile_new)
+
+        gen_raster = pivot(period_rows, de_sterile_new_meta, val_sterile_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_sterile_new2 = list(gen_raster)
+
+        qs_condoms_revisit = DataValue.objects.what(*condoms_revisit_de_names)
+        qs_condoms_revisit = qs_condoms_revisit.annotate(de_name=Value(condoms_revisit_short_names[0], output_field=CharField()))
+        qs_condoms_revisit = qs_condoms_revisit.filter(category_combo__categories__name='Revisits')
+        qs_condoms_revisit = qs_condoms_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_condoms_revisit = qs_condoms_revisit.where(filter_district)
+        qs_condoms_revisit = qs_condoms_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_condoms_revisit = qs_condoms_revisit.when(*periods)
+        qs_condoms_revisit = qs_condoms_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_condoms_revisit = qs_condoms_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_condoms_revisit = list(val_condoms_revisit)
+
+        gen_raster = pivot(period_rows, de_condoms_revisit_meta, val_condoms_revisit, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_condoms_revisit2 = list(gen_raster)
+
+        qs_fp_revisit = DataValue.objects.what(*fp_revisit_de_names)
+        qs_fp_revisit = qs_fp_revisit.filter(category_combo__categories__name='Revisits')
+        qs_fp_revisit = qs_fp_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_fp_revisit = qs_fp_revisit.where(filter_district)
+        qs_fp_revisit = qs_fp_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_fp_revisit = qs_fp_revisit.when(*periods)
+        qs_fp_revisit = qs_fp_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_fp_revisit = qs_fp_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_fp_revisit = list(val_fp_revisit)
+
+        gen_raster = pivot(period_rows, de_fp_revisit_meta, val_fp_revisit, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_fp_revisit2 = list(gen_raster)
+
+        qs_oral_revisit = DataValue.objects.what(*oral_revisit_de_names)
+        qs_oral_revisit = qs_oral_revisit.annotate(de_name=Value(oral_revisit_short_names[0], output_field=CharField()))
+        qs_oral_revisit = qs_oral_revisit.filter(category_combo__categories__name='Revisits')
+        qs_oral_revisit = qs_oral_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_oral_revisit = qs_oral_revisit.where(filter_district)
+        qs_oral_revisit = qs_oral_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_oral_revisit = qs_oral_revisit.when(*periods)
+        qs_oral_revisit = qs_oral_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_oral_revisit = qs_oral_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_oral_revisit = list(val_oral_revisit)
+
+        gen_raster = pivot(period_rows, de_oral_revisit_meta, val_oral_revisit, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_oral_revisit2 = list(gen_raster)
+
+        qs_other_revisit = DataValue.objects.what(*other_revisit_de_names)
+        qs_other_revisit = qs_other_revisit.annotate(de_name=Value(other_revisit_short_names[0], output_field=CharField()))
+        qs_other_revisit = qs_other_revisit.filter(category_combo__categories__name='Revisits')
+        qs_other_revisit = qs_other_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_other_revisit = qs_other_revisit.where(filter_district)
+        qs_other_revisit = qs_other_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_other_revisit = qs_other_revisit.when(*periods)
+        qs_other_revisit = qs_other_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_other_revisit = qs_other_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_other_revisit = list(val_other_revisit)
+
+        gen_raster = pivot(period_rows, de_other_revisit_meta, val_other_revisit, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_other_revisit2 = list(gen_raster)
+
+        qs_hiv_new = DataValue.objects.what(*hiv_new_de_names)
+        qs_hiv_new = qs_hiv_new.annotate(de_name=Value(hiv_new_short_names[0], output_field=CharField()))
+        qs_hiv_new = qs_hiv_new.filter(category_combo__categories__name='New Users')
+        qs_hiv_new = qs_hiv_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_new = qs_hiv_new.where(filter_district)
+        qs_hiv_new = qs_hiv_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_new = qs_hiv_new.when(*periods)
+        qs_hiv_new = qs_hiv_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_new = qs_hiv_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_new = list(val_hiv_new)
+
+        gen_raster = pivot(period_rows, de_hiv_new_meta, val_hiv_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_new2 = list(gen_raster)
+
+        qs_hiv_revisit = DataValue.objects.what(*hiv_revisit_de_names)
+        qs_hiv_revisit = qs_hiv_revisit.annotate(de_name=Value(hiv_revisit_short_names[0], output_field=CharField()))
+        qs_hiv_revisit = qs_hiv_revisit.filter(category_combo__categories__name='Revisits')
+        qs_hiv_revisit = qs_hiv_revisit.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_revisit = qs_hiv_revisit.where(filter_district)
+        qs_hiv_revisit = qs_hiv_revisit.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_revisit = qs_hiv_revisit.when(*periods)
+        qs_hiv_revisit = qs_hiv_revisit.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_revisit = qs_hiv_revisit.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_revisit = list(val_hiv_revisit)
+
+        gen_raster = pivot(period_rows, de_hiv_revisit_meta, val_hiv_revisit, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_revisit2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_condoms_new2, val_fp_new2, val_oral_new2, val_other_new2, val_sterile_new2, val_condoms_revisit2, val_fp_revisit2, val_oral_revisit2, val_other_revisit2, val_hiv_new2, val_hiv_revisit2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (condom_new, inject_new, iud_new, natural_new, implant_new, oral_new, other_new, sterile_new, condom_revisit, inject_revisit, iud_revisit, natural_revisit, implant_revisit, oral_revisit, other_revisit, hiv_new, hiv_revisit, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        total_new_sum = default_zero(condom_new['numeric_sum']) + default_zero(inject_new['numeric_sum']) + default_zero(iud_new['numeric_sum']) + default_zero(natural_new['numeric_sum']) + default_zero(implant_new['numeric_sum']) + default_zero(oral_new['numeric_sum']) + default_zero(other_new['numeric_sum']) + default_zero(sterile_new['numeric_sum'])
-        total_new_val = {
-            'de_name': 'New Users - TOTAL',
-            'cat_combo': None,
-            'numeric_sum': total_new_sum,
-        }
-        total_new_val.update(_group_ou_dict)
-        calculated_vals.append(total_new_val)
-
-        total_revisit_sum = default_zero(condom_revisit['numeric_sum']) + default_zero(inject_revisit['numeric_sum']) + default_zero(iud_revisit['numeric_sum']) + default_zero(natural_revisit['numeric_sum']) + default_zero(implant_revisit['numeric_sum']) + default_zero(oral_revisit['numeric_sum']) + default_zero(other_revisit['numeric_sum'])
-        total_revisit_val = {
-            'de_name': 'Revisits - TOTAL',
-            'cat_combo': None,
-            'numeric_sum': total_revisit_sum,
-        }
-        total_revisit_val.update(_group_ou_dict)
-        calculated_vals.append(total_revisit_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    fp_matrix = cached_result('fp_scorecard', (periods, filter_district and filter_district.name), fp_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        fp_matrix = fp_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        fp_matrix = fp_matrix.rollup(ou_list)
+    fp_matrix.calculate(fp_calculations)
 
     data_element_metas += list(product(['New Users - TOTAL'], (None,)))
     data_element_metas += list(product(['Revisits - TOTAL'], (None,)))
@@ -2678,42 +2000,19 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
     # fp_ls.add_interval('green', 60, None)
     # legend_sets.append(fp_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(fp_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        fp_matrix = fp_matrix.take(table.matrix_rows(fp_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = fp_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="family_planning_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('family_planning_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('family_planning_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -2721,51 +2020,55 @@ def fp_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/fp_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     oral_de_names = (
@@ -2779,20 +2082,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_oral_meta = list(product(oral_short_names, (None,)))
     data_element_metas += de_oral_meta
 
-    qs_oral = DataValue.objects.what(*oral_de_names)
-    qs_oral = qs_oral.annotate(de_name=Value(oral_short_names[0], output_field=CharField()))
-    qs_oral = qs_oral.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_oral = qs_oral.where(filter_district)
-    qs_oral = qs_oral.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_oral = qs_oral.when(filter_period)
-    qs_oral = qs_oral.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_oral = qs_oral.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_oral = list(val_oral)
-
-    gen_raster = grabbag.rasterize(ou_list, de_oral_meta, val_oral, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_oral2 = list(gen_raster)
-
     condoms_de_names = (
         '105-2.5 Female Condom',
         '105-2.5 Male Condom',
@@ -2803,20 +2092,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_condoms_meta = list(product(condoms_short_names, (None,)))
     data_element_metas += de_condoms_meta
 
-    qs_condoms = DataValue.objects.what(*condoms_de_names)
-    qs_condoms = qs_condoms.annotate(de_name=Value(condoms_short_names[0], output_field=CharField()))
-    qs_condoms = qs_condoms.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_condoms = qs_condoms.where(filter_district)
-    qs_condoms = qs_condoms.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_condoms = qs_condoms.when(filter_period)
-    qs_condoms = qs_condoms.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_condoms = qs_condoms.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_condoms = list(val_condoms)
-
-    gen_raster = grabbag.rasterize(ou_list, de_condoms_meta, val_condoms, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_condoms2 = list(gen_raster)
-
     implants_new_de_names = (
         '105-2.7 Implant',
     )
@@ -2826,21 +2101,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_implants_new_meta = list(product(implants_new_short_names, (None,)))
     data_element_metas += de_implants_new_meta
 
-    qs_implants_new = DataValue.objects.what(*implants_new_de_names)
-    qs_implants_new = qs_implants_new.annotate(de_name=Value(implants_new_short_names[0], output_field=CharField()))
-    qs_implants_new = qs_implants_new.filter(category_combo__categories__name='New Users')
-    qs_implants_new = qs_implants_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_implants_new = qs_implants_new.where(filter_district)
-    qs_implants_new = qs_implants_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_implants_new = qs_implants_new.when(filter_period)
-    qs_implants_new = qs_implants_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_implants_new = qs_implants_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_implants_new = list(val_implants_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_implants_new_meta, val_implants_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_implants_new2 = list(gen_raster)
-
     injectable_de_names = (
         '105-2.5 Injectable',
     )
@@ -2850,20 +2110,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_injectable_meta = list(product(injectable_short_names, (None,)))
     data_element_metas += de_injectable_meta
 
-    qs_injectable = DataValue.objects.what(*injectable_de_names)
-    qs_injectable = qs_injectable.annotate(de_name=Value(injectable_short_names[0], output_field=CharField()))
-    qs_injectable = qs_injectable.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_injectable = qs_injectable.where(filter_district)
-    qs_injectable = qs_injectable.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_injectable = qs_injectable.when(filter_period)
-    qs_injectable = qs_injectable.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_injectable = qs_injectable.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_injectable = list(val_injectable)
-
-    gen_raster = grabbag.rasterize(ou_list, de_injectable_meta, val_injectable, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_injectable2 = list(gen_raster)
-
     iud_de_names = (
         '105-2.5 IUDs',
     )
@@ -2873,20 +2119,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_iud_meta = list(product(iud_short_names, (None,)))
     data_element_metas += de_iud_meta
 
-    qs_iud = DataValue.objects.what(*iud_de_names)
-    qs_iud = qs_iud.annotate(de_name=Value(iud_short_names[0], output_field=CharField()))
-    qs_iud = qs_iud.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_iud = qs_iud.where(filter_district)
-    qs_iud = qs_iud.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_iud = qs_iud.when(filter_period)
-    qs_iud = qs_iud.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_iud = qs_iud.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_iud = list(val_iud)
-
-    gen_raster = grabbag.rasterize(ou_list, de_iud_meta, val_iud, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_iud2 = list(gen_raster)
-
     sterile_new_de_names = (
         '105-2.7 Female Sterilisation (TubeLigation)',
         '105-2.7 Male Sterilisation (Vasectomy)',
@@ -2897,20 +2129,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_sterile_new_meta = list(product(sterile_new_short_names, (None,)))
     data_element_metas += de_sterile_new_meta
 
-    qs_sterile_new = DataValue.objects.what(*sterile_new_de_names)
-    qs_sterile_new = qs_sterile_new.annotate(de_name=Value(sterile_new_short_names[0], output_field=CharField()))
-    qs_sterile_new = qs_sterile_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_sterile_new = qs_sterile_new.where(filter_district)
-    qs_sterile_new = qs_sterile_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_sterile_new = qs_sterile_new.when(filter_period)
-    qs_sterile_new = qs_sterile_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_sterile_new = qs_sterile_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_sterile_new = list(val_sterile_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_sterile_new_meta, val_sterile_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_sterile_new2 = list(gen_raster)
-
     natural_de_names = (
         '105-2.5 Natural',
     )
@@ -2920,20 +2138,6 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_natural_meta = list(product(natural_short_names, (None,)))
     data_element_metas += de_natural_meta
 
-    qs_natural = DataValue.objects.what(*natural_de_names)
-    qs_natural = qs_natural.annotate(de_name=Value(natural_short_names[0], output_field=CharField()))
-    qs_natural = qs_natural.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_natural = qs_natural.where(filter_district)
-    qs_natural = qs_natural.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_natural = qs_natural.when(filter_period)
-    qs_natural = qs_natural.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_natural = qs_natural.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_natural = list(val_natural)
-
-    gen_raster = grabbag.rasterize(ou_list, de_natural_meta, val_natural, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_natural2 = list(gen_raster)
-
     emergency_de_names = (
         '105-2.6 Emergency contraceptives  No. Dispensed by CBD',
         '105-2.6 Emergency contraceptives  No. Dispensed at Unit',
@@ -2945,138 +2149,153 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_emergency_meta = list(product(emergency_short_names, (None,)))
     data_element_metas += de_emergency_meta
 
-    qs_emergency = DataValue.objects.what(*emergency_de_names)
-    qs_emergency = qs_emergency.annotate(de_name=Value(emergency_short_names[0], output_field=CharField()))
-    qs_emergency = qs_emergency.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_emergency = qs_emergency.where(filter_district)
-    qs_emergency = qs_emergency.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_emergency = qs_emergency.when(filter_period)
-    qs_emergency = qs_emergency.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_emergency = qs_emergency.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_emergency = list(val_emergency)
-
-    gen_raster = grabbag.rasterize(ou_list, de_emergency_meta, val_emergency, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_emergency2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_oral2, val_condoms2, val_implants_new2, val_injectable2, val_iud2, val_sterile_new2, val_natural2, val_emergency2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (oral, condoms, implants_new, injectable, iud, sterile_new, natural, emergency, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(oral['numeric_sum']):
-            cyp_oral = oral['numeric_sum'] / 15
-        else:
-            cyp_oral = None
-        cyp_oral_val = {
-            'de_name': 'CYPs Oral',
-            'cat_combo': None,
-            'numeric_sum': cyp_oral,
-        }
-        cyp_oral_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_oral_val)
-
-        if all_not_none(condoms['numeric_sum']):
-            cyp_condoms = condoms['numeric_sum'] / 120
-        else:
-            cyp_condoms = None
-        cyp_condoms_val = {
-            'de_name': 'CYPs Condoms',
-            'cat_combo': None,
-            'numeric_sum': cyp_condoms,
-        }
-        cyp_condoms_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_condoms_val)
-
-        if all_not_none(implants_new['numeric_sum']):
-            cyp_implants = implants_new['numeric_sum'] * Decimal(2.5)
-        else:
-            cyp_implants = None
-        cyp_implants_val = {
-            'de_name': 'CYPs Implants',
-            'cat_combo': None,
-            'numeric_sum': cyp_implants,
-        }
-        cyp_implants_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_implants_val)
-
-        if all_not_none(injectable['numeric_sum']):
-            cyp_injectable = injectable['numeric_sum'] / 4
-        else:
-            cyp_injectable = None
-        cyp_injectable_val = {
-            'de_name': 'CYPs Injectable',
-            'cat_combo': None,
-            'numeric_sum': cyp_injectable,
-        }
-        cyp_injectable_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_injectable_val)
-
-        if all_not_none(iud['numeric_sum']):
-            cyp_iud = iud['numeric_sum'] * Decimal(4.6)
-        else:
-            cyp_iud = None
-        cyp_iud_val = {
-            'de_name': 'CYPs IUD',
-            'cat_combo': None,
-            'numeric_sum': cyp_iud,
-        }
-        cyp_iud_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_iud_val)
-
-        if all_not_none(sterile_new['numeric_sum']):
-            cyp_sterile = sterile_new['numeric_sum'] * Decimal(10)
-        else:
-            cyp_sterile = None
-        cyp_sterile_val = {
-            'de_name': 'CYPs sterile',
-            'cat_combo': None,
-            'numeric_sum': cyp_sterile,
-        }
-        cyp_sterile_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_sterile_val)
-
-        if all_not_none(natural['numeric_sum']):
-            cyp_natural = natural['numeric_sum'] / 4
-        else:
-            cyp_natural = None
-        cyp_natural_val = {
-            'de_name': 'CYPs Natural Methods',
-            'cat_combo': None,
-            'numeric_sum': cyp_natural,
-        }
-        cyp_natural_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_natural_val)
+    def cyp_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_oral = DataValue.objects.what(*oral_de_names)
+        qs_oral = qs_oral.annotate(de_name=Value(oral_short_names[0], output_field=CharField()))
+        qs_oral = qs_oral.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_oral = qs_oral.where(filter_district)
+        qs_oral = qs_oral.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_oral = qs_oral.when(*periods)
+        qs_oral = qs_oral.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_oral = qs_oral.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_oral = list(val_oral)
+
+        gen_raster = pivot(period_rows, de_oral_meta, val_oral, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_oral2 = list(gen_raster)
+
+        qs_condoms = DataValue.objects.what(*condoms_de_names)
+        qs_condoms = qs_condoms.annotate(de_name=Value(condoms_short_names[0], output_field=CharField()))
+        qs_condoms = qs_condoms.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_condoms = qs_condoms.where(filter_district)
+        qs_condoms = qs_condoms.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_condoms = qs_condoms.when(*periods)
+        qs_condoms = qs_condoms.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_condoms = qs_condoms.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_condoms = list(val_condoms)
+
+        gen_raster = pivot(period_rows, de_condoms_meta, val_condoms, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_condoms2 = list(gen_raster)
+
+        qs_implants_new = DataValue.objects.what(*implants_new_de_names)
+        qs_implants_new = qs_implants_new.annotate(de_name=Value(implants_new_short_names[0], output_field=CharField()))
+        qs_implants_new = qs_implants_new.filter(category_combo__categories__name='New Users')
+        qs_implants_new = qs_implants_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_implants_new = qs_implants_new.where(filter_district)
+        qs_implants_new = qs_implants_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_implants_new = qs_implants_new.when(*periods)
+        qs_implants_new = qs_implants_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_implants_new = qs_implants_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_implants_new = list(val_implants_new)
+
+        gen_raster = pivot(period_rows, de_implants_new_meta, val_implants_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_implants_new2 = list(gen_raster)
+
+        qs_injectable = DataValue.objects.what(*injectable_de_names)
+        qs_injectable = qs_injectable.annotate(de_name=Value(injectable_short_names[0], output_field=CharField()))
+        qs_injectable = qs_injectable.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_injectable = qs_injectable.where(filter_district)
+        qs_injectable = qs_injectable.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_injectable = qs_injectable.when(*periods)
+        qs_injectable = qs_injectable.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_injectable = qs_injectable.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_injectable = list(val_injectable)
+
+        gen_raster = pivot(period_rows, de_injectable_meta, val_injectable, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_injectable2 = list(gen_raster)
+
+        qs_iud = DataValue.objects.what(*iud_de_names)
+        qs_iud = qs_iud.annotate(de_name=Value(iud_short_names[0], output_field=CharField()))
+        qs_iud = qs_iud.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_iud = qs_iud.where(filter_district)
+        qs_iud = qs_iud.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_iud = qs_iud.when(*periods)
+        qs_iud = qs_iud.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_iud = qs_iud.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_iud = list(val_iud)
+
+        gen_raster = pivot(period_rows, de_iud_meta, val_iud, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_iud2 = list(gen_raster)
+
+        qs_sterile_new = DataValue.objects.what(*sterile_new_de_names)
+        qs_sterile_new = qs_sterile_new.annotate(de_name=Value(sterile_new_short_names[0], output_field=CharField()))
+        qs_sterile_new = qs_sterile_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_sterile_new = qs_sterile_new.where(filter_district)
+        qs_sterile_new = qs_sterile_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_sterile_new = qs_sterile_new.when(*periods)
+        qs_sterile_new = qs_sterile_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_sterile_new = qs_sterile_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_sterile_new = list(val_sterile_new)
+
+        gen_raster = pivot(period_rows, de_sterile_new_meta, val_sterile_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_sterile_new2 = list(gen_raster)
+
+        qs_natural = DataValue.objects.what(*natural_de_names)
+        qs_natural = qs_natural.annotate(de_name=Value(natural_short_names[0], output_field=CharField()))
+        qs_natural = qs_natural.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_natural = qs_natural.where(filter_district)
+        qs_natural = qs_natural.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_natural = qs_natural.when(*periods)
+        qs_natural = qs_natural.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_natural = qs_natural.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_natural = list(val_natural)
+
+        gen_raster = pivot(period_rows, de_natural_meta, val_natural, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_natural2 = list(gen_raster)
+
+        qs_emergency = DataValue.objects.what(*emergency_de_names)
+        qs_emergency = qs_emergency.annotate(de_name=Value(emergency_short_names[0], output_field=CharField()))
+        qs_emergency = qs_emergency.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_emergency = qs_emergency.where(filter_district)
+        qs_emergency = qs_emergency.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_emergency = qs_emergency.when(*periods)
+        qs_emergency = qs_emergency.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_emergency = qs_emergency.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_emergency = list(val_emergency)
+
+        gen_raster = pivot(period_rows, de_emergency_meta, val_emergency, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_emergency2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_oral2, val_condoms2, val_implants_new2, val_injectable2, val_iud2, val_sterile_new2, val_natural2, val_emergency2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(emergency['numeric_sum']):
-            cyp_emergency = emergency['numeric_sum'] / 20
-        else:
-            cyp_emergency = None
-        cyp_emergency_val = {
-            'de_name': 'CYPs Emergency Contraceptives',
-            'cat_combo': None,
-            'numeric_sum': cyp_emergency,
-        }
-        cyp_emergency_val.update(_group_ou_dict)
-        calculated_vals.append(cyp_emergency_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    cyp_matrix = cached_result('fp_cyp_scorecard', (periods, filter_district and filter_district.name), cyp_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        cyp_matrix = cyp_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        cyp_matrix = cyp_matrix.rollup(ou_list)
+    cyp_matrix.calculate(cyp_calculations)
 
-    data_element_metas += list(product(['CYPs Oral'], (None,)))
-    data_element_metas += list(product(['CYPs Condoms'], (None,)))
-    data_element_metas += list(product(['CYPs Implants'], (None,)))
-    data_element_metas += list(product(['CYPs Injectable'], (None,)))
-    data_element_metas += list(product(['CYPs IUD'], (None,)))
-    data_element_metas += list(product(['CYP Sterilisation'], (None,)))
-    data_element_metas += list(product(['CYPs Natural Methods'], (None,)))
-    data_element_metas += list(product(['CYPs Emergency contraceptives'], (None,)))
+    data_element_metas += [(cyp_name, None) for _, cyp_name, _ in CYP_FACTORS]
 
     legend_sets = list()
     # fp_cyp_ls = LegendSet()
@@ -3087,42 +2306,19 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
     # fp_cyp_ls.add_interval('green', 60, None)
     # legend_sets.append(fp_cyp_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(cyp_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        cyp_matrix = cyp_matrix.take(table.matrix_rows(cyp_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = cyp_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="fp_cyp_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('fp_cyp_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('fp_cyp_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -3130,20 +2326,29 @@ def fp_cyp_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/fp_cyp_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
 def fp_cyp_by_district(request, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
@@ -3153,16 +2358,12 @@ def fp_cyp_by_district(request, output_format='HTML'):
     period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all districts (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=1).annotate(district=F('name'))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by('district')
-    ou_list = list(qs_ou.values_list('district'))
+    ou_list = dims.ou_paths(1, filter_district)
     ou_headers = ['District',]
 
     def val_with_subcat_fun(row, col):
@@ -3195,7 +2396,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_oral = qs_oral.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_oral = list(val_oral)
 
-    gen_raster = grabbag.rasterize(ou_list, de_oral_meta, val_oral, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_oral_meta, val_oral, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_oral2 = list(gen_raster)
 
     condoms_de_names = (
@@ -3219,7 +2420,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_condoms = qs_condoms.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_condoms = list(val_condoms)
 
-    gen_raster = grabbag.rasterize(ou_list, de_condoms_meta, val_condoms, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_condoms_meta, val_condoms, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_condoms2 = list(gen_raster)
 
     implants_new_de_names = (
@@ -3243,7 +2444,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_implants_new = qs_implants_new.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_implants_new = list(val_implants_new)
 
-    gen_raster = grabbag.rasterize(ou_list, de_implants_new_meta, val_implants_new, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_implants_new_meta, val_implants_new, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_implants_new2 = list(gen_raster)
 
     injectable_de_names = (
@@ -3266,7 +2467,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_injectable = qs_injectable.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_injectable = list(val_injectable)
 
-    gen_raster = grabbag.rasterize(ou_list, de_injectable_meta, val_injectable, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_injectable_meta, val_injectable, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_injectable2 = list(gen_raster)
 
     iud_de_names = (
@@ -3289,7 +2490,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_iud = qs_iud.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_iud = list(val_iud)
 
-    gen_raster = grabbag.rasterize(ou_list, de_iud_meta, val_iud, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_iud_meta, val_iud, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_iud2 = list(gen_raster)
 
     sterile_new_de_names = (
@@ -3313,7 +2514,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_sterile_new = qs_sterile_new.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_sterile_new = list(val_sterile_new)
 
-    gen_raster = grabbag.rasterize(ou_list, de_sterile_new_meta, val_sterile_new, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_sterile_new_meta, val_sterile_new, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_sterile_new2 = list(gen_raster)
 
     natural_de_names = (
@@ -3336,7 +2537,7 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_natural = qs_natural.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_natural = list(val_natural)
 
-    gen_raster = grabbag.rasterize(ou_list, de_natural_meta, val_natural, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_natural_meta, val_natural, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_natural2 = list(gen_raster)
 
     emergency_de_names = (
@@ -3361,136 +2562,30 @@ def fp_cyp_by_district(request, output_format='HTML'):
     val_emergency = qs_emergency.values('district', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
     val_emergency = list(val_emergency)
 
-    gen_raster = grabbag.rasterize(ou_list, de_emergency_meta, val_emergency, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
+    gen_raster = pivot(ou_list, de_emergency_meta, val_emergency, get_ou_path, lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
     val_emergency2 = list(gen_raster)
 
     # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_oral2, val_condoms2, val_implants_new2, val_injectable2, val_iud2, val_sterile_new2, val_natural2, val_emergency2), key=lambda x: (x['district'],)), key=lambda x: (x['district'],))
+    grouped_vals = pivot_rows(ou_list, val_oral2, val_condoms2, val_implants_new2, val_injectable2, val_iud2, val_sterile_new2, val_natural2, val_emergency2)
     if True:
         grouped_vals = list(filter_empty_rows(grouped_vals))
 
     # perform calculations
-    for _group in grouped_vals:
-        (ou_path, (oral, condoms, implants_new, injectable, iud, sterile_new, natural, emergency, *other_vals)) = _group
-        
-        calculated_vals = list()
+    cyp_matrix = ScorecardMatrix.from_grouped(grouped_vals, de_oral_meta + de_condoms_meta + de_implants_new_meta + de_injectable_meta + de_iud_meta + de_sterile_new_meta + de_natural_meta + de_emergency_meta)
+    cyp_matrix.calculate(cyp_calculations)
 
-        if all_not_none(oral['numeric_sum']):
-            cyp_oral = oral['numeric_sum'] / 15
-        else:
-            cyp_oral = None
-        cyp_oral_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Oral',
-            'cat_combo': None,
-            'numeric_sum': cyp_oral,
-        }
-        calculated_vals.append(cyp_oral_val)
+    data_element_names = list()
+    data_element_names += list(product(oral_short_names, (None,)))
+    data_element_names += list(product(condoms_short_names, (None,)))
+    data_element_names += list(product(implants_new_short_names, (None,)))
+    data_element_names += list(product(injectable_short_names, (None,)))
+    data_element_names += list(product(iud_short_names, (None,)))
+    data_element_names += list(product(sterile_new_short_names, (None,)))
+    data_element_names += list(product(natural_short_names, (None,)))
+    data_element_names += list(product(emergency_short_names, (None,)))
 
-        if all_not_none(condoms['numeric_sum']):
-            cyp_condoms = condoms['numeric_sum'] / 120
-        else:
-            cyp_condoms = None
-        cyp_condoms_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Condoms',
-            'cat_combo': None,
-            'numeric_sum': cyp_condoms,
-        }
-        calculated_vals.append(cyp_condoms_val)
-
-        if all_not_none(implants_new['numeric_sum']):
-            cyp_implants = implants_new['numeric_sum'] * Decimal(2.5)
-        else:
-            cyp_implants = None
-        cyp_implants_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Implants',
-            'cat_combo': None,
-            'numeric_sum': cyp_implants,
-        }
-        calculated_vals.append(cyp_implants_val)
-
-        if all_not_none(injectable['numeric_sum']):
-            cyp_injectable = injectable['numeric_sum'] / 4
-        else:
-            cyp_injectable = None
-        cyp_injectable_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Injectable',
-            'cat_combo': None,
-            'numeric_sum': cyp_injectable,
-        }
-        calculated_vals.append(cyp_injectable_val)
-
-        if all_not_none(iud['numeric_sum']):
-            cyp_iud = iud['numeric_sum'] * Decimal(4.6)
-        else:
-            cyp_iud = None
-        cyp_iud_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs IUD',
-            'cat_combo': None,
-            'numeric_sum': cyp_iud,
-        }
-        calculated_vals.append(cyp_iud_val)
-
-        if all_not_none(sterile_new['numeric_sum']):
-            cyp_sterile = sterile_new['numeric_sum'] * Decimal(10)
-        else:
-            cyp_sterile = None
-        cyp_sterile_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs sterile',
-            'cat_combo': None,
-            'numeric_sum': cyp_sterile,
-        }
-        calculated_vals.append(cyp_sterile_val)
-
-        if all_not_none(natural['numeric_sum']):
-            cyp_natural = natural['numeric_sum'] / 4
-        else:
-            cyp_natural = None
-        cyp_natural_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Natural Methods',
-            'cat_combo': None,
-            'numeric_sum': cyp_natural,
-        }
-        calculated_vals.append(cyp_natural_val)
-
-        if all_not_none(emergency['numeric_sum']):
-            cyp_emergency = emergency['numeric_sum'] / 20
-        else:
-            cyp_emergency = None
-        cyp_emergency_val = {
-            'district': ou_path[0],
-            'de_name': 'CYPs Emergency Contraceptives',
-            'cat_combo': None,
-            'numeric_sum': cyp_emergency,
-        }
-        calculated_vals.append(cyp_emergency_val)
-
-        _group[1].extend(calculated_vals)
-
-    data_element_names = list()
-    data_element_names += list(product(oral_short_names, (None,)))
-    data_element_names += list(product(condoms_short_names, (None,)))
-    data_element_names += list(product(implants_new_short_names, (None,)))
-    data_element_names += list(product(injectable_short_names, (None,)))
-    data_element_names += list(product(iud_short_names, (None,)))
-    data_element_names += list(product(sterile_new_short_names, (None,)))
-    data_element_names += list(product(natural_short_names, (None,)))
-    data_element_names += list(product(emergency_short_names, (None,)))
-
-    data_element_names += list(product(['CYPs Oral'], (None,)))
-    data_element_names += list(product(['CYPs Condoms'], (None,)))
-    data_element_names += list(product(['CYPs Implants'], (None,)))
-    data_element_names += list(product(['CYPs Injectable'], (None,)))
-    data_element_names += list(product(['CYPs IUD'], (None,)))
-    data_element_names += list(product(['CYP Sterilisation'], (None,)))
-    data_element_names += list(product(['CYPs Natural Methods'], (None,)))
-    data_element_names += list(product(['CYPs Emergency contraceptives'], (None,)))
+    data_element_names += [(cyp_name, None) for _, cyp_name, _ in CYP_FACTORS]
+    grouped_vals = cyp_matrix.to_grid(('district',), data_element_names)
 
     legend_sets = list()
     # fp_cyp_ls = LegendSet()
@@ -3502,41 +2597,9 @@ def fp_cyp_by_district(request, output_format='HTML'):
     # legend_sets.append(fp_cyp_ls)
 
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_names)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="fp_cyp_districts_scorecard.xlsx"'
-
-        return response
+        return scorecard_excel_response('fp_cyp_districts_scorecard.xlsx', ou_headers, data_element_names, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('fp_cyp_districts_scorecard.csv', ou_headers, data_element_names, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -3546,47 +2609,45 @@ def fp_cyp_by_district(request, output_format='HTML'):
         'period_desc': period_desc,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
-        'excel_url': make_excel_url(request.path)
+        'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
     }
 
     return render(request, 'cannula/fp_cyp_districts.html', context)
 
 @login_required
+@cache_scorecard
 def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     targets_de_names = (
@@ -3598,21 +2659,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_meta = list(product(targets_short_names, (None,)))
     data_element_metas += de_targets_meta
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(de_name=Value(targets_short_names[0], output_field=CharField()))
-    qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_targets = qs_targets.when(filter_period)
-
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     notif_new_de_names = (
         '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC) [Cases] New',
         '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC) [Cases] Relapse',
@@ -3627,21 +2673,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_notif_new_meta = list(product(notif_new_short_names, (None,)))
     data_element_metas += de_notif_new_meta
 
-    qs_notif_new = DataValue.objects.what(*notif_new_de_names)
-    qs_notif_new = qs_notif_new.annotate(de_name=Value(notif_new_short_names[0], output_field=CharField()))
-    qs_notif_new = qs_notif_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_notif_new = qs_notif_new.where(filter_district)
-    qs_notif_new = qs_notif_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_notif_new = qs_notif_new.when(filter_period)
-
-    qs_notif_new = qs_notif_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_notif_new = qs_notif_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_notif_new = list(val_notif_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_notif_new_meta, val_notif_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_notif_new2 = list(gen_raster)
-
     notif_all_de_names = (
         '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC) [Cases] New',
         '106a 3.1.a.1 Bacteriologically confirmed, PTB (P-BC) [Cases] Relapse',
@@ -3665,21 +2696,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_notif_all_meta = list(product(notif_all_short_names, (None,)))
     data_element_metas += de_notif_all_meta
 
-    qs_notif_all = DataValue.objects.what(*notif_all_de_names)
-    qs_notif_all = qs_notif_all.annotate(de_name=Value(notif_all_short_names[0], output_field=CharField()))
-    qs_notif_all = qs_notif_all.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_notif_all = qs_notif_all.where(filter_district)
-    qs_notif_all = qs_notif_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_notif_all = qs_notif_all.when(filter_period)
-
-    qs_notif_all = qs_notif_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_notif_all = qs_notif_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_notif_all = list(val_notif_all)
-
-    gen_raster = grabbag.rasterize(ou_list, de_notif_all_meta, val_notif_all, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_notif_all2 = list(gen_raster)
-
     hiv_tested_de_names = (
         '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC) Tested for HIV',
         '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD) Tested for HIV',
@@ -3692,21 +2708,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_tested_meta = list(product(hiv_tested_short_names, (None,)))
     data_element_metas += de_hiv_tested_meta
 
-    qs_hiv_tested = DataValue.objects.what(*hiv_tested_de_names)
-    qs_hiv_tested = qs_hiv_tested.annotate(de_name=Value(hiv_tested_short_names[0], output_field=CharField()))
-    qs_hiv_tested = qs_hiv_tested.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_tested = qs_hiv_tested.where(filter_district)
-    qs_hiv_tested = qs_hiv_tested.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_tested = qs_hiv_tested.when(filter_period)
-
-    qs_hiv_tested = qs_hiv_tested.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_tested = qs_hiv_tested.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_tested = list(val_hiv_tested)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_tested_meta, val_hiv_tested, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_tested2 = list(gen_raster)
-
     hiv_pos_de_names = (
         '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC) HIV Positive',
         '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD) HIV Positive',
@@ -3719,21 +2720,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_pos_meta = list(product(hiv_pos_short_names, (None,)))
     data_element_metas += de_hiv_pos_meta
 
-    qs_hiv_pos = DataValue.objects.what(*hiv_pos_de_names)
-    qs_hiv_pos = qs_hiv_pos.annotate(de_name=Value(hiv_pos_short_names[0], output_field=CharField()))
-    qs_hiv_pos = qs_hiv_pos.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_pos = qs_hiv_pos.where(filter_district)
-    qs_hiv_pos = qs_hiv_pos.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_pos = qs_hiv_pos.when(filter_period)
-
-    qs_hiv_pos = qs_hiv_pos.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_pos = qs_hiv_pos.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_pos = list(val_hiv_pos)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_pos_meta, val_hiv_pos, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_pos2 = list(gen_raster)
-
     hiv_art_de_names = (
         '106a 3.1.c.1 New HIV/TB Patients Registered, PTB (P-BC) On ART',
         '106a 3.1.c.2 New HIV/TB Patients Registered, Clinically diagnosed PTB (P-CD) On ART',
@@ -3746,21 +2732,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_hiv_art_meta = list(product(hiv_art_short_names, (None,)))
     data_element_metas += de_hiv_art_meta
 
-    qs_hiv_art = DataValue.objects.what(*hiv_art_de_names)
-    qs_hiv_art = qs_hiv_art.annotate(de_name=Value(hiv_art_short_names[0], output_field=CharField()))
-    qs_hiv_art = qs_hiv_art.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_hiv_art = qs_hiv_art.where(filter_district)
-    qs_hiv_art = qs_hiv_art.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_hiv_art = qs_hiv_art.when(filter_period)
-
-    qs_hiv_art = qs_hiv_art.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_hiv_art = qs_hiv_art.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_hiv_art = list(val_hiv_art)
-
-    gen_raster = grabbag.rasterize(ou_list, de_hiv_art_meta, val_hiv_art, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_hiv_art2 = list(gen_raster)
-
     registered_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC)',
     )
@@ -3770,21 +2741,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_registered_meta = list(product(registered_short_names, (None,)))
     data_element_metas += de_registered_meta
 
-    qs_registered = DataValue.objects.what(*registered_de_names)
-    qs_registered = qs_registered.annotate(de_name=Value(registered_short_names[0], output_field=CharField()))
-    qs_registered = qs_registered.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_registered = qs_registered.where(filter_district)
-    qs_registered = qs_registered.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_registered = qs_registered.when(filter_period)
-
-    qs_registered = qs_registered.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_registered = qs_registered.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_registered = list(val_registered)
-
-    gen_raster = grabbag.rasterize(ou_list, de_registered_meta, val_registered, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_registered2 = list(gen_raster)
-
     evaluated_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Cured',
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Trt Completed',
@@ -3798,21 +2754,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_evaluated_meta = list(product(evaluated_short_names, (None,)))
     data_element_metas += de_evaluated_meta
 
-    qs_evaluated = DataValue.objects.what(*evaluated_de_names)
-    qs_evaluated = qs_evaluated.annotate(de_name=Value(evaluated_short_names[0], output_field=CharField()))
-    qs_evaluated = qs_evaluated.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_evaluated = qs_evaluated.where(filter_district)
-    qs_evaluated = qs_evaluated.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_evaluated = qs_evaluated.when(filter_period)
-
-    qs_evaluated = qs_evaluated.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_evaluated = qs_evaluated.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_evaluated = list(val_evaluated)
-
-    gen_raster = grabbag.rasterize(ou_list, de_evaluated_meta, val_evaluated, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_evaluated2 = list(gen_raster)
-
     cured_completed_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Cured',
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Trt Completed',
@@ -3823,21 +2764,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_cured_completed_meta = list(product(cured_completed_short_names, (None,)))
     data_element_metas += de_cured_completed_meta
 
-    qs_cured_completed = DataValue.objects.what(*cured_completed_de_names)
-    qs_cured_completed = qs_cured_completed.annotate(de_name=Value(cured_completed_short_names[0], output_field=CharField()))
-    qs_cured_completed = qs_cured_completed.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_cured_completed = qs_cured_completed.where(filter_district)
-    qs_cured_completed = qs_cured_completed.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_cured_completed = qs_cured_completed.when(filter_period)
-
-    qs_cured_completed = qs_cured_completed.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_cured_completed = qs_cured_completed.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_cured_completed = list(val_cured_completed)
-
-    gen_raster = grabbag.rasterize(ou_list, de_cured_completed_meta, val_cured_completed, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_cured_completed2 = list(gen_raster)
-
     cured_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Cured',
     )
@@ -3847,21 +2773,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_cured_meta = list(product(cured_short_names, (None,)))
     data_element_metas += de_cured_meta
 
-    qs_cured = DataValue.objects.what(*cured_de_names)
-    qs_cured = qs_cured.annotate(de_name=Value(cured_short_names[0], output_field=CharField()))
-    qs_cured = qs_cured.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_cured = qs_cured.where(filter_district)
-    qs_cured = qs_cured.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_cured = qs_cured.when(filter_period)
-
-    qs_cured = qs_cured.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_cured = qs_cured.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_cured = list(val_cured)
-
-    gen_raster = grabbag.rasterize(ou_list, de_cured_meta, val_cured, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_cured2 = list(gen_raster)
-
     ltfu_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Lost to Followup',
     )
@@ -3871,21 +2782,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_ltfu_meta = list(product(ltfu_short_names, (None,)))
     data_element_metas += de_ltfu_meta
 
-    qs_ltfu = DataValue.objects.what(*ltfu_de_names)
-    qs_ltfu = qs_ltfu.annotate(de_name=Value(ltfu_short_names[0], output_field=CharField()))
-    qs_ltfu = qs_ltfu.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_ltfu = qs_ltfu.where(filter_district)
-    qs_ltfu = qs_ltfu.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_ltfu = qs_ltfu.when(filter_period)
-
-    qs_ltfu = qs_ltfu.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_ltfu = qs_ltfu.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_ltfu = list(val_ltfu)
-
-    gen_raster = grabbag.rasterize(ou_list, de_ltfu_meta, val_ltfu, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_ltfu2 = list(gen_raster)
-
     notif_under15_de_names = (
         '106a 3.1.b.1 Bacteriologically confirmed, PTB (P-BC) New and Relapse [Age Groups]',
         '106a 3.1.b.2 Clinically diagnosed PTB (P-CD) [Age Groups]',
@@ -3897,21 +2793,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_notif_under15_meta = list(product(notif_under15_short_names, (None,)))
     data_element_metas += de_notif_under15_meta
 
-    qs_notif_under15 = DataValue.objects.what(*notif_under15_de_names)
-    qs_notif_under15 = qs_notif_under15.annotate(de_name=Value(notif_under15_short_names[0], output_field=CharField()))
-    qs_notif_under15 = qs_notif_under15.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_notif_under15 = qs_notif_under15.where(filter_district)
-    qs_notif_under15 = qs_notif_under15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_notif_under15 = qs_notif_under15.when(filter_period)
-
-    qs_notif_under15 = qs_notif_under15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_notif_under15 = qs_notif_under15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_notif_under15 = list(val_notif_under15)
-
-    gen_raster = grabbag.rasterize(ou_list, de_notif_under15_meta, val_notif_under15, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_notif_under152 = list(gen_raster)
-
     failed_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Failure',
     )
@@ -3921,21 +2802,6 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_failed_meta = list(product(failed_short_names, (None,)))
     data_element_metas += de_failed_meta
 
-    qs_failed = DataValue.objects.what(*failed_de_names)
-    qs_failed = qs_failed.annotate(de_name=Value(failed_short_names[0], output_field=CharField()))
-    qs_failed = qs_failed.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_failed = qs_failed.where(filter_district)
-    qs_failed = qs_failed.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_failed = qs_failed.when(filter_period)
-
-    qs_failed = qs_failed.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_failed = qs_failed.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_failed = list(val_failed)
-
-    gen_raster = grabbag.rasterize(ou_list, de_failed_meta, val_failed, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_failed2 = list(gen_raster)
-
     died_de_names = (
         '106a 3.1.h.1 TB Treat. Outcome (All): New Patients Category I (PTB-BC) Died',
     )
@@ -3945,106 +2811,242 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_died_meta = list(product(died_short_names, (None,)))
     data_element_metas += de_died_meta
 
-    qs_died = DataValue.objects.what(*died_de_names)
-    qs_died = qs_died.annotate(de_name=Value(died_short_names[0], output_field=CharField()))
-    qs_died = qs_died.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_died = qs_died.where(filter_district)
-    qs_died = qs_died.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_died = qs_died.when(filter_period)
-
-    qs_died = qs_died.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_died = qs_died.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_died = list(val_died)
-
-    gen_raster = grabbag.rasterize(ou_list, de_died_meta, val_died, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_died2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_targets2, val_notif_new2, val_notif_all2, val_hiv_tested2, val_hiv_pos2, val_hiv_art2, val_registered2, val_evaluated2, val_cured_completed2, val_cured2, val_ltfu2, val_notif_under152, val_failed2, val_died2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (g_ou_path, (target_notif_new, notif_new, notif_all, hiv_tested, hiv_pos, hiv_art, registered, evaluated, cured_completed, cured, ltfu, notif_under15, failed, died, *other_vals)) = _group
-        
-        calculated_vals = list()
-        g_ou_dict = ou_dict_from_path(g_ou_path)
-
-        if all_not_none(cured_completed['numeric_sum'], evaluated['numeric_sum']) and evaluated['numeric_sum']:
-            tsr_percent = 100 * cured_completed['numeric_sum'] / evaluated['numeric_sum']
-        else:
-            tsr_percent = None
-        tsr_percent_val = {
-            'de_name': '% TSR',
-            'cat_combo': None,
-            'numeric_sum': tsr_percent,
-        }
-        tsr_percent_val.update(g_ou_dict)
-        calculated_vals.append(tsr_percent_val)
-
-        if all_not_none(ltfu['numeric_sum'], evaluated['numeric_sum']) and evaluated['numeric_sum']:
-            ltfu_percent = 100 * ltfu['numeric_sum'] / evaluated['numeric_sum']
-        else:
-            ltfu_percent = None
-        ltfu_percent_val = {
-            'de_name': '% LTFU',
-            'cat_combo': None,
-            'numeric_sum': ltfu_percent,
-        }
-        ltfu_percent_val.update(g_ou_dict)
-        calculated_vals.append(ltfu_percent_val)
-
-        if all_not_none(notif_new['numeric_sum'], target_notif_new['numeric_sum']) and target_notif_new['numeric_sum']:
-            notif_new_percent = 100 * notif_new['numeric_sum'] / target_notif_new['numeric_sum']
-        else:
-            notif_new_percent = None
-        notif_new_percent_val = {
-            'de_name': '% of cases notified (NEW & Relapse)',
-            'cat_combo': None,
-            'numeric_sum': notif_new_percent,
-        }
-        notif_new_percent_val.update(g_ou_dict)
-        calculated_vals.append(notif_new_percent_val)
-
-        if all_not_none(hiv_tested['numeric_sum'], notif_all['numeric_sum']) and notif_all['numeric_sum']:
-            hiv_tested_percent = 100 * hiv_tested['numeric_sum'] / notif_all['numeric_sum']
-        else:
-            hiv_tested_percent = None
-        hiv_tested_percent_val = {
-            'de_name': '% Tested for HIV',
-            'cat_combo': None,
-            'numeric_sum': hiv_tested_percent,
-        }
-        hiv_tested_percent_val.update(g_ou_dict)
-        calculated_vals.append(hiv_tested_percent_val)
-
-        if all_not_none(hiv_art['numeric_sum'], hiv_pos['numeric_sum']) and hiv_pos['numeric_sum']:
-            hiv_art_percent = 100 * hiv_art['numeric_sum'] / hiv_pos['numeric_sum']
-        else:
-            hiv_art_percent = None
-        hiv_art_percent_val = {
-            'de_name': '% HIV+ on ART',
-            'cat_combo': None,
-            'numeric_sum': hiv_art_percent,
-        }
-        hiv_art_percent_val.update(g_ou_dict)
-        calculated_vals.append(hiv_art_percent_val)
+    def tb_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(de_name=Value(targets_short_names[0], output_field=CharField()))
+        qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_targets = qs_targets.when(*periods)
+
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(period_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_notif_new = DataValue.objects.what(*notif_new_de_names)
+        qs_notif_new = qs_notif_new.annotate(de_name=Value(notif_new_short_names[0], output_field=CharField()))
+        qs_notif_new = qs_notif_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_notif_new = qs_notif_new.where(filter_district)
+        qs_notif_new = qs_notif_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_notif_new = qs_notif_new.when(*periods)
+
+        qs_notif_new = qs_notif_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_notif_new = qs_notif_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_notif_new = list(val_notif_new)
+
+        gen_raster = pivot(period_rows, de_notif_new_meta, val_notif_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_notif_new2 = list(gen_raster)
+
+        qs_notif_all = DataValue.objects.what(*notif_all_de_names)
+        qs_notif_all = qs_notif_all.annotate(de_name=Value(notif_all_short_names[0], output_field=CharField()))
+        qs_notif_all = qs_notif_all.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_notif_all = qs_notif_all.where(filter_district)
+        qs_notif_all = qs_notif_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_notif_all = qs_notif_all.when(*periods)
+
+        qs_notif_all = qs_notif_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_notif_all = qs_notif_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_notif_all = list(val_notif_all)
+
+        gen_raster = pivot(period_rows, de_notif_all_meta, val_notif_all, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_notif_all2 = list(gen_raster)
+
+        qs_hiv_tested = DataValue.objects.what(*hiv_tested_de_names)
+        qs_hiv_tested = qs_hiv_tested.annotate(de_name=Value(hiv_tested_short_names[0], output_field=CharField()))
+        qs_hiv_tested = qs_hiv_tested.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_tested = qs_hiv_tested.where(filter_district)
+        qs_hiv_tested = qs_hiv_tested.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_tested = qs_hiv_tested.when(*periods)
+
+        qs_hiv_tested = qs_hiv_tested.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_tested = qs_hiv_tested.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_tested = list(val_hiv_tested)
+
+        gen_raster = pivot(period_rows, de_hiv_tested_meta, val_hiv_tested, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_tested2 = list(gen_raster)
+
+        qs_hiv_pos = DataValue.objects.what(*hiv_pos_de_names)
+        qs_hiv_pos = qs_hiv_pos.annotate(de_name=Value(hiv_pos_short_names[0], output_field=CharField()))
+        qs_hiv_pos = qs_hiv_pos.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_pos = qs_hiv_pos.where(filter_district)
+        qs_hiv_pos = qs_hiv_pos.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_pos = qs_hiv_pos.when(*periods)
+
+        qs_hiv_pos = qs_hiv_pos.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_pos = qs_hiv_pos.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_pos = list(val_hiv_pos)
+
+        gen_raster = pivot(period_rows, de_hiv_pos_meta, val_hiv_pos, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_pos2 = list(gen_raster)
+
+        qs_hiv_art = DataValue.objects.what(*hiv_art_de_names)
+        qs_hiv_art = qs_hiv_art.annotate(de_name=Value(hiv_art_short_names[0], output_field=CharField()))
+        qs_hiv_art = qs_hiv_art.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_hiv_art = qs_hiv_art.where(filter_district)
+        qs_hiv_art = qs_hiv_art.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_hiv_art = qs_hiv_art.when(*periods)
+
+        qs_hiv_art = qs_hiv_art.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_hiv_art = qs_hiv_art.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_hiv_art = list(val_hiv_art)
+
+        gen_raster = pivot(period_rows, de_hiv_art_meta, val_hiv_art, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_hiv_art2 = list(gen_raster)
+
+        qs_registered = DataValue.objects.what(*registered_de_names)
+        qs_registered = qs_registered.annotate(de_name=Value(registered_short_names[0], output_field=CharField()))
+        qs_registered = qs_registered.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_registered = qs_registered.where(filter_district)
+        qs_registered = qs_registered.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_registered = qs_registered.when(*periods)
+
+        qs_registered = qs_registered.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_registered = qs_registered.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_registered = list(val_registered)
+
+        gen_raster = pivot(period_rows, de_registered_meta, val_registered, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_registered2 = list(gen_raster)
+
+        qs_evaluated = DataValue.objects.what(*evaluated_de_names)
+        qs_evaluated = qs_evaluated.annotate(de_name=Value(evaluated_short_names[0], output_field=CharField()))
+        qs_evaluated = qs_evaluated.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_evaluated = qs_evaluated.where(filter_district)
+        qs_evaluated = qs_evaluated.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_evaluated = qs_evaluated.when(*periods)
+
+        qs_evaluated = qs_evaluated.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_evaluated = qs_evaluated.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_evaluated = list(val_evaluated)
+
+        gen_raster = pivot(period_rows, de_evaluated_meta, val_evaluated, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_evaluated2 = list(gen_raster)
+
+        qs_cured_completed = DataValue.objects.what(*cured_completed_de_names)
+        qs_cured_completed = qs_cured_completed.annotate(de_name=Value(cured_completed_short_names[0], output_field=CharField()))
+        qs_cured_completed = qs_cured_completed.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_cured_completed = qs_cured_completed.where(filter_district)
+        qs_cured_completed = qs_cured_completed.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_cured_completed = qs_cured_completed.when(*periods)
+
+        qs_cured_completed = qs_cured_completed.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_cured_completed = qs_cured_completed.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_cured_completed = list(val_cured_completed)
+
+        gen_raster = pivot(period_rows, de_cured_completed_meta, val_cured_completed, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_cured_completed2 = list(gen_raster)
+
+        qs_cured = DataValue.objects.what(*cured_de_names)
+        qs_cured = qs_cured.annotate(de_name=Value(cured_short_names[0], output_field=CharField()))
+        qs_cured = qs_cured.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_cured = qs_cured.where(filter_district)
+        qs_cured = qs_cured.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_cured = qs_cured.when(*periods)
+
+        qs_cured = qs_cured.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_cured = qs_cured.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_cured = list(val_cured)
+
+        gen_raster = pivot(period_rows, de_cured_meta, val_cured, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_cured2 = list(gen_raster)
+
+        qs_ltfu = DataValue.objects.what(*ltfu_de_names)
+        qs_ltfu = qs_ltfu.annotate(de_name=Value(ltfu_short_names[0], output_field=CharField()))
+        qs_ltfu = qs_ltfu.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_ltfu = qs_ltfu.where(filter_district)
+        qs_ltfu = qs_ltfu.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_ltfu = qs_ltfu.when(*periods)
+
+        qs_ltfu = qs_ltfu.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_ltfu = qs_ltfu.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_ltfu = list(val_ltfu)
+
+        gen_raster = pivot(period_rows, de_ltfu_meta, val_ltfu, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_ltfu2 = list(gen_raster)
+
+        qs_notif_under15 = DataValue.objects.what(*notif_under15_de_names)
+        qs_notif_under15 = qs_notif_under15.annotate(de_name=Value(notif_under15_short_names[0], output_field=CharField()))
+        qs_notif_under15 = qs_notif_under15.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_notif_under15 = qs_notif_under15.where(filter_district)
+        qs_notif_under15 = qs_notif_under15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_notif_under15 = qs_notif_under15.when(*periods)
+
+        qs_notif_under15 = qs_notif_under15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_notif_under15 = qs_notif_under15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_notif_under15 = list(val_notif_under15)
+
+        gen_raster = pivot(period_rows, de_notif_under15_meta, val_notif_under15, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_notif_under152 = list(gen_raster)
+
+        qs_failed = DataValue.objects.what(*failed_de_names)
+        qs_failed = qs_failed.annotate(de_name=Value(failed_short_names[0], output_field=CharField()))
+        qs_failed = qs_failed.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_failed = qs_failed.where(filter_district)
+        qs_failed = qs_failed.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_failed = qs_failed.when(*periods)
+
+        qs_failed = qs_failed.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_failed = qs_failed.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_failed = list(val_failed)
+
+        gen_raster = pivot(period_rows, de_failed_meta, val_failed, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_failed2 = list(gen_raster)
+
+        qs_died = DataValue.objects.what(*died_de_names)
+        qs_died = qs_died.annotate(de_name=Value(died_short_names[0], output_field=CharField()))
+        qs_died = qs_died.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_died = qs_died.where(filter_district)
+        qs_died = qs_died.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_died = qs_died.when(*periods)
+
+        qs_died = qs_died.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_died = qs_died.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_died = list(val_died)
+
+        gen_raster = pivot(period_rows, de_died_meta, val_died, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_died2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_targets2, val_notif_new2, val_notif_all2, val_hiv_tested2, val_hiv_pos2, val_hiv_art2, val_registered2, val_evaluated2, val_cured_completed2, val_cured2, val_ltfu2, val_notif_under152, val_failed2, val_died2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(cured['numeric_sum'], evaluated['numeric_sum']) and evaluated['numeric_sum']:
-            cure_percent = 100 * cured['numeric_sum'] / evaluated['numeric_sum']
-        else:
-            cure_percent = None
-        cure_percent_val = {
-            'de_name': '% Cure Rate',
-            'cat_combo': None,
-            'numeric_sum': cure_percent,
-        }
-        cure_percent_val.update(g_ou_dict)
-        calculated_vals.append(cure_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, de_targets_meta + de_notif_new_meta + de_notif_all_meta + de_hiv_tested_meta + de_hiv_pos_meta + de_hiv_art_meta + de_registered_meta + de_evaluated_meta + de_cured_completed_meta + de_cured_meta + de_ltfu_meta + de_notif_under15_meta + de_failed_meta + de_died_meta)
 
-        _group[1].extend(calculated_vals)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
 
     data_element_metas += list(product(['% TSR'], (None,)))
     data_element_metas += list(product(['% LTFU'], (None,)))
@@ -4085,42 +3087,33 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
     cnr_ls.add_interval('green', 115, None)
     legend_sets.append(cnr_ls)
 
+    table = TableParams.from_request(request)
+
+    def tb_rows():
+        # computed as the rows are sent, so a streamed page starts before the scorecard is ready
+        # the facility matrix serves every level of this scorecard
+        tb_matrix = cached_result('tb_scorecard', (periods, filter_district and filter_district.name), tb_facility_matrix)
+        if trend:
+            tb_matrix = tb_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+        else:
+            tb_matrix = tb_matrix.rollup(ou_list)
+        tb_matrix.calculate(tb_calculations)
+
+        if trend:
+            # the change since the previous period needs the rows of the previous period, so pick the rows out of the whole matrix
+            rows = table.apply(tb_matrix.iter_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets, num_rows=len(tb_matrix.rows))
+        else:
+            # only make the rows of the page
+            tb_matrix = tb_matrix.take(table.matrix_rows(tb_matrix, data_element_metas, len(ou_headers), legend_sets))
+            rows = tb_matrix.iter_grid(OU_PATH_FIELDS, data_element_metas)
+        yield from rows
+
+    grouped_vals = tb_rows()
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="tb_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('tb_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('tb_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -4128,53 +3121,60 @@ def tb_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
-    return render(request, 'cannula/tb_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
+    template_name = 'cannula/tb_{0}.html'.format(OrgUnit.get_level_field(org_unit_level))
+    if org_unit_level == 3: # facility pages are long, send the table as it is rendered
+        return stream_scorecard(request, template_name, context)
+    return render(request, template_name, context)
 
 @login_required
+@cache_scorecard
 def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
-   
+
     opd_attend_de_names = (
         '105-1.1 OPD New Attendance',
         '105-1.1 OPD Re-Attendance',
@@ -4185,20 +3185,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_opd_attend_meta = list(product(opd_attend_short_names, (None,)))
     data_element_metas += de_opd_attend_meta
 
-    qs_opd_attend = DataValue.objects.what(*opd_attend_de_names)
-    qs_opd_attend = qs_opd_attend.annotate(de_name=Value(opd_attend_short_names[0], output_field=CharField()))
-    qs_opd_attend = qs_opd_attend.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_opd_attend = qs_opd_attend.where(filter_district)
-    qs_opd_attend = qs_opd_attend.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_opd_attend = qs_opd_attend.filter(facility__icontains='Hospital')
-    qs_opd_attend = qs_opd_attend.when(filter_period)
-    qs_opd_attend = qs_opd_attend.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_opd_attend = qs_opd_attend.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_opd_attend_meta, val_opd_attend, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_opd_attend2 = list(gen_raster)
-   
     muac_de_names = (
         '106a Nutri No. 1 of clients who received nutrition assessment in this quarter using color coded MUAC tapes/Z score chart',
     )
@@ -4208,20 +3194,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_muac_meta = list(product(muac_short_names, (None,)))
     data_element_metas += de_muac_meta
 
-    qs_muac = DataValue.objects.what(*muac_de_names)
-    qs_muac = qs_muac.annotate(de_name=Value(muac_short_names[0], output_field=CharField()))
-    qs_muac = qs_muac.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_muac = qs_muac.where(filter_district)
-    qs_muac = qs_muac.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_muac = qs_muac.filter(facility__icontains='Hospital')
-    qs_muac = qs_muac.when(filter_period)
-    qs_muac = qs_muac.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_muac = qs_muac.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_muac_meta, val_muac, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_muac2 = list(gen_raster)
-   
     muac_mothers_de_names = (
         '106a Nutri No. 1 of clients who received nutrition assessment in this quarter using color coded MUAC tapes/Z score chart Pregnant/Lactating Women',
     )
@@ -4231,20 +3203,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_muac_mothers_meta = list(product(muac_mothers_short_names, (None,)))
     data_element_metas += de_muac_mothers_meta
 
-    qs_muac_mothers = DataValue.objects.what(*muac_mothers_de_names)
-    qs_muac_mothers = qs_muac_mothers.annotate(de_name=Value(muac_mothers_short_names[0], output_field=CharField()))
-    qs_muac_mothers = qs_muac_mothers.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_muac_mothers = qs_muac_mothers.where(filter_district)
-    qs_muac_mothers = qs_muac_mothers.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_muac_mothers = qs_muac_mothers.filter(facility__icontains='Hospital')
-    qs_muac_mothers = qs_muac_mothers.when(filter_period)
-    qs_muac_mothers = qs_muac_mothers.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_muac_mothers = qs_muac_mothers.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_muac_mothers_meta, val_muac_mothers, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_muac_mothers2 = list(gen_raster)
-   
     mothers_total_de_names = (
         '105-2.1 A3:Total ANC visits (New clients + Re-attendances)',
         '105-2.3 Postnatal Attendances',
@@ -4255,20 +3213,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_mothers_total_meta = list(product(mothers_total_short_names, (None,)))
     data_element_metas += de_mothers_total_meta
 
-    qs_mothers_total = DataValue.objects.what(*mothers_total_de_names)
-    qs_mothers_total = qs_mothers_total.annotate(de_name=Value(mothers_total_short_names[0], output_field=CharField()))
-    qs_mothers_total = qs_mothers_total.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_mothers_total = qs_mothers_total.where(filter_district)
-    qs_mothers_total = qs_mothers_total.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_mothers_total = qs_mothers_total.filter(facility__icontains='Hospital')
-    qs_mothers_total = qs_mothers_total.when(filter_period)
-    qs_mothers_total = qs_mothers_total.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_mothers_total = qs_mothers_total.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_mothers_total_meta, val_mothers_total, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_mothers_total2 = list(gen_raster)
-   
     i_f_counsel_de_names = (
         '106a Nutri N7-No. of pregnant and lactating women who received infant feeding counseling - Total',
     )
@@ -4278,20 +3222,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_i_f_counsel_meta = list(product(i_f_counsel_short_names, (None,)))
     data_element_metas += de_i_f_counsel_meta
 
-    qs_i_f_counsel = DataValue.objects.what(*i_f_counsel_de_names)
-    qs_i_f_counsel = qs_i_f_counsel.annotate(de_name=Value(i_f_counsel_short_names[0], output_field=CharField()))
-    qs_i_f_counsel = qs_i_f_counsel.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_i_f_counsel = qs_i_f_counsel.where(filter_district)
-    qs_i_f_counsel = qs_i_f_counsel.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_i_f_counsel = qs_i_f_counsel.filter(facility__icontains='Hospital')
-    qs_i_f_counsel = qs_i_f_counsel.when(filter_period)
-    qs_i_f_counsel = qs_i_f_counsel.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_i_f_counsel = qs_i_f_counsel.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_i_f_counsel_meta, val_i_f_counsel, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_i_f_counsel2 = list(gen_raster)
-   
     m_n_counsel_de_names = (
         '106a Nutri N6-No. of pregnant and lactating women who received maternal nutrition counseling - Total',
     )
@@ -4301,20 +3231,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_m_n_counsel_meta = list(product(m_n_counsel_short_names, (None,)))
     data_element_metas += de_m_n_counsel_meta
 
-    qs_m_n_counsel = DataValue.objects.what(*m_n_counsel_de_names)
-    qs_m_n_counsel = qs_m_n_counsel.annotate(de_name=Value(m_n_counsel_short_names[0], output_field=CharField()))
-    qs_m_n_counsel = qs_m_n_counsel.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_m_n_counsel = qs_m_n_counsel.where(filter_district)
-    qs_m_n_counsel = qs_m_n_counsel.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_m_n_counsel = qs_m_n_counsel.filter(facility__icontains='Hospital')
-    qs_m_n_counsel = qs_m_n_counsel.when(filter_period)
-    qs_m_n_counsel = qs_m_n_counsel.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_m_n_counsel = qs_m_n_counsel.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_m_n_counsel_meta, val_m_n_counsel, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_m_n_counsel2 = list(gen_raster)
-   
     active_art_de_names = (
         '106a ART No. active on ART on 1st line ARV regimen',
         '106a ART No. active on ART on 2nd line ARV regimen',
@@ -4326,20 +3242,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_active_art_meta = list(product(active_art_short_names, (None,)))
     data_element_metas += de_active_art_meta
 
-    qs_active_art = DataValue.objects.what(*active_art_de_names)
-    qs_active_art = qs_active_art.annotate(de_name=Value(active_art_short_names[0], output_field=CharField()))
-    qs_active_art = qs_active_art.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_active_art = qs_active_art.where(filter_district)
-    qs_active_art = qs_active_art.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_active_art = qs_active_art.filter(facility__icontains='Hospital')
-    qs_active_art = qs_active_art.when(filter_period)
-    qs_active_art = qs_active_art.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_active_art = qs_active_art.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_active_art_meta, val_active_art, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_active_art2 = list(gen_raster)
-   
     active_art_malnourish_de_names = (
         '106a ART No. active on ART assessed for Malnutrition at their visit in quarter',
     )
@@ -4349,20 +3251,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_active_art_malnourish_meta = list(product(active_art_malnourish_short_names, (None,)))
     data_element_metas += de_active_art_malnourish_meta
 
-    qs_active_art_malnourish = DataValue.objects.what(*active_art_malnourish_de_names)
-    qs_active_art_malnourish = qs_active_art_malnourish.annotate(de_name=Value(active_art_malnourish_short_names[0], output_field=CharField()))
-    qs_active_art_malnourish = qs_active_art_malnourish.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_active_art_malnourish = qs_active_art_malnourish.where(filter_district)
-    qs_active_art_malnourish = qs_active_art_malnourish.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_active_art_malnourish = qs_active_art_malnourish.filter(facility__icontains='Hospital')
-    qs_active_art_malnourish = qs_active_art_malnourish.when(filter_period)
-    qs_active_art_malnourish = qs_active_art_malnourish.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_active_art_malnourish = qs_active_art_malnourish.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_active_art_malnourish_meta, val_active_art_malnourish, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_active_art_malnourish2 = list(gen_raster)
-   
     new_malnourish_de_names = (
         '106a Nutri N4-No. of newly identified malnourished cases in this quarter - Total',
     )
@@ -4372,20 +3260,6 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_new_malnourish_meta = list(product(new_malnourish_short_names, (None,)))
     data_element_metas += de_new_malnourish_meta
 
-    qs_new_malnourish = DataValue.objects.what(*new_malnourish_de_names)
-    qs_new_malnourish = qs_new_malnourish.annotate(de_name=Value(new_malnourish_short_names[0], output_field=CharField()))
-    qs_new_malnourish = qs_new_malnourish.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_new_malnourish = qs_new_malnourish.where(filter_district)
-    qs_new_malnourish = qs_new_malnourish.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_new_malnourish = qs_new_malnourish.filter(facility__icontains='Hospital')
-    qs_new_malnourish = qs_new_malnourish.when(filter_period)
-    qs_new_malnourish = qs_new_malnourish.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_new_malnourish = qs_new_malnourish.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_new_malnourish_meta, val_new_malnourish, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_new_malnourish2 = list(gen_raster)
-   
     supp_feeding_de_names = (
         '106a Nutri N5-No. of clients who received nutrition supplementary / therapeutic feeds - Total',
     )
@@ -4395,105 +3269,178 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
     de_supp_feeding_meta = list(product(supp_feeding_short_names, (None,)))
     data_element_metas += de_supp_feeding_meta
 
-    qs_supp_feeding = DataValue.objects.what(*supp_feeding_de_names)
-    qs_supp_feeding = qs_supp_feeding.annotate(de_name=Value(supp_feeding_short_names[0], output_field=CharField()))
-    qs_supp_feeding = qs_supp_feeding.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_supp_feeding = qs_supp_feeding.where(filter_district)
-    qs_supp_feeding = qs_supp_feeding.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_supp_feeding = qs_supp_feeding.filter(facility__icontains='Hospital')
-    qs_supp_feeding = qs_supp_feeding.when(filter_period)
-    qs_supp_feeding = qs_supp_feeding.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_supp_feeding = qs_supp_feeding.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-
-    gen_raster = grabbag.rasterize(ou_list, de_supp_feeding_meta, val_supp_feeding, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_supp_feeding2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_opd_attend2, val_muac2, val_muac_mothers2, val_mothers_total2, val_i_f_counsel2, val_m_n_counsel2, val_active_art2, val_active_art_malnourish2, val_new_malnourish2, val_supp_feeding2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (opd_attend, muac, muac_mothers, mothers, infant_feeding, maternal_nutrition, active_art, active_art_malnourish, new_malnourish, supp_feeding, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(muac['numeric_sum'], opd_attend['numeric_sum']) and opd_attend['numeric_sum']:
-            assessment_percent = (muac['numeric_sum'] * 100) / opd_attend['numeric_sum']
-        else:
-            assessment_percent = None
-        assessment_percent_val = {
-            'de_name': '% of clients who received nutrition asssessment  in OPD',
-            'cat_combo': None,
-            'numeric_sum': assessment_percent,
-        }
-        assessment_percent_val.update(_group_ou_dict)
-        calculated_vals.append(assessment_percent_val)
-
-        if all_not_none(mothers['numeric_sum'], muac_mothers['numeric_sum']) and mothers['numeric_sum']:
-            assessment_mothers_percent = (muac_mothers['numeric_sum'] * 100) / mothers['numeric_sum']
-        else:
-            assessment_mothers_percent = None
-        assessment_mothers_percent_val = {
-            'de_name': '% of clients who received nutrition assessment   Pregnant/Lactating Women',
-            'cat_combo': None,
-            'numeric_sum': assessment_mothers_percent,
-        }
-        assessment_mothers_percent_val.update(_group_ou_dict)
-        calculated_vals.append(assessment_mothers_percent_val)
-
-        if all_not_none(active_art['numeric_sum'], active_art_malnourish['numeric_sum']) and active_art['numeric_sum']:
-            active_art_malnourish_percent = (active_art_malnourish['numeric_sum'] * 100) / active_art['numeric_sum']
-        else:
-            active_art_malnourish_percent = None
-        active_art_malnourish_percent_val = {
-            'de_name': '% of active on ART assessed for Malnutrition at their visit in quarter',
-            'cat_combo': None,
-            'numeric_sum': active_art_malnourish_percent,
-        }
-        active_art_malnourish_percent_val.update(_group_ou_dict)
-        calculated_vals.append(active_art_malnourish_percent_val)
-
-        if all_not_none(mothers['numeric_sum'], infant_feeding['numeric_sum']) and mothers['numeric_sum']:
-            mothers_i_f_percent = (infant_feeding['numeric_sum'] * 100) / mothers['numeric_sum']
-        else:
-            mothers_i_f_percent = None
-        mothers_i_f_percent_val = {
-            'de_name': '% of pregnant and lactating women who received infant feeding counseling ',
-            'cat_combo': None,
-            'numeric_sum': mothers_i_f_percent,
-        }
-        mothers_i_f_percent_val.update(_group_ou_dict)
-        calculated_vals.append(mothers_i_f_percent_val)
-
-        if all_not_none(mothers['numeric_sum'], maternal_nutrition['numeric_sum']) and mothers['numeric_sum']:
-            mothers_m_n_percent = (maternal_nutrition['numeric_sum'] * 100) / mothers['numeric_sum']
-        else:
-            mothers_m_n_percent = None
-        mothers_m_n_percent_val = {
-            'de_name': '% of pregnant and lactating women who received maternal nutrition counseling ',
-            'cat_combo': None,
-            'numeric_sum': mothers_m_n_percent,
-        }
-        mothers_m_n_percent_val.update(_group_ou_dict)
-        calculated_vals.append(mothers_m_n_percent_val)
+    def nutrition_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_opd_attend = DataValue.objects.what(*opd_attend_de_names)
+        qs_opd_attend = qs_opd_attend.annotate(de_name=Value(opd_attend_short_names[0], output_field=CharField()))
+        qs_opd_attend = qs_opd_attend.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_opd_attend = qs_opd_attend.where(filter_district)
+        qs_opd_attend = qs_opd_attend.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_opd_attend = qs_opd_attend.filter(facility__icontains='Hospital')
+        qs_opd_attend = qs_opd_attend.when(*periods)
+        qs_opd_attend = qs_opd_attend.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_opd_attend = qs_opd_attend.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_opd_attend_meta, val_opd_attend, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_opd_attend2 = list(gen_raster)
+
+        qs_muac = DataValue.objects.what(*muac_de_names)
+        qs_muac = qs_muac.annotate(de_name=Value(muac_short_names[0], output_field=CharField()))
+        qs_muac = qs_muac.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_muac = qs_muac.where(filter_district)
+        qs_muac = qs_muac.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_muac = qs_muac.filter(facility__icontains='Hospital')
+        qs_muac = qs_muac.when(*periods)
+        qs_muac = qs_muac.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_muac = qs_muac.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_muac_meta, val_muac, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_muac2 = list(gen_raster)
+
+        qs_muac_mothers = DataValue.objects.what(*muac_mothers_de_names)
+        qs_muac_mothers = qs_muac_mothers.annotate(de_name=Value(muac_mothers_short_names[0], output_field=CharField()))
+        qs_muac_mothers = qs_muac_mothers.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_muac_mothers = qs_muac_mothers.where(filter_district)
+        qs_muac_mothers = qs_muac_mothers.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_muac_mothers = qs_muac_mothers.filter(facility__icontains='Hospital')
+        qs_muac_mothers = qs_muac_mothers.when(*periods)
+        qs_muac_mothers = qs_muac_mothers.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_muac_mothers = qs_muac_mothers.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_muac_mothers_meta, val_muac_mothers, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_muac_mothers2 = list(gen_raster)
+
+        qs_mothers_total = DataValue.objects.what(*mothers_total_de_names)
+        qs_mothers_total = qs_mothers_total.annotate(de_name=Value(mothers_total_short_names[0], output_field=CharField()))
+        qs_mothers_total = qs_mothers_total.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_mothers_total = qs_mothers_total.where(filter_district)
+        qs_mothers_total = qs_mothers_total.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_mothers_total = qs_mothers_total.filter(facility__icontains='Hospital')
+        qs_mothers_total = qs_mothers_total.when(*periods)
+        qs_mothers_total = qs_mothers_total.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_mothers_total = qs_mothers_total.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_mothers_total_meta, val_mothers_total, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_mothers_total2 = list(gen_raster)
+
+        qs_i_f_counsel = DataValue.objects.what(*i_f_counsel_de_names)
+        qs_i_f_counsel = qs_i_f_counsel.annotate(de_name=Value(i_f_counsel_short_names[0], output_field=CharField()))
+        qs_i_f_counsel = qs_i_f_counsel.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_i_f_counsel = qs_i_f_counsel.where(filter_district)
+        qs_i_f_counsel = qs_i_f_counsel.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_i_f_counsel = qs_i_f_counsel.filter(facility__icontains='Hospital')
+        qs_i_f_counsel = qs_i_f_counsel.when(*periods)
+        qs_i_f_counsel = qs_i_f_counsel.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_i_f_counsel = qs_i_f_counsel.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_i_f_counsel_meta, val_i_f_counsel, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_i_f_counsel2 = list(gen_raster)
+
+        qs_m_n_counsel = DataValue.objects.what(*m_n_counsel_de_names)
+        qs_m_n_counsel = qs_m_n_counsel.annotate(de_name=Value(m_n_counsel_short_names[0], output_field=CharField()))
+        qs_m_n_counsel = qs_m_n_counsel.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_m_n_counsel = qs_m_n_counsel.where(filter_district)
+        qs_m_n_counsel = qs_m_n_counsel.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_m_n_counsel = qs_m_n_counsel.filter(facility__icontains='Hospital')
+        qs_m_n_counsel = qs_m_n_counsel.when(*periods)
+        qs_m_n_counsel = qs_m_n_counsel.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_m_n_counsel = qs_m_n_counsel.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_m_n_counsel_meta, val_m_n_counsel, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_m_n_counsel2 = list(gen_raster)
+
+        qs_active_art = DataValue.objects.what(*active_art_de_names)
+        qs_active_art = qs_active_art.annotate(de_name=Value(active_art_short_names[0], output_field=CharField()))
+        qs_active_art = qs_active_art.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_active_art = qs_active_art.where(filter_district)
+        qs_active_art = qs_active_art.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_active_art = qs_active_art.filter(facility__icontains='Hospital')
+        qs_active_art = qs_active_art.when(*periods)
+        qs_active_art = qs_active_art.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_active_art = qs_active_art.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_active_art_meta, val_active_art, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_active_art2 = list(gen_raster)
+
+        qs_active_art_malnourish = DataValue.objects.what(*active_art_malnourish_de_names)
+        qs_active_art_malnourish = qs_active_art_malnourish.annotate(de_name=Value(active_art_malnourish_short_names[0], output_field=CharField()))
+        qs_active_art_malnourish = qs_active_art_malnourish.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_active_art_malnourish = qs_active_art_malnourish.where(filter_district)
+        qs_active_art_malnourish = qs_active_art_malnourish.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_active_art_malnourish = qs_active_art_malnourish.filter(facility__icontains='Hospital')
+        qs_active_art_malnourish = qs_active_art_malnourish.when(*periods)
+        qs_active_art_malnourish = qs_active_art_malnourish.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_active_art_malnourish = qs_active_art_malnourish.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_active_art_malnourish_meta, val_active_art_malnourish, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_active_art_malnourish2 = list(gen_raster)
+
+        qs_new_malnourish = DataValue.objects.what(*new_malnourish_de_names)
+        qs_new_malnourish = qs_new_malnourish.annotate(de_name=Value(new_malnourish_short_names[0], output_field=CharField()))
+        qs_new_malnourish = qs_new_malnourish.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_new_malnourish = qs_new_malnourish.where(filter_district)
+        qs_new_malnourish = qs_new_malnourish.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_new_malnourish = qs_new_malnourish.filter(facility__icontains='Hospital')
+        qs_new_malnourish = qs_new_malnourish.when(*periods)
+        qs_new_malnourish = qs_new_malnourish.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_new_malnourish = qs_new_malnourish.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_new_malnourish_meta, val_new_malnourish, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_new_malnourish2 = list(gen_raster)
+
+        qs_supp_feeding = DataValue.objects.what(*supp_feeding_de_names)
+        qs_supp_feeding = qs_supp_feeding.annotate(de_name=Value(supp_feeding_short_names[0], output_field=CharField()))
+        qs_supp_feeding = qs_supp_feeding.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_supp_feeding = qs_supp_feeding.where(filter_district)
+        qs_supp_feeding = qs_supp_feeding.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_supp_feeding = qs_supp_feeding.filter(facility__icontains='Hospital')
+        qs_supp_feeding = qs_supp_feeding.when(*periods)
+        qs_supp_feeding = qs_supp_feeding.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_supp_feeding = qs_supp_feeding.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+
+        gen_raster = pivot(period_rows, de_supp_feeding_meta, val_supp_feeding, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_supp_feeding2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_opd_attend2, val_muac2, val_muac_mothers2, val_mothers_total2, val_i_f_counsel2, val_m_n_counsel2, val_active_art2, val_active_art_malnourish2, val_new_malnourish2, val_supp_feeding2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(new_malnourish['numeric_sum'], supp_feeding['numeric_sum']) and new_malnourish['numeric_sum']:
-            supp_feeding_percent = (supp_feeding['numeric_sum'] * 100) / new_malnourish['numeric_sum']
-        else:
-            supp_feeding_percent = None
-        supp_feeding_percent_val = {
-            'de_name': '% of newly identified malnorished cases who received nutrition suplementary/ therapeutic feeds',
-            'cat_combo': None,
-            'numeric_sum': supp_feeding_percent,
-        }
-        supp_feeding_percent_val.update(_group_ou_dict)
-        calculated_vals.append(supp_feeding_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    nutrition_matrix = cached_result('nutrition_by_hospital', (periods, filter_district and filter_district.name), nutrition_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        nutrition_matrix = nutrition_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        nutrition_matrix = nutrition_matrix.rollup(ou_list)
+    nutrition_matrix.calculate(nutrition_calculations)
 
     data_element_metas += list(product(['% of clients who received nutrition asssessment  in OPD'], (None,)))
     data_element_metas += list(product(['% of clients who received nutrition assessment   Pregnant/Lactating Women'], (None,)))
@@ -4520,42 +3467,19 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
         malnourished_ls.mappings[i] = True
     legend_sets.append(malnourished_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(nutrition_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        nutrition_matrix = nutrition_matrix.take(table.matrix_rows(nutrition_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = nutrition_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="nutrition_hospitals_scorecard.xlsx"'
-
-        return response
+        return scorecard_excel_response('nutrition_hospitals_scorecard.xlsx', ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('nutrition_hospitals_scorecard.csv', ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -4563,51 +3487,55 @@ def nutrition_by_hospital(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/nutrition_hospitals.html', context)
 
 @login_required
+@cache_scorecard
 def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     viral_load_de_names = (
@@ -4620,19 +3548,6 @@ def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
     )
     de_viral_load_meta = list(product(viral_load_short_names, (None,)))
 
-    qs_viral_load = DataValue.objects.what(*viral_load_de_names)
-    qs_viral_load = qs_viral_load.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_viral_load = qs_viral_load.where(filter_district)
-    qs_viral_load = qs_viral_load.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_viral_load = qs_viral_load.when(filter_period)
-    qs_viral_load = qs_viral_load.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_viral_load = qs_viral_load.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_viral_load = list(val_viral_load)
-
-    gen_raster = grabbag.rasterize(ou_list, de_viral_load_meta, val_viral_load, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_viral_load2 = list(gen_raster)
-
     viral_target_de_names = (
         'VL_TARGET',
     )
@@ -4641,79 +3556,67 @@ def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
     )
     de_viral_target_meta = list(product(viral_target_short_names, (None,)))
 
-    qs_viral_target = DataValue.objects.what(*viral_target_de_names)
-    qs_viral_target = qs_viral_target.annotate(de_name=Value(viral_target_short_names[0], output_field=CharField()))
-    qs_viral_target = qs_viral_target.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_viral_target = qs_viral_target.where(filter_district)
-    qs_viral_target = qs_viral_target.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_viral_target = qs_viral_target.when(filter_period[:4])
-    qs_viral_target = qs_viral_target.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_viral_target = qs_viral_target.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_viral_target = list(val_viral_target)
-
-    gen_raster = grabbag.rasterize(ou_list, de_viral_target_meta, val_viral_target, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_viral_target2 = list(gen_raster)
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_viral_target2, val_viral_load2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (vl_target, vl_rejected, vl_sent, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(vl_target['numeric_sum'], vl_sent['numeric_sum']) and vl_target['numeric_sum']:
-            vl_sent_percent = (vl_sent['numeric_sum'] * 100) / vl_target['numeric_sum']
-        else:
-            vl_sent_percent = None
-        vl_sent_percent_val = {
-            'de_name': '% Achievement (sent)',
-            'cat_combo': None,
-            'numeric_sum': vl_sent_percent,
-        }
-        vl_sent_percent_val.update(_group_ou_dict)
-        calculated_vals.append(vl_sent_percent_val)
-
-        if all_not_none(vl_sent['numeric_sum'], vl_rejected['numeric_sum']) and vl_sent['numeric_sum']:
-            vl_rejected_percent = (vl_rejected['numeric_sum'] * 100) / vl_sent['numeric_sum']
-        else:
-            vl_rejected_percent = None
-        vl_rejected_percent_val = {
-            'de_name': '% Sample rejection',
-            'cat_combo': None,
-            'numeric_sum': vl_rejected_percent,
-        }
-        vl_rejected_percent_val.update(_group_ou_dict)
-        calculated_vals.append(vl_rejected_percent_val)
-
-        vl_returned = default_zero(vl_sent['numeric_sum']) - default_zero(vl_rejected['numeric_sum'])
-        vl_returned_val = {
-            'de_name': 'Samples returned',
-            'cat_combo': 'None',
-            'numeric_sum': vl_returned,
-        }
-        vl_returned_val.update(_group_ou_dict)
-        calculated_vals.append(vl_returned_val)
+    def vl_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_viral_load = DataValue.objects.what(*viral_load_de_names)
+        qs_viral_load = qs_viral_load.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_viral_load = qs_viral_load.where(filter_district)
+        qs_viral_load = qs_viral_load.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_viral_load = qs_viral_load.when(*periods)
+        qs_viral_load = qs_viral_load.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_viral_load = qs_viral_load.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_viral_load = list(val_viral_load)
+
+        gen_raster = pivot(period_rows, de_viral_load_meta, val_viral_load, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_viral_load2 = list(gen_raster)
+
+        qs_viral_target = DataValue.objects.what(*viral_target_de_names)
+        qs_viral_target = qs_viral_target.annotate(de_name=Value(viral_target_short_names[0], output_field=CharField()))
+        qs_viral_target = qs_viral_target.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_viral_target = qs_viral_target.where(filter_district)
+        qs_viral_target = qs_viral_target.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_viral_target = qs_viral_target.when(*sorted(set(p[:4] for p in periods)))
+        qs_viral_target = qs_viral_target.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_viral_target = qs_viral_target.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_viral_target = list(val_viral_target)
+
+        gen_raster = pivot(year_rows, de_viral_target_meta, val_viral_target, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_viral_target2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_viral_target2, val_viral_load2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(vl_sent['numeric_sum'], vl_returned) and vl_sent['numeric_sum']:
-            vl_returned_percent = (vl_returned * 100) / vl_sent['numeric_sum']
-        else:
-            vl_returned_percent = None
-        vl_returned_percent_val = {
-            'de_name': '% Achievement (returned)',
-            'cat_combo': None,
-            'numeric_sum': vl_returned_percent,
-        }
-        vl_returned_percent_val.update(_group_ou_dict)
-        calculated_vals.append(vl_returned_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, de_viral_target_meta + de_viral_load_meta)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    vl_matrix = cached_result('vl_scorecard', (periods, filter_district and filter_district.name), vl_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        vl_matrix = vl_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        vl_matrix = vl_matrix.rollup(ou_list)
+    vl_matrix.calculate(vl_calculations)
 
     data_element_metas = list()
     
@@ -4724,7 +3627,8 @@ def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
     data_element_metas += list(product(['% Sample rejection'], (None,)))
     data_element_metas += list(product(['Samples returned'], (None,)))
     data_element_metas += list(product(['% Achievement'], (None,)))
-
+    # the columns under those headings
+    vl_columns = de_viral_target_meta + de_viral_load_meta + [('% Achievement (sent)', None), ('% Sample rejection', None), ('Samples returned', None), ('% Achievement (returned)', None)]
     num_path_elements = len(ou_headers)
     legend_sets = list()
     achievement_ls = LegendSet()
@@ -4742,42 +3646,19 @@ def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
     rejection_ls.mappings[num_path_elements+4] = True
     legend_sets.append(rejection_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(vl_matrix.to_grid(OU_PATH_FIELDS + ('period',), vl_columns, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        vl_matrix = vl_matrix.take(table.matrix_rows(vl_matrix, vl_columns, len(ou_headers), legend_sets))
+        grouped_vals = vl_matrix.to_grid(OU_PATH_FIELDS, vl_columns)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="viral_load_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('viral_load_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('viral_load_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
     context = {
         'grouped_data': grouped_vals,
@@ -4785,51 +3666,55 @@ def vl_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/vl_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     targets_de_names = (
@@ -4845,20 +3730,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_meta = list(product(targets_de_names, (None,)))
     data_element_metas += list(product(targets_short_names, (None,)))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_targets = qs_targets.when(filter_period[:4])
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     targets_care_female_de_names = (
         'GEND_GBV TARGET: GBV Care',
     )
@@ -4868,22 +3739,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_care_female_meta = list(product(targets_care_female_short_names, ('Female',)))
     data_element_metas += de_targets_care_female_meta
 
-    qs_targets_care_female = DataValue.objects.what(*targets_care_female_de_names)
-    qs_targets_care_female = qs_targets_care_female.annotate(de_name=Value(targets_care_female_short_names[0], output_field=CharField()))
-    qs_targets_care_female = qs_targets_care_female.filter(category_combo__categories__name='Female')
-    qs_targets_care_female = qs_targets_care_female.annotate(cat_combo=Value('Female', output_field=CharField()))
-    if filter_district:
-        qs_targets_care_female = qs_targets_care_female.where(filter_district)
-    qs_targets_care_female = qs_targets_care_female.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_targets_care_female = qs_targets_care_female.when(filter_period[:4])
-    qs_targets_care_female = qs_targets_care_female.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets_care_female = qs_targets_care_female.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_targets_care_female = list(val_targets_care_female)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_care_female_meta, val_targets_care_female, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets_care_female2 = list(gen_raster)
-
     targets_care_male_de_names = (
         'GEND_GBV TARGET: GBV Care',
     )
@@ -4893,22 +3748,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_care_male_meta = list(product(targets_care_male_short_names, ('Male',)))
     data_element_metas += de_targets_care_male_meta
 
-    qs_targets_care_male = DataValue.objects.what(*targets_care_male_de_names)
-    qs_targets_care_male = qs_targets_care_male.annotate(de_name=Value(targets_care_male_short_names[0], output_field=CharField()))
-    qs_targets_care_male = qs_targets_care_male.filter(category_combo__categories__name='Male')
-    qs_targets_care_male = qs_targets_care_male.annotate(cat_combo=Value('Male', output_field=CharField()))
-    if filter_district:
-        qs_targets_care_male = qs_targets_care_male.where(filter_district)
-    qs_targets_care_male = qs_targets_care_male.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_targets_care_male = qs_targets_care_male.when(filter_period[:4])
-    qs_targets_care_male = qs_targets_care_male.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets_care_male = qs_targets_care_male.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_targets_care_male = list(val_targets_care_male)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_care_male_meta, val_targets_care_male, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets_care_male2 = list(gen_raster)
-
     targets_pep_de_names = (
         'GEND_GBV_PEP TARGET: GBV PEP default',
     )
@@ -4918,21 +3757,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_targets_pep_meta = list(product(targets_pep_short_names, (None,)))
     data_element_metas += de_targets_pep_meta
 
-    qs_targets_pep = DataValue.objects.what(*targets_pep_de_names)
-    qs_targets_pep = qs_targets_pep.annotate(de_name=Value(targets_pep_short_names[0], output_field=CharField()))
-    qs_targets_pep = qs_targets_pep.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets_pep = qs_targets_pep.where(filter_district)
-    qs_targets_pep = qs_targets_pep.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_targets_pep = qs_targets_pep.when(filter_period[:4])
-    qs_targets_pep = qs_targets_pep.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets_pep = qs_targets_pep.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_targets_pep = list(val_targets_pep)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_pep_meta, val_targets_pep, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets_pep2 = list(gen_raster)
-
     sexual_violence_female_de_names = (
         '105-1.3 OPD Abortions Due To Gender Based Violence (GBV)',
         '105-1.3 OPD Sexually Transmitted Infection Due To SGBV',
@@ -4943,21 +3767,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_sexual_violence_female_meta = list(product(sexual_violence_female_short_names, ('Female',)))
     data_element_metas += de_sexual_violence_female_meta
 
-    qs_sexual_violence_female = DataValue.objects.what(*sexual_violence_female_de_names)
-    qs_sexual_violence_female = qs_sexual_violence_female.annotate(de_name=Value(sexual_violence_female_short_names[0], output_field=CharField()))
-    qs_sexual_violence_female = qs_sexual_violence_female.filter(category_combo__categories__name='Female')
-    qs_sexual_violence_female = qs_sexual_violence_female.annotate(cat_combo=Value('Female', output_field=CharField()))
-    if filter_district:
-        qs_sexual_violence_female = qs_sexual_violence_female.where(filter_district)
-    qs_sexual_violence_female = qs_sexual_violence_female.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_sexual_violence_female = qs_sexual_violence_female.when(filter_period)
-    qs_sexual_violence_female = qs_sexual_violence_female.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_sexual_violence_female = qs_sexual_violence_female.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_sexual_violence_female = list(val_sexual_violence_female)
-
-    gen_raster = grabbag.rasterize(ou_list, de_sexual_violence_female_meta, val_sexual_violence_female, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_sexual_violence_female2 = list(gen_raster)
-
     sexual_violence_male_de_names = (
         '105-1.3 OPD Abortions Due To Gender Based Violence (GBV)',
         '105-1.3 OPD Sexually Transmitted Infection Due To SGBV',
@@ -4968,21 +3777,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_sexual_violence_male_meta = list(product(sexual_violence_male_short_names, ('Male',)))
     data_element_metas += de_sexual_violence_male_meta
 
-    qs_sexual_violence_male = DataValue.objects.what(*sexual_violence_male_de_names)
-    qs_sexual_violence_male = qs_sexual_violence_male.annotate(de_name=Value(sexual_violence_male_short_names[0], output_field=CharField()))
-    qs_sexual_violence_male = qs_sexual_violence_male.filter(category_combo__categories__name='Male')
-    qs_sexual_violence_male = qs_sexual_violence_male.annotate(cat_combo=Value('Male', output_field=CharField()))
-    if filter_district:
-        qs_sexual_violence_male = qs_sexual_violence_male.where(filter_district)
-    qs_sexual_violence_male = qs_sexual_violence_male.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_sexual_violence_male = qs_sexual_violence_male.when(filter_period)
-    qs_sexual_violence_male = qs_sexual_violence_male.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_sexual_violence_male = qs_sexual_violence_male.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_sexual_violence_male = list(val_sexual_violence_male)
-
-    gen_raster = grabbag.rasterize(ou_list, de_sexual_violence_male_meta, val_sexual_violence_male, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_sexual_violence_male2 = list(gen_raster)
-
     sexual_violence_de_names = (
         '105-1.3 OPD Abortions Due To Gender Based Violence (GBV)',
         '105-1.3 OPD Sexually Transmitted Infection Due To SGBV',
@@ -4993,20 +3787,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_sexual_violence_meta = list(product(sexual_violence_short_names, (None,)))
     data_element_metas += de_sexual_violence_meta
 
-    qs_sexual_violence = DataValue.objects.what(*sexual_violence_de_names)
-    qs_sexual_violence = qs_sexual_violence.annotate(de_name=Value(sexual_violence_short_names[0], output_field=CharField()))
-    qs_sexual_violence = qs_sexual_violence.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_sexual_violence = qs_sexual_violence.where(filter_district)
-    qs_sexual_violence = qs_sexual_violence.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_sexual_violence = qs_sexual_violence.when(filter_period)
-    qs_sexual_violence = qs_sexual_violence.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_sexual_violence = qs_sexual_violence.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_sexual_violence = list(val_sexual_violence)
-
-    gen_raster = grabbag.rasterize(ou_list, de_sexual_violence_meta, val_sexual_violence, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_sexual_violence2 = list(gen_raster)
-
     gbv_care_de_names = (
         '105-1.3 OPD Sexually Transmitted Infection Due To SGBV',
     )
@@ -5016,20 +3796,6 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_gbv_care_meta = list(product(gbv_care_short_names, (None,)))
     data_element_metas += de_gbv_care_meta
 
-    qs_gbv_care = DataValue.objects.what(*gbv_care_de_names)
-    qs_gbv_care = qs_gbv_care.annotate(de_name=Value(gbv_care_short_names[0], output_field=CharField()))
-    qs_gbv_care = qs_gbv_care.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_gbv_care = qs_gbv_care.where(filter_district)
-    qs_gbv_care = qs_gbv_care.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_gbv_care = qs_gbv_care.when(filter_period)
-    qs_gbv_care = qs_gbv_care.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_gbv_care = qs_gbv_care.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_gbv_care = list(val_gbv_care)
-
-    gen_raster = grabbag.rasterize(ou_list, de_gbv_care_meta, val_gbv_care, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_gbv_care2 = list(gen_raster)
-
     pep_de_names = (
         '106a PEP Q2-Number provided with PEP following - Rape/Sexual Assault or Defilement',
     )
@@ -5039,95 +3805,172 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_pep_meta = list(product(pep_short_names, (None,)))
     data_element_metas += de_pep_meta
 
-    qs_pep = DataValue.objects.what(*pep_de_names)
-    qs_pep = qs_pep.annotate(de_name=Value(pep_short_names[0], output_field=CharField()))
-    qs_pep = qs_pep.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_pep = qs_pep.where(filter_district)
-    qs_pep = qs_pep.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_pep = qs_pep.when(filter_period)
-    qs_pep = qs_pep.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_pep = qs_pep.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_pep = list(val_pep)
-
-    gen_raster = grabbag.rasterize(ou_list, de_pep_meta, val_pep, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_pep2 = list(gen_raster)
-
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_targets2, val_targets_care_female2, val_targets_care_male2, val_targets_pep2, val_sexual_violence_female2, val_sexual_violence_male2, val_sexual_violence2, val_gbv_care2, val_pep2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (target_gbv, target_physical, target_sexual, target_gbv_f, target_gbv_m, target_pep, sexual_f, sexual_m, sexual, gbv_care, pep, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(sexual['numeric_sum'], target_physical['numeric_sum']) and target_physical['numeric_sum']:
-            perf_sexual = 100 * sexual['numeric_sum'] / target_physical['numeric_sum']
-        else:
-            perf_sexual = None
-        perf_sexual_val = {
-            'de_name': 'Perf% Sexual violence (post-rape care)',
-            'cat_combo': None,
-            'numeric_sum': perf_sexual,
-        }
-        perf_sexual_val.update(_group_ou_dict)
-        calculated_vals.append(perf_sexual_val)
-
-        if all_not_none(sexual_f['numeric_sum'], target_gbv_f['numeric_sum']) and target_gbv_f['numeric_sum']:
-            perf_sexual_f = 100 * sexual_f['numeric_sum'] / target_gbv_f['numeric_sum']
-        else:
-            perf_sexual_f = None
-        perf_sexual_f_val = {
-            'de_name': 'Perf% Sexual violence',
-            'cat_combo': 'Female',
-            'numeric_sum': perf_sexual_f,
-        }
-        perf_sexual_f_val.update(_group_ou_dict)
-        calculated_vals.append(perf_sexual_f_val)
-
-        if all_not_none(sexual_m['numeric_sum'], target_gbv_m['numeric_sum']) and target_gbv_m['numeric_sum']:
-            perf_sexual_m = 100 * sexual_m['numeric_sum'] / target_gbv_m['numeric_sum']
-        else:
-            perf_sexual_m = None
-        perf_sexual_m_val = {
-            'de_name': 'Perf% Sexual violence',
-            'cat_combo': 'Male',
-            'numeric_sum': perf_sexual_m,
-        }
-        perf_sexual_m_val.update(_group_ou_dict)
-        calculated_vals.append(perf_sexual_m_val)
-
-        if all_not_none(gbv_care['numeric_sum'], target_gbv['numeric_sum']) and target_gbv['numeric_sum']:
-            perf_gbv_care = 100 * gbv_care['numeric_sum'] / target_gbv['numeric_sum']
-        else:
-            perf_gbv_care = None
-        perf_gbv_care_val = {
-            'de_name': 'Perf% Receiving post-GBV clinical care',
-            'cat_combo': None,
-            'numeric_sum': perf_gbv_care,
-        }
-        perf_gbv_care_val.update(_group_ou_dict)
-        calculated_vals.append(perf_gbv_care_val)
+    def gbv_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_targets = qs_targets.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(year_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_targets_care_female = DataValue.objects.what(*targets_care_female_de_names)
+        qs_targets_care_female = qs_targets_care_female.annotate(de_name=Value(targets_care_female_short_names[0], output_field=CharField()))
+        qs_targets_care_female = qs_targets_care_female.filter(category_combo__categories__name='Female')
+        qs_targets_care_female = qs_targets_care_female.annotate(cat_combo=Value('Female', output_field=CharField()))
+        if filter_district:
+            qs_targets_care_female = qs_targets_care_female.where(filter_district)
+        qs_targets_care_female = qs_targets_care_female.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_targets_care_female = qs_targets_care_female.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets_care_female = qs_targets_care_female.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets_care_female = qs_targets_care_female.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_targets_care_female = list(val_targets_care_female)
+
+        gen_raster = pivot(year_rows, de_targets_care_female_meta, val_targets_care_female, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets_care_female2 = list(gen_raster)
+
+        qs_targets_care_male = DataValue.objects.what(*targets_care_male_de_names)
+        qs_targets_care_male = qs_targets_care_male.annotate(de_name=Value(targets_care_male_short_names[0], output_field=CharField()))
+        qs_targets_care_male = qs_targets_care_male.filter(category_combo__categories__name='Male')
+        qs_targets_care_male = qs_targets_care_male.annotate(cat_combo=Value('Male', output_field=CharField()))
+        if filter_district:
+            qs_targets_care_male = qs_targets_care_male.where(filter_district)
+        qs_targets_care_male = qs_targets_care_male.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_targets_care_male = qs_targets_care_male.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets_care_male = qs_targets_care_male.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets_care_male = qs_targets_care_male.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_targets_care_male = list(val_targets_care_male)
+
+        gen_raster = pivot(year_rows, de_targets_care_male_meta, val_targets_care_male, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets_care_male2 = list(gen_raster)
+
+        qs_targets_pep = DataValue.objects.what(*targets_pep_de_names)
+        qs_targets_pep = qs_targets_pep.annotate(de_name=Value(targets_pep_short_names[0], output_field=CharField()))
+        qs_targets_pep = qs_targets_pep.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets_pep = qs_targets_pep.where(filter_district)
+        qs_targets_pep = qs_targets_pep.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_targets_pep = qs_targets_pep.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets_pep = qs_targets_pep.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets_pep = qs_targets_pep.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_targets_pep = list(val_targets_pep)
+
+        gen_raster = pivot(year_rows, de_targets_pep_meta, val_targets_pep, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets_pep2 = list(gen_raster)
+
+        qs_sexual_violence_female = DataValue.objects.what(*sexual_violence_female_de_names)
+        qs_sexual_violence_female = qs_sexual_violence_female.annotate(de_name=Value(sexual_violence_female_short_names[0], output_field=CharField()))
+        qs_sexual_violence_female = qs_sexual_violence_female.filter(category_combo__categories__name='Female')
+        qs_sexual_violence_female = qs_sexual_violence_female.annotate(cat_combo=Value('Female', output_field=CharField()))
+        if filter_district:
+            qs_sexual_violence_female = qs_sexual_violence_female.where(filter_district)
+        qs_sexual_violence_female = qs_sexual_violence_female.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_sexual_violence_female = qs_sexual_violence_female.when(*periods)
+        qs_sexual_violence_female = qs_sexual_violence_female.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_sexual_violence_female = qs_sexual_violence_female.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_sexual_violence_female = list(val_sexual_violence_female)
+
+        gen_raster = pivot(period_rows, de_sexual_violence_female_meta, val_sexual_violence_female, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_sexual_violence_female2 = list(gen_raster)
+
+        qs_sexual_violence_male = DataValue.objects.what(*sexual_violence_male_de_names)
+        qs_sexual_violence_male = qs_sexual_violence_male.annotate(de_name=Value(sexual_violence_male_short_names[0], output_field=CharField()))
+        qs_sexual_violence_male = qs_sexual_violence_male.filter(category_combo__categories__name='Male')
+        qs_sexual_violence_male = qs_sexual_violence_male.annotate(cat_combo=Value('Male', output_field=CharField()))
+        if filter_district:
+            qs_sexual_violence_male = qs_sexual_violence_male.where(filter_district)
+        qs_sexual_violence_male = qs_sexual_violence_male.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_sexual_violence_male = qs_sexual_violence_male.when(*periods)
+        qs_sexual_violence_male = qs_sexual_violence_male.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_sexual_violence_male = qs_sexual_violence_male.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_sexual_violence_male = list(val_sexual_violence_male)
+
+        gen_raster = pivot(period_rows, de_sexual_violence_male_meta, val_sexual_violence_male, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_sexual_violence_male2 = list(gen_raster)
+
+        qs_sexual_violence = DataValue.objects.what(*sexual_violence_de_names)
+        qs_sexual_violence = qs_sexual_violence.annotate(de_name=Value(sexual_violence_short_names[0], output_field=CharField()))
+        qs_sexual_violence = qs_sexual_violence.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_sexual_violence = qs_sexual_violence.where(filter_district)
+        qs_sexual_violence = qs_sexual_violence.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_sexual_violence = qs_sexual_violence.when(*periods)
+        qs_sexual_violence = qs_sexual_violence.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_sexual_violence = qs_sexual_violence.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_sexual_violence = list(val_sexual_violence)
+
+        gen_raster = pivot(period_rows, de_sexual_violence_meta, val_sexual_violence, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_sexual_violence2 = list(gen_raster)
+
+        qs_gbv_care = DataValue.objects.what(*gbv_care_de_names)
+        qs_gbv_care = qs_gbv_care.annotate(de_name=Value(gbv_care_short_names[0], output_field=CharField()))
+        qs_gbv_care = qs_gbv_care.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_gbv_care = qs_gbv_care.where(filter_district)
+        qs_gbv_care = qs_gbv_care.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_gbv_care = qs_gbv_care.when(*periods)
+        qs_gbv_care = qs_gbv_care.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_gbv_care = qs_gbv_care.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_gbv_care = list(val_gbv_care)
+
+        gen_raster = pivot(period_rows, de_gbv_care_meta, val_gbv_care, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_gbv_care2 = list(gen_raster)
+
+        qs_pep = DataValue.objects.what(*pep_de_names)
+        qs_pep = qs_pep.annotate(de_name=Value(pep_short_names[0], output_field=CharField()))
+        qs_pep = qs_pep.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_pep = qs_pep.where(filter_district)
+        qs_pep = qs_pep.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_pep = qs_pep.when(*periods)
+        qs_pep = qs_pep.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_pep = qs_pep.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_pep = list(val_pep)
+
+        gen_raster = pivot(period_rows, de_pep_meta, val_pep, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_pep2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_targets2, val_targets_care_female2, val_targets_care_male2, val_targets_pep2, val_sexual_violence_female2, val_sexual_violence_male2, val_sexual_violence2, val_gbv_care2, val_pep2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(pep['numeric_sum'], target_pep['numeric_sum']) and target_pep['numeric_sum']:
-            perf_pep = 100 * pep['numeric_sum'] / target_pep['numeric_sum']
-        else:
-            perf_pep = None
-        perf_pep_val = {
-            'de_name': 'Perf% PEP',
-            'cat_combo': None,
-            'numeric_sum': perf_pep,
-        }
-        perf_pep_val.update(_group_ou_dict)
-        calculated_vals.append(perf_pep_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    gbv_matrix = cached_result('gbv_scorecard', (periods, filter_district and filter_district.name), gbv_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        gbv_matrix = gbv_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        gbv_matrix = gbv_matrix.rollup(ou_list)
+    gbv_matrix.calculate(gbv_calculations)
 
     data_element_metas += list(product(['Perf% Sexual violence (post-rape care)'], (None,)))
     data_element_metas += list(product(['Perf% Sexual violence'], ('Female',)))
@@ -5152,42 +3995,19 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
     legend_sets.append(gbv_ls)
 
 
-    if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="gbv_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(gbv_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        gbv_matrix = gbv_matrix.take(table.matrix_rows(gbv_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = gbv_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
+    if output_format == 'EXCEL':
+        return scorecard_excel_response('gbv_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('gbv_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
 
     context = {
@@ -5196,22 +4016,31 @@ def gbv_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/gbv_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard(period_type='month')
 def sc_mos_by_site(request, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    month_years = zip([((this_day.month-i-1)%12)+1 for i in range(5*12)], ([this_day.year] * this_day.month) + sorted([this_day.year-i for i in range(1, 5)]*12, reverse=True))
-    PREV_5YR_MONTHS = ['{0}-{1:02}'.format(y, m) for m, y in month_years]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    PREV_5YR_MONTHS = dimensions.prev_5yr_months(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_MONTHS:
         filter_period=request.GET['period']
@@ -5221,16 +4050,12 @@ def sc_mos_by_site(request, output_format='HTML'):
     period_desc = filter_period #dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=3).annotate(district=F('parent__parent__name'), subcounty=F('parent__name'), facility=F('name'))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by('district', 'subcounty', 'facility')
-    ou_list = list(qs_ou.values_list('district', 'subcounty', 'facility'))
+    ou_list = dims.ou_paths(3, filter_district)
     ou_headers = ['District', 'Subcounty', 'Facility']
 
     def val_with_subcat_fun(row, col):
@@ -5238,48 +4063,8 @@ def sc_mos_by_site(request, output_format='HTML'):
         de_name, subcategory = col
         return { 'district': district, 'subcounty': subcounty, 'facility': facility, 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None }
 
-    supply_names = [
-        '105-6  Zidovudine /Lamivudine/Nevirapine (AZT/3TC/NVP)',
-        '105-6 (RHZE) blister strip 150/75/400/275 mg',
-        '105-6 Abacavir/Lamivudine (ABC/3TC) 60mg/30mg (Paediatric)',
-        '105-6 Amoxicillin dispersible 125mg tablet (For children)',
-        '105-6 Artemether/ Lumefantrine 100/20mg tablet',
-        '105-6 Bendrofulazide (Aprinox) 5mg',
-        '105-6 Blood 450 ml',
-        '105-6 CD4 reagent Specify',
-        '105-6 Captopril 25mg tablet',
-        '105-6 Cardiac Aspirin 75/80 mg',
-        '105-6 Ceftriaxone 1g Injection',
-        '105-6 Chlorhexidine 20%',
-        '105-6 Co-tromoxazole 480mg tablet',
-        '105-6 Cotrimoxazole 960mg tablet',
-        '105-6 Determine HIV Screening test, tests',
-        '105-6 Efavirenz (EFV) 600mg',
-        '105-6 Glibenclamide 5mg tablet',
-        '105-6 Insulin short-acting',
-        '105-6 Mama Kit',
-        '105-6 Measles Vaccine',
-        '105-6 Metformin 500mg',
-        '105-6 Misoprostol 200mcg Tablet',
-        '105-6 Nevirapine (NVP) 200mg',
-        '105-6 Nevirapine (NVP) 50mg',
-        '105-6 Nifedipine tablets 20mg tablet',
-        '105-6 ORS Sachets with zinc tablet',
-        '105-6 Oxytocin Injection',
-        '105-6 Propranolol 40mg tablet',
-        '105-6 RH blister strip 150/75 mg',
-        '105-6 Ready to use Therapeutic feeds (RUTF)',
-        '105-6 Stat-pack HIV Confirmatory rapid tests, tests',
-        '105-6 Sulfadoxine / Pyrimethamine tablet',
-        '105-6 Tenofovir/Lamivudine (TDF/3TC) 300mg/300mg',
-        '105-6 Tenofovir/Lamivudine/Efavirenz (TDF/3TC/EFV) 300mg/300mg/',
-        '105-6 Therapeutic milk F100 (100Kcal/100ml)',
-        '105-6 Therapeutic milk F75 (75Kcal/100ml)',
-        '105-6 Unigold HIV RDT Tie-breaker test, tests',
-        '105-6 ZN reagent for AFB',
-        '105-6 Zidovudine/Lamivudine (AZT/3TC) 300mg/150m'
-    ]
-    stock_de_names = ((s+' Days out of stock', s+' Quantity Utilized', s+' Stock at Hand') for s in supply_names)
+    supply_names = SUPPLY_NAMES
+    stock_de_names = ((s+suffix for suffix in STOCK_SUFFIXES) for s in supply_names)
     stock_de_names = list(chain.from_iterable(stock_de_names)) # flatten the list of tuples of strings into a list of strings
     de_stock_meta = list(product(stock_de_names, (None,)))
 
@@ -5293,64 +4078,20 @@ def sc_mos_by_site(request, output_format='HTML'):
     qs_stock = qs_stock.annotate(period=F('quarter'))
     qs_stock = qs_stock.order_by('district', 'subcounty', 'facility', 'de_name', 'cat_combo', 'period')
     val_stock = qs_stock.values('district', 'subcounty', 'facility', 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_stock = list(val_stock)
 
-    gen_raster = grabbag.rasterize(ou_list, de_stock_meta, val_stock, lambda x: (x['district'], x['subcounty'], x['facility']), lambda x: (x['de_name'], x['cat_combo']), val_with_subcat_fun)
-    val_stock2 = list(gen_raster)
+    # a facility has three values per supply, so keep them in a compact grid rather than a dict each
+    stock_grid = ScorecardGrid.from_values(('district', 'subcounty', 'facility'), ou_list, de_stock_meta, val_stock.iterator(), lambda x: (x['district'], x['subcounty'], x['facility']), lambda x: (x['de_name'], x['cat_combo']))
+    stock_grid.remove_empty_rows()
 
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_stock2), key=lambda x: (x['district'], x['subcounty'], x['facility'])), key=lambda x: (x['district'], x['subcounty'], x['facility']))
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
+    calc_names = [on_hand.replace('Stock at Hand', 'Months of Stock') for _, _, on_hand in grouper(stock_de_names, 3)]
+    grouped_vals = ScorecardGrid(stock_grid.ou_path_fields, [(c, None) for c in calc_names])
 
-    calc_names = OrderedDict()
-    # perform calculations
-    for _group in grouped_vals:
-        (district_subcounty_facility, (*stock_vals,)) = _group
-        days_out, utilized, on_hand, *other_vals = stock_vals
-        
-        calculated_vals = list()
-        AVG_MONTH_DAYS = 30 # days in month
-
-        for days_out, utilized, on_hand in grouper(stock_vals, 3):
-            if all_not_none(utilized['numeric_sum'], days_out['numeric_sum']) and days_out['numeric_sum'] < AVG_MONTH_DAYS:
-                avg_consumption = utilized['numeric_sum'] * (AVG_MONTH_DAYS / (AVG_MONTH_DAYS - days_out['numeric_sum']))
-            else:
-                avg_consumption = None
-            # calc_name = on_hand['de_name'].replace('Stock at Hand', 'Adjusted Consumption')
-            # calc_names[calc_name] = True
-            # avg_consumption_val = {
-            #     'district': district_subcounty_facility[0],
-            #     'subcounty': district_subcounty_facility[1],
-            #     'facility': district_subcounty_facility[2],
-            #     'de_name': calc_name,
-            #     'cat_combo': None,
-            #     'numeric_sum': avg_consumption,
-            # }
-            # calculated_vals.append(avg_consumption_val)
-
-            if all_not_none(on_hand['numeric_sum']) and avg_consumption and on_hand['numeric_sum'] > 0:
-                months_of_stock = on_hand['numeric_sum']/(avg_consumption)
-            else:
-                months_of_stock = None
-                if on_hand['numeric_sum']:
-                    months_of_stock = -on_hand['numeric_sum']
-            calc_name = on_hand['de_name'].replace('Stock at Hand', 'Months of Stock')
-            calc_names[calc_name] = True
-            sc_mos_val = {
-                'district': district_subcounty_facility[0],
-                'subcounty': district_subcounty_facility[1],
-                'facility': district_subcounty_facility[2],
-                'de_name': calc_name,
-                'cat_combo': None,
-                'numeric_sum': months_of_stock,
-            }
-            calculated_vals.append(sc_mos_val)
+    def months_of_stock_rows():
+        # perform calculations, a row at a time so the page can be sent as it is rendered
+        for district_subcounty_facility, stock_row in stock_grid:
+            calculated_vals = [months_of_stock(*stock) for stock in grouper(map(nan_to_none, stock_row.values), 3)]
 
-        if True:
-            _group[1] = calculated_vals
-        else:
-            _group[1].extend(calculated_vals)
+            yield district_subcounty_facility, grouped_vals.make_row(district_subcounty_facility, calculated_vals)
 
     data_element_names = list()
     if False:
@@ -5383,45 +4124,18 @@ def sc_mos_by_site(request, output_format='HTML'):
             sc_soh_ls.mappings[mos_base_index+(i)] = True
     legend_sets.append(sc_soh_ls)
 
+    table = TableParams.from_request(request)
+    page_rows = table.apply(months_of_stock_rows(), len(ou_headers), legend_sets, num_rows=len(stock_grid))
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_names)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="sc_mos_sites_scorecard.xlsx"'
-
-        return response
+        grouped_vals.rows = [row for _, row in page_rows]
+        return scorecard_excel_response('sc_mos_sites_scorecard.xlsx', ou_headers, data_element_names, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        grouped_vals.rows = [row for _, row in page_rows]
+        return scorecard_csv_response('sc_mos_sites_scorecard.csv', ou_headers, data_element_names, grouped_vals)
 
     context = {
-        'grouped_data': grouped_vals,
+        'grouped_data': page_rows,
         'ou_headers': ou_headers,
         'data_element_names': data_element_names,
         'legend_sets': legend_sets,
@@ -5429,49 +4143,50 @@ def sc_mos_by_site(request, output_format='HTML'):
         'period_list': PREV_5YR_MONTHS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         #TODO: this doesn't work if you have more than one LegendSet mapped to the exact same columns
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
-    return render(request, 'cannula/sc_mos_sites.html', context)
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
+    return stream_scorecard(request, 'cannula/sc_mos_sites.html', context)
 
 @login_required
+@cache_scorecard
 def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     target_all_de_names = (
@@ -5483,26 +4198,11 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_target_all_meta = list(product(target_all_de_names, (None,)))
     data_element_metas += list(product(target_all_short_names, (None,)))
 
-    qs_target_all = DataValue.objects.what(*target_all_de_names)
-    qs_target_all = qs_target_all.annotate(cat_combo=Value(None, output_field=CharField()))
-    # qs_target_all = qs_target_all.annotate(cat_combo=F('category_combo__name'))
-    if filter_district:
-        qs_target_all = qs_target_all.where(filter_district)
-    qs_target_all = qs_target_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # target_all are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_target_all = qs_target_all.when(filter_period[:4])
-    qs_target_all = qs_target_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_target_all = qs_target_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_target_all = list(val_target_all)
-
-    gen_raster = grabbag.rasterize(ou_list, de_target_all_meta, val_target_all, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_target_all2 = list(gen_raster)
-
     subcategory_names = ('(<15, Female)', '(<15, Male)', '(15+, Female)', '(15+, Male)')
     subcategory_names2 = ('(<1, Female)', '(<1, Male)', '(1-9, Female)', '(1-9, Male)', '(10-14, Female)', '(10-14, Male)', '(15+, Female)', '(15+, Male)')
     cc_lt_15 = ['<2 Years', '2 - < 5 Years (HIV Care)', '5 - 14 Years']
     cc_ge_15 = ['15 Years and above']
-    
+
     targets_de_names = (
         'TX_NEW (N, Aggregated Age/Sex) TARGET: HIV Prevention Program',
     )
@@ -5514,21 +4214,6 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     # de_targets_meta = list(product(targets_de_names, subcategory_names2))
     # data_element_metas += list(product(targets_short_names, subcategory_names2))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=F('category_combo__name'))
-    qs_targets = qs_targets.filter(category_combo__name__in=subcategory_names2)
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, so filter by year component of period and divide result by 4 to get quarter
-    qs_targets = qs_targets.when(filter_period[:4])
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     art_new_de_names = (
         '106a ART No. of new clients started on ART at this facility during the quarter',
     )
@@ -5538,20 +4223,6 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_new_meta = list(product(art_new_short_names, (None,)))
     data_element_metas += de_art_new_meta
 
-    qs_art_new = DataValue.objects.what(*art_new_de_names)
-    qs_art_new = qs_art_new.annotate(de_name=Value(art_new_short_names[0], output_field=CharField()))
-    qs_art_new = qs_art_new.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_art_new = qs_art_new.where(filter_district)
-    qs_art_new = qs_art_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_new = qs_art_new.when(filter_period)
-    qs_art_new = qs_art_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_new = qs_art_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_new = list(val_art_new)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_new_meta, val_art_new, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_new2 = list(gen_raster)
-    
     art_new_lt_15_de_names = (
         '106a ART No. of new clients started on ART at this facility during the quarter',
     )
@@ -5561,29 +4232,6 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_new_lt_15_meta = list(product(art_new_lt_15_short_names, subcategory_names[:2]))
     data_element_metas += de_art_new_lt_15_meta
 
-    qs_art_new_lt_15 = DataValue.objects.what(*art_new_lt_15_de_names)
-    qs_art_new_lt_15 = qs_art_new_lt_15.annotate(de_name=Value(art_new_lt_15_short_names[0], output_field=CharField()))
-    qs_art_new_lt_15 = qs_art_new_lt_15.filter(Q(category_combo__categories__name='<2 Years')|Q(category_combo__categories__name='2 - < 5 Years (HIV Care)')|Q(category_combo__categories__name='5 - 14 Years'))
-    qs_art_new_lt_15 = qs_art_new_lt_15.annotate(
-        cat_combo=Case(
-            When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
-            When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
-            # When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
-            # When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
-            default=None, output_field=CharField()
-        )
-    )
-    if filter_district:
-        qs_art_new_lt_15 = qs_art_new_lt_15.where(filter_district)
-    qs_art_new_lt_15 = qs_art_new_lt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_new_lt_15 = qs_art_new_lt_15.when(filter_period)
-    qs_art_new_lt_15 = qs_art_new_lt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_new_lt_15 = qs_art_new_lt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_new_lt_15 = list(val_art_new_lt_15)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_new_lt_15_meta, val_art_new_lt_15, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_new_lt_152 = list(gen_raster)
-    
     art_new_gt_15_de_names = (
         '106a ART No. of new clients started on ART at this facility during the quarter',
     )
@@ -5593,104 +4241,129 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_new_gt_15_meta = list(product(art_new_gt_15_short_names, subcategory_names[2:]))
     data_element_metas += de_art_new_gt_15_meta
 
-    qs_art_new_gt_15 = DataValue.objects.what(*art_new_gt_15_de_names)
-    qs_art_new_gt_15 = qs_art_new_gt_15.annotate(de_name=Value(art_new_gt_15_short_names[0], output_field=CharField()))
-    qs_art_new_gt_15 = qs_art_new_gt_15.filter(Q(category_combo__categories__name='15 Years and above'))
-    qs_art_new_gt_15 = qs_art_new_gt_15.annotate(
-        cat_combo=Case(
-            # When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
-            # When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
-            default=None, output_field=CharField()
+    def art_new_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_target_all = DataValue.objects.what(*target_all_de_names)
+        qs_target_all = qs_target_all.annotate(cat_combo=Value(None, output_field=CharField()))
+        # qs_target_all = qs_target_all.annotate(cat_combo=F('category_combo__name'))
+        if filter_district:
+            qs_target_all = qs_target_all.where(filter_district)
+        qs_target_all = qs_target_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # target_all are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_target_all = qs_target_all.when(*sorted(set(p[:4] for p in periods)))
+        qs_target_all = qs_target_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_target_all = qs_target_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_target_all = list(val_target_all)
+
+        gen_raster = pivot(year_rows, de_target_all_meta, val_target_all, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_target_all2 = list(gen_raster)
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=F('category_combo__name'))
+        qs_targets = qs_targets.filter(category_combo__name__in=subcategory_names2)
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, so filter by year component of period and divide result by 4 to get quarter
+        qs_targets = qs_targets.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value')/4)
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(year_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_art_new = DataValue.objects.what(*art_new_de_names)
+        qs_art_new = qs_art_new.annotate(de_name=Value(art_new_short_names[0], output_field=CharField()))
+        qs_art_new = qs_art_new.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_art_new = qs_art_new.where(filter_district)
+        qs_art_new = qs_art_new.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_new = qs_art_new.when(*periods)
+        qs_art_new = qs_art_new.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_new = qs_art_new.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_new = list(val_art_new)
+
+        gen_raster = pivot(period_rows, de_art_new_meta, val_art_new, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_new2 = list(gen_raster)
+
+        qs_art_new_lt_15 = DataValue.objects.what(*art_new_lt_15_de_names)
+        qs_art_new_lt_15 = qs_art_new_lt_15.annotate(de_name=Value(art_new_lt_15_short_names[0], output_field=CharField()))
+        qs_art_new_lt_15 = qs_art_new_lt_15.filter(Q(category_combo__categories__name='<2 Years')|Q(category_combo__categories__name='2 - < 5 Years (HIV Care)')|Q(category_combo__categories__name='5 - 14 Years'))
+        qs_art_new_lt_15 = qs_art_new_lt_15.annotate(
+            cat_combo=Case(
+                When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
+                When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
+                # When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
+                # When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
+                default=None, output_field=CharField()
+            )
         )
-    )
-    if filter_district:
-        qs_art_new_gt_15 = qs_art_new_gt_15.where(filter_district)
-    qs_art_new_gt_15 = qs_art_new_gt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_new_gt_15 = qs_art_new_gt_15.when(filter_period)
-    qs_art_new_gt_15 = qs_art_new_gt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_new_gt_15 = qs_art_new_gt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_new_gt_15 = list(val_art_new_gt_15)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_new_gt_15_meta, val_art_new_gt_15, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_new_gt_152 = list(gen_raster)
-
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_target_all2, val_targets2, val_art_new2, val_art_new_lt_152, val_art_new_gt_152), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (target_all, target_under15_f, target_under15_m, target_over15_f, target_over15_m, art_new, art_new_under15_f, art_new_under15_m, art_new_over15_f, art_new_over15_m, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(art_new['numeric_sum'], target_all['numeric_sum']) and target_all['numeric_sum']:
-            perf_art_new = 100 * art_new['numeric_sum'] / target_all['numeric_sum']
-        else:
-            perf_art_new = None
-        perf_art_new_val = {
-            'de_name': 'Perf% New on ART',
-            'cat_combo': None,
-            'numeric_sum': perf_art_new,
-        }
-        perf_art_new_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_new_val)
-
-        if all_not_none(art_new_under15_f['numeric_sum'], target_under15_f['numeric_sum']) and target_under15_f['numeric_sum']:
-            perf_art_new_under15_f = 100 * art_new_under15_f['numeric_sum'] / target_under15_f['numeric_sum']
-        else:
-            perf_art_new_under15_f = None
-        perf_art_new_under15_f_val = {
-            'de_name': 'Perf% New on ART',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': perf_art_new_under15_f,
-        }
-        perf_art_new_under15_f_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_new_under15_f_val)
-
-        if all_not_none(art_new_under15_m['numeric_sum'], target_under15_m['numeric_sum']) and target_under15_m['numeric_sum']:
-            perf_art_new_under15_m = 100 * art_new_under15_m['numeric_sum'] / target_under15_m['numeric_sum']
-        else:
-            perf_art_new_under15_m = None
-        perf_art_new_under15_m_val = {
-            'de_name': 'Perf% New on ART',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': perf_art_new_under15_m,
-        }
-        perf_art_new_under15_m_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_new_under15_m_val)
-
-        if all_not_none(art_new_over15_f['numeric_sum'], target_over15_f['numeric_sum']) and target_over15_f['numeric_sum']:
-            perf_art_new_over15_f = 100 * art_new_over15_f['numeric_sum'] / target_over15_f['numeric_sum']
-        else:
-            perf_art_new_over15_f = None
-        perf_art_new_over15_f_val = {
-            'de_name': 'Perf% New on ART',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': perf_art_new_over15_f,
-        }
-        perf_art_new_over15_f_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_new_over15_f_val)
+        if filter_district:
+            qs_art_new_lt_15 = qs_art_new_lt_15.where(filter_district)
+        qs_art_new_lt_15 = qs_art_new_lt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_new_lt_15 = qs_art_new_lt_15.when(*periods)
+        qs_art_new_lt_15 = qs_art_new_lt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_new_lt_15 = qs_art_new_lt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_new_lt_15 = list(val_art_new_lt_15)
+
+        gen_raster = pivot(period_rows, de_art_new_lt_15_meta, val_art_new_lt_15, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_new_lt_152 = list(gen_raster)
+
+        qs_art_new_gt_15 = DataValue.objects.what(*art_new_gt_15_de_names)
+        qs_art_new_gt_15 = qs_art_new_gt_15.annotate(de_name=Value(art_new_gt_15_short_names[0], output_field=CharField()))
+        qs_art_new_gt_15 = qs_art_new_gt_15.filter(Q(category_combo__categories__name='15 Years and above'))
+        qs_art_new_gt_15 = qs_art_new_gt_15.annotate(
+            cat_combo=Case(
+                # When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
+                # When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
+                default=None, output_field=CharField()
+            )
+        )
+        if filter_district:
+            qs_art_new_gt_15 = qs_art_new_gt_15.where(filter_district)
+        qs_art_new_gt_15 = qs_art_new_gt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_new_gt_15 = qs_art_new_gt_15.when(*periods)
+        qs_art_new_gt_15 = qs_art_new_gt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_new_gt_15 = qs_art_new_gt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_new_gt_15 = list(val_art_new_gt_15)
+
+        gen_raster = pivot(period_rows, de_art_new_gt_15_meta, val_art_new_gt_15, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_new_gt_152 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_target_all2, val_targets2, val_art_new2, val_art_new_lt_152, val_art_new_gt_152)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(art_new_over15_m['numeric_sum'], target_over15_m['numeric_sum']) and target_over15_m['numeric_sum']:
-            perf_art_new_over15_m = 100 * art_new_over15_m['numeric_sum'] / target_over15_m['numeric_sum']
-        else:
-            perf_art_new_over15_m = None
-        perf_art_new_over15_m_val = {
-            'de_name': 'Perf% New on ART',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': perf_art_new_over15_m,
-        }
-        perf_art_new_over15_m_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_new_over15_m_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    art_new_matrix = cached_result('art_new_scorecard', (periods, filter_district and filter_district.name), art_new_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        art_new_matrix = art_new_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        art_new_matrix = art_new_matrix.rollup(ou_list)
+    art_new_matrix.calculate(art_new_calculations)
 
     data_element_metas += list(product(['Perf% New on ART'], (None,)))
     data_element_metas += list(product(['Perf% New on ART'], ('(<15, Female)',)))
@@ -5714,42 +4387,19 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
     art_new_ls.mappings[num_path_elements+14] = True
     legend_sets.append(art_new_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(art_new_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        art_new_matrix = art_new_matrix.take(table.matrix_rows(art_new_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = art_new_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="art_new_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('art_new_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('art_new_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
 
     context = {
@@ -5758,51 +4408,55 @@ def art_new_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/art_new_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     target_all_de_names = (
@@ -5814,26 +4468,11 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_target_all_meta = list(product(target_all_de_names, (None,)))
     data_element_metas += list(product(target_all_short_names, (None,)))
 
-    qs_target_all = DataValue.objects.what(*target_all_de_names)
-    qs_target_all = qs_target_all.annotate(cat_combo=Value(None, output_field=CharField()))
-    # qs_target_all = qs_target_all.annotate(cat_combo=F('category_combo__name'))
-    if filter_district:
-        qs_target_all = qs_target_all.where(filter_district)
-    qs_target_all = qs_target_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, but this is a cumulative target, so filter by year component of period and *DO NOT* divide result by 4 to get quarter
-    qs_target_all = qs_target_all.when(filter_period[:4])
-    qs_target_all = qs_target_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_target_all = qs_target_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_target_all = list(val_target_all)
-
-    gen_raster = grabbag.rasterize(ou_list, de_target_all_meta, val_target_all, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_target_all2 = list(gen_raster)
-
     subcategory_names = ('(<15, Female)', '(<15, Male)', '(15+, Female)', '(15+, Male)')
     subcategory_names2 = ('(<1, Female)', '(<1, Male)', '(1-9, Female)', '(1-9, Male)', '(10-14, Female)', '(10-14, Male)', '(15+, Female)', '(15+, Male)')
     cc_lt_15 = ['<2 Years', '2 - < 5 Years (HIV Care)', '5 - 14 Years']
     cc_ge_15 = ['15 Years and above']
-    
+
     targets_de_names = (
         'TX_CURR (N, Aggregated Age/Sex) TARGET: Receiving ART',
     )
@@ -5845,21 +4484,6 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     # de_targets_meta = list(product(targets_de_names, subcategory_names2))
     # data_element_metas += list(product(targets_short_names, subcategory_names2))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=F('category_combo__name'))
-    qs_targets = qs_targets.filter(category_combo__name__in=subcategory_names)
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    # targets are annual, but this is a cumulative target, so filter by year component of period and *DO NOT* divide result by 4 to get quarter
-    qs_targets = qs_targets.when(filter_period[:4])
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     art_active_de_names = (
         '106a ART No. active on ART on 1st line ARV regimen',
         '106a ART No. active on ART on 2nd line ARV regimen',
@@ -5871,20 +4495,6 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_active_meta = list(product(art_active_short_names, (None,)))
     data_element_metas += de_art_active_meta
 
-    qs_art_active = DataValue.objects.what(*art_active_de_names)
-    qs_art_active = qs_art_active.annotate(de_name=Value(art_active_short_names[0], output_field=CharField()))
-    qs_art_active = qs_art_active.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_art_active = qs_art_active.where(filter_district)
-    qs_art_active = qs_art_active.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_active = qs_art_active.when(filter_period)
-    qs_art_active = qs_art_active.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_active = qs_art_active.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_active = list(val_art_active)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_active_meta, val_art_active, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_active2 = list(gen_raster)
-    
     art_active_lt_15_de_names = (
         '106a ART No. active on ART on 1st line ARV regimen',
         '106a ART No. active on ART on 2nd line ARV regimen',
@@ -5896,29 +4506,6 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_active_lt_15_meta = list(product(art_active_lt_15_short_names, subcategory_names[:2]))
     data_element_metas += de_art_active_lt_15_meta
 
-    qs_art_active_lt_15 = DataValue.objects.what(*art_active_lt_15_de_names)
-    qs_art_active_lt_15 = qs_art_active_lt_15.annotate(de_name=Value(art_active_lt_15_short_names[0], output_field=CharField()))
-    qs_art_active_lt_15 = qs_art_active_lt_15.filter(Q(category_combo__categories__name='<2 Years')|Q(category_combo__categories__name='2 - < 5 Years (HIV Care)')|Q(category_combo__categories__name='5 - 14 Years'))
-    qs_art_active_lt_15 = qs_art_active_lt_15.annotate(
-        cat_combo=Case(
-            When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
-            When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
-            # When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
-            # When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
-            default=None, output_field=CharField()
-        )
-    )
-    if filter_district:
-        qs_art_active_lt_15 = qs_art_active_lt_15.where(filter_district)
-    qs_art_active_lt_15 = qs_art_active_lt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_active_lt_15 = qs_art_active_lt_15.when(filter_period)
-    qs_art_active_lt_15 = qs_art_active_lt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_active_lt_15 = qs_art_active_lt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_active_lt_15 = list(val_art_active_lt_15)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_active_lt_15_meta, val_art_active_lt_15, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_active_lt_152 = list(gen_raster)
-    
     art_active_gt_15_de_names = (
         '106a ART No. active on ART on 1st line ARV regimen',
         '106a ART No. active on ART on 2nd line ARV regimen',
@@ -5930,104 +4517,129 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     de_art_active_gt_15_meta = list(product(art_active_gt_15_short_names, subcategory_names[2:]))
     data_element_metas += de_art_active_gt_15_meta
 
-    qs_art_active_gt_15 = DataValue.objects.what(*art_active_gt_15_de_names)
-    qs_art_active_gt_15 = qs_art_active_gt_15.annotate(de_name=Value(art_active_gt_15_short_names[0], output_field=CharField()))
-    qs_art_active_gt_15 = qs_art_active_gt_15.filter(Q(category_combo__categories__name='15 Years and above'))
-    qs_art_active_gt_15 = qs_art_active_gt_15.annotate(
-        cat_combo=Case(
-            # When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
-            # When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
-            When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
-            default=None, output_field=CharField()
+    def art_active_facility_matrix():
+        # data is collected at facility level, coarser levels are rolled up from the facility matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(3)[1:] # skip the topmost/country level
+        FACILITY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(3, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(3, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_target_all = DataValue.objects.what(*target_all_de_names)
+        qs_target_all = qs_target_all.annotate(cat_combo=Value(None, output_field=CharField()))
+        # qs_target_all = qs_target_all.annotate(cat_combo=F('category_combo__name'))
+        if filter_district:
+            qs_target_all = qs_target_all.where(filter_district)
+        qs_target_all = qs_target_all.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, but this is a cumulative target, so filter by year component of period and *DO NOT* divide result by 4 to get quarter
+        qs_target_all = qs_target_all.when(*sorted(set(p[:4] for p in periods)))
+        qs_target_all = qs_target_all.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_target_all = qs_target_all.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_target_all = list(val_target_all)
+
+        gen_raster = pivot(year_rows, de_target_all_meta, val_target_all, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_target_all2 = list(gen_raster)
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=F('category_combo__name'))
+        qs_targets = qs_targets.filter(category_combo__name__in=subcategory_names)
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        # targets are annual, but this is a cumulative target, so filter by year component of period and *DO NOT* divide result by 4 to get quarter
+        qs_targets = qs_targets.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(year_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_art_active = DataValue.objects.what(*art_active_de_names)
+        qs_art_active = qs_art_active.annotate(de_name=Value(art_active_short_names[0], output_field=CharField()))
+        qs_art_active = qs_art_active.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_art_active = qs_art_active.where(filter_district)
+        qs_art_active = qs_art_active.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_active = qs_art_active.when(*periods)
+        qs_art_active = qs_art_active.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_active = qs_art_active.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_active = list(val_art_active)
+
+        gen_raster = pivot(period_rows, de_art_active_meta, val_art_active, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_active2 = list(gen_raster)
+
+        qs_art_active_lt_15 = DataValue.objects.what(*art_active_lt_15_de_names)
+        qs_art_active_lt_15 = qs_art_active_lt_15.annotate(de_name=Value(art_active_lt_15_short_names[0], output_field=CharField()))
+        qs_art_active_lt_15 = qs_art_active_lt_15.filter(Q(category_combo__categories__name='<2 Years')|Q(category_combo__categories__name='2 - < 5 Years (HIV Care)')|Q(category_combo__categories__name='5 - 14 Years'))
+        qs_art_active_lt_15 = qs_art_active_lt_15.annotate(
+            cat_combo=Case(
+                When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
+                When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
+                # When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
+                # When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
+                default=None, output_field=CharField()
+            )
         )
-    )
-    if filter_district:
-        qs_art_active_gt_15 = qs_art_active_gt_15.where(filter_district)
-    qs_art_active_gt_15 = qs_art_active_gt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_art_active_gt_15 = qs_art_active_gt_15.when(filter_period)
-    qs_art_active_gt_15 = qs_art_active_gt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_art_active_gt_15 = qs_art_active_gt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_art_active_gt_15 = list(val_art_active_gt_15)
-
-    gen_raster = grabbag.rasterize(ou_list, de_art_active_gt_15_meta, val_art_active_gt_15, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_art_active_gt_152 = list(gen_raster)
-
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_target_all2, val_targets2, val_art_active2, val_art_active_lt_152, val_art_active_gt_152), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (target_all, target_under15_f, target_under15_m, target_over15_f, target_over15_m, art_active, art_active_under15_f, art_active_under15_m, art_active_over15_f, art_active_over15_m, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(art_active['numeric_sum'], target_all['numeric_sum']) and target_all['numeric_sum']:
-            perf_art_active = 100 * art_active['numeric_sum'] / target_all['numeric_sum']
-        else:
-            perf_art_active = None
-        perf_art_active_val = {
-            'de_name': 'Perf% Active on ART',
-            'cat_combo': None,
-            'numeric_sum': perf_art_active,
-        }
-        perf_art_active_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_active_val)
-
-        if all_not_none(art_active_under15_f['numeric_sum'], target_under15_f['numeric_sum']) and target_under15_f['numeric_sum']:
-            perf_art_active_under15_f = 100 * art_active_under15_f['numeric_sum'] / target_under15_f['numeric_sum']
-        else:
-            perf_art_active_under15_f = None
-        perf_art_active_under15_f_val = {
-            'de_name': 'Perf% Active on ART',
-            'cat_combo': '(<15, Female)',
-            'numeric_sum': perf_art_active_under15_f,
-        }
-        perf_art_active_under15_f_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_active_under15_f_val)
-
-        if all_not_none(art_active_under15_m['numeric_sum'], target_under15_m['numeric_sum']) and target_under15_m['numeric_sum']:
-            perf_art_active_under15_m = 100 * art_active_under15_m['numeric_sum'] / target_under15_m['numeric_sum']
-        else:
-            perf_art_active_under15_m = None
-        perf_art_active_under15_m_val = {
-            'de_name': 'Perf% Active on ART',
-            'cat_combo': '(<15, Male)',
-            'numeric_sum': perf_art_active_under15_m,
-        }
-        perf_art_active_under15_m_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_active_under15_m_val)
+        if filter_district:
+            qs_art_active_lt_15 = qs_art_active_lt_15.where(filter_district)
+        qs_art_active_lt_15 = qs_art_active_lt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_active_lt_15 = qs_art_active_lt_15.when(*periods)
+        qs_art_active_lt_15 = qs_art_active_lt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_active_lt_15 = qs_art_active_lt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_active_lt_15 = list(val_art_active_lt_15)
+
+        gen_raster = pivot(period_rows, de_art_active_lt_15_meta, val_art_active_lt_15, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_active_lt_152 = list(gen_raster)
+
+        qs_art_active_gt_15 = DataValue.objects.what(*art_active_gt_15_de_names)
+        qs_art_active_gt_15 = qs_art_active_gt_15.annotate(de_name=Value(art_active_gt_15_short_names[0], output_field=CharField()))
+        qs_art_active_gt_15 = qs_art_active_gt_15.filter(Q(category_combo__categories__name='15 Years and above'))
+        qs_art_active_gt_15 = qs_art_active_gt_15.annotate(
+            cat_combo=Case(
+                # When(Q(category_combo__categories__name__in=cc_lt_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[0])),
+                # When(Q(category_combo__categories__name__in=cc_lt_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[1])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & Q(category_combo__name__contains='Female'), then=Value(subcategory_names[2])),
+                When(Q(category_combo__categories__name__in=cc_ge_15) & ~Q(category_combo__name__contains='Female'), then=Value(subcategory_names[3])),
+                default=None, output_field=CharField()
+            )
+        )
+        if filter_district:
+            qs_art_active_gt_15 = qs_art_active_gt_15.where(filter_district)
+        qs_art_active_gt_15 = qs_art_active_gt_15.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_art_active_gt_15 = qs_art_active_gt_15.when(*periods)
+        qs_art_active_gt_15 = qs_art_active_gt_15.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_art_active_gt_15 = qs_art_active_gt_15.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_art_active_gt_15 = list(val_art_active_gt_15)
+
+        gen_raster = pivot(period_rows, de_art_active_gt_15_meta, val_art_active_gt_15, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_art_active_gt_152 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_target_all2, val_targets2, val_art_active2, val_art_active_lt_152, val_art_active_gt_152)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(art_active_over15_f['numeric_sum'], target_over15_f['numeric_sum']) and target_over15_f['numeric_sum']:
-            perf_art_active_over15_f = 100 * art_active_over15_f['numeric_sum'] / target_over15_f['numeric_sum']
-        else:
-            perf_art_active_over15_f = None
-        perf_art_active_over15_f_val = {
-            'de_name': 'Perf% Active on ART',
-            'cat_combo': '(15+, Female)',
-            'numeric_sum': perf_art_active_over15_f,
-        }
-        perf_art_active_over15_f_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_active_over15_f_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        if all_not_none(art_active_over15_m['numeric_sum'], target_over15_m['numeric_sum']) and target_over15_m['numeric_sum']:
-            perf_art_active_over15_m = 100 * art_active_over15_m['numeric_sum'] / target_over15_m['numeric_sum']
-        else:
-            perf_art_active_over15_m = None
-        perf_art_active_over15_m_val = {
-            'de_name': 'Perf% Active on ART',
-            'cat_combo': '(15+, Male)',
-            'numeric_sum': perf_art_active_over15_m,
-        }
-        perf_art_active_over15_m_val.update(_group_ou_dict)
-        calculated_vals.append(perf_art_active_over15_m_val)
-
-        _group[1].extend(calculated_vals)
+    # the facility matrix serves every level of this scorecard
+    art_active_matrix = cached_result('art_active_scorecard', (periods, filter_district and filter_district.name), art_active_facility_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        art_active_matrix = art_active_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        art_active_matrix = art_active_matrix.rollup(ou_list)
+    art_active_matrix.calculate(art_active_calculations)
 
     data_element_metas += list(product(['Perf% Active on ART'], (None,)))
     data_element_metas += list(product(['Perf% Active on ART'], ('(<15, Female)',)))
@@ -6051,42 +4663,19 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
     art_active_ls.mappings[num_path_elements+14] = True
     legend_sets.append(art_active_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(art_active_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        art_active_matrix = art_active_matrix.take(table.matrix_rows(art_active_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = art_active_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="art_active_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('art_active_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('art_active_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
 
     context = {
@@ -6095,53 +4684,55 @@ def art_active_scorecard(request, org_unit_level=3, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/art_active_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def mnch_preg_birth_scorecard(request, org_unit_level=2, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
-    # annotations for data collected at subcounty level
-    SUBCOUNTY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(2, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     targets_de_names = (
@@ -6153,20 +4744,6 @@ def mnch_preg_birth_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_targets_meta = list(product(targets_de_names, (None,)))
     data_element_metas += list(product(targets_short_names, (None,)))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
-    # population estimates are annual, so filter by year component of period
-    qs_targets = qs_targets.when(filter_period[:4])
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     anc_de_names = (
         '105-2.1 A1:ANC 1st Visit for women',
         '105-2.1 A1:ANC 1st Visit for women (No. in 1st Trimester)',
@@ -6188,219 +4765,71 @@ def mnch_preg_birth_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_anc_meta = list(product(anc_de_names, (None,)))
     data_element_metas += de_anc_meta
 
-    qs_anc = DataValue.objects.what(*anc_de_names)
-    qs_anc = qs_anc.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_anc = qs_anc.where(filter_district)
-    qs_anc = qs_anc.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_anc = qs_anc.when(filter_period)
-    qs_anc = qs_anc.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_anc = qs_anc.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_anc = list(val_anc)
-
-    gen_raster = grabbag.rasterize(ou_list, de_anc_meta, val_anc, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_anc2 = list(gen_raster)
-
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_targets2, val_anc2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (catchment_pop, anc1, anc1_1st_trimester, anc_already_art, anc4, ipt1, ipt2, anc_started_art, maternity_started_art, maternal_deaths, deliveries, pnc_started_art, vit_a_maternity, caesarian, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_pregnant = (catchment_pop['numeric_sum'] * Decimal(0.05))/4 # split by quarter
-        else:
-            expected_pregnant = None
-        expected_pregnant_val = {
-            'de_name': 'Expected Pregnancies',
-            'cat_combo': None,
-            'numeric_sum': expected_pregnant,
-        }
-        expected_pregnant_val.update(_group_ou_dict)
-        calculated_vals.append(expected_pregnant_val)
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            adolescent_pop = catchment_pop['numeric_sum'] * Decimal(0.128)
-        else:
-            adolescent_pop = None
-        adolescent_pop_val = {
-            'de_name': 'Adolescent Population',
-            'cat_combo': None,
-            'numeric_sum': adolescent_pop,
-        }
-        adolescent_pop_val.update(_group_ou_dict)
-        calculated_vals.append(adolescent_pop_val)
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_pregnant_hiv = (catchment_pop['numeric_sum'] * Decimal(0.0485) * Decimal(0.058))/4 # split by quarter
-        else:
-            expected_pregnant_hiv = None
-        expected_pregnant_hiv_val = {
-            'de_name': 'All expected pregnancies in a catchment population multiplied by HIV prevalence',
-            'cat_combo': None,
-            'numeric_sum': expected_pregnant_hiv,
-        }
-        expected_pregnant_hiv_val.update(_group_ou_dict)
-        calculated_vals.append(expected_pregnant_hiv_val)
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_deliver = (catchment_pop['numeric_sum'] * Decimal(0.0485))/4 # split by quarter
-        else:
-            expected_deliver = None
-        expected_deliver_val = {
-            'de_name': 'Expected Deliveries',
-            'cat_combo': None,
-            'numeric_sum': expected_deliver,
-        }
-        expected_deliver_val.update(_group_ou_dict)
-        calculated_vals.append(expected_deliver_val)
-
-        if all_not_none(anc1['numeric_sum'], expected_pregnant) and expected_pregnant:
-            anc1_percent = 100 * anc1['numeric_sum'] / expected_pregnant
-        else:
-            anc1_percent = None
-        anc1_percent_val = {
-            'de_name': '% ANC1 Attendance coverage---Target=90%',
-            'cat_combo': None,
-            'numeric_sum': anc1_percent,
-        }
-        anc1_percent_val.update(_group_ou_dict)
-        calculated_vals.append(anc1_percent_val)
-
-        if all_not_none(anc1_1st_trimester['numeric_sum'], expected_pregnant) and expected_pregnant:
-            anc1_1st_trimester_percent = 100 * anc1_1st_trimester['numeric_sum'] / expected_pregnant
-        else:
-            anc1_1st_trimester_percent = None
-        anc1_1st_trimester_percent_val = {
-            'de_name': '% of pregnant women attending 1st ANC visit within the 1st trimester---Target=45%',
-            'cat_combo': None,
-            'numeric_sum': anc1_1st_trimester_percent,
-        }
-        anc1_1st_trimester_percent_val.update(_group_ou_dict)
-        calculated_vals.append(anc1_1st_trimester_percent_val)
-
-        if all_not_none(anc4['numeric_sum'], expected_pregnant) and expected_pregnant:
-            anc4_percent = 100 * anc4['numeric_sum'] / expected_pregnant
-        else:
-            anc4_percent = None
-        anc4_percent_val = {
-            'de_name': '% ANC4 Attendance coverage---Target=60%',
-            'cat_combo': None,
-            'numeric_sum': anc4_percent,
-        }
-        anc4_percent_val.update(_group_ou_dict)
-        calculated_vals.append(anc4_percent_val)
-
-        if all_not_none(ipt1['numeric_sum'], expected_pregnant) and expected_pregnant:
-            ipt1_percent = 100 * ipt1['numeric_sum'] / expected_pregnant
-        else:
-            ipt1_percent = None
-        ipt1_percent_val = {
-            'de_name': 'IPT1 Coverage--Target=90%',
-            'cat_combo': None,
-            'numeric_sum': ipt1_percent,
-        }
-        ipt1_percent_val.update(_group_ou_dict)
-        calculated_vals.append(ipt1_percent_val)
-
-        if all_not_none(ipt2['numeric_sum'], expected_pregnant) and expected_pregnant:
-            ipt2_percent = 100 * ipt2['numeric_sum'] / expected_pregnant
-        else:
-            ipt2_percent = None
-        ipt2_percent_val = {
-            'de_name': 'IPT2 Coverage--Target=90%',
-            'cat_combo': None,
-            'numeric_sum': ipt2_percent,
-        }
-        ipt2_percent_val.update(_group_ou_dict)
-        calculated_vals.append(ipt2_percent_val)
+    def mnch_subcounty_matrix():
+        # data is collected at facility and subcounty level, the district level is rolled up from the subcounty matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(2)[1:] # skip the topmost/country level
+        # annotations for data collected at facility level
+        FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
+        # annotations for data collected at subcounty level
+        SUBCOUNTY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(2, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(2, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
+        # population estimates are annual, so filter by year component of period
+        qs_targets = qs_targets.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(year_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_anc = DataValue.objects.what(*anc_de_names)
+        qs_anc = qs_anc.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_anc = qs_anc.where(filter_district)
+        qs_anc = qs_anc.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_anc = qs_anc.when(*periods)
+        qs_anc = qs_anc.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_anc = qs_anc.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_anc = list(val_anc)
+
+        gen_raster = pivot(period_rows, de_anc_meta, val_anc, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_anc2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_targets2, val_anc2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(vit_a_maternity['numeric_sum'], deliveries['numeric_sum']) and deliveries['numeric_sum']:
-            vit_a_maternity_percent = 100 * vit_a_maternity['numeric_sum'] / deliveries['numeric_sum']
-        else:
-            vit_a_maternity_percent = None
-        vit_a_maternity_percent_val = {
-            'de_name': 'VITA Supplementation for mothers--Target =90%',
-            'cat_combo': None,
-            'numeric_sum': vit_a_maternity_percent,
-        }
-        vit_a_maternity_percent_val.update(_group_ou_dict)
-        calculated_vals.append(vit_a_maternity_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        if all_not_none(maternal_deaths['numeric_sum'], deliveries['numeric_sum']) and deliveries['numeric_sum']:
-            maternal_deaths_percent = 100 * maternal_deaths['numeric_sum'] / deliveries['numeric_sum']
-        else:
-            maternal_deaths_percent = None
-        maternal_deaths_percent_val = {
-            'de_name': 'Maternal mortality',
-            'cat_combo': None,
-            'numeric_sum': maternal_deaths_percent,
-        }
-        maternal_deaths_percent_val.update(_group_ou_dict)
-        calculated_vals.append(maternal_deaths_percent_val)
-
-        if all_not_none(expected_pregnant_hiv) and expected_pregnant_hiv:
-            emtct_art_percent = 100 * sum_zero(anc_already_art['numeric_sum'], anc_started_art['numeric_sum'], maternity_started_art['numeric_sum'], pnc_started_art['numeric_sum']) / expected_pregnant_hiv
-        else:
-            emtct_art_percent = None
-        emtct_art_percent_val = {
-            'de_name': '% of eMTCT eligible women on ART----95%',
-            'cat_combo': None,
-            'numeric_sum': emtct_art_percent,
-        }
-        emtct_art_percent_val.update(_group_ou_dict)
-        calculated_vals.append(emtct_art_percent_val)
-
-        if all_not_none(deliveries['numeric_sum'], expected_deliver) and expected_deliver:
-            deliveries_in_unit_percent = 100 * deliveries['numeric_sum'] / expected_deliver
-        else:
-            deliveries_in_unit_percent = None
-        deliveries_in_unit_percent_val = {
-            'de_name': '% of institutional deliveries  Target=60%',
-            'cat_combo': None,
-            'numeric_sum': deliveries_in_unit_percent,
-        }
-        deliveries_in_unit_percent_val.update(_group_ou_dict)
-        calculated_vals.append(deliveries_in_unit_percent_val)
+    # the subcounty matrix serves every level of this scorecard
+    mnch_matrix = cached_result('mnch_preg_birth_scorecard', (periods, filter_district and filter_district.name), mnch_subcounty_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        mnch_matrix = mnch_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        mnch_matrix = mnch_matrix.rollup(ou_list)
+    mnch_matrix.calculate(mnch_preg_birth_calculations)
 
-        if all_not_none(caesarian['numeric_sum'], expected_deliver) and expected_deliver:
-            caesarean_percent = 100 * caesarian['numeric_sum'] / expected_deliver
-        else:
-            caesarean_percent = None
-        caesarean_percent_val = {
-            'de_name': 'Caesarean section rate (10%-15%)',
-            'cat_combo': None,
-            'numeric_sum': caesarean_percent,
-        }
-        caesarean_percent_val.update(_group_ou_dict)
-        calculated_vals.append(caesarean_percent_val)
-
-        # _group[1].extend(calculated_vals)
-        _group[1] = calculated_vals # hide source values
-
-    data_element_metas = list() # hide source values
-    data_element_metas += list(product(['Expected Pregnancies (5 % of population)'], (None,)))
-    data_element_metas += list(product(['Adolescent Population (12.8 % of population)'], (None,)))
-    data_element_metas += list(product(['All expected pregnancies in a catchment population multiplied by HIV prevalence'], (None,)))
-    data_element_metas += list(product(['Expected Deliveries (4.8 % of population)'], (None,)))
-    data_element_metas += list(product(['% ANC1 Attendance coverage---Target=90%'], (None,)))
-    data_element_metas += list(product(['% of pregnant women attending 1st ANC visit within the 1st trimester---Target=45%'], (None,)))
-    data_element_metas += list(product(['% ANC4 Attendance coverage---Target=60%'], (None,)))
-    data_element_metas += list(product(['IPT1 Coverage--Target=90%'], (None,)))
-    data_element_metas += list(product(['IPT2 Coverage--Target=90%'], (None,)))
-    data_element_metas += list(product(['VITA Supplementation for mothers--Target =90%'], (None,)))
-    data_element_metas += list(product(['Maternal mortality'], (None,)))
-    data_element_metas += list(product(['% of eMTCT eligible women on ART----95%'], (None,)))
-    data_element_metas += list(product(['% of institutional deliveries  Target=60%'], (None,)))
-    data_element_metas += list(product(['Caesarean section rate (10%-15%)'], (None,)))
+    data_element_metas = list(MNCH_PREG_BIRTH_COLUMNS) # hide source values
 
 
     num_path_elements = len(ou_headers)
@@ -6452,42 +4881,19 @@ def mnch_preg_birth_scorecard(request, org_unit_level=2, output_format='HTML'):
     caesarian_ls.mappings[num_path_elements+13] = True
     legend_sets.append(caesarian_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(mnch_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        mnch_matrix = mnch_matrix.take(table.matrix_rows(mnch_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = mnch_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="mnch_preg_birth_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('mnch_preg_birth_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('mnch_preg_birth_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
 
     context = {
@@ -6496,53 +4902,55 @@ def mnch_preg_birth_scorecard(request, org_unit_level=2, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/mnch_preg_birth_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
 
 @login_required
+@cache_scorecard
 def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     this_day = date.today()
     this_year = this_day.year
-    PREV_5YR_QTRS = ['%d-Q%d' % (y, q) for y in range(this_year, this_year-6, -1) for q in range(4, 0, -1)]
-    DISTRICT_LIST = list(OrgUnit.objects.filter(level=1).order_by('name').values_list('name', flat=True))
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+    dims = dimensions.current()
+    DISTRICT_LIST = dims.district_list
     OU_PATH_FIELDS = OrgUnit.level_fields(org_unit_level)[1:] # skip the topmost/country level
-    # annotations for data collected at facility level
-    FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
-    # annotations for data collected at subcounty level
-    SUBCOUNTY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(2, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
 
     if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
         filter_period=request.GET['period']
     else:
         filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
 
-    period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
+    # trend mode, with a row for each period between start_period and end_period
+    periods = trend_periods(request, PREV_5YR_QTRS)
+    trend = periods is not None
+    if trend:
+        period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+    else:
+        periods = [filter_period]
+        period_desc = dateutil.DateSpan.fromquarter(filter_period).format()
 
     if 'district' in request.GET and request.GET['district'] in DISTRICT_LIST:
-        filter_district = OrgUnit.objects.get(name=request.GET['district'])
+        filter_district = dims.district(request.GET['district'])
     else:
         filter_district = None
 
     # # all facilities (or equivalent)
-    qs_ou = OrgUnit.objects.filter(level=org_unit_level).annotate(**OrgUnit.level_annotations(org_unit_level))
-    if filter_district:
-        qs_ou = qs_ou.filter(Q(lft__gte=filter_district.lft) & Q(rght__lte=filter_district.rght))
-    qs_ou = qs_ou.order_by(*OU_PATH_FIELDS)
-
-    ou_list = list(qs_ou.values_list(*OU_PATH_FIELDS))
+    ou_list = dims.ou_paths(org_unit_level, filter_district)
     ou_headers = OrgUnit.level_names(org_unit_level)[1:] # skip the topmost/country level
 
-    def orgunit_vs_de_catcombo_default(row, col):
-        val_dict = dict(zip(OU_PATH_FIELDS, row))
-        de_name, subcategory = col
-        val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
-        return val_dict
-
     data_element_metas = list()
 
     targets_de_names = (
@@ -6554,20 +4962,6 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_targets_meta = list(product(targets_de_names, (None,)))
     data_element_metas += list(product(targets_short_names, (None,)))
 
-    qs_targets = DataValue.objects.what(*targets_de_names)
-    qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_targets = qs_targets.where(filter_district)
-    qs_targets = qs_targets.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
-    # population estimates are annual, so filter by year component of period
-    qs_targets = qs_targets.when(filter_period[:4])
-    qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_targets = list(val_targets)
-
-    gen_raster = grabbag.rasterize(ou_list, de_targets_meta, val_targets, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_targets2 = list(gen_raster)
-
     maternity_de_names = (
         '105-1.3 OPD Neonatal  Sepsis (0-7days)',
         '105-2.2 Birth Asyphyxia',
@@ -6583,19 +4977,6 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_maternity_meta = list(product(maternity_de_names, (None,)))
     data_element_metas += de_maternity_meta
 
-    qs_maternity = DataValue.objects.what(*maternity_de_names)
-    qs_maternity = qs_maternity.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_maternity = qs_maternity.where(filter_district)
-    qs_maternity = qs_maternity.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_maternity = qs_maternity.when(filter_period)
-    qs_maternity = qs_maternity.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_maternity = qs_maternity.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_maternity = list(val_maternity)
-
-    gen_raster = grabbag.rasterize(ou_list, de_maternity_meta, val_maternity, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_maternity2 = list(gen_raster)
-
     vaccine_under_1_de_names = (
         '105-2.11 BCG',
         '105-2.11 DPT-HepB+Hib 3',
@@ -6607,20 +4988,6 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_vaccine_under_1_meta = list(product(vaccine_under_1_de_names, (None,)))
     data_element_metas += de_vaccine_under_1_meta
 
-    qs_vaccine_under_1 = DataValue.objects.what(*vaccine_under_1_de_names)
-    qs_vaccine_under_1 = qs_vaccine_under_1.filter(category_combo__categories__name='Under 1')
-    qs_vaccine_under_1 = qs_vaccine_under_1.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_vaccine_under_1 = qs_vaccine_under_1.where(filter_district)
-    qs_vaccine_under_1 = qs_vaccine_under_1.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_vaccine_under_1 = qs_vaccine_under_1.when(filter_period)
-    qs_vaccine_under_1 = qs_vaccine_under_1.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_vaccine_under_1 = qs_vaccine_under_1.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_vaccine_under_1 = list(val_vaccine_under_1)
-
-    gen_raster = grabbag.rasterize(ou_list, de_vaccine_under_1_meta, val_vaccine_under_1, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_vaccine_under_12 = list(gen_raster)
-
     under_five_categs = ('0-28 Days', '29 Days-4 Years')
 
     under_5_de_names = (
@@ -6636,20 +5003,6 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_under_5_meta = list(product(under_5_de_names, (None,)))
     data_element_metas += de_under_5_meta
 
-    qs_under_5 = DataValue.objects.what(*under_5_de_names)
-    qs_under_5 = qs_under_5.filter(category_combo__categories__name__in=under_five_categs)
-    qs_under_5 = qs_under_5.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_under_5 = qs_under_5.where(filter_district)
-    qs_under_5 = qs_under_5.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_under_5 = qs_under_5.when(filter_period)
-    qs_under_5 = qs_under_5.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_under_5 = qs_under_5.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_under_5 = list(val_under_5)
-
-    gen_raster = grabbag.rasterize(ou_list, de_under_5_meta, val_under_5, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_under_52 = list(gen_raster)
-
     other_de_names = (
         '105-2.11 PCV 3',
         '105-2.8 Dewormed 2nd Dose in the Year',
@@ -6661,246 +5014,112 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     de_other_meta = list(product(other_de_names, (None,)))
     data_element_metas += de_other_meta
 
-    qs_other = DataValue.objects.what(*other_de_names)
-    qs_other = qs_other.annotate(cat_combo=Value(None, output_field=CharField()))
-    if filter_district:
-        qs_other = qs_other.where(filter_district)
-    qs_other = qs_other.annotate(**FACILITY_LEVEL_ANNOTATIONS)
-    qs_other = qs_other.when(filter_period)
-    qs_other = qs_other.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
-    val_other = qs_other.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
-    val_other = list(val_other)
-
-    gen_raster = grabbag.rasterize(ou_list, de_other_meta, val_other, ou_path_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
-    val_other2 = list(gen_raster)
-
-
-    # combine the data and group by district, subcounty and facility
-    grouped_vals = groupbylist(sorted(chain(val_targets2, val_maternity2, val_vaccine_under_12, val_under_52, val_other2), key=ou_path_from_dict), key=ou_path_from_dict)
-    if True:
-        grouped_vals = list(filter_empty_rows(grouped_vals))
-
-
-    # perform calculations
-    for _group in grouped_vals:
-        (_group_ou_path, (catchment_pop, neonatal_sepsis, asyphyxia, deliveries, still_fresh, still_macerated, live_births, pnc_6_hours, bcg_under1, dpt3_under1, polio3_under1, new_attend_under5, acute_diarr_under5, malaria_under5, malaria_conf_under5, pneum_under5, pcv, deworm, vitamin_a, *other_vals)) = _group
-        _group_ou_dict = dict(zip(OU_PATH_FIELDS, _group_ou_path))
-        
-        calculated_vals = list()
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_deliver = (catchment_pop['numeric_sum'] * Decimal(0.0485))/4 # split by quarter
-        else:
-            expected_deliver = None
-        expected_deliver_val = {
-            'de_name': 'Expected Deliveries',
-            'cat_combo': None,
-            'numeric_sum': expected_deliver,
-        }
-        expected_deliver_val.update(_group_ou_dict)
-        calculated_vals.append(expected_deliver_val)
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_under_1_pop = catchment_pop['numeric_sum'] * Decimal(0.043)
-        else:
-            expected_under_1_pop = None
-        expected_under_1_pop_val = {
-            'de_name': 'Number of children below one year in a given population',
-            'cat_combo': None,
-            'numeric_sum': expected_under_1_pop,
-        }
-        expected_under_1_pop_val.update(_group_ou_dict)
-        calculated_vals.append(expected_under_1_pop_val)
-
-        if all_not_none(catchment_pop['numeric_sum']):
-            expected_under_5_malaria = (catchment_pop['numeric_sum'] * Decimal(0.177))/4 # split by quarter
-        else:
-            expected_under_5_malaria = None
-        expected_under_5_malaria_val = {
-            'de_name': 'Expected under-five with positive test for malaria',
-            'cat_combo': None,
-            'numeric_sum': expected_under_5_malaria,
-        }
-        expected_under_5_malaria_val.update(_group_ou_dict)
-        calculated_vals.append(expected_under_5_malaria_val)
-
-        if all_not_none(pnc_6_hours['numeric_sum'], expected_deliver) and expected_deliver:
-            pnc_6_days_percent = 100 * pnc_6_hours['numeric_sum'] / expected_deliver
-        else:
-            pnc_6_days_percent = None
-        pnc_6_days_percent_val = {
-            'de_name': '% of Mothers receiving PNC checks within 6 days----Target=60%',
-            'cat_combo': None,
-            'numeric_sum': pnc_6_days_percent,
-        }
-        pnc_6_days_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pnc_6_days_percent_val)
-
-        if all_not_none(asyphyxia['numeric_sum'], live_births['numeric_sum']) and live_births['numeric_sum']:
-            asyphyxia_percent = 100 * asyphyxia['numeric_sum'] / live_births['numeric_sum']
-        else:
-            asyphyxia_percent = None
-        asyphyxia_percent_val = {
-            'de_name': '% of babies with Birth Asphyxia ---<1.1',
-            'cat_combo': None,
-            'numeric_sum': asyphyxia_percent,
-        }
-        asyphyxia_percent_val.update(_group_ou_dict)
-        calculated_vals.append(asyphyxia_percent_val)
-
-        expected_live = sum_zero(expected_deliver) - sum_zero(still_fresh['numeric_sum'], still_macerated['numeric_sum'])
-        if all_not_none(neonatal_sepsis['numeric_sum'], expected_live) and expected_live:
-            sepsis_percent = 100 * neonatal_sepsis['numeric_sum'] / expected_live
-        else:
-            sepsis_percent = None
-        sepsis_percent_val = {
-            'de_name': '% of neonates (aged 0 -28 days) presenting to health facilities with sepsis/infections <1.1',
-            'cat_combo': None,
-            'numeric_sum': sepsis_percent,
-        }
-        sepsis_percent_val.update(_group_ou_dict)
-        calculated_vals.append(sepsis_percent_val)
-
-        if all_not_none(dpt3_under1['numeric_sum'], expected_under_1_pop) and expected_under_1_pop:
-            dpt3_percent = 100 * dpt3_under1['numeric_sum'] / expected_under_1_pop
-        else:
-            dpt3_percent = None
-        dpt3_percent_val = {
-            'de_name': 'DPT 3 coverage--Target=97%',
-            'cat_combo': None,
-            'numeric_sum': dpt3_percent,
-        }
-        dpt3_percent_val.update(_group_ou_dict)
-        calculated_vals.append(dpt3_percent_val)
-
-        if all_not_none(bcg_under1['numeric_sum'], expected_under_1_pop) and expected_under_1_pop:
-            bcg_percent = 100 * bcg_under1['numeric_sum'] / expected_under_1_pop
-        else:
-            bcg_percent = None
-        bcg_percent_val = {
-            'de_name': 'BCGCoverage---Target=97%',
-            'cat_combo': None,
-            'numeric_sum': bcg_percent,
-        }
-        bcg_percent_val.update(_group_ou_dict)
-        calculated_vals.append(bcg_percent_val)
-
-        if all_not_none(polio3_under1['numeric_sum'], expected_under_1_pop) and expected_under_1_pop:
-            polio3_percent = 100 * polio3_under1['numeric_sum'] / expected_under_1_pop
-        else:
-            polio3_percent = None
-        polio3_percent_val = {
-            'de_name': 'Polio3 Coverage---97%',
-            'cat_combo': None,
-            'numeric_sum': polio3_percent,
-        }
-        polio3_percent_val.update(_group_ou_dict)
-        calculated_vals.append(polio3_percent_val)
-
-        if all_not_none(malaria_conf_under5['numeric_sum']) and malaria_under5['numeric_sum']:
-            malaria_conf_lab_under5_percent = 100 * malaria_conf_under5['numeric_sum'] / malaria_under5['numeric_sum']
-        else:
-            malaria_conf_lab_under5_percent = None
-        malaria_conf_lab_under5_percent_val = {
-            'de_name': '% of children U5 diagnosed with malaria who have laboratory confirmation.-----90%',
-            'cat_combo': None,
-            'numeric_sum': malaria_conf_lab_under5_percent,
-        }
-        malaria_conf_lab_under5_percent_val.update(_group_ou_dict)
-        calculated_vals.append(malaria_conf_lab_under5_percent_val)
-
-        if all_not_none(malaria_conf_under5['numeric_sum']) and expected_under_5_malaria:
-            malaria_conf_under5_percent = 100 * malaria_conf_under5['numeric_sum'] / expected_under_5_malaria
-        else:
-            malaria_conf_under5_percent = None
-        malaria_conf_under5_percent_val = {
-            'de_name': '% 0f children under five with confirmed malaria---Target<20%',
-            'cat_combo': None,
-            'numeric_sum': malaria_conf_under5_percent,
-        }
-        malaria_conf_under5_percent_val.update(_group_ou_dict)
-        calculated_vals.append(malaria_conf_under5_percent_val)
-
-        if all_not_none(acute_diarr_under5['numeric_sum']) and new_attend_under5['numeric_sum']:
-            acute_diarr_under5_percent = 100 * acute_diarr_under5['numeric_sum'] / new_attend_under5['numeric_sum']
-        else:
-            acute_diarr_under5_percent = None
-        acute_diarr_under5_percent_val = {
-            'de_name': '% under 5 treated with diarrhorea---Target=<20%',
-            'cat_combo': None,
-            'numeric_sum': acute_diarr_under5_percent,
-        }
-        acute_diarr_under5_percent_val.update(_group_ou_dict)
-        calculated_vals.append(acute_diarr_under5_percent_val)
-
-        if all_not_none(pneum_under5['numeric_sum']) and new_attend_under5['numeric_sum']:
-            pneum_under5_percent = 100 * pneum_under5['numeric_sum'] / new_attend_under5['numeric_sum']
-        else:
-            pneum_under5_percent = None
-        pneum_under5_percent_val = {
-            'de_name': '% under 5 treated with pneumonia----Target=<20%',
-            'cat_combo': None,
-            'numeric_sum': pneum_under5_percent,
-        }
-        pneum_under5_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pneum_under5_percent_val)
+    def mnch_subcounty_matrix():
+        # data is collected at facility and subcounty level, the district level is rolled up from the subcounty matrix
+        OU_PATH_FIELDS = OrgUnit.level_fields(2)[1:] # skip the topmost/country level
+        # annotations for data collected at facility level
+        FACILITY_LEVEL_ANNOTATIONS = { k:v for k,v in OrgUnit.level_annotations(3, prefix='org_unit__').items() if k in OU_PATH_FIELDS }
+        # annotations for data collected at subcounty level
+        SUBCOUNTY_LEVEL_ANNOTATIONS = OrgUnit.level_annotations(2, prefix='org_unit__')
+
+        ou_list = dims.ou_paths(2, filter_district)
+        period_rows = [ou_path + (p,) for ou_path in ou_list for p in periods]
+        year_rows = [ou_path + (p[:4],) for ou_path in ou_list for p in periods] # each period gets the annual values for its year
+
+        def ou_period_from_dict(v_dict):
+            return ou_path_from_dict(v_dict) + (v_dict['period'],)
+
+        def orgunit_vs_de_catcombo_default(row, col):
+            val_dict = dict(zip(OU_PATH_FIELDS, row))
+            de_name, subcategory = col
+            val_dict.update({ 'cat_combo': subcategory, 'de_name': de_name, 'numeric_sum': None })
+            return val_dict
+
+        qs_targets = DataValue.objects.what(*targets_de_names)
+        qs_targets = qs_targets.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_targets = qs_targets.where(filter_district)
+        qs_targets = qs_targets.annotate(**SUBCOUNTY_LEVEL_ANNOTATIONS)
+        # population estimates are annual, so filter by year component of period
+        qs_targets = qs_targets.when(*sorted(set(p[:4] for p in periods)))
+        qs_targets = qs_targets.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_targets = qs_targets.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_targets = list(val_targets)
+
+        gen_raster = pivot(year_rows, de_targets_meta, val_targets, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_targets2 = list(gen_raster)
+
+        qs_maternity = DataValue.objects.what(*maternity_de_names)
+        qs_maternity = qs_maternity.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_maternity = qs_maternity.where(filter_district)
+        qs_maternity = qs_maternity.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_maternity = qs_maternity.when(*periods)
+        qs_maternity = qs_maternity.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_maternity = qs_maternity.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_maternity = list(val_maternity)
+
+        gen_raster = pivot(period_rows, de_maternity_meta, val_maternity, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_maternity2 = list(gen_raster)
+
+        qs_vaccine_under_1 = DataValue.objects.what(*vaccine_under_1_de_names)
+        qs_vaccine_under_1 = qs_vaccine_under_1.filter(category_combo__categories__name='Under 1')
+        qs_vaccine_under_1 = qs_vaccine_under_1.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_vaccine_under_1 = qs_vaccine_under_1.where(filter_district)
+        qs_vaccine_under_1 = qs_vaccine_under_1.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_vaccine_under_1 = qs_vaccine_under_1.when(*periods)
+        qs_vaccine_under_1 = qs_vaccine_under_1.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_vaccine_under_1 = qs_vaccine_under_1.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_vaccine_under_1 = list(val_vaccine_under_1)
+
+        gen_raster = pivot(period_rows, de_vaccine_under_1_meta, val_vaccine_under_1, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_vaccine_under_12 = list(gen_raster)
+
+        qs_under_5 = DataValue.objects.what(*under_5_de_names)
+        qs_under_5 = qs_under_5.filter(category_combo__categories__name__in=under_five_categs)
+        qs_under_5 = qs_under_5.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_under_5 = qs_under_5.where(filter_district)
+        qs_under_5 = qs_under_5.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_under_5 = qs_under_5.when(*periods)
+        qs_under_5 = qs_under_5.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_under_5 = qs_under_5.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_under_5 = list(val_under_5)
+
+        gen_raster = pivot(period_rows, de_under_5_meta, val_under_5, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_under_52 = list(gen_raster)
+
+        qs_other = DataValue.objects.what(*other_de_names)
+        qs_other = qs_other.annotate(cat_combo=Value(None, output_field=CharField()))
+        if filter_district:
+            qs_other = qs_other.where(filter_district)
+        qs_other = qs_other.annotate(**FACILITY_LEVEL_ANNOTATIONS)
+        qs_other = qs_other.when(*periods)
+        qs_other = qs_other.order_by(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period')
+        val_other = qs_other.values(*OU_PATH_FIELDS, 'de_name', 'cat_combo', 'period').annotate(values_count=Count('numeric_value'), numeric_sum=Sum('numeric_value'))
+        val_other = list(val_other)
+
+        gen_raster = pivot(period_rows, de_other_meta, val_other, ou_period_from_dict, lambda x: (x['de_name'], x['cat_combo']), orgunit_vs_de_catcombo_default)
+        val_other2 = list(gen_raster)
+
+        # combine the data and group by district, subcounty and facility
+        grouped_vals = pivot_rows(period_rows, val_targets2, val_maternity2, val_vaccine_under_12, val_under_52, val_other2)
+        if True:
+            grouped_vals = list(filter_empty_rows(grouped_vals))
 
-        if all_not_none(vitamin_a['numeric_sum']) and expected_under_1_pop:
-            vitamin_a_percent = 100 * vitamin_a['numeric_sum'] / expected_under_1_pop
-        else:
-            vitamin_a_percent = None
-        vitamin_a_percent_val = {
-            'de_name': ' Vit A Suplement 2nd Dose COVERAGE  in theYear---Target=97%',
-            'cat_combo': None,
-            'numeric_sum': vitamin_a_percent,
-        }
-        vitamin_a_percent_val.update(_group_ou_dict)
-        calculated_vals.append(vitamin_a_percent_val)
+        return ScorecardMatrix.from_grouped(grouped_vals, data_element_metas)
 
-        if all_not_none(deworm['numeric_sum']) and expected_under_1_pop:
-            deworm_percent = 100 * deworm['numeric_sum'] / expected_under_1_pop
-        else:
-            deworm_percent = None
-        deworm_percent_val = {
-            'de_name': '105-2.8 Dewormed 2nd Dose COVERAGE in the Year----Target=97%',
-            'cat_combo': None,
-            'numeric_sum': deworm_percent,
-        }
-        deworm_percent_val.update(_group_ou_dict)
-        calculated_vals.append(deworm_percent_val)
+    # the subcounty matrix serves every level of this scorecard
+    mnch_matrix = cached_result('mnch_pnc_child_scorecard', (periods, filter_district and filter_district.name), mnch_subcounty_matrix)
+    if trend:
+        ou_headers = ou_headers + ('Period',)
+        mnch_matrix = mnch_matrix.rollup([ou_path + (p,) for ou_path in ou_list for p in periods], by_period=True)
+    else:
+        mnch_matrix = mnch_matrix.rollup(ou_list)
+    mnch_matrix.calculate(mnch_pnc_child_calculations)
 
-        if all_not_none(pcv['numeric_sum']) and expected_under_1_pop:
-            pcv_percent = 100 * pcv['numeric_sum'] / expected_under_1_pop
-        else:
-            pcv_percent = None
-        pcv_percent_val = {
-            'de_name': 'PCV3 Coverage----Target=97%',
-            'cat_combo': None,
-            'numeric_sum': pcv_percent,
-        }
-        pcv_percent_val.update(_group_ou_dict)
-        calculated_vals.append(pcv_percent_val)
-
-        # _group[1].extend(calculated_vals)
-        _group[1] = calculated_vals # hide source values
-
-    data_element_metas = list() # hide source values
-    data_element_metas += list(product(['Expected Deliveries (4.8 % of population)'], (None,)))
-    data_element_metas += list(product(['Number of children below one year in a given population (4.3 % of population)'], (None,)))
-    data_element_metas += list(product(['Expected under-five with positive test for malaria (17.7 % of population)'], (None,)))
-    data_element_metas += list(product(['% of Mothers receiving PNC checks within 6 days----Target=60%'], (None,)))
-    data_element_metas += list(product(['% of babies with Birth Asphyxia ---<1.1'], (None,)))
-    data_element_metas += list(product(['% of neonates (aged 0 -28 days) presenting to health facilities with sepsis/infections <1.1'], (None,)))
-    data_element_metas += list(product(['DPT 3 coverage--Target=97% '], (None,)))
-    data_element_metas += list(product(['BCGCoverage---Target=97%'], (None,)))
-    data_element_metas += list(product(['Polio3 Coverage---97%'], (None,)))
-    data_element_metas += list(product(['% of children U5 diagnosed with malaria who have laboratory confirmation.-----90%'], (None,)))
-    data_element_metas += list(product(['% 0f children under five with confirmed malaria---Target<20%'], (None,)))
-    data_element_metas += list(product(['% under 5 treated with diarrhorea---Target=<20%'], (None,)))
-    data_element_metas += list(product(['% under 5 treated with pneumonia----Target=<20%'], (None,)))
-    data_element_metas += list(product([' Vit A Suplement 2nd Dose COVERAGE  in theYear---Target=97%'], (None,)))
-    data_element_metas += list(product(['105-2.8 Dewormed 2nd Dose COVERAGE in the Year----Target=97%'], (None,)))
-    data_element_metas += list(product(['PCV3 Coverage----Target=97%'], (None,)))
+    data_element_metas = list(MNCH_PNC_CHILD_COLUMNS) # hide source values
 
 
     num_path_elements = len(ou_headers)
@@ -6956,42 +5175,19 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
     vita_deworm_pcv_ls.mappings[num_path_elements+15] = True
     legend_sets.append(vita_deworm_pcv_ls)
 
+    table = TableParams.from_request(request)
+    if trend:
+        # the change since the previous period needs the rows of the previous period, so pick the rows out of the grid
+        grouped_vals = table.apply(mnch_matrix.to_grid(OU_PATH_FIELDS + ('period',), data_element_metas, dict(zip(periods[1:], periods))), len(ou_headers), legend_sets)
+    else:
+        # only copy out the rows of the page
+        mnch_matrix = mnch_matrix.take(table.matrix_rows(mnch_matrix, data_element_metas, len(ou_headers), legend_sets))
+        grouped_vals = mnch_matrix.to_grid(OU_PATH_FIELDS, data_element_metas)
+
     if output_format == 'EXCEL':
-        wb = openpyxl.workbook.Workbook()
-        ws = wb.active # workbooks are created with at least one worksheet
-        ws.title = 'Sheet1' # unfortunately it is named "Sheet" not "Sheet1"
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-
-        headers = chain(ou_headers, data_element_metas)
-        for i, name in enumerate(headers, start=1):
-            c = ws.cell(row=1, column=i)
-            if not isinstance(name, tuple):
-                c.value = str(name)
-            else:
-                de, cat_combo = name
-                if cat_combo is None:
-                    c.value = str(de)
-                else:
-                    c.value = str(de) + '\n' + str(cat_combo)
-        for i, g in enumerate(grouped_vals, start=2):
-            ou_path, g_val_list = g
-            for col_idx, ou in enumerate(ou_path, start=1):
-                ws.cell(row=i, column=col_idx, value=ou)
-            for j, g_val in enumerate(g_val_list, start=len(ou_path)+1):
-                ws.cell(row=i, column=j, value=g_val['numeric_sum'])
-
-        for ls in legend_sets:
-            # apply conditional formatting from LegendSets
-            for rule in ls.openpyxl_rules():
-                for cell_range in ls.excel_ranges():
-                    ws.conditional_formatting.add(cell_range, rule)
-
-
-        response = HttpResponse(openpyxl.writer.excel.save_virtual_workbook(wb), content_type='application/vnd.ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="mnch_pnc_child_{0}_scorecard.xlsx"'.format(OrgUnit.get_level_field(org_unit_level))
-
-        return response
+        return scorecard_excel_response('mnch_pnc_child_{0}_scorecard.xlsx'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals, legend_sets)
+    if output_format == 'CSV':
+        return scorecard_csv_response('mnch_pnc_child_{0}_scorecard.csv'.format(OrgUnit.get_level_field(org_unit_level)), ou_headers, data_element_metas, grouped_vals)
 
 
     context = {
@@ -7000,10 +5196,81 @@ def mnch_pnc_child_scorecard(request, org_unit_level=2, output_format='HTML'):
         'data_element_names': data_element_metas,
         'legend_sets': legend_sets,
         'period_desc': period_desc,
+        'trend': trend,
+        'start_period': periods[0] if trend else None,
+        'end_period': periods[-1] if trend else None,
         'period_list': PREV_5YR_QTRS,
         'district_list': DISTRICT_LIST,
         'excel_url': make_excel_url(request.path),
+        'csv_url': make_csv_url(request.path),
         'legend_set_mappings': { tuple([i-len(ou_headers) for i in ls.mappings]):ls.canonical_name() for ls in legend_sets },
+        'table': table,
     }
 
+    if output_format == 'JSON':
+        return scorecard_json(request, context)
+
     return render(request, 'cannula/mnch_pnc_child_{0}.html'.format(OrgUnit.get_level_field(org_unit_level)), context)
+
+@login_required
+def data_values_csv(request):
+    """
+    The data values of the data elements (de=, by name or alias, may be
+    repeated) of a district, from start_period to end_period, as CSV
+    """
+    de_names = request.GET.getlist('de')
+    if not de_names:
+        # rather than every data value there is
+        raise Http404("Data element is missing, use de= (may be repeated)")
+    district = request.GET.get('district') or None
+
+    qs = DataValue.objects.what(*de_names)
+    if district:
+        qs = qs.where(district)
+    try:
+        qs = qs.filter(period_range_filter(request.GET.get('start_period'), request.GET.get('end_period')))
+    except ValueError:
+        raise Http404("Period is invalid, use a month (2017-09), quarter (2017-Q3) or year (2017)")
+
+    return data_values_csv_response('data_values.csv', qs)
+
+PROFILE_MAX_QUARTERS = 20
+
+@login_required
+def facility_profile(request, output_format='HTML'):
+    this_day = date.today()
+    this_year = this_day.year
+    PREV_5YR_QTRS = dimensions.prev_5yr_quarters(this_day)
+
+    facility = get_object_or_404(OrgUnit, id=parse_int(request.GET.get('facility')))
+    ou_path = tuple(facility.get_ancestors(include_self=True).values_list('name', flat=True))[1:] # skip the topmost/country level
+
+    if 'period' in request.GET and request.GET['period'] in PREV_5YR_QTRS:
+        filter_period=request.GET['period']
+    else:
+        filter_period = '%d-Q%d' % (this_year, month2quarter(this_day.month))
+
+    # the trend over the quarters up to filter_period
+    num_quarters = min(max(parse_int(request.GET.get('quarters'), 4), 1), PROFILE_MAX_QUARTERS)
+    end_index = PREV_5YR_QTRS.index(filter_period)
+    periods = list(reversed(PREV_5YR_QTRS[end_index:end_index+num_quarters]))
+    period_desc = dateutil.DateSpan.fromquarter(periods[0]).combine(dateutil.DateSpan.fromquarter(periods[-1])).format_long()
+
+    # every program from one query of the facility's values
+    matrices = cached_result('facility_profile', (facility.id, periods), lambda: indicators.facility_profile(facility, periods))
+
+    context = {
+        'facility': facility,
+        'ou_path': ou_path,
+        'periods': periods,
+        'programs': [(program.name, reverse(program.scorecard), rows) for program, rows in indicators.profile_tables(matrices)],
+        'period_desc': period_desc,
+        'period_list': PREV_5YR_QTRS,
+        'filter_period': filter_period,
+        'num_quarters': num_quarters,
+    }
+
+    if output_format == 'JSON':
+        return profile_json(request, context)
+
+    return render(request, 'cannula/facility_profile.html', context)
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import RequestFactory
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from . import dimensions
+from .dateutil import current_and_previous_periods
+
+logger = logging.getLogger(__name__)
+
+def scorecard_url_patterns(levels=None, output_formats=('HTML',)):
+    """Routed scorecard URLs (those served through the scorecard cache)"""
+    from .urls import urlpatterns
+
+    for pattern in urlpatterns:
+        period_type = getattr(pattern.callback, 'scorecard_period_type', None)
+        if period_type is None:
+            continue
+        view_kwargs = pattern.default_args
+        if view_kwargs.get('output_format', 'HTML') not in output_formats:
+            continue
+        if levels is not None and view_kwargs.get('org_unit_level') not in levels:
+            continue
+        yield pattern, period_type
+
+def scorecard_warm_requests(levels=None, output_formats=('HTML',), districts=None):
+    """
+    Every scorecard x level x (all districts + each district) x (default,
+    current and previous period)
+    """
+    if districts is None:
+        districts = dimensions.current().district_list
+
+    for pattern, period_type in scorecard_url_patterns(levels, output_formats):
+        for district in [None] + list(districts):
+            for period in (None,) + current_and_previous_periods(period_type):
+                params = { 'period': period } if period else {}
+                if district:
+                    params['district'] = district
+                yield reverse(pattern.name), pattern.callback, pattern.default_args, params
+
+def warm_scorecard(user, path, view, view_kwargs, params):
+    request = RequestFactory().get(path, params)
+    request.user = user
+    try:
+        response = view(request, **view_kwargs)
+        if response.streaming:
+            # streamed responses are only cached once they have been sent in full
+            for chunk in response.streaming_content:
+                pass
+            response.close()
+        logger.debug((path, params, response.status_code))
+        return response.status_code
+    finally:
+        connection.close() # each worker thread has its own connection
+
+def warm_scorecards(user, concurrency=None, levels=None, output_formats=('HTML',), districts=None):
+    """
+    Render scorecards into the scorecard cache, using a pool of worker threads.
+    Returns the number of scorecards rendered
+    """
+    if concurrency is None:
+        concurrency = getattr(settings, 'SCORECARD_WARM_CONCURRENCY', 2)
+
+    warm_requests = list(scorecard_warm_requests(levels, output_formats, districts))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(warm_scorecard, user, *r) for r in warm_requests]
+        for f in futures:
+            f.result() # re-raise any exception from the worker
+
+    return len(warm_requests)
+
+def warm_user(username=None):
+    """The (active) user the scorecards are rendered for, as login is required"""
+    User = get_user_model()
+    users = User.objects.filter(is_active=True)
+    if username:
+        return users.get(username=username)
+    return users.filter(is_superuser=True).order_by('id').first()
+
+def warm_scorecards_after_import():
+    """
+    Post-import hook. Must only be called once the import has been committed,
+    otherwise the workers would render the old data
+    """
+    if not getattr(settings, 'SCORECARD_WARM_AFTER_IMPORT', False):
+        return
+
+    user = warm_user()
+    if user is None:
+        logger.warning('No active superuser to warm the scorecard cache for')
+        return
+
+    output_formats = ('HTML', 'EXCEL') if getattr(settings, 'SCORECARD_WARM_EXCEL_AFTER_IMPORT', False) else ('HTML',)
+
+    def run():
+        try:
+            warm_scorecards(user, output_formats=output_formats)
+        except Exception:
+            logger.exception('Warming the scorecard cache failed')
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name='warm_scorecards', daemon=True).start()
@@ -53,6 +53,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'cannula.profiling.ProfilingMiddleware',
 )
 
 ROOT_URLCONF = 'rhites_ec_www.urls'
@@ -92,6 +93,61 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/1.8/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # rendered scorecards, shared by all the worker processes on this host
+    'scorecards': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'scorecard_cache'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+SCORECARD_CACHE = 'scorecards'
+SCORECARD_WARM_CONCURRENCY = 2 # scorecards rendered at once by the cache warmer
+SCORECARD_WARM_AFTER_IMPORT = True
+SCORECARD_WARM_EXCEL_AFTER_IMPORT = False # also build the Excel exports after each import
+VALIDATION_MATERIALIZED_VIEWS = False # create validation rule views as materialized views, refreshed after imports (rules must be saved again to switch)
+SCORECARD_EXPORT_CACHE_DIR = os.path.join(BASE_DIR, 'export_cache') # Excel exports kept between downloads, None to rebuild them each time
+SCORECARD_EXPORT_CACHE_MAX_BYTES = 2*1024**3 # least recently downloaded exports are removed beyond this
+SCORECARD_QUERY_CONCURRENCY = 1 # queries of one scorecard run at once (each on its own connection), 1 to run them in turn
+SCORECARD_BUNDLE_PROCESSES = 2 # scorecards computed at once for an exported bundle (each in a process of its own)
+SCORECARD_PROFILING = False # profile every request, not only those of staff users asking with ?profile
+
+
+# Logging
+# https://docs.djangoproject.com/en/1.8/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        # one JSON object per line, to aggregate request profiles across days
+        'profiling': {
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'profiling.log'),
+            'when': 'midnight',
+            'backupCount': 30,
+        },
+    },
+    'loggers': {
+        'cannula.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 